@@ -21,19 +21,9 @@ Autor: Green David s.r.o.
 Verze: 2.0 (Master Prompt V2 compliant)
 """
 
-from datetime import datetime, timedelta
 import json
-import sqlite3
-from typing import List, Dict, Optional, Any
-
-# Reference na get_db
-get_db = None
-
-def get_db_with_row_factory():
-    db = get_db()
-    db.row_factory = sqlite3.Row
-    return db
-
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
 # =============================================================================
 # 1. CAUSAL ENGINE - ROOT CAUSE ANALÝZA
@@ -12,21 +12,16 @@ Autor: Green David s.r.o.
 Verze: 1.0
 """
 
-from flask import jsonify, request
-from datetime import datetime, timedelta
-from functools import wraps
 import json
 import math
+from datetime import datetime, timedelta
+from functools import wraps
 
-# Reference na get_db - nastaví se z main.py
-get_db = None
+from flask import jsonify, request
+
+from ai_operator_facts import RuleFacts
+from app.database import get_db
 
-def get_db_with_row_factory():
-    """Získej DB connection s row_factory pro dict přístup"""
-    import sqlite3
-    db = get_db()  # Volá správně get_db(), ne sám sebe!
-    db.row_factory = sqlite3.Row
-    return db
 
 def login_required(f):
     @wraps(f)
@@ -41,8 +36,10 @@ def login_required(f):
 def get_ai_dashboard():
     """Hlavní AI dashboard - RULE ENGINE V1"""
     try:
-        db = get_db_with_row_factory()
+        db = get_db()
         today = datetime.now().date()
+        # Sdílené agregace (zakázky, hodiny týmu, sklad) pro všechna pravidla níže
+        facts = RuleFacts(db, today)
         
         # Sbíráme všechna varování a doporučení
         warnings = []
@@ -53,23 +50,23 @@ def get_ai_dashboard():
         # =====================================================================
         
         # 1. Zakázka > 110% rozpočtu
-        budget_warnings = get_budget_warnings(db)
+        budget_warnings = get_budget_warnings(db, facts)
         warnings.extend(budget_warnings)
         
         # 2. Zaměstnanec > 45h týdně
-        overwork_warnings = get_overwork_warnings(db, today)
+        overwork_warnings = get_overwork_warnings(db, today, facts)
         warnings.extend(overwork_warnings)
         
         # 3. Materiál pod minimem
-        stock_warnings = get_stock_warnings(db)
+        stock_warnings = get_stock_warnings(db, facts)
         warnings.extend(stock_warnings)
         
         # 4. Zakázka bez aktivity 5+ dní
-        inactive_warnings = get_inactive_job_warnings(db, today)
+        inactive_warnings = get_inactive_job_warnings(db, today, facts)
         warnings.extend(inactive_warnings)
         
         # 5. Zpožděné zakázky
-        delay_warnings = get_delay_warnings(db, today)
+        delay_warnings = get_delay_warnings(db, today, facts)
         warnings.extend(delay_warnings)
         
         # 6. Úkoly bez přiřazení blízko deadline
@@ -85,15 +82,15 @@ def get_ai_dashboard():
         recommendations.extend(weather_recs)
         
         # 2. Přetížení/volno zaměstnanců
-        workload_recs = get_workload_recommendations(db, today)
+        workload_recs = get_workload_recommendations(db, today, facts)
         recommendations.extend(workload_recs)
         
         # 3. Materiál pro nadcházející zakázky
-        material_recs = get_material_recommendations(db, today)
+        material_recs = get_material_recommendations(db, today, facts)
         recommendations.extend(material_recs)
         
         # 4. Zakázky k dokončení
-        completion_recs = get_completion_recommendations(db, today)
+        completion_recs = get_completion_recommendations(db, today, facts)
         recommendations.extend(completion_recs)
         
         # =====================================================================
@@ -125,7 +122,7 @@ def get_ai_dashboard():
             'recommendations': recommendations,
             'recommendations_count': len(recommendations),
             'today_actions': today_actions,
-            'workload_balance': get_workload_balance_data(db, today),
+            'workload_balance': get_workload_balance_data(db, today, facts=facts),
             'weather_alerts': get_weather_alerts_data(db, today),
             'material_predictions': get_material_predictions_data(db)
         }
@@ -150,23 +147,17 @@ def get_ai_dashboard():
 # PRAVIDLA VAROVÁNÍ (Rule Engine)
 # =============================================================================
 
-def get_budget_warnings(db):
+def get_budget_warnings(db, facts=None):
     """Zakázky přes 110% rozpočtu"""
     warnings = []
     try:
-        jobs = db.execute('''
-            SELECT j.id, j.client, j.name, j.estimated_value, j.actual_value,
-                   CASE WHEN j.estimated_value > 0 
-                        THEN (COALESCE(j.actual_value, 0) / j.estimated_value) * 100 
-                        ELSE 0 END as percent_used
-            FROM jobs j
-            WHERE j.estimated_value > 0
-            AND j.status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-            AND COALESCE(j.actual_value, 0) > j.estimated_value * 1.1
-        ''').fetchall()
+        facts = facts or RuleFacts(db, datetime.now().date())
+        jobs = [j for j in facts.open_jobs()
+                if (j.get('estimated_value') or 0) > 0
+                and (j.get('actual_value') or 0) > j['estimated_value'] * 1.1]
         
         for job in jobs:
-            percent = job['percent_used']
+            percent = (job['actual_value'] or 0) / job['estimated_value'] * 100
             warnings.append({
                 'id': f"budget_{job['id']}",
                 'type': 'budget_overrun',
@@ -186,26 +177,15 @@ def get_budget_warnings(db):
     return warnings
 
 
-def get_overwork_warnings(db, today):
+def get_overwork_warnings(db, today, facts=None):
     """Zaměstnanci přes 45h týdně"""
     warnings = []
     try:
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        employees = db.execute('''
-            SELECT e.id, e.name, COALESCE(SUM(t.hours), 0) as hours_this_week
-            FROM employees e
-            LEFT JOIN timesheets t ON t.employee_id = e.id
-                AND (t.date BETWEEN ? AND ? OR t.date BETWEEN ? AND ?)
-            WHERE e.status = 'active'
-            GROUP BY e.id
-            HAVING hours_this_week > 45
-        ''', (week_start.isoformat(), week_end.isoformat(),
-              week_start.strftime('%d.%m.%Y'), week_end.strftime('%d.%m.%Y'))).fetchall()
+        facts = facts or RuleFacts(db, today)
+        employees = [e for e in facts.active_employees() if e['hours'] > 45]
         
         for emp in employees:
-            hours = emp['hours_this_week']
+            hours = emp['hours']
             warnings.append({
                 'id': f"overwork_{emp['id']}",
                 'type': 'overwork',
@@ -225,26 +205,21 @@ def get_overwork_warnings(db, today):
     return warnings
 
 
-def get_stock_warnings(db):
+def get_stock_warnings(db, facts=None):
     """Materiál pod minimálním stavem"""
     warnings = []
     try:
-        items = db.execute('''
-            SELECT id, name, qty, minStock, unit
-            FROM warehouse_items
-            WHERE status = 'active'
-            AND qty < minStock
-            AND minStock > 0
-        ''').fetchall()
+        facts = facts or RuleFacts(db, datetime.now().date())
+        items = facts.low_stock()
         
         for item in items:
-            ratio = item['qty'] / item['minStock'] if item['minStock'] > 0 else 0
+            ratio = item['qty'] / item['min_qty'] if item['min_qty'] > 0 else 0
             warnings.append({
                 'id': f"stock_{item['id']}",
                 'type': 'low_stock',
                 'severity': 'critical' if ratio < 0.3 else 'high' if ratio < 0.5 else 'medium',
                 'title': f"📦 Dochází: {item['name']}",
-                'detail': f"{item['qty']:.0f} {item['unit']} (min: {item['minStock']:.0f})",
+                'detail': f"{item['qty']:.0f} {item['unit']} (min: {item['min_qty']:.0f})",
                 'entity': 'warehouse',
                 'entity_id': item['id'],
                 'action': {
@@ -258,21 +233,16 @@ def get_stock_warnings(db):
     return warnings
 
 
-def get_inactive_job_warnings(db, today):
+def get_inactive_job_warnings(db, today, facts=None):
     """Zakázky bez aktivity 5+ dní"""
     warnings = []
     try:
         five_days_ago = today - timedelta(days=5)
+        facts = facts or RuleFacts(db, today)
         
-        jobs = db.execute('''
-            SELECT j.id, j.client, j.name, j.status,
-                   MAX(t.date) as last_activity
-            FROM jobs j
-            LEFT JOIN timesheets t ON t.job_id = j.id
-            WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'pending')
-            GROUP BY j.id
-            HAVING last_activity IS NULL OR last_activity < ?
-        ''', (five_days_ago.isoformat(),)).fetchall()
+        jobs = [j for j in facts.jobs()
+                if j.get('status') in ('active', 'Aktivní', 'rozpracováno', 'pending')
+                and (j['last_activity'] is None or j['last_activity'] < five_days_ago.isoformat())]
         
         for job in jobs:
             days_inactive = (today - datetime.fromisoformat(job['last_activity']).date()).days if job['last_activity'] else 999
@@ -296,17 +266,13 @@ def get_inactive_job_warnings(db, today):
     return warnings
 
 
-def get_delay_warnings(db, today):
+def get_delay_warnings(db, today, facts=None):
     """Zpožděné zakázky"""
     warnings = []
     try:
-        jobs = db.execute('''
-            SELECT id, client, name, planned_end_date
-            FROM jobs
-            WHERE status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-            AND planned_end_date IS NOT NULL
-            AND planned_end_date < ?
-        ''', (today.isoformat(),)).fetchall()
+        facts = facts or RuleFacts(db, today)
+        jobs = [j for j in facts.open_jobs()
+                if j.get('planned_end_date') and j['planned_end_date'] < today.isoformat()]
         
         for job in jobs:
             days_late = (today - datetime.fromisoformat(job['planned_end_date']).date()).days
@@ -413,22 +379,12 @@ def get_weather_recommendations(db, today):
     return recommendations
 
 
-def get_workload_recommendations(db, today):
+def get_workload_recommendations(db, today, facts=None):
     """Doporučení pro vyrovnání vytížení"""
     recommendations = []
     try:
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        employees = db.execute('''
-            SELECT e.id, e.name, COALESCE(SUM(t.hours), 0) as hours
-            FROM employees e
-            LEFT JOIN timesheets t ON t.employee_id = e.id
-                AND (t.date BETWEEN ? AND ? OR t.date BETWEEN ? AND ?)
-            WHERE e.status = 'active'
-            GROUP BY e.id
-        ''', (week_start.isoformat(), week_end.isoformat(),
-              week_start.strftime('%d.%m.%Y'), week_end.strftime('%d.%m.%Y'))).fetchall()
+        facts = facts or RuleFacts(db, today)
+        employees = facts.active_employees()
         
         if employees:
             avg_hours = sum(e['hours'] for e in employees) / len(employees)
@@ -456,25 +412,20 @@ def get_workload_recommendations(db, today):
     return recommendations
 
 
-def get_material_recommendations(db, today):
+def get_material_recommendations(db, today, facts=None):
     """Doporučení pro objednání materiálu"""
     recommendations = []
     try:
-        # Materiály pod minimem
-        low_stock = db.execute('''
-            SELECT id, name, qty, minStock, unit
-            FROM warehouse_items
-            WHERE status = 'active' AND qty < minStock * 1.2 AND minStock > 0
-            ORDER BY (qty / minStock) ASC
-            LIMIT 5
-        ''').fetchall()
+        # Materiály pod minimem (+20% rezerva)
+        facts = facts or RuleFacts(db, today)
+        low_stock = facts.low_stock(factor=1.2)[:5]
         
         if low_stock:
-            items_list = ', '.join([f"{i['name']} ({i['qty']:.0f}/{i['minStock']:.0f})" for i in low_stock[:3]])
+            items_list = ', '.join([f"{i['name']} ({i['qty']:.0f}/{i['min_qty']:.0f})" for i in low_stock[:3]])
             recommendations.append({
                 'id': 'material_order',
                 'type': 'material_order',
-                'priority': 'high' if any(i['qty'] < i['minStock'] * 0.5 for i in low_stock) else 'medium',
+                'priority': 'high' if any(i['qty'] < i['min_qty'] * 0.5 for i in low_stock) else 'medium',
                 'title': f"📦 Objednat materiál",
                 'detail': items_list,
                 'suggestion': f"Doporučuji objednat {len(low_stock)} položek",
@@ -489,17 +440,15 @@ def get_material_recommendations(db, today):
     return recommendations
 
 
-def get_completion_recommendations(db, today):
+def get_completion_recommendations(db, today, facts=None):
     """Doporučení k dokončení zakázek"""
     recommendations = []
     try:
         # Zakázky s vysokým progress ale ne dokončené
-        jobs = db.execute('''
-            SELECT id, client, name, progress, completion_percent
-            FROM jobs
-            WHERE status NOT IN ('Dokončeno', 'completed', 'archived')
-            AND (progress >= 90 OR completion_percent >= 90)
-        ''').fetchall()
+        facts = facts or RuleFacts(db, today)
+        jobs = [j for j in facts.jobs()
+                if j.get('status') not in ('Dokončeno', 'completed', 'archived')
+                and ((j.get('progress') or 0) >= 90 or (j.get('completion_percent') or 0) >= 90)]
         
         for job in jobs:
             progress = job['progress'] or job['completion_percent'] or 0
@@ -838,7 +787,7 @@ def get_material_recommendation(item, days_until_empty, daily_usage):
         return f"📋 Naplánovat objednávku do 2 týdnů"
 
 
-def get_workload_balance_data(db, today, period='week'):
+def get_workload_balance_data(db, today, period='week', facts=None):
     """Analýza vytížení zaměstnanců a doporučení vyrovnání"""
     
     # Určení období
@@ -867,21 +816,23 @@ def get_workload_balance_data(db, today, period='week'):
     
     # Získej zaměstnance a jejich hodiny - OPRAVENO pro různé formáty dat
     try:
-        employees = db.execute('''
-            SELECT e.id, e.name, e.role,
-                   COALESCE(SUM(t.hours), 0) as hours_period,
-                   COUNT(DISTINCT t.id) as entries_count
-            FROM employees e
-            LEFT JOIN timesheets t ON t.employee_id = e.id 
-                AND (
-                    t.date BETWEEN ? AND ?
-                    OR t.date BETWEEN ? AND ?
-                )
-            WHERE e.status = 'active' OR e.status IS NULL
-            GROUP BY e.id
-            ORDER BY hours_period DESC
-        ''', (period_start.isoformat(), period_end.isoformat(),
-              period_start.strftime('%d.%m.%Y'), period_end.strftime('%d.%m.%Y'))).fetchall()
+        if period == 'week' and facts is not None:
+            # Aktuální týden už spočítaly sdílené fakty dashboardu
+            employees = [dict(e, hours_period=e['hours'], entries_count=e['entries'])
+                         for e in facts.employee_week_hours()
+                         if e['status'] == 'active' or e['status'] is None]
+        else:
+            employees = db.execute('''
+                SELECT e.id, e.name, e.role,
+                       COALESCE(SUM(t.hours), 0) as hours_period,
+                       COUNT(DISTINCT t.id) as entries_count
+                FROM employees e
+                LEFT JOIN timesheets t ON t.employee_id = e.id
+                    AND t.date_iso BETWEEN ? AND ?
+                WHERE e.status = 'active' OR e.status IS NULL
+                GROUP BY e.id
+                ORDER BY hours_period DESC
+            ''', (period_start.isoformat(), period_end.isoformat())).fetchall()
     except Exception as e:
         print(f"Workload query error: {e}")
         employees = []
@@ -1066,7 +1017,7 @@ def get_anomalies_data(db, today):
 def get_planning_optimization():
     """Optimalizační doporučení pro plánování"""
     try:
-        db = get_db_with_row_factory()
+        db = get_db()
         today = datetime.now().date()
         
         result = {
@@ -1374,7 +1325,7 @@ def get_efficiency_tips(db):
 def get_plant_intelligence():
     """Biointeligence pro správu rostlin"""
     try:
-        db = get_db_with_row_factory()
+        db = get_db()
         today = datetime.now().date()
         
         result = {
@@ -1748,14 +1699,14 @@ def register_routes(app):
     @app.route('/api/ai/material-predictions')
     @login_required
     def api_material_predictions():
-        db = get_db_with_row_factory()
+        db = get_db()
         predictions = get_material_predictions_data(db)
         return jsonify(predictions)
     
     @app.route('/api/ai/workload-analysis')
     @login_required
     def api_workload_analysis():
-        db = get_db_with_row_factory()
+        db = get_db()
         today = datetime.now().date()
         period = request.args.get('period', 'week')
         analysis = get_workload_balance_data(db, today, period)
@@ -1765,14 +1716,14 @@ def register_routes(app):
     @login_required
     def api_jobs_overview():
         """Přehled zakázek s historií"""
-        db = get_db_with_row_factory()
+        db = get_db()
         return jsonify(get_jobs_overview_data(db))
     
     @app.route('/api/ai/timeline-stats')
     @login_required
     def api_timeline_stats():
         """Statistiky z timeline/výkazů"""
-        db = get_db_with_row_factory()
+        db = get_db()
         period = request.args.get('period', 'month')
         return jsonify(get_timeline_stats(db, period))
     
@@ -1780,7 +1731,7 @@ def register_routes(app):
     @login_required
     def api_employee_stats(employee_id):
         """Detailní statistiky zaměstnance"""
-        db = get_db_with_row_factory()
+        db = get_db()
         return jsonify(get_employee_detailed_stats(db, employee_id))
     
     # =================================================================
@@ -1792,7 +1743,7 @@ def register_routes(app):
     def api_get_drafts():
         """Seznam všech čekajících draftů"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             drafts = db.execute('''
                 SELECT id, insight_id, type, title, description, entity, entity_id,
                        status, created_at, payload
@@ -1812,7 +1763,7 @@ def register_routes(app):
         """Vytvoření nového draftu"""
         try:
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             
             db.execute('''
                 INSERT INTO ai_action_drafts (insight_id, type, title, entity, entity_id, payload, status, created_at)
@@ -1838,7 +1789,7 @@ def register_routes(app):
     def api_approve_draft_v2(draft_id):
         """Schválení a provedení draftu"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             
             draft = db.execute('SELECT * FROM ai_action_drafts WHERE id = ?', (draft_id,)).fetchone()
             if not draft:
@@ -1864,7 +1815,7 @@ def register_routes(app):
     def api_reject_draft_v2(draft_id):
         """Zamítnutí draftu"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             
             db.execute('''
                 UPDATE ai_action_drafts 
@@ -1887,7 +1838,7 @@ def register_routes(app):
     def api_snooze_insight_str(insight_id):
         """Odložení insightu na 24h (string ID)"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             snooze_until = (datetime.now() + timedelta(hours=24)).isoformat()
             
             db.execute('''
@@ -1906,7 +1857,7 @@ def register_routes(app):
     def api_dismiss_insight_str(insight_id):
         """Zavření insightu (string ID)"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             
             db.execute('''
                 INSERT OR REPLACE INTO ai_insight_states (insight_id, status, updated_at)
@@ -1928,7 +1879,7 @@ def register_routes(app):
     def api_job_indicators(job_id):
         """Inline indikátory pro konkrétní zakázku"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             today = datetime.now().date()
             indicators = []
             
@@ -1983,7 +1934,7 @@ def register_routes(app):
     def api_all_job_indicators():
         """Indikátory pro všechny aktivní zakázky (pro jobs.html)"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             today = datetime.now().date()
             result = {}
             
@@ -2037,9 +1988,8 @@ def register_routes(app):
         try:
             # Import brain module
             import ai_operator_brain as brain
-            brain.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             result = brain.run_complete_analysis(db)
             
             return jsonify(result)
@@ -2061,9 +2011,8 @@ def register_routes(app):
         """Pouze reflexní mozek (offline capable)"""
         try:
             import ai_operator_brain as brain
-            brain.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             reflex = brain.ReflexEngine(db)
             insights = reflex.run_all_rules()
             
@@ -2087,9 +2036,8 @@ def register_routes(app):
         """Strategický mozek - predikce a porovnání"""
         try:
             import ai_operator_brain as brain
-            brain.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             strategic = brain.StrategicBrain(db)
             
             return jsonify({
@@ -2107,10 +2055,9 @@ def register_routes(app):
         """Zaloguj rozhodnutí pro učení"""
         try:
             import ai_operator_brain as brain
-            brain.get_db = get_db
             
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             learning = brain.LearningLayer(db)
             
             learning.log_decision(
@@ -2131,9 +2078,8 @@ def register_routes(app):
         """Získej vzorce schvalování a úspěšnost"""
         try:
             import ai_operator_brain as brain
-            brain.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             learning = brain.LearningLayer(db)
             
             return jsonify({
@@ -2149,7 +2095,7 @@ def register_routes(app):
     def api_get_preferences():
         """Získej firemní nastavení AI"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             prefs = db.execute('''
                 SELECT key, value, description, updated_at
                 FROM ai_company_preferences
@@ -2166,7 +2112,7 @@ def register_routes(app):
         """Aktualizuj firemní nastavení AI"""
         try:
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             
             for key, value in data.items():
                 db.execute('''
@@ -2192,9 +2138,8 @@ def register_routes(app):
         """Root cause analýza zpoždění zakázky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             causal = adv.CausalEngine(db)
             result = causal.analyze_job_delay(job_id)
             
@@ -2209,9 +2154,8 @@ def register_routes(app):
         """Najdi dostupné pracovníky s ohledem na omezení"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             solver = adv.ConstraintSolver(db)
             
             date = request.args.get('date', datetime.now().date().isoformat())
@@ -2230,9 +2174,8 @@ def register_routes(app):
         """Optimalizuj denní plán"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             solver = adv.ConstraintSolver(db)
             result = solver.optimize_daily_plan(date)
             
@@ -2247,9 +2190,8 @@ def register_routes(app):
         """Vyhodnoť rizika zakázky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             risk_mgr = adv.RiskManager(db)
             risks = risk_mgr.assess_job_risks(job_id)
             
@@ -2264,9 +2206,8 @@ def register_routes(app):
         """Souhrn všech rizik"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             risk_mgr = adv.RiskManager(db)
             summary = risk_mgr.get_risk_summary()
             
@@ -2281,9 +2222,8 @@ def register_routes(app):
         """Kvalita dat entity"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             dq = adv.DataQualityAutopilot(db)
             
             entity_id = request.args.get('id', type=int)
@@ -2300,9 +2240,8 @@ def register_routes(app):
         """Detekuj anomálie v datech"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             dq = adv.DataQualityAutopilot(db)
             anomalies = dq.detect_anomalies()
             
@@ -2317,9 +2256,8 @@ def register_routes(app):
         """Historie rozhodnutí"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             journal = adv.DecisionJournal(db)
             
             entity_type = request.args.get('entity_type')
@@ -2339,10 +2277,9 @@ def register_routes(app):
         """Zaznamenej nové rozhodnutí"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             journal = adv.DecisionJournal(db)
             
             decision_id = journal.record_decision(
@@ -2368,10 +2305,9 @@ def register_routes(app):
         """Schval rozhodnutí"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             journal = adv.DecisionJournal(db)
             
             success = journal.approve_decision(
@@ -2391,10 +2327,9 @@ def register_routes(app):
         """Zaznamenej výsledek rozhodnutí"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             journal = adv.DecisionJournal(db)
             
             success = journal.record_outcome(
@@ -2414,9 +2349,8 @@ def register_routes(app):
         """Získej poučení z rozhodnutí"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             journal = adv.DecisionJournal(db)
             
             decision_type = request.args.get('type')
@@ -2433,9 +2367,8 @@ def register_routes(app):
         """Predikce spotřeby položky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             supply = adv.SupplyChainBrain(db)
             
             days = request.args.get('days', 30, type=int)
@@ -2452,9 +2385,8 @@ def register_routes(app):
         """Dynamické min/max pro položku"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             supply = adv.SupplyChainBrain(db)
             result = supply.calculate_dynamic_minmax(item_id)
             
@@ -2469,9 +2401,8 @@ def register_routes(app):
         """Report mrtvého kapitálu"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             supply = adv.SupplyChainBrain(db)
             report = supply.get_dead_capital_report()
             
@@ -2486,9 +2417,8 @@ def register_routes(app):
         """Timeline zakázky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             replay = adv.MissionReplay(db)
             timeline = replay.get_job_timeline(job_id)
             
@@ -2503,9 +2433,8 @@ def register_routes(app):
         """Incident report zakázky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             replay = adv.MissionReplay(db)
             
             incident_type = request.args.get('type', 'delay')
@@ -2522,9 +2451,8 @@ def register_routes(app):
         """Zjisti potřebnou úroveň schválení"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             hierarchy = adv.DecisionHierarchy(db)
             
             action_type = request.args.get('action', 'general')
@@ -2543,9 +2471,8 @@ def register_routes(app):
         """Kontrola SLA breach"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             hierarchy = adv.DecisionHierarchy(db)
             
             insight_id = request.args.get('insight_id', '')
@@ -2571,9 +2498,8 @@ def register_routes(app):
         """Zero-UI kontextové zobrazení"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             engine = ps.ZeroUIEngine(db)
             
             user_id = request.args.get('user_id', 1, type=int)
@@ -2593,9 +2519,8 @@ def register_routes(app):
         """Kontextové inteligentní pole"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             field = ps.ContextualIntelligenceField(db)
             
             user_id = request.args.get('user_id', 1, type=int)
@@ -2616,9 +2541,8 @@ def register_routes(app):
         """Detekuj narušení plánu"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             sow = ps.SelfOrganizingWork(db)
             
             disruptions = sow.detect_disruptions()
@@ -2634,9 +2558,8 @@ def register_routes(app):
         """Generuj plán reorganizace"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             sow = ps.SelfOrganizingWork(db)
             
             disruptions = sow.detect_disruptions()
@@ -2653,10 +2576,9 @@ def register_routes(app):
         """Vytvoř stín rozhodnutí"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             shadow = ps.DecisionShadow(db)
             
             shadow_id = shadow.cast_shadow(
@@ -2683,9 +2605,8 @@ def register_routes(app):
         """Získej vzorce rozhodování"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             shadow = ps.DecisionShadow(db)
             
             user_id = request.args.get('user_id', type=int)
@@ -2702,9 +2623,8 @@ def register_routes(app):
         """Psychologie organizace"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             shadow = ps.DecisionShadow(db)
             psychology = shadow.get_organizational_psychology()
             
@@ -2719,9 +2639,8 @@ def register_routes(app):
         """Mapa pravděpodobností"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             pv = ps.ProbabilityVisualization(db)
             
             horizon = request.args.get('horizon', 30, type=int)
@@ -2738,10 +2657,9 @@ def register_routes(app):
         """Simulace scénáře"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
             scenario = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             sim = ps.RealitySimulationEngine(db)
             
             result = sim.simulate_scenario(scenario)
@@ -2757,12 +2675,11 @@ def register_routes(app):
         """Porovnání scénářů"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
             data = request.get_json() or {}
             scenarios = data.get('scenarios', [])
             
-            db = get_db_with_row_factory()
+            db = get_db()
             sim = ps.RealitySimulationEngine(db)
             
             result = sim.compare_scenarios(scenarios)
@@ -2778,9 +2695,8 @@ def register_routes(app):
         """Vícevrstvý časový pohled"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             tlv = ps.TimeLayeredView(db)
             
             entity_type = request.args.get('entity_type', 'company')
@@ -2799,9 +2715,8 @@ def register_routes(app):
         """Mapa energie organizace"""
         try:
             import ai_operator_postsoftware as ps
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             dem = ps.DigitalEnergyMap(db)
             
             energy_map = dem.generate_energy_map()
@@ -2824,10 +2739,8 @@ def register_routes(app):
         try:
             import ai_operator_advanced as adv
             import ai_operator_postsoftware as ps
-            adv.get_db = get_db
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             
             # Get job data
             job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
@@ -2941,7 +2854,7 @@ def register_routes(app):
         """Provést AI akci na zakázce"""
         try:
             data = request.get_json() or {}
-            db = get_db_with_row_factory()
+            db = get_db()
             
             # Get job
             job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
@@ -3033,10 +2946,8 @@ def register_routes(app):
         try:
             import ai_operator_advanced as adv
             import ai_operator_postsoftware as ps
-            adv.get_db = get_db
-            ps.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             ghost_plans = []
             
             # Get job
@@ -3099,9 +3010,8 @@ def register_routes(app):
         """Timeline replay zakázky"""
         try:
             import ai_operator_advanced as adv
-            adv.get_db = get_db
             
-            db = get_db_with_row_factory()
+            db = get_db()
             replay = adv.MissionReplay(db)
             timeline = replay.get_job_timeline(job_id)
             
@@ -3120,7 +3030,7 @@ def register_routes(app):
     def api_job_live_metrics(job_id):
         """Živé metriky zakázky - real-time přepočet"""
         try:
-            db = get_db_with_row_factory()
+            db = get_db()
             
             job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
             if not job:
@@ -3297,12 +3207,11 @@ def get_timeline_stats(db, period='month'):
                    COUNT(DISTINCT t.id) as entries
             FROM employees e
             LEFT JOIN timesheets t ON t.employee_id = e.id
-                AND (t.date BETWEEN ? AND ? OR t.date BETWEEN ? AND ?)
+                AND t.date_iso BETWEEN ? AND ?
             WHERE e.status = 'active'
             GROUP BY e.id
             ORDER BY total_hours DESC
-        ''', (start_date.isoformat(), end_date.isoformat(),
-              start_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y'))).fetchall()
+        ''', (start_date.isoformat(), end_date.isoformat())).fetchall()
         
         # Celkové hodiny podle zakázek
         by_job = db.execute('''
@@ -3311,23 +3220,21 @@ def get_timeline_stats(db, period='month'):
                    COUNT(DISTINCT t.id) as entries
             FROM jobs j
             LEFT JOIN timesheets t ON t.job_id = j.id
-                AND (t.date BETWEEN ? AND ? OR t.date BETWEEN ? AND ?)
+                AND t.date_iso BETWEEN ? AND ?
             GROUP BY j.id
             HAVING total_hours > 0
             ORDER BY total_hours DESC
             LIMIT 20
-        ''', (start_date.isoformat(), end_date.isoformat(),
-              start_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y'))).fetchall()
+        ''', (start_date.isoformat(), end_date.isoformat())).fetchall()
         
         # Denní breakdown
         daily = db.execute('''
-            SELECT date, SUM(hours) as total_hours, COUNT(DISTINCT employee_id) as workers
+            SELECT date_iso as date, SUM(hours) as total_hours, COUNT(DISTINCT employee_id) as workers
             FROM timesheets
-            WHERE date BETWEEN ? AND ? OR date BETWEEN ? AND ?
-            GROUP BY date
-            ORDER BY date
-        ''', (start_date.isoformat(), end_date.isoformat(),
-              start_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y'))).fetchall()
+            WHERE date_iso BETWEEN ? AND ?
+            GROUP BY date_iso
+            ORDER BY date_iso
+        ''', (start_date.isoformat(), end_date.isoformat())).fetchall()
         
         total_hours = sum(e['total_hours'] or 0 for e in by_employee)
         
@@ -3380,8 +3287,8 @@ def get_employee_detailed_stats(db, employee_id):
                 COALESCE(AVG(hours), 0) as avg_hours_per_entry
             FROM timesheets
             WHERE employee_id = ?
-            AND (date >= ? OR date >= ?)
-        ''', (employee_id, month_ago.isoformat(), month_ago.strftime('%d.%m.%Y'))).fetchone()
+            AND date_iso >= ?
+        ''', (employee_id, month_ago.isoformat())).fetchone()
         
         # Zakázky na kterých pracoval
         jobs_worked = db.execute('''
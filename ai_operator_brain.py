@@ -19,19 +19,10 @@ Autor: Green David s.r.o.
 Verze: 3.0 (Master Prompt compliant)
 """
 
-from datetime import datetime, timedelta
 import json
-import sqlite3
-
-# Reference na get_db
-get_db = None
-
-def get_db_with_row_factory():
-    """Získej DB connection s row_factory"""
-    db = get_db()
-    db.row_factory = sqlite3.Row
-    return db
+from datetime import datetime, timedelta
 
+from ai_operator_facts import CLOSED_JOB_STATUSES, RuleFacts
 
 # =============================================================================
 # REFLEXNÍ MOZEK - OFFLINE ENGINE
@@ -47,6 +38,8 @@ class ReflexEngine:
         self.db = db
         self.today = datetime.now().date()
         self.insights = []
+        # Sdílené agregace (zakázky, hodiny týmu, sklad) pro všechna pravidla
+        self.facts = RuleFacts(db, self.today)
         
         # Načtení company preferences
         self.preferences = self._load_preferences()
@@ -137,13 +130,8 @@ class ReflexEngine:
     def _check_job_deadline_passed(self):
         """T1: Zakázky po termínu"""
         try:
-            jobs = self.db.execute('''
-                SELECT id, client, name, planned_end_date
-                FROM jobs
-                WHERE status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND planned_end_date IS NOT NULL
-                AND planned_end_date < ?
-            ''', (self.today.isoformat(),)).fetchall()
+            jobs = [j for j in self.facts.open_jobs()
+                    if j.get('planned_end_date') and j['planned_end_date'] < self.today.isoformat()]
             
             for job in jobs:
                 days_late = (self.today - datetime.strptime(job['planned_end_date'], '%Y-%m-%d').date()).days
@@ -167,13 +155,9 @@ class ReflexEngine:
         """T2: Deadline se blíží (do 3 dnů)"""
         try:
             deadline_soon = self.today + timedelta(days=3)
-            jobs = self.db.execute('''
-                SELECT id, client, name, planned_end_date, progress
-                FROM jobs
-                WHERE status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND planned_end_date IS NOT NULL
-                AND planned_end_date BETWEEN ? AND ?
-            ''', (self.today.isoformat(), deadline_soon.isoformat())).fetchall()
+            jobs = [j for j in self.facts.open_jobs()
+                    if j.get('planned_end_date')
+                    and self.today.isoformat() <= j['planned_end_date'] <= deadline_soon.isoformat()]
             
             for job in jobs:
                 progress = job['progress'] or 0
@@ -261,18 +245,10 @@ class ReflexEngine:
         cutoff = self.today - timedelta(days=inactive_days)
         
         try:
-            jobs = self.db.execute('''
-                SELECT j.id, j.client, j.name, j.status,
-                       MAX(t.date) as last_timesheet,
-                       MAX(tk.updated_at) as last_task_update
-                FROM jobs j
-                LEFT JOIN timesheets t ON t.job_id = j.id
-                LEFT JOIN tasks tk ON tk.job_id = j.id
-                WHERE j.status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled', 'waiting')
-                GROUP BY j.id
-                HAVING (last_timesheet IS NULL OR last_timesheet < ?)
-                   AND (last_task_update IS NULL OR last_task_update < ?)
-            ''', (cutoff.isoformat(), cutoff.isoformat())).fetchall()
+            jobs = [j for j in self.facts.jobs()
+                    if j.get('status') not in CLOSED_JOB_STATUSES + ('waiting',)
+                    and (j['last_activity'] is None or j['last_activity'] < cutoff.isoformat())
+                    and (j['last_task_update'] is None or j['last_task_update'] < cutoff.isoformat())]
             
             for job in jobs:
                 self._add_insight(
@@ -439,19 +415,11 @@ class ReflexEngine:
     def _check_employee_overload(self):
         """K1: Zaměstnanec přes limit hodin"""
         max_hours = self.preferences.get('max_weekly_hours', 45)
-        week_start = self.today - timedelta(days=self.today.weekday())
-        week_end = week_start + timedelta(days=6)
+        week_start = self.facts.week_start
         
         try:
-            employees = self.db.execute('''
-                SELECT e.id, e.name, COALESCE(SUM(t.hours), 0) as hours_this_week
-                FROM employees e
-                LEFT JOIN timesheets t ON t.employee_id = e.id
-                    AND t.date BETWEEN ? AND ?
-                WHERE e.status = 'active'
-                GROUP BY e.id
-                HAVING hours_this_week > ?
-            ''', (week_start.isoformat(), week_end.isoformat(), max_hours)).fetchall()
+            employees = [dict(e, hours_this_week=e['hours']) for e in self.facts.active_employees()
+                         if e['hours'] > max_hours]
             
             for emp in employees:
                 overtime = emp['hours_this_week'] - max_hours
@@ -473,23 +441,17 @@ class ReflexEngine:
     
     def _check_employee_idle(self):
         """K2: Nevyužitý zaměstnanec - málo práce"""
-        week_start = self.today - timedelta(days=self.today.weekday())
-        week_end = week_start + timedelta(days=6)
+        week_start = self.facts.week_start
         
         try:
             # Check employees with < 20h this week AND no future assignments
-            employees = self.db.execute('''
-                SELECT e.id, e.name, 
-                       COALESCE(SUM(t.hours), 0) as hours_this_week,
-                       (SELECT COUNT(*) FROM planning_assignments pa 
-                        WHERE pa.employee_id = e.id AND pa.date > ?) as future_assignments
-                FROM employees e
-                LEFT JOIN timesheets t ON t.employee_id = e.id
-                    AND t.date BETWEEN ? AND ?
-                WHERE e.status = 'active'
-                GROUP BY e.id
-                HAVING hours_this_week < 20 AND future_assignments = 0
-            ''', (self.today.isoformat(), week_start.isoformat(), week_end.isoformat())).fetchall()
+            # Zaměstnanci s budoucím přiřazením - jeden dotaz místo subselectu na osobu
+            planned = {r[0] for r in self.db.execute(
+                'SELECT DISTINCT employee_id FROM planning_assignments WHERE date > ?',
+                (self.today.isoformat(),)
+            ).fetchall()}
+            employees = [dict(e, hours_this_week=e['hours']) for e in self.facts.active_employees()
+                         if e['hours'] < 20 and e['id'] not in planned]
             
             for emp in employees:
                 self._add_insight(
@@ -618,7 +580,7 @@ class ReflexEngine:
     def _check_low_stock(self):
         """S1: Položky pod minimem"""
         try:
-            # Try inventory table first, fallback to warehouse_items
+            # Try inventory table first, fallback to warehouse_items (sdílené fakty)
             try:
                 low_items = self.db.execute('''
                     SELECT id, name, quantity, min_quantity, unit, location
@@ -628,13 +590,8 @@ class ReflexEngine:
                     AND quantity <= min_quantity
                 ''').fetchall()
             except:
-                low_items = self.db.execute('''
-                    SELECT id, name, quantity, min_quantity, unit, location
-                    FROM warehouse_items
-                    WHERE min_quantity IS NOT NULL
-                    AND min_quantity > 0
-                    AND quantity <= min_quantity
-                ''').fetchall()
+                low_items = [dict(i, quantity=i['qty'], min_quantity=i['min_qty'])
+                             for i in self.facts.low_stock()]
             
             for item in low_items:
                 severity = 'CRITICAL' if item['quantity'] == 0 else 'WARN'
@@ -945,16 +902,10 @@ class ReflexEngine:
         critical_pct = self.preferences.get('budget_critical_pct', 110)
         
         try:
-            jobs = self.db.execute('''
-                SELECT id, client, name, estimated_value, actual_value,
-                       CASE WHEN estimated_value > 0 
-                            THEN (COALESCE(actual_value, 0) / estimated_value) * 100 
-                            ELSE 0 END as pct_used
-                FROM jobs
-                WHERE status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND estimated_value > 0
-                AND COALESCE(actual_value, 0) > estimated_value * ? / 100
-            ''', (warning_pct,)).fetchall()
+            jobs = [dict(j, pct_used=(j.get('actual_value') or 0) / j['estimated_value'] * 100)
+                    for j in self.facts.open_jobs()
+                    if (j.get('estimated_value') or 0) > 0
+                    and (j.get('actual_value') or 0) > j['estimated_value'] * warning_pct / 100]
             
             for job in jobs:
                 pct = job['pct_used']
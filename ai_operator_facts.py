@@ -0,0 +1,161 @@
+"""
+GREEN DAVID APP - AI OPERÁTOR SDÍLENÉ FAKTY
+============================================
+Společný základ pro všechny AI enginy (ai_operator_api dashboard,
+RuleEngine, ReflexEngine). Agregace, které pravidla dříve počítala každé
+samostatným dotazem, se spočítají jednou za běh:
+
+- employee_week_hours: hodiny zaměstnanců v aktuálním týdnu (1 scan timesheets)
+- jobs: zakázky + poslední aktivita / otevřené úkoly (1 scan jobs, timesheets, tasks)
+- stock: skladové položky s normalizovanými sloupci qty / min_qty / reserved_qty
+
+Fakty se počítají líně - engine platí jen za ty, které jeho pravidla čtou.
+"""
+
+import json
+from datetime import timedelta
+
+from app.database import table_columns
+from app.utils import stock_summary
+
+CLOSED_JOB_STATUSES = ('Dokončeno', 'completed', 'archived', 'cancelled')
+OPEN_TASK_EXCLUDED = ('done', 'completed', 'cancelled')
+
+
+class RuleFacts:
+    """Fakty pro jeden běh pravidel.
+
+    dirty=None znamená celou databázi; jinak {typ entity: množina id}
+    (viz change feed v ai_operator_rule_engine) a fakty se omezí na ně.
+    """
+
+    def __init__(self, db, today, dirty=None):
+        self.db = db
+        self.today = today
+        self.dirty = dirty
+        self.week_start = today - timedelta(days=today.weekday())
+        self.week_end = self.week_start + timedelta(days=6)
+        self._cache = {}
+
+    def _scope(self, column, entity_type):
+        if self.dirty is None:
+            return '', ()
+        ids = sorted(self.dirty.get(entity_type, ()))
+        return f" AND {column} IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+
+    def _cached(self, name, builder):
+        if name not in self._cache:
+            try:
+                self._cache[name] = builder()
+            except Exception as e:
+                print(f"[AI Facts] {name} error: {e}")
+                self._cache[name] = []
+        return self._cache[name]
+
+    # ------------------------------------------------------------------
+    # Zaměstnanci
+    # ------------------------------------------------------------------
+
+    def employee_week_hours(self):
+        """Všichni zaměstnanci s hodinami za aktuální týden."""
+        return self._cached('employee_week_hours', self._load_employee_week_hours)
+
+    def _load_employee_week_hours(self):
+        scope, scope_params = self._scope('e.id', 'employee')
+        rows = self.db.execute(f'''
+            SELECT e.id, e.name, e.role, e.status,
+                   COALESCE(SUM(t.hours), 0) as hours,
+                   COUNT(t.id) as entries
+            FROM employees e
+            LEFT JOIN timesheets t ON t.employee_id = e.id
+                AND t.date_iso BETWEEN ? AND ?
+            WHERE 1=1{scope}
+            GROUP BY e.id
+            ORDER BY hours DESC
+        ''', (self.week_start.isoformat(), self.week_end.isoformat()) + scope_params).fetchall()
+        return [dict(r) for r in rows]
+
+    def active_employees(self):
+        return [e for e in self.employee_week_hours() if e['status'] == 'active']
+
+    # ------------------------------------------------------------------
+    # Zakázky
+    # ------------------------------------------------------------------
+
+    def jobs(self):
+        """Všechny zakázky (j.*) + last_activity, last_task_update, open_tasks."""
+        return self._cached('jobs', self._load_jobs)
+
+    def _load_jobs(self):
+        scope, scope_params = self._scope('j.id', 'job')
+        task_cols = table_columns(self.db, 'tasks')
+        last_task_update = 'MAX(updated_at)' if 'updated_at' in task_cols else 'NULL'
+        rows = self.db.execute(f'''
+            SELECT j.*,
+                   ts.last_activity,
+                   tk.last_task_update,
+                   COALESCE(tk.open_tasks, 0) as open_tasks
+            FROM jobs j
+            LEFT JOIN (
+                SELECT job_id, MAX(date_iso) as last_activity
+                FROM timesheets GROUP BY job_id
+            ) ts ON ts.job_id = j.id
+            LEFT JOIN (
+                SELECT job_id, {last_task_update} as last_task_update,
+                       SUM(CASE WHEN status NOT IN {OPEN_TASK_EXCLUDED} THEN 1 ELSE 0 END) as open_tasks
+                FROM tasks GROUP BY job_id
+            ) tk ON tk.job_id = j.id
+            WHERE 1=1{scope}
+        ''', scope_params).fetchall()
+        return [dict(r) for r in rows]
+
+    def open_jobs(self):
+        return [j for j in self.jobs() if j.get('status') not in CLOSED_JOB_STATUSES]
+
+    # ------------------------------------------------------------------
+    # Sklad
+    # ------------------------------------------------------------------
+
+    def stock(self):
+        """Aktivní skladové položky s qty, min_qty, reserved_qty (float, nikdy None)."""
+        return self._cached('stock', self._load_stock)
+
+    def _load_stock(self):
+        cols = table_columns(self.db, 'warehouse_items')
+        if not cols:
+            return []
+        # Dvě generace schématu: qty/minStock/status (warehouse_extended)
+        # a quantity/min_quantity (ensure_schema)
+        qty = 'qty' if 'qty' in cols else 'quantity'
+        min_qty = 'minStock' if 'minStock' in cols else 'min_quantity'
+        reserved = 'reserved_qty' if 'reserved_qty' in cols else '0'
+        location = 'location' if 'location' in cols else 'NULL'
+        where = "status = 'active'" if 'status' in cols else '1=1'
+        scope, scope_params = self._scope('id', 'warehouse_item')
+        rows = self.db.execute(f'''
+            SELECT id, name, unit, {location} as location,
+                   COALESCE({qty}, 0) as qty,
+                   COALESCE({min_qty}, 0) as min_qty,
+                   COALESCE({reserved}, 0) as reserved_qty
+            FROM warehouse_items
+            WHERE {where}{scope}
+        ''', scope_params).fetchall()
+        return [dict(r) for r in rows]
+
+    def low_stock(self, factor=1.0):
+        """Položky s qty < min_qty * factor (jen s nastaveným minimem), nejhorší první."""
+        if factor == 1.0 and 'stock' not in self._cache:
+            # Materializovaný stav skladu - indexované čtení bez načtení celého skladu
+            return self._cached('low_stock', self._load_low_stock)
+        items = [i for i in self.stock() if i['min_qty'] > 0 and i['qty'] < i['min_qty'] * factor]
+        return sorted(items, key=lambda i: i['qty'] / i['min_qty'])
+
+    def _load_low_stock(self):
+        ids = None if self.dirty is None else self.dirty.get('warehouse_item', ())
+        items = stock_summary.low_stock_items(self.db, item_ids=ids)
+        reserved = {}
+        if items and 'reserved_qty' in table_columns(self.db, 'warehouse_items'):
+            reserved = dict(self.db.execute(
+                "SELECT id, COALESCE(reserved_qty, 0) FROM warehouse_items WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([i['id'] for i in items]),)).fetchall())
+        return [dict(i, reserved_qty=reserved.get(i['id'], 0)) for i in items]
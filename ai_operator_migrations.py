@@ -111,6 +111,96 @@ def apply_ai_operator_migrations(db):
     print("✅ AI Operátor migrations applied (insight, action_draft, event_log)")
 
 
+def apply_scheduler_migrations(db):
+    """Lease tabulka pro volbu leadera mezi gunicorn workery (rule engine scheduler)"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_lease (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            heartbeat_at TEXT DEFAULT (datetime('now'))
+        )
+    ''')
+    # Poslední běhy rule engine čte dashboard i scheduler
+    db.execute('CREATE INDEX IF NOT EXISTS idx_event_log_type_created ON event_log(entity_type, event_type, created_at)')
+    db.commit()
+
+
+# Strop feedu: starší záznamy mažou samy triggery, takže feed neroste ani bez
+# běžícího scheduleru (AI_RULES_SCHEDULER=0 bez samostatného workeru). Ztracené
+# změny dožene plný průchod pravidel (ten feed nepotřebuje).
+CHANGE_FEED_MAX_ROWS = 20000
+
+# Které entity "zašpiní" zápis do tabulky: (typ entity, sloupec s jejím id)
+CHANGE_FEED_SOURCES = {
+    'jobs': [('job', 'id')],
+    'tasks': [('task', 'id'), ('job', 'job_id'), ('employee', 'employee_id')],
+    'timesheets': [('job', 'job_id'), ('employee', 'employee_id')],
+    'employees': [('employee', 'id')],
+    'warehouse_items': [('warehouse_item', 'id')],
+    'warehouse_movements': [('warehouse_item', 'item_id'), ('job', 'job_id')],
+    'attachments': [('job', "CASE WHEN {row}.entity_type = 'job' THEN {row}.entity_id END")],
+    'job_employees': [('job', 'job_id'), ('employee', 'employee_id')],
+    'team_member_profile': [('employee', 'employee_id')],
+}
+
+
+def apply_change_feed_migrations(db):
+    """Change feed pro inkrementální rule engine: triggery zapisují id změněných entit"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS entity_change (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity_type TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            changed_at TEXT DEFAULT (datetime('now'))
+        )
+    ''')
+    
+    for table, sources in CHANGE_FEED_SOURCES.items():
+        columns = {r[1] for r in db.execute(f"PRAGMA table_info({table})").fetchall()}
+        if not columns:
+            continue
+        
+        def _select(row):
+            parts = []
+            for entity_type, column in sources:
+                if column in columns:
+                    expr = f"{row}.{column}"
+                elif '{row}' in column:
+                    expr = column.format(row=row)
+                else:
+                    continue
+                parts.append(f"SELECT '{entity_type}' AS t, {expr} AS i")
+            return parts
+        
+        for op, rows in (('INSERT', ['NEW']), ('UPDATE', ['NEW', 'OLD']), ('DELETE', ['OLD'])):
+            selects = [part for row in rows for part in _select(row)]
+            if not selects:
+                continue
+            db.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_change_{table}_{op.lower()}
+                AFTER {op} ON {table}
+                BEGIN
+                    INSERT INTO entity_change (entity_type, entity_id)
+                    SELECT t, i FROM ({' UNION '.join(selects)}) WHERE i IS NOT NULL;
+                    DELETE FROM entity_change
+                    WHERE id <= (SELECT MAX(id) FROM entity_change) - {CHANGE_FEED_MAX_ROWS};
+                END
+            ''')
+    db.commit()
+
+
+def apply_change_feed_retention(db):
+    """Přegeneruj triggery feedu se stropem CHANGE_FEED_MAX_ROWS a ořízni stávající feed"""
+    for (name,) in db.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_change_%'").fetchall():
+        db.execute(f"DROP TRIGGER IF EXISTS {name}")
+    apply_change_feed_migrations(db)
+    db.execute('DELETE FROM entity_change WHERE id <= (SELECT MAX(id) FROM entity_change) - ?',
+               (CHANGE_FEED_MAX_ROWS,))
+    db.commit()
+
+
 def log_event(db, entity_type, entity_id, event_type, payload=None, actor_id=None):
     """Zaloguj událost do event_log"""
     import json
@@ -10,21 +10,14 @@ Autor: Green David s.r.o.
 Verze: 1.0
 """
 
-from flask import jsonify, request, session
+import json
 from datetime import datetime, timedelta
 from functools import wraps
-import json
-import sqlite3
 
-# Reference na get_db - nastaví se z main.py
-get_db = None
-
-def get_db_with_row_factory():
-    """Získej DB connection s row_factory pro dict přístup"""
-    db = get_db()
-    db.row_factory = sqlite3.Row
-    return db
+from flask import jsonify, request, session
 
+from app.database import get_db
+from app.utils import event_stream
 
 # =============================================================================
 # RBAC - ROLE-BASED ACCESS CONTROL
@@ -91,7 +84,7 @@ def get_current_user_role():
     if not uid:
         return None, None
     
-    db = get_db_with_row_factory()
+    db = get_db()
     user = db.execute('SELECT id, role, manager_id FROM users WHERE id = ?', (uid,)).fetchone()
     
     if not user:
@@ -103,7 +96,7 @@ def get_current_user_role():
 
 def get_user_team_ids(user_id):
     """Získej ID zaměstnanců v týmu uživatele (pro managery)"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     # Najdi zaměstnance kde manager_id = user_id
     team = db.execute('''
@@ -117,7 +110,7 @@ def get_user_team_ids(user_id):
 
 def get_user_job_ids(user_id):
     """Získej ID zakázek přiřazených uživateli"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     jobs = db.execute('''
         SELECT DISTINCT job_id FROM job_employees WHERE employee_id = ?
@@ -165,7 +158,7 @@ def filter_insight_for_role(insight, role, user_id):
         
         # Nebo jeho úkolů
         if entity_type == 'task':
-            db = get_db_with_row_factory()
+            db = get_db()
             task = db.execute('SELECT employee_id FROM tasks WHERE id = ?', (entity_id,)).fetchone()
             if not task or task['employee_id'] != user_id:
                 return None
@@ -330,7 +323,7 @@ def create_notification_for_insight(insight, target_users=None):
     Vytvoř notifikace pro insight.
     Pokud target_users je None, notifikuje podle pravidel relevance.
     """
-    db = get_db_with_row_factory()
+    db = get_db()
     
     insight_id = insight.get('id')
     insight_type = insight.get('type', '')
@@ -345,6 +338,7 @@ def create_notification_for_insight(insight, target_users=None):
         target_users = get_relevant_users_for_insight(insight)
     
     notifications_created = 0
+    notified = []
     
     for user_id in target_users:
         # Zkontroluj roli uživatele
@@ -365,7 +359,11 @@ def create_notification_for_insight(insight, target_users=None):
         ''', (user_id, insight_id, insight_type, title, summary, severity))
         
         notifications_created += 1
+        notified.append(user_id)
     
+    event_stream.publish(db, 'ai_notification', {
+        'insight_id': insight_id, 'type': insight_type, 'title': title, 'severity': severity
+    }, notified)
     db.commit()
     return notifications_created
 
@@ -374,7 +372,7 @@ def get_relevant_users_for_insight(insight):
     """
     Najdi uživatele relevantní pro daný insight podle pravidel v PRD.
     """
-    db = get_db_with_row_factory()
+    db = get_db()
     
     insight_type = insight.get('type', '')
     severity = insight.get('severity', 'INFO')
@@ -430,7 +428,7 @@ def get_relevant_users_for_insight(insight):
 
 def get_user_notifications(user_id, unread_only=False, limit=50):
     """Získej notifikace pro uživatele"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     query = 'SELECT * FROM ai_notifications WHERE user_id = ?'
     params = [user_id]
@@ -447,7 +445,7 @@ def get_user_notifications(user_id, unread_only=False, limit=50):
 
 def mark_notification_read(notification_id, user_id):
     """Označ notifikaci jako přečtenou"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE ai_notifications 
@@ -459,7 +457,7 @@ def mark_notification_read(notification_id, user_id):
 
 def mark_all_notifications_read(user_id):
     """Označ všechny notifikace jako přečtené"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE ai_notifications 
@@ -471,7 +469,7 @@ def mark_all_notifications_read(user_id):
 
 def get_unread_count(user_id):
     """Počet nepřečtených notifikací"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     result = db.execute('''
         SELECT COUNT(*) as count FROM ai_notifications 
@@ -490,7 +488,7 @@ def generate_morning_digest(user_id):
     Vygeneruj ranní digest pro uživatele.
     Top 3 kritické + plán dne.
     """
-    db = get_db_with_row_factory()
+    db = get_db()
     
     # Získej roli pro filtrování
     user = db.execute('SELECT role FROM users WHERE id = ?', (user_id,)).fetchone()
@@ -556,7 +554,7 @@ def generate_evening_digest(user_id):
     Vygeneruj večerní digest - rizika na zítra.
     Počasí, chybějící materiál, nedokončené úkoly.
     """
-    db = get_db_with_row_factory()
+    db = get_db()
     
     tomorrow = (datetime.now().date() + timedelta(days=1)).isoformat()
     
@@ -598,7 +596,7 @@ def generate_evening_digest(user_id):
 
 def log_digest_sent(user_id, digest_type, insights_count):
     """Zaloguj odeslání digestu"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         INSERT INTO ai_digest_log (user_id, digest_type, insights_count)
@@ -689,7 +687,7 @@ def register_notification_routes(app):
         if not uid:
             return jsonify({'error': 'unauthorized'}), 401
         
-        db = get_db_with_row_factory()
+        db = get_db()
         
         if request.method == 'GET':
             settings = db.execute(
@@ -761,7 +759,7 @@ def notify_on_new_insight(insight):
     # Pro ostatní se notifikace posílají v digestu
     elif severity == 'WARN':
         # Volitelně notifikovat i WARN
-        db = get_db_with_row_factory()
+        db = get_db()
         
         # Najdi uživatele s instant_critical = 1 (rozšířeno na WARN)
         users = db.execute('''
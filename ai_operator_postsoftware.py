@@ -23,21 +23,11 @@ Autor: Green David s.r.o.
 Verze: 3.0 (Post-Software Layer)
 """
 
-from datetime import datetime, timedelta
 import json
-import sqlite3
 import math
 import random
-from typing import List, Dict, Optional, Any, Tuple
-
-# Reference na get_db
-get_db = None
-
-def get_db_with_row_factory():
-    db = get_db()
-    db.row_factory = sqlite3.Row
-    return db
-
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 # =============================================================================
 # 1. ZERO-UI MODE - Kontextové zobrazení
@@ -1372,7 +1362,7 @@ class TimeLayeredView:
             
             # Hours worked
             hours = self.db.execute('''
-                SELECT SUM(hours) as total FROM timesheets WHERE date >= ?
+                SELECT SUM(hours) as total FROM timesheets WHERE date_iso >= ?
             ''', (past_30,)).fetchone()
             
             return {
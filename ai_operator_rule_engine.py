@@ -8,24 +8,25 @@ Autor: Green David s.r.o.
 Verze: 2.0 (PRD compliant)
 """
 
-from flask import jsonify, request
+import json
 from datetime import datetime, timedelta
 from functools import wraps
-import json
-import sqlite3
 
-# Reference na get_db - nastaví se z main.py
-get_db = None
+from flask import jsonify, request
+
+from ai_operator_facts import RuleFacts
+from app.database import get_db
+from app.utils import event_stream
+from app.utils.permissions import require_role
 
-def get_db_with_row_factory():
-    """Získej DB connection s row_factory pro dict přístup"""
-    db = get_db()
-    db.row_factory = sqlite3.Row
-    return db
 
 def login_required(f):
+    """Přihlášený uživatel; zápisové metody (POST) vyžadují roli s právem zápisu."""
     @wraps(f)
     def decorated(*args, **kwargs):
+        _u, err = require_role(write=request.method != 'GET')
+        if err:
+            return err
         return f(*args, **kwargs)
     return decorated
 
@@ -37,111 +38,169 @@ def login_required(f):
 class RuleEngine:
     """Deterministický rule engine pro generování insightů"""
     
+    # Prefix insight_key pravidla -> typ entity, na které pravidlo závisí
+    # (inkrementální běh přepočítá jen entity ze změnového feedu)
+    RULE_ENTITIES = {
+        'R1': 'job', 'R2': 'job', 'R3': 'job', 'R4': 'task', 'R5': 'job',
+        'R6': 'employee', 'R7': 'employee', 'R8': 'warehouse_item',
+        'R9': 'warehouse_item', 'R10': 'job', 'R11': 'job', 'R12': 'job',
+        'R13': 'job', 'R14': 'job', 'R15': 'job',
+    }
+    RULES = tuple(RULE_ENTITIES)
+    
     def __init__(self, db):
         self.db = db
         self.insights_generated = []
+        self._findings = {}
+        self._failed_rules = set()
+        self._dirty = None
+        self.facts = None
     
-    def run_all_rules(self):
-        """Spusť všechna pravidla a vrať seznam nových insightů"""
+    def run_all_rules(self, dirty=None):
+        """Spusť všechna pravidla a vrať seznam nových insightů.
+        
+        dirty=None znamená plný průchod; jinak {typ entity: množina id}
+        a pravidla se vyhodnotí jen pro tyto entity.
+        """
         self.insights_generated = []
+        self._findings = {}
+        self._failed_rules = set()
+        self._dirty = dirty
         today = datetime.now().date()
+        # Společné agregace (zakázky, hodiny týmu, sklad) - jeden scan pro všechna pravidla
+        self.facts = RuleFacts(self.db, today, dirty)
         
-        # R1: Budget overrun - labor
-        self._rule_budget_overrun_labor()
-        
-        # R2: Budget overrun - material
-        self._rule_budget_overrun_material()
-        
-        # R3: Job behind schedule
-        self._rule_job_behind_schedule(today)
-        
-        # R4: Task overdue
-        self._rule_task_overdue(today)
-        
-        # R5: No activity on job
-        self._rule_no_activity_on_job(today)
-        
-        # R6: Employee overload
-        self._rule_employee_overload(today)
-        
-        # R7: Employee idle
-        self._rule_employee_idle(today)
-        
-        # R8: Low stock
-        self._rule_low_stock()
-        
-        # R9: Reservation exceeds stock
-        self._rule_reservation_exceeds_stock()
-        
-        # R10: Missing location
-        self._rule_missing_location()
+        for rule, method, args in (
+            ('R1', self._rule_budget_overrun_labor, ()),            # Budget overrun - labor
+            ('R2', self._rule_budget_overrun_material, ()),         # Budget overrun - material
+            ('R3', self._rule_job_behind_schedule, (today,)),       # Job behind schedule
+            ('R4', self._rule_task_overdue, (today,)),              # Task overdue
+            ('R5', self._rule_no_activity_on_job, (today,)),        # No activity on job
+            ('R6', self._rule_employee_overload, (today,)),         # Employee overload
+            ('R7', self._rule_employee_idle, (today,)),             # Employee idle
+            ('R8', self._rule_low_stock, ()),                       # Low stock
+            ('R9', self._rule_reservation_exceeds_stock, ()),       # Reservation exceeds stock
+            ('R10', self._rule_missing_location, ()),               # Missing location
+            ('R11', self._rule_missing_estimates, ()),              # Missing estimates
+            ('R12', self._rule_missing_photo_doc, ()),              # Missing photo documentation
+            ('R13', self._rule_completed_not_invoiced, ()),         # Completed not invoiced
+            ('R14', self._rule_weather_risk_outdoor, (today,)),     # Weather risk outdoor
+            ('R15', self._rule_inventory_variance, ()),             # Inventory variance
+        ):
+            if self._in_scope(rule):
+                method(*args)
         
-        # R11: Missing estimates
-        self._rule_missing_estimates()
-        
-        # R12: Missing photo documentation
-        self._rule_missing_photo_doc()
-        
-        # R13: Completed not invoiced
-        self._rule_completed_not_invoiced()
-        
-        # R14: Weather risk outdoor
-        self._rule_weather_risk_outdoor(today)
-        
-        # R15: Inventory variance
-        self._rule_inventory_variance()
+        # Jeden zápis za celý běh místo SELECT + INSERT/UPDATE + commit na nález
+        self._flush_findings([rule for rule in self.RULES if self._in_scope(rule)])
         
         return self.insights_generated
     
+    def _in_scope(self, rule):
+        return self._dirty is None or bool(self._dirty.get(self.RULE_ENTITIES[rule]))
+    
+    def _scope(self, column, rule):
+        """SQL filtr na dirty entity pravidla: (fragment, parametry); prázdný při plném průchodu"""
+        if self._dirty is None:
+            return '', ()
+        ids = sorted(self._dirty.get(self.RULE_ENTITIES[rule], ()))
+        return f" AND {column} IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+    
     def _create_or_update_insight(self, key, insight_type, severity, title, summary, 
                                    evidence, actions, entity_type=None, entity_id=None,
                                    confidence='HIGH'):
-        """Vytvoř nebo aktualizuj insight (idempotentní)"""
-        
-        # Zkontroluj jestli insight s tímto klíčem už existuje
-        existing = self.db.execute(
-            'SELECT id, status FROM insight WHERE insight_key = ?', (key,)
-        ).fetchone()
-        
-        if existing:
-            # Pokud je resolved/dismissed a problém stále trvá, znovu otevři
-            if existing['status'] in ('resolved', 'dismissed'):
-                self.db.execute('''
-                    UPDATE insight SET 
-                        status = 'open',
-                        severity = ?,
-                        title = ?,
-                        summary = ?,
-                        evidence_json = ?,
-                        actions_json = ?,
-                        updated_at = datetime('now'),
-                        resolved_at = NULL
-                    WHERE id = ?
-                ''', (severity, title, summary, json.dumps(evidence), 
-                      json.dumps(actions), existing['id']))
-                self.db.commit()
-            return existing['id']
-        
-        # Vytvoř nový insight
-        cursor = self.db.execute('''
-            INSERT INTO insight (insight_key, type, severity, status, title, summary,
-                                evidence_json, actions_json, entity_type, entity_id, confidence)
-            VALUES (?, ?, ?, 'open', ?, ?, ?, ?, ?, ?, ?)
-        ''', (key, insight_type, severity, title, summary, 
-              json.dumps(evidence), json.dumps(actions),
-              entity_type, entity_id, confidence))
-        self.db.commit()
+        """Zaznamenej nález pro tento běh; do DB se zapíše hromadně v _flush_findings"""
+        self._findings[key] = (
+            key, insight_type, severity, title, summary,
+            json.dumps(evidence), json.dumps(actions),
+            entity_type, entity_id, confidence
+        )
+    
+    def _rule_failed(self, rule, error):
+        """Pravidlo spadlo - jeho insighty se v tomto běhu nesmí auto-resolvovat"""
+        print(f"{rule} error: {error}")
+        self._failed_rules.add(rule)
+    
+    def _flush_findings(self, rules):
+        """Zapiš všechny nálezy běhu v jedné transakci.
         
-        insight_id = cursor.lastrowid
-        self.insights_generated.append({
-            'id': insight_id,
-            'key': key,
-            'type': insight_type,
-            'severity': severity,
-            'title': title
-        })
+        Nové insighty vloží, existující aktualizuje (resolved/dismissed znovu
+        otevře, snoozed nechá odložené) a otevřené insighty pravidel, jejichž podmínka už neplatí,
+        označí jako resolved.
+        """
+        keys_json = json.dumps(list(self._findings))
+        try:
+            existing = {
+                row['insight_key'] for row in self.db.execute(
+                    'SELECT insight_key FROM insight WHERE insight_key IN (SELECT value FROM json_each(?))',
+                    (keys_json,)
+                ).fetchall()
+            }
+            
+            changed = self.db.executemany('''
+                INSERT INTO insight (insight_key, type, severity, status, title, summary,
+                                    evidence_json, actions_json, entity_type, entity_id, confidence)
+                VALUES (?, ?, ?, 'open', ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(insight_key) DO UPDATE SET
+                    status = CASE WHEN insight.status IN ('resolved', 'dismissed') THEN 'open'
+                                  ELSE insight.status END,
+                    severity = excluded.severity,
+                    title = excluded.title,
+                    summary = excluded.summary,
+                    evidence_json = excluded.evidence_json,
+                    actions_json = excluded.actions_json,
+                    updated_at = datetime('now'),
+                    resolved_at = CASE WHEN insight.status IN ('resolved', 'dismissed') THEN NULL
+                                       ELSE insight.resolved_at END
+                WHERE insight.status IN ('resolved', 'dismissed')
+                   OR insight.severity IS NOT excluded.severity
+                   OR insight.title IS NOT excluded.title
+                   OR insight.summary IS NOT excluded.summary
+                   OR insight.evidence_json IS NOT excluded.evidence_json
+            ''', list(self._findings.values())).rowcount
+            
+            # Auto-resolve jen pro pravidla, která doběhla bez chyby
+            # (GLOB - v LIKE by '_' v 'R1_' odpovídalo i 'R10')
+            resolve_sql = '''
+                UPDATE insight SET status = 'resolved',
+                                   resolved_at = datetime('now'),
+                                   updated_at = datetime('now')
+                WHERE status = 'open'
+                AND insight_key GLOB ?
+                AND insight_key NOT IN (SELECT value FROM json_each(?))
+            '''
+            rules = [rule for rule in rules if rule not in self._failed_rules]
+            if self._dirty is None:
+                resolved = self.db.executemany(resolve_sql, [(f"{rule}_*", keys_json) for rule in rules])
+            else:
+                # Inkrementálně jen insighty přepočítaných entit
+                resolved = self.db.executemany(
+                    resolve_sql + " AND entity_id IN (SELECT value FROM json_each(?))",
+                    [(f"{rule}_*", keys_json,
+                      json.dumps(sorted(self._dirty[self.RULE_ENTITIES[rule]]))) for rule in rules]
+                )
+            
+            new_keys = [key for key in self._findings if key not in existing]
+            created = self.db.execute(
+                'SELECT id, insight_key, type, severity, title FROM insight '
+                'WHERE insight_key IN (SELECT value FROM json_each(?))',
+                (json.dumps(new_keys),)
+            ).fetchall() if new_keys else []
+            changed += max(resolved.rowcount, 0)
+            if changed > 0:
+                # Obsah insightů je filtrovaný podle role - stream nese jen počty
+                event_stream.publish(self.db, 'insights', {'new': len(created), 'changed': changed})
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
         
-        return insight_id
+        self.insights_generated = [{
+            'id': row['id'],
+            'key': row['insight_key'],
+            'type': row['type'],
+            'severity': row['severity'],
+            'title': row['title']
+        } for row in created]
     
     # =========================================================================
     # PRAVIDLA R1-R15
@@ -150,14 +209,9 @@ class RuleEngine:
     def _rule_budget_overrun_labor(self):
         """R1: Překročení rozpočtu práce > 110%"""
         try:
-            jobs = self.db.execute('''
-                SELECT j.id, j.client, j.name, j.budget_labor, j.actual_labor_cost,
-                       j.estimated_hours, j.actual_hours
-                FROM jobs j
-                WHERE j.status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND j.budget_labor > 0
-                AND j.actual_labor_cost > j.budget_labor * 1.1
-            ''').fetchall()
+            jobs = [j for j in self.facts.open_jobs()
+                    if (j.get('budget_labor') or 0) > 0
+                    and (j.get('actual_labor_cost') or 0) > j['budget_labor'] * 1.1]
             
             for job in jobs:
                 percent = (job['actual_labor_cost'] / job['budget_labor']) * 100
@@ -184,18 +238,14 @@ class RuleEngine:
                     entity_id=job['id']
                 )
         except Exception as e:
-            print(f"R1 error: {e}")
+            self._rule_failed('R1', e)
     
     def _rule_budget_overrun_material(self):
         """R2: Překročení rozpočtu materiálu > 110%"""
         try:
-            jobs = self.db.execute('''
-                SELECT j.id, j.client, j.name, j.budget_materials, j.actual_material_cost
-                FROM jobs j
-                WHERE j.status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND j.budget_materials > 0
-                AND j.actual_material_cost > j.budget_materials * 1.1
-            ''').fetchall()
+            jobs = [j for j in self.facts.open_jobs()
+                    if (j.get('budget_materials') or 0) > 0
+                    and (j.get('actual_material_cost') or 0) > j['budget_materials'] * 1.1]
             
             for job in jobs:
                 percent = (job['actual_material_cost'] / job['budget_materials']) * 100
@@ -220,21 +270,17 @@ class RuleEngine:
                     entity_id=job['id']
                 )
         except Exception as e:
-            print(f"R2 error: {e}")
+            self._rule_failed('R2', e)
     
     def _rule_job_behind_schedule(self, today):
         """R3: Zakázka ve skluzu - deadline < 7 dní a nízký progress"""
         try:
             deadline_soon = today + timedelta(days=7)
             
-            jobs = self.db.execute('''
-                SELECT j.id, j.client, j.name, j.planned_end_date, j.deadline,
-                       j.progress, j.completion_percent
-                FROM jobs j
-                WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'pending')
-                AND (j.planned_end_date IS NOT NULL OR j.deadline IS NOT NULL)
-                AND (j.planned_end_date <= ? OR j.deadline <= ?)
-            ''', (deadline_soon.isoformat(), deadline_soon.isoformat())).fetchall()
+            jobs = [j for j in self.facts.jobs()
+                    if j.get('status') in ('active', 'Aktivní', 'rozpracováno', 'pending')
+                    and any(d and d <= deadline_soon.isoformat()
+                            for d in (j.get('planned_end_date'), j.get('deadline')))]
             
             for job in jobs:
                 progress = job['progress'] or job['completion_percent'] or 0
@@ -273,12 +319,13 @@ class RuleEngine:
                     except:
                         pass
         except Exception as e:
-            print(f"R3 error: {e}")
+            self._rule_failed('R3', e)
     
     def _rule_task_overdue(self, today):
         """R4: Úkol po termínu"""
         try:
-            tasks = self.db.execute('''
+            scope, scope_params = self._scope('t.id', 'R4')
+            tasks = self.db.execute(f'''
                 SELECT t.id, t.title, t.due_date, t.status, t.employee_id,
                        j.client, j.name as job_name, e.name as employee_name
                 FROM tasks t
@@ -286,8 +333,8 @@ class RuleEngine:
                 LEFT JOIN employees e ON e.id = t.employee_id
                 WHERE t.status NOT IN ('done', 'completed', 'cancelled')
                 AND t.due_date IS NOT NULL
-                AND t.due_date < ?
-            ''', (today.isoformat(),)).fetchall()
+                AND t.due_date < ?{scope}
+            ''', (today.isoformat(),) + scope_params).fetchall()
             
             for task in tasks:
                 try:
@@ -320,22 +367,15 @@ class RuleEngine:
                 except:
                     pass
         except Exception as e:
-            print(f"R4 error: {e}")
+            self._rule_failed('R4', e)
     
     def _rule_no_activity_on_job(self, today):
         """R5: Zakázka bez aktivity 5+ dní"""
         try:
             five_days_ago = today - timedelta(days=5)
             
-            jobs = self.db.execute('''
-                SELECT j.id, j.client, j.name, j.status,
-                       MAX(t.date) as last_activity,
-                       j.project_manager_id
-                FROM jobs j
-                LEFT JOIN timesheets t ON t.job_id = j.id
-                WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'pending')
-                GROUP BY j.id
-            ''').fetchall()
+            jobs = [j for j in self.facts.jobs()
+                    if j.get('status') in ('active', 'Aktivní', 'rozpracováno', 'pending')]
             
             for job in jobs:
                 last_activity = job['last_activity']
@@ -376,27 +416,17 @@ class RuleEngine:
                         entity_id=job['id']
                     )
         except Exception as e:
-            print(f"R5 error: {e}")
+            self._rule_failed('R5', e)
     
     def _rule_employee_overload(self, today):
         """R6: Zaměstnanec přetížený > 45h/týden"""
         try:
             week_start = today - timedelta(days=today.weekday())
-            week_end = week_start + timedelta(days=6)
             
-            employees = self.db.execute('''
-                SELECT e.id, e.name, COALESCE(SUM(t.hours), 0) as hours_this_week
-                FROM employees e
-                LEFT JOIN timesheets t ON t.employee_id = e.id
-                    AND (t.date BETWEEN ? AND ? OR t.date BETWEEN ? AND ?)
-                WHERE e.status = 'active'
-                GROUP BY e.id
-                HAVING hours_this_week > 45
-            ''', (week_start.isoformat(), week_end.isoformat(),
-                  week_start.strftime('%d.%m.%Y'), week_end.strftime('%d.%m.%Y'))).fetchall()
+            employees = [e for e in self.facts.active_employees() if e['hours'] > 45]
             
             for emp in employees:
-                hours = emp['hours_this_week']
+                hours = emp['hours']
                 key = f"R6_OVERLOAD_{emp['id']}_{week_start.isoformat()}"
                 
                 self._create_or_update_insight(
@@ -420,15 +450,16 @@ class RuleEngine:
                     entity_id=emp['id']
                 )
         except Exception as e:
-            print(f"R6 error: {e}")
+            self._rule_failed('R6', e)
     
     def _rule_employee_idle(self, today):
         """R7: Zaměstnanec bez práce další 2 dny"""
         try:
             two_days = today + timedelta(days=2)
+            scope, scope_params = self._scope('e.id', 'R7')
             
             # Najdi zaměstnance bez přiřazených úkolů na příští 2 dny
-            employees = self.db.execute('''
+            employees = self.db.execute(f'''
                 SELECT e.id, e.name
                 FROM employees e
                 WHERE e.status = 'active'
@@ -438,8 +469,8 @@ class RuleEngine:
                     WHERE t.employee_id IS NOT NULL
                     AND t.status NOT IN ('done', 'completed', 'cancelled')
                     AND (t.due_date >= ? OR t.due_date IS NULL)
-                )
-            ''', (today.isoformat(),)).fetchall()
+                ){scope}
+            ''', (today.isoformat(),) + scope_params).fetchall()
             
             for emp in employees:
                 key = f"R7_IDLE_{emp['id']}_{today.isoformat()}"
@@ -462,34 +493,28 @@ class RuleEngine:
                     entity_id=emp['id']
                 )
         except Exception as e:
-            print(f"R7 error: {e}")
+            self._rule_failed('R7', e)
     
     def _rule_low_stock(self):
         """R8: Materiál pod minimálním stavem"""
         try:
-            items = self.db.execute('''
-                SELECT id, name, qty, minStock, unit
-                FROM warehouse_items
-                WHERE status = 'active'
-                AND qty < minStock
-                AND minStock > 0
-            ''').fetchall()
+            items = self.facts.low_stock()
             
             for item in items:
                 key = f"R8_LOW_STOCK_{item['id']}"
-                ratio = item['qty'] / item['minStock'] if item['minStock'] > 0 else 0
+                ratio = item['qty'] / item['min_qty'] if item['min_qty'] > 0 else 0
                 
                 self._create_or_update_insight(
                     key=key,
                     insight_type='LOW_STOCK',
                     severity='CRITICAL' if ratio < 0.3 else 'WARN',
                     title=f"📦 Dochází: {item['name']}",
-                    summary=f"{item['qty']:.0f} {item['unit']} (min: {item['minStock']:.0f})",
+                    summary=f"{item['qty']:.0f} {item['unit']} (min: {item['min_qty']:.0f})",
                     evidence={
                         'item_id': item['id'],
                         'item_name': item['name'],
                         'current_qty': item['qty'],
-                        'min_qty': item['minStock'],
+                        'min_qty': item['min_qty'],
                         'unit': item['unit'],
                         'ratio': round(ratio, 2)
                     },
@@ -501,17 +526,12 @@ class RuleEngine:
                     entity_id=item['id']
                 )
         except Exception as e:
-            print(f"R8 error: {e}")
+            self._rule_failed('R8', e)
     
     def _rule_reservation_exceeds_stock(self):
         """R9: Rezervace přesahuje dostupné množství"""
         try:
-            items = self.db.execute('''
-                SELECT id, name, qty, reserved_qty, unit
-                FROM warehouse_items
-                WHERE status = 'active'
-                AND reserved_qty > qty
-            ''').fetchall()
+            items = [i for i in self.facts.stock() if i['reserved_qty'] > i['qty']]
             
             for item in items:
                 key = f"R9_RESERVATION_EXCEEDS_{item['id']}"
@@ -538,17 +558,12 @@ class RuleEngine:
                     entity_id=item['id']
                 )
         except Exception as e:
-            print(f"R9 error: {e}")
+            self._rule_failed('R9', e)
     
     def _rule_missing_location(self):
         """R10: Zakázka bez lokace"""
         try:
-            jobs = self.db.execute('''
-                SELECT id, client, name
-                FROM jobs
-                WHERE status NOT IN ('Dokončeno', 'completed', 'archived', 'cancelled')
-                AND (city IS NULL OR city = '')
-            ''').fetchall()
+            jobs = [j for j in self.facts.open_jobs() if not j.get('city')]
             
             for job in jobs:
                 key = f"R10_MISSING_LOCATION_{job['id']}"
@@ -567,21 +582,14 @@ class RuleEngine:
                     entity_id=job['id']
                 )
         except Exception as e:
-            print(f"R10 error: {e}")
+            self._rule_failed('R10', e)
     
     def _rule_missing_estimates(self):
         """R11: Úkoly bez odhadu"""
         try:
             # Počet úkolů bez odhadu na aktivních zakázkách
-            result = self.db.execute('''
-                SELECT j.id, j.client, j.name, COUNT(t.id) as tasks_without_estimate
-                FROM jobs j
-                JOIN tasks t ON t.job_id = j.id
-                WHERE j.status IN ('active', 'Aktivní', 'rozpracováno')
-                AND t.status NOT IN ('done', 'completed', 'cancelled')
-                GROUP BY j.id
-                HAVING tasks_without_estimate > 3
-            ''').fetchall()
+            result = [dict(j, tasks_without_estimate=j['open_tasks']) for j in self.facts.jobs()
+                      if j.get('status') in ('active', 'Aktivní', 'rozpracováno') and j['open_tasks'] > 3]
             
             for job in result:
                 key = f"R11_MISSING_ESTIMATES_{job['id']}"
@@ -603,14 +611,15 @@ class RuleEngine:
                     entity_id=job['id']
                 )
         except Exception as e:
-            print(f"R11 error: {e}")
+            self._rule_failed('R11', e)
     
     def _rule_missing_photo_doc(self):
         """R12: Chybějící foto dokumentace pro zakázky vyžadující fotky"""
         try:
             # Najdi aktivní zakázky které vyžadují foto dokumentaci
             # (landscaping, garden, outdoor typy nebo ty s photo_required flag)
-            jobs = self.db.execute('''
+            scope, scope_params = self._scope('j.id', 'R12')
+            jobs = self.db.execute(f'''
                 SELECT j.id, j.client, j.name, j.type, j.status, j.created_at,
                        (SELECT COUNT(*) FROM attachments a 
                         WHERE a.entity_type = 'job' AND a.entity_id = j.id 
@@ -619,8 +628,8 @@ class RuleEngine:
                 FROM jobs j
                 WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'Dokončeno', 'completed')
                 AND (j.type IN ('landscaping', 'garden', 'outdoor', 'zahrada', 'terasa', 'plot', 'venkovní') 
-                     OR j.photo_required = 1)
-            ''').fetchall()
+                     OR j.photo_required = 1){scope}
+            ''', scope_params).fetchall()
             
             for job in jobs:
                 photo_count = job['photo_count'] or 0
@@ -654,17 +663,14 @@ class RuleEngine:
                         entity_id=job['id']
                     )
         except Exception as e:
-            print(f"R12 error: {e}")
+            self._rule_failed('R12', e)
     
     def _rule_completed_not_invoiced(self):
         """R13: Dokončená zakázka bez faktury"""
         try:
-            jobs = self.db.execute('''
-                SELECT id, client, name, completed_at, actual_end_date
-                FROM jobs
-                WHERE status IN ('Dokončeno', 'completed')
-                AND (completed_at IS NOT NULL OR actual_end_date IS NOT NULL)
-            ''').fetchall()
+            jobs = [j for j in self.facts.jobs()
+                    if j.get('status') in ('Dokončeno', 'completed')
+                    and (j.get('completed_at') is not None or j.get('actual_end_date') is not None)]
             
             # Check if invoice exists (simplified - would need invoices table)
             for job in jobs:
@@ -689,7 +695,7 @@ class RuleEngine:
                     entity_id=job['id']
                 )
         except Exception as e:
-            print(f"R13 error: {e}")
+            self._rule_failed('R13', e)
     
     def _rule_weather_risk_outdoor(self, today):
         """R14: Riziko počasí pro venkovní práce"""
@@ -698,12 +704,9 @@ class RuleEngine:
             forecast = self._get_weather_forecast(today)
             
             # Najdi zakázky s venkovní prací
-            jobs = self.db.execute('''
-                SELECT id, client, name, start_date, weather_dependent, type
-                FROM jobs
-                WHERE status IN ('active', 'Aktivní', 'pending', 'rozpracováno')
-                AND (weather_dependent = 1 OR type IN ('landscaping', 'garden', 'outdoor'))
-            ''').fetchall()
+            jobs = [j for j in self.facts.jobs()
+                    if j.get('status') in ('active', 'Aktivní', 'pending', 'rozpracováno')
+                    and (j.get('weather_dependent') == 1 or j.get('type') in ('landscaping', 'garden', 'outdoor'))]
             
             for day in forecast[:5]:
                 if day.get('rain_chance', 0) > 60 or day.get('temp', 15) < 0:
@@ -734,15 +737,16 @@ class RuleEngine:
                                 entity_id=job['id']
                             )
         except Exception as e:
-            print(f"R14 error: {e}")
+            self._rule_failed('R14', e)
     
     def _rule_inventory_variance(self):
         """R15: Odchylka spotřeby materiálu od plánovaného"""
         try:
             # Porovnej plánovanou vs skutečnou spotřebu materiálu na zakázkách
             # Hledáme zakázky kde skutečná spotřeba se významně liší od plánované
+            scope, scope_params = self._scope('j.id', 'R15')
             
-            jobs_with_variance = self.db.execute('''
+            jobs_with_variance = self.db.execute(f'''
                 SELECT 
                     j.id, j.client, j.name,
                     COALESCE(SUM(jr.quantity), 0) as planned_qty,
@@ -750,10 +754,10 @@ class RuleEngine:
                 FROM jobs j
                 LEFT JOIN job_reservations jr ON jr.job_id = j.id
                 LEFT JOIN warehouse_movements wm ON wm.job_id = j.id AND wm.movement_type = 'issue'
-                WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'Dokončeno', 'completed')
+                WHERE j.status IN ('active', 'Aktivní', 'rozpracováno', 'Dokončeno', 'completed'){scope}
                 GROUP BY j.id
                 HAVING planned_qty > 0 AND ABS(actual_qty - planned_qty) / planned_qty > 0.2
-            ''').fetchall()
+            ''', scope_params).fetchall()
             
             for job in jobs_with_variance:
                 planned = job['planned_qty'] or 0
@@ -792,7 +796,7 @@ class RuleEngine:
                         entity_id=job['id']
                     )
         except Exception as e:
-            print(f"R15 error: {e}")
+            self._rule_failed('R15', e)
     
     def _get_weather_forecast(self, today):
         """Simulace předpovědi počasí"""
@@ -809,13 +813,48 @@ class RuleEngine:
         return forecast
 
 
+# =============================================================================
+# CHANGE FEED (entity_change, plněno triggery z ai_operator_migrations)
+# =============================================================================
+
+def read_change_feed(db, limit=5000):
+    """Vrať ({typ entity: množina id}, poslední id feedu).
+    
+    Při více než `limit` změnách vrátí dirty=None - levnější je plný průchod.
+    """
+    try:
+        upto = db.execute('SELECT MAX(id) FROM entity_change').fetchone()[0]
+    except Exception:
+        return None, None  # feed ještě neexistuje - jen plné průchody
+    if upto is None:
+        return {}, None
+    rows = db.execute(
+        'SELECT DISTINCT entity_type, entity_id FROM entity_change WHERE id <= ? LIMIT ?',
+        (upto, limit + 1)
+    ).fetchall()
+    if len(rows) > limit:
+        return None, upto
+    dirty = {}
+    for entity_type, entity_id in rows:
+        dirty.setdefault(entity_type, set()).add(entity_id)
+    return dirty, upto
+
+
+def trim_change_feed(db, upto):
+    """Odstraň zpracované záznamy feedu (novější změny zůstanou pro další běh)"""
+    if upto is None:
+        return
+    db.execute('DELETE FROM entity_change WHERE id <= ?', (upto,))
+    db.commit()
+
+
 # =============================================================================
 # INSIGHT MANAGEMENT API
 # =============================================================================
 
 def get_insights(status=None, severity=None, insight_type=None, limit=50, apply_rbac=True):
     """Získej seznam insightů s filtry a RBAC"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     query = 'SELECT * FROM insight WHERE 1=1'
     params = []
@@ -854,7 +893,7 @@ def get_insights(status=None, severity=None, insight_type=None, limit=50, apply_
 
 def get_insight_detail(insight_id, apply_rbac=True):
     """Získej detail insightu včetně evidence a akcí s RBAC"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     insight = db.execute('SELECT * FROM insight WHERE id = ?', (insight_id,)).fetchone()
     
@@ -889,7 +928,7 @@ def get_insight_detail(insight_id, apply_rbac=True):
 
 def snooze_insight(insight_id, until_date):
     """Odlož insight"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE insight SET status = 'snoozed', snoozed_until = ?, updated_at = datetime('now')
@@ -902,7 +941,7 @@ def snooze_insight(insight_id, until_date):
 
 def dismiss_insight(insight_id, reason_code, user_id=None):
     """Zamítni insight s důvodem"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE insight SET 
@@ -919,7 +958,7 @@ def dismiss_insight(insight_id, reason_code, user_id=None):
 
 def resolve_insight(insight_id):
     """Označ insight jako vyřešený"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE insight SET 
@@ -939,7 +978,7 @@ def resolve_insight(insight_id):
 
 def create_action_draft(insight_id, action_type, title, payload, user_id=None):
     """Vytvoř návrh akce"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     cursor = db.execute('''
         INSERT INTO action_draft (insight_id, created_by, action_type, title, payload_json, status)
@@ -952,7 +991,7 @@ def create_action_draft(insight_id, action_type, title, payload, user_id=None):
 
 def get_action_drafts(status=None, limit=50):
     """Získej seznam návrhů akcí"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     query = 'SELECT * FROM action_draft'
     params = []
@@ -977,7 +1016,7 @@ def get_action_drafts(status=None, limit=50):
 
 def approve_action_draft(draft_id, user_id=None):
     """Schval návrh akce"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE action_draft SET 
@@ -993,7 +1032,7 @@ def approve_action_draft(draft_id, user_id=None):
 
 def reject_action_draft(draft_id, reason, user_id=None):
     """Zamítni návrh akce"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     db.execute('''
         UPDATE action_draft SET 
@@ -1010,7 +1049,7 @@ def reject_action_draft(draft_id, reason, user_id=None):
 
 def execute_action_draft(draft_id):
     """Proveď schválenou akci"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     draft = db.execute('SELECT * FROM action_draft WHERE id = ?', (draft_id,)).fetchone()
     
@@ -1291,7 +1330,7 @@ def _execute_request_timesheet_approval(db, payload):
         SELECT t.id, t.employee_id, e.name as employee_name, t.date, t.hours
         FROM timesheets t
         JOIN employees e ON e.id = t.employee_id
-        WHERE t.date BETWEEN ? AND ?
+        WHERE t.date_iso BETWEEN ? AND ?
         AND (t.approved IS NULL OR t.approved = 0)
     ''', (period_start, period_end)).fetchall()
     
@@ -1435,7 +1474,7 @@ Green David s.r.o.
 def get_company_health_score(db=None):
     """Vypočítej skóre zdraví firmy"""
     if db is None:
-        db = get_db_with_row_factory()
+        db = get_db()
     
     # Počty insightů podle severity
     counts = db.execute('''
@@ -1465,7 +1504,7 @@ def get_company_health_score(db=None):
 
 def get_top_insights(limit=3):
     """Získej top N nejdůležitějších insightů pro dnešek"""
-    db = get_db_with_row_factory()
+    db = get_db()
     
     insights = db.execute('''
         SELECT id, type, severity, title, summary, actions_json, entity_type, entity_id
@@ -1498,12 +1537,9 @@ def register_ai_operator_routes(app):
     @login_required
     def api_ai_dashboard_v2():
         """Hlavní AI dashboard endpoint (Rule Engine verze)"""
-        db = get_db_with_row_factory()
-        
-        # Spusť rule engine pro aktualizaci insightů
-        engine = RuleEngine(db)
-        engine.run_all_rules()
+        db = get_db()
         
+        # Insighty materializuje ai_operator_scheduler na pozadí - zde jen čtení
         # Získej data pro dashboard
         health = get_company_health_score(db)
         top_insights = get_top_insights(3)
@@ -1626,7 +1662,7 @@ def register_ai_operator_routes(app):
     @login_required
     def api_run_rules():
         """Manuální spuštění rule engine"""
-        db = get_db_with_row_factory()
+        db = get_db()
         start_time = datetime.now()
         engine = RuleEngine(db)
         insights = engine.run_all_rules()
@@ -1650,7 +1686,7 @@ def register_ai_operator_routes(app):
     @login_required
     def api_rules_status():
         """Stav rule engine - poslední běhy, latence, počty insightů"""
-        db = get_db_with_row_factory()
+        db = get_db()
         
         # Poslední běhy rule engine
         last_runs = db.execute('''
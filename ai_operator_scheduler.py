@@ -0,0 +1,226 @@
+"""
+GREEN DAVID APP - AI OPERÁTOR SCHEDULER
+========================================
+Vyhodnocuje pravidla RuleEngine na pozadí místo při každém GET dashboardu.
+
+- In-process vlákno v každém gunicorn workeru; pravidla spouští jen leader,
+  zvolený přes lease řádek v tabulce scheduler_lease.
+- Plný průchod po intervalu (AI_RULES_INTERVAL, výchozí 900 s); při změně dat
+  (PRAGMA data_version) inkrementální běh jen nad entitami z entity_change,
+  nejvýše jednou za AI_RULES_MIN_GAP. Zpracované záznamy feedu maže běh
+  pravidel; strop velikosti feedu drží triggery (CHANGE_FEED_MAX_ROWS), takže
+  feed neroste ani bez scheduleru.
+- Leader také rozesílá automatické notifikace (app.utils.notification_fanout)
+  každých NOTIFY_INTERVAL sekund - /api/notifications je pak čisté čtení.
+- Leader každých COUNTERS_RECONCILE_INTERVAL s srovná počítadla user_counters
+  s přepočtem od nuly (pojistka k triggerům).
+- Samostatný worker: python ai_operator_scheduler.py [--once]
+  (pak ve webu nastav AI_RULES_SCHEDULER=0).
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from app.database import open_connection
+from app.utils.notification_fanout import NOTIFY_INTERVAL, run_notification_fanout
+from app.utils.user_counters import RECONCILE_INTERVAL, reconcile_user_counters
+
+LEASE_NAME = 'rule_engine'
+LEASE_TTL = 60          # s - leader musí lease obnovit dřív, než vyprší
+POLL_INTERVAL = 5       # s - jak často vlákno kontroluje změny dat
+RUN_INTERVAL = int(os.environ.get('AI_RULES_INTERVAL', '900'))
+MIN_GAP = int(os.environ.get('AI_RULES_MIN_GAP', '60'))
+
+_state = {'thread': None, 'wake': threading.Event(), 'stop': threading.Event()}
+
+
+def _owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def try_acquire_lease(db, owner, name=LEASE_NAME, ttl=LEASE_TTL):
+    """Získej nebo obnov lease; vrací True, pokud je tento proces leader."""
+    now = time.time()
+    try:
+        db.execute('''
+            INSERT INTO scheduler_lease (name, owner, expires_at, heartbeat_at)
+            VALUES (?, ?, ?, datetime('now'))
+            ON CONFLICT(name) DO UPDATE SET
+                owner = excluded.owner,
+                expires_at = excluded.expires_at,
+                heartbeat_at = excluded.heartbeat_at
+            WHERE scheduler_lease.owner = excluded.owner OR scheduler_lease.expires_at < ?
+        ''', (name, owner, now + ttl, now))
+        db.commit()
+        row = db.execute('SELECT owner FROM scheduler_lease WHERE name = ?', (name,)).fetchone()
+        return bool(row) and row[0] == owner
+    except Exception as e:
+        db.rollback()
+        print(f"[AI Scheduler] Lease error: {e}")
+        return False
+
+
+def release_lease(db, owner, name=LEASE_NAME):
+    try:
+        db.execute('DELETE FROM scheduler_lease WHERE name = ? AND owner = ?', (name, owner))
+        db.commit()
+    except Exception:
+        pass
+
+
+def run_rules_once(db, full=True):
+    """Jeden běh pravidel + záznam RULES_RUN do event_log.
+    
+    full=False přepočítá jen entity ze změnového feedu (entity_change);
+    plný průchod je pojistka pro pravidla závislá na čase (termíny, neaktivita).
+    """
+    from ai_operator_migrations import log_event
+    from ai_operator_rule_engine import RuleEngine, read_change_feed, trim_change_feed
+
+    dirty, upto = read_change_feed(db)
+    if full or dirty is None:
+        dirty = None
+    elif not dirty:
+        return []  # změny jen v tabulkách, na kterých pravidla nezávisí
+
+    start_time = datetime.now()
+    insights = RuleEngine(db).run_all_rules(dirty=dirty)
+    trim_change_feed(db, upto)
+    duration_ms = (datetime.now() - start_time).total_seconds() * 1000
+    log_event(db, 'rule_engine', None, 'RULES_RUN', {
+        'insights_generated': len(insights),
+        'duration_ms': duration_ms,
+        'trigger': 'scheduler',
+        'mode': 'full' if dirty is None else 'incremental',
+        'dirty': {k: len(v) for k, v in (dirty or {}).items()}
+    })
+    return insights
+
+
+def run_notifications_once(db):
+    """Rozeslání automatických notifikací; chyba nezastaví běh pravidel."""
+    try:
+        events, inserted = run_notification_fanout(db)
+        if inserted:
+            print(f"[AI Scheduler] Notifications: {inserted} new ({events} events)")
+    except Exception as e:
+        db.rollback()
+        print(f"[AI Scheduler] Notification fan-out failed: {e}")
+
+
+def reconcile_counters_once(db):
+    try:
+        fixed = reconcile_user_counters(db)
+        if fixed:
+            print(f"[AI Scheduler] User counters: corrected {fixed} users")
+    except Exception as e:
+        db.rollback()
+        print(f"[AI Scheduler] Counter reconciliation failed: {e}")
+
+
+def _data_version(db):
+    # Mění se s každým commitem z jiného spojení (i z jiných workerů)
+    return db.execute('PRAGMA data_version').fetchone()[0]
+
+
+def _scheduler_loop(stop, wake, once=False):
+    db = open_connection()
+    owner = _owner_id()
+    is_leader = False
+    last_lease = 0.0
+    last_run = 0.0
+    last_full = 0.0
+    last_notify = 0.0
+    last_reconcile = time.time()  # migrace počítadla právě naplnila
+    seen_version = None
+    try:
+        while not stop.is_set():
+            now = time.time()
+            if now - last_lease >= LEASE_TTL / 3:
+                is_leader = try_acquire_lease(db, owner)
+                last_lease = now
+
+            if is_leader and (once or now - last_notify >= NOTIFY_INTERVAL):
+                run_notifications_once(db)
+                last_notify = time.time()
+
+            if is_leader and now - last_reconcile >= RECONCILE_INTERVAL:
+                reconcile_counters_once(db)
+                last_reconcile = time.time()
+
+            if is_leader:
+                version = _data_version(db)
+                changed = version != seen_version
+                due = now - last_full >= RUN_INTERVAL
+                full = once or due or wake.is_set()
+                if full or (changed and now - last_run >= MIN_GAP):
+                    wake.clear()
+                    try:
+                        run_rules_once(db, full=full)
+                    except Exception as e:
+                        db.rollback()
+                        print(f"[AI Scheduler] Rule run failed: {e}")
+                    last_run = time.time()
+                    if full:
+                        last_full = last_run
+                    # Vlastní zápisy data_version na tomto spojení nemění; změny jiných
+                    # workerů během běhu zůstanou ve feedu pro další inkrementální běh
+                    seen_version = version
+                    if once:
+                        break
+            elif once:
+                print("[AI Scheduler] Another worker holds the lease - nothing to do")
+                break
+
+            wake.wait(POLL_INTERVAL)
+    finally:
+        if is_leader:
+            release_lease(db, owner)
+        db.close()
+
+
+def start_scheduler():
+    """Spusť scheduler vlákno v tomto procesu (idempotentní)."""
+    if os.environ.get('AI_RULES_SCHEDULER', '1') == '0':
+        return None
+    thread = _state['thread']
+    if thread is not None and thread.is_alive():
+        return thread
+    _state['stop'].clear()
+    thread = threading.Thread(
+        target=_scheduler_loop, args=(_state['stop'], _state['wake']),
+        name='ai-rule-scheduler', daemon=True
+    )
+    thread.start()
+    _state['thread'] = thread
+    return thread
+
+
+def stop_scheduler():
+    _state['stop'].set()
+    _state['wake'].set()
+
+
+def request_rules_run():
+    """Požádej leadera v tomto procesu o okamžitý běh (např. po hromadné změně dat)."""
+    _state['wake'].set()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    once = '--once' in argv
+    print(f"[AI Scheduler] Standalone worker (interval {RUN_INTERVAL}s, once={once})")
+    try:
+        _scheduler_loop(_state['stop'], _state['wake'], once=once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,35 +1,111 @@
-import sqlite3
 import os
-from flask import g
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+
 from app.config import DATABASE as DB_PATH
 
+# ----------------- Connection pool -----------------
+# Per-worker pool of pre-configured connections. Pragmas are tuned once per
+# connection (not per request); connections are reset and reused afterwards.
+# get_db() hands out a writer, get_read_db() a query_only reader.
+
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "4"))
+STATEMENT_CACHE_SIZE = 256
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+_pool = {"pid": None, "rw": [], "ro": []}
+_pool_lock = threading.Lock()
+
+
+def _ensure_db_dir():
+    db_dir = os.path.dirname(DB_PATH)
+    if db_dir and not os.path.exists(db_dir):
+        try:
+            os.makedirs(db_dir, exist_ok=True)
+            print(f"[DB] Created directory: {db_dir}")
+        except Exception as e:
+            print(f"[DB] Warning: Could not create directory {db_dir}: {e}")
+
+
+def _connect(readonly=False):
+    _ensure_db_dir()
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=5,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not readonly:
+            # WAL is persistent in the DB file; set it from writers only
+            conn.execute("PRAGMA journal_mode=WAL")
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+    except Exception:
+        pass
+    return conn
+
+
+def _acquire(kind):
+    with _pool_lock:
+        if _pool["pid"] != os.getpid():
+            # Forked worker - never reuse the parent's connections
+            _pool.update(pid=os.getpid(), rw=[], ro=[])
+        if _pool[kind]:
+            return _pool[kind].pop()
+    return _connect(readonly=(kind == "ro"))
+
+
+def _release(conn, kind):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        # Modules may swap row_factory / tracing; hand out a clean connection next time
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(None)
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return
+    with _pool_lock:
+        if _pool["pid"] == os.getpid() and len(_pool[kind]) < POOL_SIZE:
+            _pool[kind].append(conn)
+            return
+    conn.close()
+
+
+def open_connection(readonly=False):
+    """Unpooled, pre-configured connection for background threads and CLI jobs."""
+    return _connect(readonly=readonly)
+
+
 def get_db():
+    """Writer connection for the current app context (pooled)."""
     if "db" not in g:
-        # Ensure directory exists for DB_PATH
-        db_dir = os.path.dirname(DB_PATH)
-        if db_dir and not os.path.exists(db_dir):
-            try:
-                os.makedirs(db_dir, exist_ok=True)
-                print(f"[DB] Created directory: {db_dir}")
-            except Exception as e:
-                print(f"[DB] Warning: Could not create directory {db_dir}: {e}")
-        
         # Log database path (only once at startup)
         if not hasattr(get_db, '_logged'):
             print(f"[DB] Using database: {DB_PATH}")
             get_db._logged = True
-        
-        # Connect with WAL mode for better concurrency
-        # Use a small timeout to reduce 'database is locked' errors under concurrent requests
-        g.db = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=5)
-        g.db.row_factory = sqlite3.Row
-        # Enable WAL mode for better performance and durability
-        try:
-            g.db.execute("PRAGMA journal_mode=WAL")
-        except Exception:
-            pass
+        g.db = _acquire("rw")
     return g.db
 
+
+def get_read_db():
+    """Read-only (query_only) connection for pure read endpoints (pooled)."""
+    if "read_db" not in g:
+        g.read_db = _acquire("ro")
+    return g.read_db
+
+
 def _table_has_column(db, table: str, column: str) -> bool:
     try:
         rows = db.execute(f"PRAGMA table_info({table})").fetchall()
@@ -50,11 +126,87 @@ def _table_exists(db, table: str) -> bool:
         return False
 
 
+def change_feed_version(db):
+    """Monotonic write counter from the entity_change feed (None if the feed is missing).
+
+    Comparable across connections and workers; sqlite_sequence keeps growing
+    even after consumed feed rows are trimmed.
+    """
+    try:
+        row = db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'entity_change'").fetchone()
+    except Exception:
+        return None
+    return row[0] if row else 0
+
+
+# ----------------- Schema catalog -----------------
+# Process-wide cache of table columns and of SQL built from them. Invalidated
+# by the migration runner and whenever PRAGMA schema_version moves (checked at
+# most once per request), so ALTERs from other workers are picked up too.
+
+_schema_catalog = {"version": None, "tables": {}, "statements": {}}
+
+
+def invalidate_schema_cache():
+    """Forget cached table layouts (call after DDL)."""
+    _schema_catalog["version"] = None
+    _schema_catalog["tables"] = {}
+    _schema_catalog["statements"] = {}
+    if has_app_context():
+        g.pop("_schema_checked", None)
+
+
+def _check_schema_version(db):
+    if has_app_context():
+        if g.get("_schema_checked"):
+            return
+        g._schema_checked = True
+    try:
+        version = db.execute("PRAGMA schema_version").fetchone()[0]
+    except Exception:
+        version = None
+    if version != _schema_catalog["version"]:
+        invalidate_schema_cache()
+        _schema_catalog["version"] = version
+        if has_app_context():
+            g._schema_checked = True
+
+
+def table_info(db, table: str) -> dict:
+    """Cached PRAGMA table_info as {column: {"type", "notnull", "default", "pk"}}."""
+    _check_schema_version(db)
+    info = _schema_catalog["tables"].get(table)
+    if info is None:
+        try:
+            rows = db.execute(f"PRAGMA table_info({table})").fetchall()
+        except Exception:
+            rows = []
+        # rows: cid, name, type, notnull, dflt_value, pk
+        info = {r[1]: {"type": r[2], "notnull": int(r[3]), "default": r[4], "pk": int(r[5])} for r in rows}
+        _schema_catalog["tables"][table] = info
+    return info
+
+
+def table_columns(db, table: str) -> tuple:
+    """Cached column names of a table (empty if the table does not exist)."""
+    return tuple(table_info(db, table))
+
+
+def cached_statement(db, key: str, builder):
+    """Return SQL built by builder() once per schema version (e.g. dynamic SELECT lists)."""
+    _check_schema_version(db)
+    sql = _schema_catalog["statements"].get(key)
+    if sql is None:
+        sql = builder()
+        _schema_catalog["statements"][key] = sql
+    return sql
+
+
 def close_db(exception=None):
-    """Close the database connection at the end of the request."""
+    """Return the request's connections to the pool."""
     db = g.pop('db', None)
     if db is not None:
-        try:
-            db.close()
-        except Exception:
-            pass
+        _release(db, "rw")
+    read_db = g.pop('read_db', None)
+    if read_db is not None:
+        _release(read_db, "ro")
@@ -1,10 +1,15 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, send_file, render_template
+import json
+import os
 from datetime import datetime
-import os, io, json
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role
+
+from flask import Blueprint, Response, jsonify, render_template, request, send_file, send_from_directory
+
 from app.config import UPLOAD_FOLDER
+from app.database import get_db, table_columns
+from app.utils import db_export
+from app.utils.permissions import require_auth, require_role, requires_role
+from app.utils.response_cache import cached_response
 
 api_bp = Blueprint('api', __name__)
 
@@ -18,27 +23,96 @@ def page_trainings():
 @api_bp.route("/api/admin/export-all", methods=["GET"])
 @requires_role('owner', 'admin')
 def api_admin_export_all():
-    """Export všech tabulek do JSON (pouze owner/admin)."""
-    db = get_db()
-    tables = [r["name"] for r in db.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
-    ).fetchall()]
-    export = {
-        "exported_at": datetime.utcnow().isoformat() + "Z",
-        "db_path": os.environ.get("DB_PATH") or "/var/data/app.db",
-        "tables": {},
-    }
-    for t in tables:
-        rows = db.execute(f"SELECT * FROM {t}").fetchall()
-        export["tables"][t] = [dict(r) for r in rows]
-    payload = json.dumps(export, ensure_ascii=False, indent=2)
-    buf = io.BytesIO(payload.encode("utf-8"))
-    filename = f"green-david-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
-    return send_file(buf, mimetype="application/json", as_attachment=True, download_name=filename)
+    """Streamovaný NDJSON export všech tabulek (pouze owner/admin).
+
+    ?gzip=1              - komprimovaný výstup (.ndjson.gz)
+    ?tables=a,b          - jen vybrané tabulky
+    ?start_table=&after_rowid= - navázání přerušeného exportu
+    """
+    tables = [t for t in (request.args.get("tables") or "").split(",") if t.strip()] or None
+    start_table = request.args.get("start_table") or None
+    after_rowid = request.args.get("after_rowid", 0, type=int) or 0
+    chunk = max(100, min(request.args.get("chunk", db_export.CHUNK_ROWS, type=int) or db_export.CHUNK_ROWS, 10000))
+    stream = db_export.iter_ndjson(tables=tables, start_table=start_table,
+                                   after_rowid=after_rowid, chunk=chunk)
+    filename = f"green-david-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    if request.args.get("gzip") in ("1", "true"):
+        body, mimetype, filename = db_export.gzip_stream(stream), "application/gzip", filename + ".gz"
+    else:
+        body, mimetype = stream, "application/x-ndjson"
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Accel-Buffering": "no",
+    })
+
+
+@api_bp.route("/api/admin/export-all/manifest", methods=["GET"])
+@requires_role('owner', 'admin')
+def api_admin_export_manifest():
+    """Manifest exportu (tabulky, sloupce, počty řádků) bez dat."""
+    return jsonify({"ok": True, "manifest": db_export.build_manifest(get_db())})
+
+
+@api_bp.route("/api/admin/snapshots", methods=["GET"])
+@requires_role('owner', 'admin')
+def api_admin_snapshots():
+    return jsonify({"ok": True, "snapshots": db_export.list_snapshots()})
+
+
+@api_bp.route("/api/admin/snapshots", methods=["POST"])
+@requires_role('owner', 'admin')
+def api_admin_snapshot_create():
+    """Nový konzistentní snapshot databáze (SQLite backup API)."""
+    try:
+        snap = db_export.create_snapshot()
+    except Exception as e:
+        return jsonify({"ok": False, "error": "snapshot_failed", "message": str(e)}), 500
+    snap["url"] = f"/api/admin/snapshots/{snap['id']}"
+    return jsonify({"ok": True, "snapshot": snap}), 201
 
 
+@api_bp.route("/api/admin/snapshots/<snapshot_id>", methods=["GET"])
+@requires_role('owner', 'admin')
+def api_admin_snapshot_download(snapshot_id):
+    """Stažení snapshotu; podporuje Range / If-Range pro navázání stahování."""
+    path = db_export.snapshot_path(snapshot_id)
+    if not path:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    return send_file(path, mimetype="application/vnd.sqlite3", as_attachment=True,
+                     download_name=snapshot_id, conditional=True, max_age=0)
 
 
+@api_bp.route("/api/admin/snapshots/<snapshot_id>", methods=["DELETE"])
+@requires_role('owner', 'admin')
+def api_admin_snapshot_delete(snapshot_id):
+    path = db_export.snapshot_path(snapshot_id)
+    if not path:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    os.remove(path)
+    return jsonify({"ok": True})
+
+
+@api_bp.route("/api/admin/download-db", methods=["GET"])
+@requires_role('owner', 'admin')
+def api_admin_download_db():
+    """Stáhne konzistentní snapshot SQLite databáze (pouze owner/admin).
+
+    Nikdy neposílá živý WAL soubor. Navazující požadavek s Range dostane
+    poslední existující snapshot (If-Range ověří ETag); jinak se použije
+    snapshot mladší než SNAPSHOT_REUSE_SECONDS, a teprve pak vznikne nový.
+    """
+    snaps = db_export.list_snapshots()
+    if request.range and snaps:
+        path = db_export.snapshot_path(snaps[0]["id"])
+    else:
+        path = db_export.recent_snapshot()
+    if not path:
+        try:
+            path = db_export.snapshot_path(db_export.create_snapshot()["id"])
+        except Exception as e:
+            return jsonify({"ok": False, "error": "snapshot_failed", "message": str(e)}), 500
+    return send_file(path, mimetype="application/vnd.sqlite3",
+                     as_attachment=True, download_name="app.db", conditional=True, max_age=0)
 
 
 # Additional routes from main.py
@@ -179,7 +253,7 @@ def api_team_member_ai_analysis(employee_id):
         
         # Aktuální hodiny tento týden
         timesheet_rows = db.execute(
-            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
             (employee_id, week_start, week_end)
         ).fetchone()
         current_hours = round(timesheet_rows["total"] or 0, 1)
@@ -190,7 +264,7 @@ def api_team_member_ai_analysis(employee_id):
             week_start_check = (monday - timedelta(weeks=i)).strftime("%Y-%m-%d")
             week_end_check = (monday - timedelta(weeks=i) + timedelta(days=6)).strftime("%Y-%m-%d")
             week_hours = db.execute(
-                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                 (employee_id, week_start_check, week_end_check)
             ).fetchone()
             week_total = round(week_hours["total"] or 0, 1)
@@ -318,7 +392,7 @@ def api_ai_crew_assistant():
             
             # Aktuální hodiny tento týden
             timesheet_result = db.execute(
-                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                 (emp_id, week_start, week_end)
             ).fetchone()
             worked_hours = round(timesheet_result["total"] or 0, 1)
@@ -371,7 +445,7 @@ def api_ai_crew_assistant():
                 week_start_check = (monday - timedelta(weeks=week_i)).strftime("%Y-%m-%d")
                 week_end_check = (monday - timedelta(weeks=week_i) + timedelta(days=6)).strftime("%Y-%m-%d")
                 week_hours_result = db.execute(
-                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                     (emp_id, week_start_check, week_end_check)
                 ).fetchone()
                 week_total = round(week_hours_result["total"] or 0, 1)
@@ -410,7 +484,7 @@ def api_ai_crew_assistant():
             capacity = profile['weekly_capacity_hours'] if profile else 40.0
             if capacity > 0:
                 timesheet_result = db.execute(
-                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                     (emp_id, week_start, week_end)
                 ).fetchone()
                 worked = round(timesheet_result["total"] or 0, 1)
@@ -493,7 +567,7 @@ def api_team_ai_recommendations():
             
             # Aktuální hodiny
             timesheet_rows = db.execute(
-                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                 (emp_id, week_start, week_end)
             ).fetchone()
             current_hours = round(timesheet_rows["total"] or 0, 1)
@@ -507,7 +581,7 @@ def api_team_ai_recommendations():
                 week_start_check = (monday - timedelta(weeks=week_i)).strftime("%Y-%m-%d")
                 week_end_check = (monday - timedelta(weeks=week_i) + timedelta(days=6)).strftime("%Y-%m-%d")
                 week_hours_result = db.execute(
-                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+                    "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
                     (emp_id, week_start_check, week_end_check)
                 ).fetchone()
                 week_total = round(week_hours_result["total"] or 0, 1)
@@ -594,8 +668,8 @@ def api_weather():
         city_name = 'Praha'
     
     try:
-        import urllib.request
         import urllib.error
+        import urllib.request
         
         # Fetch weather + hourly for next 24h
         url = (
@@ -783,7 +857,7 @@ def api_dashboard_stats():
         
         # Hours this week
         hours_week = db.execute(
-            "SELECT COALESCE(SUM(hours), 0) as total FROM timesheets WHERE date >= ?",
+            "SELECT COALESCE(SUM(hours), 0) as total FROM timesheets WHERE date_iso >= ?",
             (week_start,)
         ).fetchone()['total']
         
@@ -1090,9 +1164,6 @@ def api_ai_brain_analysis():
     if err: return err
     try:
         import ai_operator_api
-        from app.database import get_db as app_get_db
-        # Nastav get_db před použitím
-        ai_operator_api.get_db = app_get_db
         data = ai_operator_api.get_ai_dashboard()
         return jsonify(data) if isinstance(data, dict) else data
     except Exception as e:
@@ -1109,15 +1180,14 @@ def api_ai_brain_analysis():
         })
 
 @api_bp.route('/api/ai/dashboard')
+@cached_response(tags=("jobs", "tasks", "timesheets", "employees", "warehouse_items", "job_materials",
+                       "job_employees", "task_assignments"), ttl=300)
 def api_ai_dashboard():
     """AI Dashboard data"""
     u, err = require_auth()
     if err: return err
     try:
         import ai_operator_api
-        from app.database import get_db as app_get_db
-        # Nastav get_db před použitím
-        ai_operator_api.get_db = app_get_db
         data = ai_operator_api.get_ai_dashboard()
         return jsonify(data) if isinstance(data, dict) else data
     except Exception as e:
@@ -1138,9 +1208,6 @@ def api_ai_drafts():
     if err: return err
     try:
         import ai_operator_api
-        from app.database import get_db as app_get_db
-        # Nastav get_db před použitím
-        ai_operator_api.get_db = app_get_db
         
         # Zkus použít funkci z ai_operator_api pokud existuje
         if hasattr(ai_operator_api, 'api_drafts'):
@@ -1186,18 +1253,13 @@ def api_ai_all_job_indicators():
     u, err = require_auth()
     if err: return err
     try:
-        import ai_operator_api
-        from app.database import get_db as app_get_db
-        ai_operator_api.get_db = app_get_db
-        
-        # Zavolej funkci z ai_operator_api
-        db = ai_operator_api.get_db_with_row_factory()
+        db = get_db()
         from datetime import datetime, timedelta
         today = datetime.now().date()
         result = {}
         
         # Zkontroluj existenci sloupce tags
-        job_cols = [r[1] for r in db.execute("PRAGMA table_info(jobs)").fetchall()]
+        job_cols = table_columns(db, "jobs")
         tags_col = "tags" if "tags" in job_cols else "NULL as tags"
         
         jobs = db.execute(f'''
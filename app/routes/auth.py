@@ -1,7 +1,9 @@
 # Green David App
 from flask import Blueprint, jsonify, redirect, request, session
 from werkzeug.security import check_password_hash, generate_password_hash
+
 from app.database import get_db
+from app.utils import user_counters
 from app.utils.permissions import current_user
 
 auth_bp = Blueprint('auth', __name__)
@@ -14,6 +16,7 @@ def api_me():
     unread = 0
     emp = None
     tasks_count = 0
+    open_issues = 0
     if u:
         try:
             db = get_db()
@@ -30,33 +33,17 @@ def api_me():
             except Exception:
                 emp = None
 
-            # Spočítej nepřečtené notifikace
-            unread = db.execute(
-                "SELECT COUNT(1) FROM notifications WHERE (user_id=? OR employee_id IN (SELECT id FROM employees WHERE user_id=?)) AND is_read=0",
-                (int(u["id"]), int(u["id"])),
-            ).fetchone()[0]
-            unread = int(unread or 0)
-
-            # Spočítej aktivní úkoly přiřazené uživateli
-            if emp:
-                tasks_count = db.execute("""
-                    SELECT COUNT(DISTINCT t.id) FROM tasks t
-                    LEFT JOIN task_assignments ta ON ta.task_id = t.id
-                    WHERE (t.employee_id=? OR ta.employee_id=? OR t.created_by=?)
-                    AND t.status NOT IN ('completed', 'done', 'cancelled', 'closed')
-                """, (emp["id"], emp["id"], int(u["id"]))).fetchone()[0]
-                tasks_count = int(tasks_count or 0)
-            else:
-                # Pokud není employee mapping, počítej úkoly vytvořené uživatelem
-                tasks_count = db.execute("""
-                    SELECT COUNT(1) FROM tasks
-                    WHERE created_by=? AND status NOT IN ('completed', 'done', 'cancelled', 'closed')
-                """, (int(u["id"]),)).fetchone()[0]
-                tasks_count = int(tasks_count or 0)
+            # Počítadla drží triggery (app.utils.user_counters) - jeden lookup podle PK
+            counters = user_counters.counters_for(db, u["id"])
+            unread = counters["unread_notifications"]
+            tasks_count = counters["open_tasks"]
+            open_issues = counters["open_issues"]
         except Exception:
             unread = 0
             tasks_count = 0
-    return jsonify({"ok": True, "authenticated": bool(u), "user": u, "employee": emp, "tasks_count": tasks_count, "unread_notifications": unread})
+            open_issues = 0
+    return jsonify({"ok": True, "authenticated": bool(u), "user": u, "employee": emp, "tasks_count": tasks_count,
+                    "unread_notifications": unread, "open_issues": open_issues})
 
 
 @auth_bp.route("/api/login", methods=["POST"])
@@ -1,5 +1,6 @@
-from flask import Blueprint, request, jsonify
-from app.database import get_db
+from flask import Blueprint, jsonify, request
+
+from app.database import get_db, table_columns
 
 budget_bp = Blueprint('budget', __name__)
 
@@ -59,38 +60,26 @@ def get_budget(job_id):
 
     grand_total = totals['material'] + totals['labor'] + totals['extras']
 
-    # Skutečné náklady z výkazů (PRÁCE)
-    ts_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
-    has_labor_cost = 'labor_cost' in ts_cols
-
+    # Skutečné náklady z výkazů (PRÁCE) - denní rollupy labor_daily
     actual_labor = {'total_hours': 0, 'total_cost': 0, 'by_employee': []}
     try:
-        if has_labor_cost:
-            ts_rows = db.execute("""
-                SELECT e.name, e.hourly_rate,
-                       SUM(t.hours) as hours,
-                       SUM(COALESCE(t.labor_cost, 0)) as cost
-                FROM timesheets t
-                JOIN employees e ON e.id = t.employee_id
-                WHERE t.job_id = ?
-                GROUP BY t.employee_id
-                ORDER BY cost DESC
-            """, (job_id,)).fetchall()
-        else:
-            ts_rows = db.execute("""
-                SELECT e.name, e.hourly_rate, SUM(t.hours) as hours
-                FROM timesheets t
-                JOIN employees e ON e.id = t.employee_id
-                WHERE t.job_id = ?
-                GROUP BY t.employee_id
-                ORDER BY hours DESC
-            """, (job_id,)).fetchall()
+        has_labor_cost = 'labor_cost' in table_columns(db, "timesheets")
+        ts_rows = db.execute("""
+            SELECT e.name, e.hourly_rate,
+                   SUM(d.hours) as hours,
+                   SUM(d.labor_cost) as cost
+            FROM labor_daily d
+            JOIN employees e ON e.id = d.employee_id
+            WHERE d.job_id = ?
+            GROUP BY d.employee_id
+            ORDER BY cost DESC, hours DESC
+        """, (job_id,)).fetchall()
 
         for ts in ts_rows:
             ts = dict(ts)
             rate = ts.get('hourly_rate') or 250.0
             hours = ts.get('hours') or 0
-            cost = ts.get('cost')
+            cost = ts.get('cost') if has_labor_cost else None
             if cost is None:
                 cost = round(hours * rate, 0)
             else:
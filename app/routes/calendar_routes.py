@@ -1,7 +1,10 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
 from datetime import datetime, timedelta
-from app.database import get_db, _table_has_column
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.database import get_db, get_read_db
+from app.utils import search_index
 from app.utils.permissions import require_auth, require_role
 
 calendar_bp = Blueprint('calendar', __name__)
@@ -146,99 +149,74 @@ def gd_api_calendar_delete(event_id):
 # ----------------- GLOBAL SEARCH -----------------
 @calendar_bp.route("/api/search", methods=["GET"])
 def api_global_search():
-    """Globální vyhledávání napříč zakázkami, úkoly, issues a zaměstnanci"""
+    """Globální vyhledávání napříč zakázkami, úkoly, issues, zaměstnanci,
+    poznámkami, adresářem a skladem (FTS index search_index)."""
     u, err = require_role()
     if err: return err
     
     query = request.args.get("q", "").strip()
+    empty = {kind: [] for kind in _SEARCH_GROUPS.values()}
     if not query or len(query) < 2:
-        return jsonify({"ok": True, "results": {"jobs": [], "tasks": [], "issues": [], "employees": []}})
-    
-    db = get_db()
-    search_term = f"%{query}%"
-    
-    # Choose best available timestamp for ordering jobs (schema differs across versions)
-    if _table_has_column(db, "jobs", "created_at"):
-        jobs_order = "datetime(created_at) DESC, id DESC"
-    elif _table_has_column(db, "jobs", "created_date"):
-        jobs_order = "datetime(created_date) DESC, id DESC"
-    elif _table_has_column(db, "jobs", "date"):
-        jobs_order = "date(date) DESC, id DESC"
-    else:
-        jobs_order = "id DESC"
-
-    # Search Jobs
-    # NOTE: Schéma "jobs" se v různých verzích liší. V této aplikaci má tabulka jobs
-    # typicky sloupce: name/title, client, city, note, code, created_at. Původní varianta
-    # používala description/customer/address, které v DB nejsou.
-    jobs = db.execute(f"""
-        SELECT
-            id,
-            COALESCE(title, name, '') AS name,
-            note AS description,
-            client AS customer,
-            city AS address,
-            status
-        FROM jobs
-        WHERE COALESCE(title, name, '') LIKE ?
-           OR client LIKE ?
-           OR city LIKE ?
-           OR note LIKE ?
-           OR code LIKE ?
-        ORDER BY {jobs_order}
-        LIMIT 10
-    """, (search_term, search_term, search_term, search_term, search_term)).fetchall()
-    
-    # Search Tasks (including assigned employees)
-    tasks = db.execute("""
-        SELECT DISTINCT t.id, t.job_id, t.title, t.description, t.status, t.due_date,
-               COALESCE(j.title, j.name, '') as job_name
-        FROM tasks t
-        LEFT JOIN jobs j ON j.id = t.job_id
-        LEFT JOIN task_assignments ta ON ta.task_id = t.id
-        LEFT JOIN employees e ON e.id = ta.employee_id
-        WHERE t.title LIKE ? 
-           OR t.description LIKE ?
-           OR e.name LIKE ?
-        ORDER BY t.created_at DESC
-        LIMIT 10
-    """, (search_term, search_term, search_term)).fetchall()
-    
-    # Search Issues (including assigned employees)
-    issues = db.execute("""
-        SELECT DISTINCT i.id, i.job_id, i.title, i.description, i.type, i.status, i.severity,
-               COALESCE(j.title, j.name, '') as job_name
-        FROM issues i
-        LEFT JOIN jobs j ON j.id = i.job_id
-        LEFT JOIN issue_assignments ia ON ia.issue_id = i.id
-        LEFT JOIN employees e ON e.id = ia.employee_id
-        WHERE i.title LIKE ? 
-           OR i.description LIKE ?
-           OR e.name LIKE ?
-        ORDER BY i.created_at DESC
-        LIMIT 10
-    """, (search_term, search_term, search_term)).fetchall()
-    
-    # Search Employees
-    employees = db.execute("""
-        SELECT id, name, email, phone, role
-        FROM employees
-        WHERE name LIKE ? OR email LIKE ? OR phone LIKE ?
-        ORDER BY name
-        LIMIT 10
-    """, (search_term, search_term, search_term)).fetchall()
+        return jsonify({"ok": True, "results": empty, "hits": []})
     
+    db = get_read_db()
+    hits = search_index.search(db, query, limit=10 * len(_SEARCH_GROUPS), per_kind=10)
+
+    ids = {}
+    for hit in hits:
+        ids.setdefault(hit["kind"], []).append(hit["id"])
+    results = dict(empty)
+    for kind, group in _SEARCH_GROUPS.items():
+        if ids.get(kind):
+            rows = {r["id"]: dict(r) for r in _search_rows(db, kind, ids[kind])}
+            # pořadí podle relevance z FTS
+            results[group] = [rows[i] for i in ids[kind] if i in rows]
+
     return jsonify({
         "ok": True,
         "query": query,
-        "results": {
-            "jobs": [dict(r) for r in jobs],
-            "tasks": [dict(r) for r in tasks],
-            "issues": [dict(r) for r in issues],
-            "employees": [dict(r) for r in employees]
-        },
-        "total": len(jobs) + len(tasks) + len(issues) + len(employees)
+        "results": results,
+        "hits": hits,
+        "total": sum(len(v) for v in results.values())
     })
 
 
+_SEARCH_GROUPS = {
+    "job": "jobs", "task": "tasks", "issue": "issues", "employee": "employees",
+    "note": "notes", "party": "parties", "warehouse_item": "warehouse_items",
+}
+
+
+def _search_rows(db, kind, ids):
+    """Detail nalezených řádků jednoho typu (tvar odpovědi /api/search)."""
+    marks = ",".join("?" * len(ids))
+    if kind == "job":
+        # NOTE: Schéma "jobs" se v různých verzích liší; typicky name/title, client, city, note, code
+        sql = f"""
+            SELECT id, COALESCE(title, name, '') AS name, note AS description,
+                   client AS customer, city AS address, status
+            FROM jobs WHERE id IN ({marks})"""
+    elif kind == "task":
+        sql = f"""
+            SELECT t.id, t.job_id, t.title, t.description, t.status, t.due_date,
+                   COALESCE(j.title, j.name, '') as job_name
+            FROM tasks t LEFT JOIN jobs j ON j.id = t.job_id
+            WHERE t.id IN ({marks})"""
+    elif kind == "issue":
+        sql = f"""
+            SELECT i.id, i.job_id, i.title, i.description, i.type, i.status, i.severity,
+                   COALESCE(j.title, j.name, '') as job_name
+            FROM issues i LEFT JOIN jobs j ON j.id = i.job_id
+            WHERE i.id IN ({marks})"""
+    elif kind == "employee":
+        sql = f"SELECT id, name, email, phone, role FROM employees WHERE id IN ({marks})"
+    elif kind == "note":
+        sql = f"SELECT id, title, category, job_id, employee_id, party_id, updated_at FROM notes WHERE id IN ({marks})"
+    elif kind == "party":
+        sql = f"SELECT id, display_name, email, phone, city, ico, status FROM parties WHERE id IN ({marks})"
+    else:
+        sql = f"SELECT * FROM warehouse_items WHERE id IN ({marks})"
+    return db.execute(sql, ids).fetchall()
+
+
 # ----------------- SMART FILTERS -----------------
@@ -1,12 +1,22 @@
 # Green David App
-from flask import Blueprint, jsonify, request, redirect, send_from_directory, render_template
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash
 import sqlite3
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role, get_current_user, normalize_role, normalize_employee_role
-from app.utils.helpers import _normalize_date
+
+from flask import Blueprint, jsonify, redirect, render_template, request, send_from_directory
+from werkzeug.security import generate_password_hash
+
 from app.config import ROLES
+from app.database import get_db, table_columns
+from app.utils.capacity import team_week_capacity, utilization, week_bounds
+from app.utils.helpers import _normalize_date
+from app.utils.permissions import (
+    get_current_user,
+    normalize_employee_role,
+    normalize_role,
+    require_auth,
+    require_role,
+    requires_role,
+)
+from app.utils.response_cache import cached_response
 
 employees_bp = Blueprint('employees', __name__)
 
@@ -20,66 +30,27 @@ def get_active_members_count(db):
     row = db.execute("SELECT COUNT(*) as cnt FROM employees WHERE status IN ('active', 'Aktivní') OR status IS NULL").fetchone()
     return row['cnt'] if row else 0
 
+def _active_utilizations(db, week_start):
+    """Vytížení (%) aktivních zaměstnanců v týdnu - jeden dotaz přes team_week_capacity"""
+    capacity = team_week_capacity(db, week_start)
+    active = db.execute("SELECT id FROM employees WHERE status IN ('active', 'Aktivní') OR status IS NULL").fetchall()
+    return [
+        utilization(capacity[r['id']]['tracked_hours'], capacity[r['id']]['weekly_capacity'])
+        for r in active if r['id'] in capacity
+    ]
+
 def get_average_utilization(db, week_start, week_end):
     """Průměrná vytíženost týmu v daném týdnu (%)"""
-    employees = db.execute("SELECT id FROM employees WHERE status IN ('active', 'Aktivní') OR status IS NULL").fetchall()
-    if not employees:
-        return 0
-    total_util = 0
-    count = 0
-    for emp in employees:
-        emp_dict = dict(emp)
-        emp_id = emp_dict['id']
-        # Získej kapacitu z profilu nebo použij fallback
-        profile = db.execute("SELECT weekly_capacity_hours FROM team_member_profile WHERE employee_id = ?", (emp_id,)).fetchone()
-        capacity = (dict(profile)['weekly_capacity_hours'] if profile else None) or 40
-        worked_row = db.execute(
-            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
-            (emp_id, week_start, week_end)
-        ).fetchone()
-        worked = (worked_row['total'] or 0) if worked_row else 0
-        if capacity > 0:
-            total_util += (worked / capacity) * 100
-        count += 1
-    return round(total_util / count, 1) if count > 0 else 0
+    utilizations = _active_utilizations(db, week_start)
+    return round(sum(utilizations) / len(utilizations), 1) if utilizations else 0
 
 def get_overloaded_count(db, week_start, week_end):
     """Počet přetížených zaměstnanců (>100% kapacity)"""
-    employees = db.execute("SELECT id FROM employees WHERE status IN ('active', 'Aktivní') OR status IS NULL").fetchall()
-    overloaded = 0
-    for emp in employees:
-        emp_dict = dict(emp)
-        emp_id = emp_dict['id']
-        # Získej kapacitu z profilu nebo použij fallback
-        profile = db.execute("SELECT weekly_capacity_hours FROM team_member_profile WHERE employee_id = ?", (emp_id,)).fetchone()
-        capacity = (dict(profile)['weekly_capacity_hours'] if profile else None) or 40
-        worked_row = db.execute(
-            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
-            (emp_id, week_start, week_end)
-        ).fetchone()
-        worked = (worked_row['total'] or 0) if worked_row else 0
-        if capacity > 0 and (worked / capacity) > 1.0:
-            overloaded += 1
-    return overloaded
+    return sum(1 for u in _active_utilizations(db, week_start) if u > 100)
 
 def get_ai_balance_score(db, week_start, week_end):
     """AI skóre vyváženosti týmu (0-100). Čím rovnoměrnější rozložení, tím vyšší."""
-    employees = db.execute("SELECT id FROM employees WHERE status IN ('active', 'Aktivní') OR status IS NULL").fetchall()
-    if not employees:
-        return 0
-    utilizations = []
-    for emp in employees:
-        emp_dict = dict(emp)
-        emp_id = emp_dict['id']
-        # Získej kapacitu z profilu nebo použij fallback
-        profile = db.execute("SELECT weekly_capacity_hours FROM team_member_profile WHERE employee_id = ?", (emp_id,)).fetchone()
-        capacity = (dict(profile)['weekly_capacity_hours'] if profile else None) or 40
-        worked_row = db.execute(
-            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
-            (emp_id, week_start, week_end)
-        ).fetchone()
-        worked = (worked_row['total'] or 0) if worked_row else 0
-        utilizations.append((worked / capacity * 100) if capacity > 0 else 0)
+    utilizations = _active_utilizations(db, week_start)
     if not utilizations:
         return 0
     avg = sum(utilizations) / len(utilizations)
@@ -195,6 +166,20 @@ def api_employees():
             ORDER BY e.id DESC
         """).fetchall()
 
+        # Týdenní hodiny (rollup), zakázky, úkoly, výkazy za 24 h a profily hromadně - ne dotazy na zaměstnance
+        week_start, _ = week_bounds()
+        capacity = team_week_capacity(db, week_start)
+        project_counts = dict(db.execute(
+            "SELECT employee_id, COUNT(DISTINCT job_id) FROM job_assignments GROUP BY employee_id").fetchall())
+        completed_tasks = dict(db.execute(
+            "SELECT employee_id, COUNT(*) FROM tasks WHERE status='completed' GROUP BY employee_id").fetchall())
+        recent_ids = {r[0] for r in db.execute(
+            "SELECT DISTINCT employee_id FROM timesheets WHERE date_iso >= date('now', '-1 day')").fetchall()}
+        try:
+            profiles = {r["employee_id"]: r for r in db.execute("SELECT * FROM team_member_profile").fetchall()}
+        except sqlite3.OperationalError:
+            profiles = {}
+
         employees = []
         for r in rows:
             emp = dict(r)
@@ -208,46 +193,19 @@ def api_employees():
             if emp.get("account_role") is not None:
                 emp["account_role"] = normalize_role(emp.get("account_role"))
             
-            # Vypočítej hodiny tento týden
-            today = datetime.now()
-            monday = today - timedelta(days=today.weekday())
-            week_start = monday.strftime("%Y-%m-%d")
-            week_end = (monday + timedelta(days=6)).strftime("%Y-%m-%d")
-            
-            timesheet_rows = db.execute(
-                "SELECT SUM(hours) as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
-                (emp_id, week_start, week_end)
-            ).fetchone()
-            emp["hours_week"] = round(timesheet_rows["total"] or 0, 1)
+            # Hodiny tento týden (labor_weekly přes team_week_capacity)
+            emp["hours_week"] = round(capacity.get(emp_id, {}).get("weekly_hours", 0), 1)
             
-            # Spočítej aktivní zakázky (kde je zaměstnanec přiřazen)
-            job_rows = db.execute(
-                "SELECT COUNT(DISTINCT job_id) as count FROM job_assignments WHERE employee_id=?",
-                (emp_id,)
-            ).fetchone()
-            emp["active_projects"] = job_rows["count"] or 0
-            
-            # Spočítej dokončené úkoly
-            task_rows = db.execute(
-                "SELECT COUNT(*) as count FROM tasks WHERE employee_id=? AND status='completed'",
-                (emp_id,)
-            ).fetchone()
-            emp["completed_tasks"] = task_rows["count"] or 0
+            # Aktivní zakázky (kde je zaměstnanec přiřazen) a dokončené úkoly
+            emp["active_projects"] = project_counts.get(emp_id, 0)
+            emp["completed_tasks"] = completed_tasks.get(emp_id, 0)
             
             # Status (online pokud má výkazy za posledních 24h)
-            recent_timesheet = db.execute(
-                "SELECT COUNT(*) as count FROM timesheets WHERE employee_id=? AND date >= date('now', '-1 day')",
-                (emp_id,)
-            ).fetchone()
-            emp["status"] = "online" if (recent_timesheet["count"] or 0) > 0 else "offline"
+            emp["status"] = "online" if emp_id in recent_ids else "offline"
             
             # NOVÉ: Rozšířený profil z Crew Control System (pokud existuje)
             try:
-                profile = db.execute(
-                    "SELECT * FROM team_member_profile WHERE employee_id = ?",
-                    (emp_id,)
-                ).fetchone()
-                
+                profile = profiles.get(emp_id)
                 if profile:
                     profile_dict = dict(profile)
                     # Parse JSON fields
@@ -325,7 +283,7 @@ def api_employees():
             approver_delegate_employee_id = data.get("approver_delegate_employee_id")
             
             # Build INSERT query with all available columns
-            cols = [r[1] for r in db.execute("PRAGMA table_info(employees)").fetchall()]
+            cols = table_columns(db, "employees")
             insert_cols = ["name", "role"]
             insert_vals = [name, role]
             
@@ -361,7 +319,7 @@ def api_employees():
             updates = []
             params = []
             # Get all available columns from schema
-            cols = [r[1] for r in db.execute("PRAGMA table_info(employees)").fetchall()]
+            cols = table_columns(db, "employees")
             allowed = ["name", "role", "phone", "email", "address", "birth_date", "contract_type", 
                       "start_date", "hourly_rate", "salary", "skills", "location", "status", "rating", "avatar_url",
                       "delegate_employee_id", "approver_delegate_employee_id"]
@@ -776,7 +734,7 @@ def gd_api_trainings_post():
         participants_json = json_lib.dumps(attendee_ids)
         
         # Dynamicky sestavit INSERT podle dostupných sloupců
-        existing_cols = {r[1] for r in db.execute("PRAGMA table_info(trainings)").fetchall()}
+        existing_cols = table_columns(db, "trainings")
         
         date_value = _normalize_date(data.get('date_start') or data.get('date'))
         date_end_value = _normalize_date(data.get('date_end')) if data.get('date_end') else None
@@ -871,7 +829,7 @@ def gd_api_trainings_put(training_id):
         if not training:
             return jsonify({"ok": False, "error": "not_found"}), 404
         
-        existing_cols = {r[1] for r in db.execute("PRAGMA table_info(trainings)").fetchall()}
+        existing_cols = table_columns(db, "trainings")
         
         # Build UPDATE query
         updates = []
@@ -1071,6 +1029,7 @@ def gd_api_trainings_complete(training_id):
 
 # ----------------- Trainings Statistics API -----------------
 @employees_bp.route("/gd/api/trainings/stats", methods=["GET"])
+@cached_response(tags=("trainings", "training_attendees", "employees"), ttl=300)
 def gd_api_trainings_stats():
     """Statistiky školení"""
     u, err = require_role(write=False)
@@ -1326,15 +1285,12 @@ def api_team_capacity_overview():
     
     db = get_db()
     try:
-        from datetime import datetime, timedelta
-        
         # Získej aktivní zaměstnance
         employees = db.execute("SELECT * FROM employees ORDER BY name").fetchall()
         
-        today = datetime.now()
-        monday = today - timedelta(days=today.weekday())
-        week_start = monday.strftime("%Y-%m-%d")
-        week_end = (monday + timedelta(days=6)).strftime("%Y-%m-%d")
+        # Hodiny a kapacity celého týmu jedním agregátem (cache po týdnech)
+        week_start, week_end = week_bounds()
+        capacity = team_week_capacity(db, week_start)
         
         overview = {
             'total_capacity': 0,
@@ -1347,26 +1303,10 @@ def api_team_capacity_overview():
         for emp in employees:
             emp_dict = dict(emp)
             emp_id = emp_dict['id']
+            stats = capacity.get(emp_id, {})
             
-            # Získej profil
-            profile = db.execute(
-                "SELECT * FROM team_member_profile WHERE employee_id = ?",
-                (emp_id,)
-            ).fetchone()
-            
-            if not profile:
-                # Vytvoř defaultní profil
-                weekly_capacity = 40.0
-            else:
-                profile_dict = dict(profile)
-                weekly_capacity = profile_dict.get('weekly_capacity_hours', 40.0)
-            
-            # Vypočítej aktuální hodiny tento týden
-            timesheet_rows = db.execute(
-                "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
-                (emp_id, week_start, week_end)
-            ).fetchone()
-            current_hours = round(timesheet_rows["total"] or 0, 1)
+            weekly_capacity = stats.get('weekly_capacity', 40.0)
+            current_hours = round(stats.get('tracked_hours', 0), 1)
             
             capacity_percent = calculate_capacity_percent({'weekly_capacity_hours': weekly_capacity}, current_hours)
             capacity_status = calculate_capacity_status(capacity_percent)
@@ -1528,7 +1468,7 @@ def api_team_member_detail(employee_id):
         week_end = (monday + timedelta(days=6)).strftime("%Y-%m-%d")
         
         timesheet_rows = db.execute(
-            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date >= ? AND date <= ?",
+            "SELECT SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) / 60.0 as total FROM timesheets WHERE employee_id=? AND date_iso BETWEEN ? AND ?",
             (employee_id, week_start, week_end)
         ).fetchone()
         employee_dict['hours_week'] = round(timesheet_rows["total"] or 0, 1)
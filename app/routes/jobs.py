@@ -1,14 +1,24 @@
 # Green David App
-from flask import Blueprint, jsonify, request, render_template, send_from_directory
-from datetime import datetime, timedelta
 import json
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.config import WRITE_ROLES
+from app.database import get_db, get_read_db, table_columns
+from app.utils import plant_search
+from app.utils.exports import export_response, iter_query
 from app.utils.helpers import (
-    audit_event, _normalize_date,
-    _jobs_info, _job_title_col, _job_select_all, 
-    _job_insert_cols_and_vals, _job_title_update_set
+    _job_insert_cols_and_vals,
+    _job_select_all,
+    _job_title_col,
+    _job_title_update_set,
+    _jobs_info,
+    _normalize_date,
+    audit_event,
 )
+from app.utils.permissions import require_auth, require_role
+from app.utils.response_cache import cached_response
 from assignment_helpers import get_task_assignees
 
 jobs_bp = Blueprint('jobs', __name__)
@@ -82,6 +92,38 @@ def job_detail_page(job_id):
     return send_from_directory(".", "job.html")
 
 
+_JOB_EXPORT_COLUMNS = ["id", "code", "title", "client", "city", "status", "date", "deadline",
+                       "completed_at", "budget", "actual_labor_cost", "actual_material_cost"]
+
+
+@jobs_bp.route("/api/jobs/export", methods=["GET"])
+def api_jobs_export():
+    """Streamovaný export zakázek (CSV / XLSX) včetně odpracovaných hodin z labor_daily."""
+    u, err = require_role(write=False)
+    if err: return err
+    db = get_db()
+    job_cols = table_columns(db, "jobs")
+    title_col = _job_title_col()
+    cols = [c for c in _JOB_EXPORT_COLUMNS if c in job_cols or c == "title"]
+    select = ", ".join(f"j.{title_col} AS title" if c == "title" else f"j.{c}" for c in cols)
+    q = f"""SELECT {select},
+                   COALESCE(l.hours, 0) AS labor_hours, COALESCE(l.labor_cost, 0) AS labor_cost
+            FROM jobs j
+            LEFT JOIN (
+                SELECT job_id, SUM(hours) AS hours, SUM(labor_cost) AS labor_cost
+                FROM labor_daily GROUP BY job_id
+            ) l ON l.job_id = j.id"""
+    params = []
+    status = request.args.get("status")
+    if status:
+        q += " WHERE j.status = ?"
+        params.append(status)
+    q += " ORDER BY j.id"
+    header = cols + ["labor_hours", "labor_cost"]
+    rows = (list(r) for r in iter_query(db, q, params))
+    return export_response(request.args.get("format", "csv").lower(), "zakazky", header, rows, sheet_title="Zakázky")
+
+
 # Additional jobs routes from main.py
 @jobs_bp.route("/api/jobs", methods=["GET","POST","PATCH","DELETE"])
 def api_jobs():
@@ -236,7 +278,7 @@ def api_job_detail(job_id):
     title_col = _job_title_col()
     
     # Get job with all available columns
-    cols = [r[1] for r in db.execute("PRAGMA table_info(jobs)").fetchall()]
+    cols = table_columns(db, "jobs")
     select_cols = ["id", title_col + " AS title", "client", "status", "city", "code", "date", "note"]
     optional_cols = ["budget", "cost_spent", "labor_cost_total", "time_spent_minutes", "hourly_rate", 
                      "budget_remaining", "margin", "time_planned_minutes"]
@@ -365,6 +407,8 @@ def api_job_detail(job_id):
 # ============================================================================
 
 @jobs_bp.route("/api/jobs/overview")
+@cached_response(tags=("jobs", "tasks", "timesheets", "employees", "job_materials", "job_assignments",
+                       "job_team_assignments", "warehouse_items"), ttl=60)
 def api_jobs_metrics_overview():
     """Get all jobs with calculated metrics for Kanban/List/Timeline views"""
     u, err = require_role(write=False)
@@ -765,8 +809,8 @@ def api_job_hub(job_id):
     try:
         team_rows = db.execute("""
             SELECT e.id, e.name, e.role, e.hourly_rate,
-                   (SELECT SUM(hours) FROM timesheets WHERE employee_id = e.id AND date >= date('now', '-7 days')) as hours_week,
-                   (SELECT SUM(hours) FROM timesheets WHERE employee_id = e.id AND job_id = ?) as hours_on_job
+                   (SELECT SUM(hours) FROM labor_daily WHERE employee_id = e.id AND day >= date('now', '-7 days')) as hours_week,
+                   (SELECT SUM(hours) FROM labor_daily WHERE employee_id = e.id AND job_id = ?) as hours_on_job
             FROM job_assignments ja
             JOIN employees e ON e.id = ja.employee_id
             WHERE ja.job_id = ?
@@ -783,32 +827,18 @@ def api_job_hub(job_id):
         'by_employee': []
     }
     try:
-        ts_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
-        has_labor_cost = 'labor_cost' in ts_cols
-
-        if has_labor_cost:
-            ts_rows = db.execute("""
-                SELECT e.id as emp_id, e.name, e.hourly_rate,
-                       SUM(t.hours) as hours,
-                       COUNT(*) as entries,
-                       SUM(COALESCE(t.labor_cost, 0)) as total_labor_cost
-                FROM timesheets t
-                JOIN employees e ON e.id = t.employee_id
-                WHERE t.job_id = ?
-                GROUP BY t.employee_id
-                ORDER BY total_labor_cost DESC
-            """, (job_id,)).fetchall()
-        else:
-            ts_rows = db.execute("""
-                SELECT e.id as emp_id, e.name, e.hourly_rate,
-                       SUM(t.hours) as hours,
-                       COUNT(*) as entries
-                FROM timesheets t
-                JOIN employees e ON e.id = t.employee_id
-                WHERE t.job_id = ?
-                GROUP BY t.employee_id
-                ORDER BY hours DESC
-            """, (job_id,)).fetchall()
+        # Součty po zaměstnancích z denních rollupů (labor_cost je 0, pokud sloupec chybí)
+        ts_rows = db.execute("""
+            SELECT e.id as emp_id, e.name, e.hourly_rate,
+                   SUM(d.hours) as hours,
+                   SUM(d.entries) as entries,
+                   SUM(d.labor_cost) as total_labor_cost
+            FROM labor_daily d
+            JOIN employees e ON e.id = d.employee_id
+            WHERE d.job_id = ?
+            GROUP BY d.employee_id
+            ORDER BY total_labor_cost DESC, hours DESC
+        """, (job_id,)).fetchall()
 
         total_hours = 0
         total_cost = 0
@@ -817,11 +847,8 @@ def api_job_hub(job_id):
             emp_hours = ts.get('hours') or 0
             emp_rate = ts.get('hourly_rate') or 250.0
 
-            if has_labor_cost:
-                emp_cost = ts.get('total_labor_cost') or 0
-                if emp_cost == 0 and emp_hours > 0:
-                    emp_cost = round(emp_hours * emp_rate, 0)
-            else:
+            emp_cost = ts.get('total_labor_cost') or 0
+            if emp_cost == 0 and emp_hours > 0:
                 emp_cost = round(emp_hours * emp_rate, 0)
 
             total_hours += emp_hours
@@ -838,7 +865,7 @@ def api_job_hub(job_id):
 
         timesheets_summary['total_hours'] = round(total_hours, 1)
         timesheets_summary['total_cost'] = round(total_cost, 0)
-        timesheets_summary['entries'] = sum(t.get('entries', 0) for t in ts_rows)
+        timesheets_summary['entries'] = sum(e['entries'] or 0 for e in timesheets_summary['by_employee'])
     except Exception as e:
         print(f"[WARN] Timesheets summary error: {e}")
     
@@ -1042,8 +1069,8 @@ def api_job_ai_insights(job_id):
     try:
         team_rows = db.execute("""
             SELECT e.id, e.name, e.role, e.hourly_rate,
-                   (SELECT SUM(hours) FROM timesheets WHERE employee_id = e.id AND date >= date('now', '-7 days')) as hours_week,
-                   (SELECT SUM(hours) FROM timesheets WHERE employee_id = e.id AND job_id = ?) as hours_on_job
+                   (SELECT SUM(hours) FROM labor_daily WHERE employee_id = e.id AND day >= date('now', '-7 days')) as hours_week,
+                   (SELECT SUM(hours) FROM labor_daily WHERE employee_id = e.id AND job_id = ?) as hours_on_job
             FROM job_assignments ja
             JOIN employees e ON e.id = ja.employee_id
             WHERE ja.job_id = ?
@@ -1056,9 +1083,9 @@ def api_job_ai_insights(job_id):
     timesheets_summary = {'total_hours': 0, 'total_cost': 0}
     try:
         ts_result = db.execute("""
-            SELECT SUM(t.hours) as total_hours
-            FROM timesheets t
-            WHERE t.job_id = ?
+            SELECT SUM(hours) as total_hours
+            FROM labor_daily
+            WHERE job_id = ?
         """, (job_id,)).fetchone()
         timesheets_summary['total_hours'] = round(ts_result['total_hours'] or 0, 1)
         timesheets_summary['total_cost'] = round((ts_result['total_hours'] or 0) * 200, 0)  # Default rate
@@ -1396,7 +1423,7 @@ def api_tasks():
         if task_id:
             # Return single task by ID
             # Zkontroluj existenci sloupců
-            task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+            task_cols = table_columns(db, "tasks")
             priority_col = "COALESCE(t.priority, 'medium') as priority" if "priority" in task_cols else "'medium' as priority"
             deadline_col = "t.deadline" if "deadline" in task_cols else "t.due_date as deadline"
             
@@ -1426,7 +1453,7 @@ def api_tasks():
         employee_id = request.args.get("employee_id", type=int)
         
         # Zkontroluj existenci sloupců
-        task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+        task_cols = table_columns(db, "tasks")
         priority_col = "COALESCE(t.priority, 'medium') as priority" if "priority" in task_cols else "'medium' as priority"
         deadline_col = "t.deadline" if "deadline" in task_cols else "t.due_date as deadline"
         
@@ -1475,7 +1502,7 @@ def api_tasks():
             if not title: return jsonify({"ok": False, "error":"invalid_input"}), 400
             
             # Zkontroluj existenci sloupce created_by před INSERT
-            task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+            task_cols = table_columns(db, "tasks")
             created_by_in_cols = "created_by" in task_cols
             
             # Vytvoř úkol
@@ -1878,7 +1905,7 @@ def api_job_employees():
 def calculate_labor_cost(employee_id, job_id, duration_minutes, db):
     """Vypočítá náklady na práci na základě hodinové sazby zaměstnance"""
     try:
-        cols = [r[1] for r in db.execute("PRAGMA table_info(employees)").fetchall()]
+        cols = table_columns(db, "employees")
         if 'hourly_rate' in cols:
             emp = db.execute("SELECT hourly_rate FROM employees WHERE id=?", (employee_id,)).fetchone()
             rate = float(emp['hourly_rate']) if emp and emp['hourly_rate'] else 250.0
@@ -1916,7 +1943,7 @@ def api_timesheets():
         title_col = _job_title_col()
         
         # Zkontroluj existující sloupce
-        timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+        timesheet_cols = table_columns(db, "timesheets")
         
         # Sestav SELECT s novými sloupci
         base_cols = "t.id,t.employee_id,t.job_id,t.date,t.hours,t.place,t.activity"
@@ -1969,11 +1996,11 @@ def api_timesheets():
         if jid: conds.append("t.job_id=?"); params.append(jid)
         if task_id: conds.append("t.task_id=?"); params.append(task_id)
         if d_from and d_to:
-            conds.append("date(t.date) BETWEEN date(?) AND date(?)"); params.extend([d_from, d_to])
+            conds.append("t.date_iso BETWEEN ? AND ?"); params.extend([d_from, d_to])
         elif d_from:
-            conds.append("date(t.date) >= date(?)"); params.append(d_from)
+            conds.append("t.date_iso >= ?"); params.append(d_from)
         elif d_to:
-            conds.append("date(t.date) <= date(?)"); params.append(d_to)
+            conds.append("t.date_iso <= ?"); params.append(d_to)
         if conds: q += " WHERE " + " AND ".join(conds)
         q += " ORDER BY t.date ASC, t.id ASC"
         rows = db.execute(q, params).fetchall()
@@ -2058,7 +2085,7 @@ def api_timesheets():
             vals = [int(emp), int(job), _normalize_date(dt), float(hours), duration_minutes, place, activity]
             
             # Přidej nová pole pokud existují sloupce
-            timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+            timesheet_cols = table_columns(db, "timesheets")
             
             if 'user_id' in timesheet_cols:
                 cols.append("user_id"); vals.append(int(user_id) if user_id else None)
@@ -2129,7 +2156,7 @@ def api_timesheets():
             old_material = old_row[1] if old_row and old_row[1] else None
             
             # Získej existující sloupce
-            timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+            timesheet_cols = table_columns(db, "timesheets")
             
             # Povolená pole (stará + nová)
             allowed = ["employee_id", "job_id", "date", "hours", "duration_minutes", "place", "activity",
@@ -2291,18 +2318,7 @@ def page_jobs():
 def page_tasks():
     return send_from_directory(".", "tasks.html")
 
-@jobs_bp.route("/issues")
-@jobs_bp.route("/api/admin/download-db", methods=["GET"])
-@requires_role('owner', 'admin')
-def api_admin_download_db():
-    """Stáhne aktuální SQLite databázi jako soubor (pouze owner/admin)."""
-    db_path = os.environ.get("DB_PATH") or "/var/data/app.db"
-    if not os.path.exists(db_path):
-        return jsonify({"ok": False, "error": "db_not_found", "path": db_path}), 404
-    return send_file(db_path, as_attachment=True, download_name="app.db")
-
-@jobs_bp.route("/api/admin/export-all", methods=["GET"])
-@requires_role('owner', 'admin')
+@jobs_bp.route("/api/jobs/<int:job_id>/materials/<int:material_id>", methods=["DELETE"])
 def api_job_material_delete(job_id, material_id):
     """Smazání materiálu ze zakázky (automaticky uvolní rezervaci ze skladu)"""
     u, err = require_auth()
@@ -2439,54 +2455,7 @@ def api_plant_catalog_search():
         }), 400
     
     try:
-        db = get_db()
-        
-        # Pokus o FTS, pokud není dostupné, použij LIKE
-        try:
-            results = db.execute('''
-                SELECT pc.id, pc.latin_name, pc.variety, pc.container_size,
-                       pc.flower_color, pc.flowering_time, pc.height,
-                       pc.light_requirements, pc.hardiness_zone
-                FROM plant_catalog_fts fts
-                JOIN plant_catalog pc ON pc.id = fts.rowid
-                WHERE plant_catalog_fts MATCH ?
-                ORDER BY rank
-                LIMIT ?
-            ''', (f'{query}*', limit)).fetchall()
-        except Exception as fts_error:
-            # FTS není dostupné, použij LIKE fallback
-            print(f"[INFO] FTS not available, using LIKE: {fts_error}")
-            search_pattern = f'%{query}%'
-            results = db.execute('''
-                SELECT id, latin_name, variety, container_size,
-                       flower_color, flowering_time, height,
-                       light_requirements, hardiness_zone
-                FROM plant_catalog
-                WHERE latin_name LIKE ? OR variety LIKE ? OR notes LIKE ?
-                ORDER BY latin_name
-                LIMIT ?
-            ''', (search_pattern, search_pattern, search_pattern, limit)).fetchall()
-        
-        plants = []
-        for row in results:
-            full_name = row['latin_name']
-            if row['variety']:
-                full_name += f" '{row['variety']}'"
-            if row['container_size']:
-                full_name += f" - {row['container_size']}"
-            
-            plants.append({
-                'id': row['id'],
-                'full_name': full_name,
-                'latin_name': row['latin_name'],
-                'variety': row['variety'],
-                'container_size': row['container_size'],
-                'flower_color': row['flower_color'],
-                'flowering_time': row['flowering_time'],
-                'height': row['height'],
-                'light_requirements': row['light_requirements'],
-                'hardiness_zone': row['hardiness_zone']
-            })
+        plants = plant_search.search_plants(get_read_db(), query, max(1, min(limit, 100)))
         
         return jsonify({
             'success': True,
@@ -2620,6 +2589,7 @@ def api_plant_catalog_by_name():
 
 # ==================== DASHBOARD STATS API ====================
 @jobs_bp.route('/api/dashboard/stats', methods=['GET'])
+@cached_response(tags=("jobs", "tasks", "timesheets", "employees", "warehouse_items"), ttl=60)
 def api_dashboard_stats():
     """Rychlé statistiky pro dashboard"""
     u, err = require_auth()
@@ -2648,7 +2618,7 @@ def api_dashboard_stats():
         
         # Hours this week
         hours_week = db.execute(
-            "SELECT COALESCE(SUM(hours), 0) as total FROM timesheets WHERE date >= ?",
+            "SELECT COALESCE(SUM(hours), 0) as total FROM timesheets WHERE date_iso >= ?",
             (week_start,)
         ).fetchone()['total']
         
@@ -3125,6 +3095,7 @@ def gd_api_job_detail(job_id):
 # === ATTACHMENTS API ===
 import os
 import uuid
+
 from werkzeug.utils import secure_filename
 
 UPLOAD_FOLDER = 'uploads'
@@ -3462,10 +3433,5 @@ def manage_team(job_id):
 print("✅ Jobs Extended API loaded")
 
 # ----------------- Planning Module API -----------------
-# Import planning functions directly
-import planning_api
-
-# Make get_db available to planning_api
-planning_api.get_db = get_db
 
 # Planning routes
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, send_from_directory, session
 from datetime import datetime
+
+from flask import Blueprint, jsonify, request, send_from_directory, session
+
 from app.database import get_db
+from app.utils import search_index
+from app.utils.response_cache import cached_response
 
 notes_bp = Blueprint('notes', __name__)
 
@@ -64,9 +68,9 @@ def get_notes():
 
     search = request.args.get('search')
     if search:
-        s = f"%{search}%"
-        query += " AND (n.title LIKE ? OR n.content LIKE ?)"
-        params.extend([s, s])
+        s = search_index.fts_query(search) or '""'
+        query += f" AND n.id IN ({search_index.match_ids_sql('note')})"
+        params.append(s)
 
     pinned = request.args.get('pinned')
     if pinned is not None and pinned.lower() in ('1', 'true', 'yes'):
@@ -105,8 +109,8 @@ def get_notes():
     elif link_type == 'party':
         count_query += " AND n.party_id IS NOT NULL"
     if search:
-        count_params.extend([s, s])
-        count_query += " AND (n.title LIKE ? OR n.content LIKE ?)"
+        count_params.append(s)
+        count_query += f" AND n.id IN ({search_index.match_ids_sql('note')})"
     if pinned is not None and pinned.lower() in ('1', 'true', 'yes'):
         count_query += " AND n.is_pinned = 1"
 
@@ -241,6 +245,7 @@ def toggle_pin_note(note_id):
 
 
 @notes_bp.route('/api/notes/stats', methods=['GET'])
+@cached_response(tags=("notes",), ttl=300)
 def notes_stats():
     db = get_db()
 
@@ -1,12 +1,13 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
 from datetime import datetime
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
 from app.database import get_db
 from app.utils.permissions import require_auth, require_role
 
 try:
     import planning_extended_api as ext_api
-    ext_api.get_db = get_db
 except ImportError:
     ext_api = None
 
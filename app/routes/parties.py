@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, send_from_directory
 import json
+
+from flask import Blueprint, jsonify, request, send_from_directory
+
 from app.database import get_db
+from app.utils import search_index
+from app.utils.response_cache import cached_response
 
 parties_bp = Blueprint('parties', __name__)
 
@@ -36,9 +40,8 @@ def get_parties():
     
     search = request.args.get('search')
     if search:
-        query += " AND (display_name LIKE ? OR legal_name LIKE ? OR email LIKE ? OR ico LIKE ?)"
-        s = f"%{search}%"
-        params.extend([s, s, s, s])
+        query += f" AND id IN ({search_index.match_ids_sql('party')})"
+        params.append(search_index.fts_query(search) or '""')
     
     # Řazení
     sort = request.args.get('sort_by', 'display_name')
@@ -232,6 +235,7 @@ def delete_interaction(party_id, interaction_id):
 
 # GET /api/parties/stats — statistiky pro dashboard
 @parties_bp.route('/api/parties/stats', methods=['GET'])
+@cached_response(tags=("parties",), ttl=300)
 def parties_stats():
     db = get_db()
     
@@ -1,18 +1,18 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
 from datetime import datetime, timedelta
-from app.database import get_db
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.database import get_db, table_columns
 from app.utils.permissions import require_auth, require_role
 
 try:
     import planning_api
-    planning_api.get_db = get_db
 except ImportError:
     planning_api = None
 
 try:
     import planning_extended_api as ext_api
-    ext_api.get_db = get_db
 except ImportError:
     ext_api = None
 
@@ -205,16 +205,6 @@ def api_seasonal():
 
 print("✅ Planning Extended Routes loaded")
 
-# WAREHOUSE EXTENDED - Nadčasové rozšíření skladu
-# ================================================================
-
-# Import warehouse extended module
-import warehouse_extended
-
-# Set get_db reference
-warehouse_extended.get_db = get_db
-
-# Apply warehouse migrations on startup
 @planning_bp.route('/api/planner/morning')
 def api_morning_planner():
     """Get smart morning planning data."""
@@ -227,7 +217,7 @@ def api_morning_planner():
         today = datetime.now().strftime('%Y-%m-%d')
         
         # Zkontroluj existenci sloupce deadline
-        task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+        task_cols = table_columns(db, "tasks")
         deadline_col = "COALESCE(t.deadline, t.due_date)" if "deadline" in task_cols else "t.due_date"
         
         # Today's tasks
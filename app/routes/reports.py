@@ -1,8 +1,12 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.database import get_db, table_columns
+from app.utils import search_index
+from app.utils.exports import csv_response, section_rows, xlsx_response
+from app.utils.permissions import require_role
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -34,39 +38,50 @@ def page_reports():
     return send_from_directory(".", "reports.html")
 
 # ----------------- Job detail UI routes -----------------
-@reports_bp.route("/api/admin/download-db", methods=["GET"])
-@requires_role('owner', 'admin')
-def api_admin_download_db():
-    """Stáhne aktuální SQLite databázi jako soubor (pouze owner/admin)."""
-    db_path = os.environ.get("DB_PATH") or "/var/data/app.db"
-    if not os.path.exists(db_path):
-        return jsonify({"ok": False, "error": "db_not_found", "path": db_path}), 404
-    return send_file(db_path, as_attachment=True, download_name="app.db")
-
-
 # Additional routes from main.py
 @reports_bp.route("/search", methods=["GET"])
 def search_page():
     q = (request.args.get("q") or "").strip()
     results = []
     if q:
-        like = f"%{q}%"
         db = get_db()
-        try:
-            # Use title column if available, fallback to name
-            title_col = _job_title_col()
-            cur = db.execute(f"SELECT id, {title_col} AS title, city, code, date FROM jobs WHERE ({title_col} LIKE ? COLLATE NOCASE OR city LIKE ? COLLATE NOCASE OR code LIKE ? COLLATE NOCASE) ORDER BY id DESC LIMIT 50", (like, like, like))
-            for r in cur.fetchall():
-                results.append({"type":"Zakázka","id":r["id"],"title":r["title"] or "", "sub":" • ".join([x for x in [r["city"], r["code"]] if x]),"date":r["date"],"url": f"/?tab=jobs&jobId={r['id']}"})
-        except Exception: pass
-        try:
-            cur = db.execute("SELECT id, name, role FROM employees WHERE (name LIKE ? COLLATE NOCASE OR role LIKE ? COLLATE NOCASE) ORDER BY id DESC LIMIT 50", (like, like))
-            for r in cur.fetchall():
-                results.append({"type":"Zaměstnanec","id":r["id"],"title":r["name"],"sub":r["role"] or "","date":"","url": "/?tab=employees"})
-        except Exception: pass
+        for hit in search_index.search(db, q, limit=50):
+            label, url = _SEARCH_LINKS[hit["kind"]]
+            results.append({"type": label, "id": hit["id"], "title": hit["title"], "sub": hit["snippet"],
+                            "date": "", "url": url.format(id=hit["id"])})
     return render_template("search.html", title="Hledání", q=q, results=results)
 
+
+_SEARCH_LINKS = {
+    "job": ("Zakázka", "/?tab=jobs&jobId={id}"),
+    "task": ("Úkol", "/tasks.html?id={id}"),
+    "issue": ("Issue", "/issues?id={id}"),
+    "employee": ("Zaměstnanec", "/employees.html?id={id}"),
+    "note": ("Poznámka", "/notes?id={id}"),
+    "party": ("Kontakt", "/directory?id={id}"),
+    "warehouse_item": ("Sklad", "/warehouse.html?item={id}"),
+}
+
 # ----------------- Calendar API -----------------
+def _report_export(report_data, export_format):
+    """Report jako XLSX (list na sekci) nebo CSV (sekce pod sebou), streamovaně."""
+    sections = list(section_rows(report_data['sections']))
+    basename = f"report-{report_data['type']}-{report_data.get('date_from') or ''}-{report_data.get('date_to') or ''}".rstrip('-')
+    if export_format == 'xlsx':
+        return xlsx_response(f"{basename}.xlsx", sections or [('Report', ['value'], [])])
+
+    def rows():
+        for name, header, section in sections:
+            yield []
+            yield [name]
+            yield header
+            yield from section
+
+    return csv_response(f"{basename}.csv",
+                        ['report', report_data['type'], report_data.get('date_from') or '', report_data.get('date_to') or ''],
+                        rows())
+
+
 @reports_bp.route('/api/reports/generate', methods=['POST'])
 def api_generate_report():
     """Generate comprehensive report with real data from all modules"""
@@ -132,7 +147,7 @@ def api_generate_report():
                             COUNT(DISTINCT job_id) as unique_jobs,
                             COUNT(*) as total_entries
                         FROM timesheets
-                        WHERE date BETWEEN ? AND ?
+                        WHERE date_iso BETWEEN ? AND ?
                         {emp_sql} {job_sql}
                     ''', (date_from, date_to) + tuple(emp_params) + tuple(job_params)).fetchone()
                     report_data['sections']['hours_summary'] = {
@@ -156,7 +171,7 @@ def api_generate_report():
                             COALESCE(SUM(t.hours), 0) as hours,
                             COUNT(DISTINCT t.employee_id) as workers
                         FROM jobs j
-                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date_iso BETWEEN ? AND ?
                         GROUP BY j.id
                         HAVING hours > 0
                         ORDER BY hours DESC
@@ -181,7 +196,7 @@ def api_generate_report():
                             COUNT(DISTINCT t.job_id) as projects,
                             COUNT(DISTINCT t.date) as days_worked
                         FROM employees e
-                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date_iso BETWEEN ? AND ?
                         WHERE e.active = 1
                         GROUP BY e.id
                         HAVING hours > 0
@@ -267,7 +282,7 @@ def api_generate_report():
                             COUNT(DISTINCT employee_id) as workers,
                             COUNT(DISTINCT job_id) as projects
                         FROM timesheets
-                        WHERE date BETWEEN ? AND ?
+                        WHERE date_iso BETWEEN ? AND ?
                         GROUP BY date
                         ORDER BY date
                     ''', (date_from, date_to)).fetchall()
@@ -312,7 +327,7 @@ def api_generate_report():
                             COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as labor_cost
                         FROM timesheets t
                         LEFT JOIN employees e ON e.id = t.employee_id
-                        WHERE t.date BETWEEN ? AND ?
+                        WHERE t.date_iso BETWEEN ? AND ?
                     ''', (date_from, date_to)).fetchone()
                     
                     # Počet zakázek dle statusu
@@ -347,7 +362,7 @@ def api_generate_report():
                             COUNT(DISTINCT t.employee_id) as workers,
                             COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as cost
                         FROM jobs j
-                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date_iso BETWEEN ? AND ?
                         LEFT JOIN employees e ON e.id = t.employee_id
                         GROUP BY j.id
                         ORDER BY hours DESC
@@ -373,7 +388,7 @@ def api_generate_report():
                             COUNT(DISTINCT t.job_id) as projects,
                             COUNT(DISTINCT t.date) as days_worked
                         FROM employees e
-                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date_iso BETWEEN ? AND ?
                         WHERE e.active = 1
                         GROUP BY e.id
                         ORDER BY hours DESC
@@ -422,7 +437,7 @@ def api_generate_report():
                             COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as labor_cost,
                             COALESCE(j.budget, 0) - COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as margin
                         FROM jobs j
-                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date_iso BETWEEN ? AND ?
                         LEFT JOIN employees e ON e.id = t.employee_id
                         WHERE j.budget > 0
                         GROUP BY j.id
@@ -446,7 +461,7 @@ def api_generate_report():
                         SELECT COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as total
                         FROM timesheets t
                         LEFT JOIN employees e ON e.id = t.employee_id
-                        WHERE t.date BETWEEN ? AND ?
+                        WHERE t.date_iso BETWEEN ? AND ?
                     ''', (date_from, date_to)).fetchone()
                     
                     # Spotřeba materiálu (z job_materials)
@@ -480,7 +495,7 @@ def api_generate_report():
                         SELECT COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as total
                         FROM timesheets t
                         LEFT JOIN employees e ON e.id = t.employee_id
-                        WHERE t.date BETWEEN ? AND ?
+                        WHERE t.date_iso BETWEEN ? AND ?
                     ''', (date_from, date_to)).fetchone()
                     
                     total_revenue = revenue['total'] or 0
@@ -507,7 +522,7 @@ def api_generate_report():
                             COALESCE(SUM(j.budget), 0) as total_budget,
                             COALESCE(SUM(t.hours), 0) as total_hours
                         FROM jobs j
-                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.job_id = j.id AND t.date_iso BETWEEN ? AND ?
                         WHERE j.client IS NOT NULL AND j.client != ''
                         GROUP BY j.client
                         ORDER BY total_budget DESC
@@ -533,13 +548,13 @@ def api_generate_report():
                     # Aktuální období
                     current = db.execute('''
                         SELECT COALESCE(SUM(hours), 0) as hours, COUNT(DISTINCT job_id) as jobs
-                        FROM timesheets WHERE date BETWEEN ? AND ?
+                        FROM timesheets WHERE date_iso BETWEEN ? AND ?
                     ''', (date_from, date_to)).fetchone()
                     
                     # Předchozí období
                     previous = db.execute('''
                         SELECT COALESCE(SUM(hours), 0) as hours, COUNT(DISTINCT job_id) as jobs
-                        FROM timesheets WHERE date BETWEEN ? AND ?
+                        FROM timesheets WHERE date_iso BETWEEN ? AND ?
                     ''', (prev_from, prev_to)).fetchone()
                     
                     curr_hours = current['hours'] or 0
@@ -566,7 +581,7 @@ def api_generate_report():
                             COALESCE(SUM(t.hours), 0) as hours,
                             COALESCE(SUM(t.hours * COALESCE(e.hourly_rate, 200)), 0) as total_cost
                         FROM employees e
-                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date BETWEEN ? AND ?
+                        LEFT JOIN timesheets t ON t.employee_id = e.id AND t.date_iso BETWEEN ? AND ?
                         WHERE e.active = 1
                         GROUP BY e.id
                         HAVING hours > 0
@@ -758,7 +773,7 @@ def api_generate_report():
                     result = db.execute('''
                         SELECT COALESCE(SUM(hours), 0) as total
                         FROM timesheets
-                        WHERE date BETWEEN ? AND ?
+                        WHERE date_iso BETWEEN ? AND ?
                     ''', (date_from, date_to)).fetchone()
                     report_data['sections']['hours'] = {'total': round(result['total'] or 0, 1)}
                 except Exception as e:
@@ -850,6 +865,8 @@ def api_generate_report():
             'has_data': any(report_data['sections'].values())
         }
         
+        if export_format in ('csv', 'xlsx'):
+            return _report_export(report_data, export_format)
         return jsonify(report_data)
         
     except Exception as e:
@@ -879,7 +896,7 @@ def api_reports_employees():
     
     db = get_db()
     # Zjisti jestli existuje sloupec active
-    cols = {r[1] for r in db.execute("PRAGMA table_info(employees)").fetchall()}
+    cols = table_columns(db, "employees")
     
     if 'active' in cols:
         employees = db.execute('''
@@ -904,88 +921,7 @@ print("✅ Velitelský Panel loaded")
 # PLANNING EXTENDED ROUTES - All New Features
 # ================================================================
 import planning_extended_api as ext_api
-ext_api.get_db = get_db
 
-# Nursery - Trvalkové školka 🌸
-@reports_bp.route('/api/plant-catalog/search', methods=['GET'])
-def api_plant_catalog_search():
-    """Vyhledávání v katalogu rostlin (autocomplete)"""
-    u, err = require_auth()
-    if err: return err
-    
-    query = request.args.get('q', '').strip()
-    limit = request.args.get('limit', 20, type=int)
-    
-    if not query or len(query) < 2:
-        return jsonify({
-            'success': False,
-            'message': 'Zadej alespoň 2 znaky pro vyhledávání'
-        }), 400
-    
-    try:
-        db = get_db()
-        
-        # Pokus o FTS, pokud není dostupné, použij LIKE
-        try:
-            results = db.execute('''
-                SELECT pc.id, pc.latin_name, pc.variety, pc.container_size,
-                       pc.flower_color, pc.flowering_time, pc.height,
-                       pc.light_requirements, pc.hardiness_zone
-                FROM plant_catalog_fts fts
-                JOIN plant_catalog pc ON pc.id = fts.rowid
-                WHERE plant_catalog_fts MATCH ?
-                ORDER BY rank
-                LIMIT ?
-            ''', (f'{query}*', limit)).fetchall()
-        except Exception as fts_error:
-            # FTS není dostupné, použij LIKE fallback
-            print(f"[INFO] FTS not available, using LIKE: {fts_error}")
-            search_pattern = f'%{query}%'
-            results = db.execute('''
-                SELECT id, latin_name, variety, container_size,
-                       flower_color, flowering_time, height,
-                       light_requirements, hardiness_zone
-                FROM plant_catalog
-                WHERE latin_name LIKE ? OR variety LIKE ? OR notes LIKE ?
-                ORDER BY latin_name
-                LIMIT ?
-            ''', (search_pattern, search_pattern, search_pattern, limit)).fetchall()
-        
-        plants = []
-        for row in results:
-            full_name = row['latin_name']
-            if row['variety']:
-                full_name += f" '{row['variety']}'"
-            if row['container_size']:
-                full_name += f" - {row['container_size']}"
-            
-            plants.append({
-                'id': row['id'],
-                'full_name': full_name,
-                'latin_name': row['latin_name'],
-                'variety': row['variety'],
-                'container_size': row['container_size'],
-                'flower_color': row['flower_color'],
-                'flowering_time': row['flowering_time'],
-                'height': row['height'],
-                'light_requirements': row['light_requirements'],
-                'hardiness_zone': row['hardiness_zone']
-            })
-        
-        return jsonify({
-            'success': True,
-            'plants': plants,
-            'count': len(plants)
-        })
-        
-    except Exception as e:
-        print(f"[ERROR] plant_catalog_search: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'message': f'Chyba při vyhledávání: {str(e)}'
-        }), 500
 
 # Additional routes from main.py
 @reports_bp.route('/reports-hub')
@@ -1,16 +1,24 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.database import get_db, table_columns
 from app.utils.helpers import (
-    audit_event, create_notification, _expand_assignees_with_delegate,
-    _notify_assignees, _normalize_date
+    _expand_assignees_with_delegate,
+    _normalize_date,
+    _notify_assignees,
+    audit_event,
+    create_notification,
 )
+from app.utils.permissions import require_auth, require_role, requires_role
 from assignment_helpers import (
-    assign_employees_to_task, assign_employees_to_issue,
-    get_task_assignees, get_issue_assignees,
-    get_employee_tasks, get_employee_issues
+    assign_employees_to_issue,
+    assign_employees_to_task,
+    get_employee_issues,
+    get_employee_tasks,
+    get_issue_assignees,
+    get_task_assignees,
 )
 
 tasks_bp = Blueprint('tasks', __name__)
@@ -48,7 +56,7 @@ def api_tasks():
         if task_id:
             # Return single task by ID
             # Zkontroluj existenci sloupců
-            task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+            task_cols = table_columns(db, "tasks")
             priority_col = "COALESCE(t.priority, 'medium') as priority" if "priority" in task_cols else "'medium' as priority"
             deadline_col = "t.deadline" if "deadline" in task_cols else "t.due_date as deadline"
             
@@ -78,7 +86,7 @@ def api_tasks():
         employee_id = request.args.get("employee_id", type=int)
         
         # Zkontroluj existenci sloupců
-        task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+        task_cols = table_columns(db, "tasks")
         priority_col = "COALESCE(t.priority, 'medium') as priority" if "priority" in task_cols else "'medium' as priority"
         deadline_col = "t.deadline" if "deadline" in task_cols else "t.due_date as deadline"
         
@@ -132,7 +140,7 @@ def api_tasks():
                 priority = "medium"
             
             # Zkontroluj existenci sloupce created_by před INSERT
-            task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+            task_cols = table_columns(db, "tasks")
             created_by_in_cols = "created_by" in task_cols
             
             if created_by_in_cols:
@@ -770,7 +778,7 @@ def api_task_filters():
     db = get_db()
     
     # Zkontroluj existenci sloupce deadline (před všemi filtry)
-    task_cols = [r[1] for r in db.execute("PRAGMA table_info(tasks)").fetchall()]
+    task_cols = table_columns(db, "tasks")
     deadline_col = "COALESCE(t.deadline, t.due_date)" if "deadline" in task_cols else "t.due_date"
     
     # Base query
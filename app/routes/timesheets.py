@@ -1,9 +1,13 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
-from datetime import datetime, timedelta, date
-from app.database import get_db
-from app.utils.permissions import require_auth, require_role, requires_role, get_current_user
-from app.utils.helpers import audit_event, _normalize_date
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+from app.database import get_db, invalidate_schema_cache, table_columns
+from app.utils.exports import export_response, iter_query
+from app.utils.heatmap import day_heatmap, employee_day_matrix
+from app.utils.helpers import _job_title_col, _normalize_date, audit_event
+from app.utils.permissions import get_current_user, require_auth, require_role, requires_role
 
 timesheets_bp = Blueprint('timesheets', __name__)
 
@@ -41,13 +45,14 @@ def api_approve_timesheet(timesheet_id):
         pass
     
     # Zkontrolovat, zda timesheets tabulka má sloupce pro schválení
-    cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+    cols = table_columns(db, "timesheets")
     
     if 'approved' not in cols:
         db.execute("ALTER TABLE timesheets ADD COLUMN approved INTEGER DEFAULT 0")
         db.execute("ALTER TABLE timesheets ADD COLUMN approved_by INTEGER NULL")
         db.execute("ALTER TABLE timesheets ADD COLUMN approved_at TEXT NULL")
         db.commit()
+        invalidate_schema_cache()
     
     # Schválit
     try:
@@ -77,7 +82,7 @@ def api_timesheets():
         title_col = _job_title_col()
         
         # Zkontroluj existující sloupce
-        timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+        timesheet_cols = table_columns(db, "timesheets")
         
         # Sestav SELECT s novými sloupci
         base_cols = "t.id,t.employee_id,t.job_id,t.date,t.hours,t.place,t.activity"
@@ -133,11 +138,11 @@ def api_timesheets():
         if jid: conds.append("t.job_id=?"); params.append(jid)
         if task_id: conds.append("t.task_id=?"); params.append(task_id)
         if d_from and d_to:
-            conds.append("date(t.date) BETWEEN date(?) AND date(?)"); params.extend([d_from, d_to])
+            conds.append("t.date_iso BETWEEN ? AND ?"); params.extend([d_from, d_to])
         elif d_from:
-            conds.append("date(t.date) >= date(?)"); params.append(d_from)
+            conds.append("t.date_iso >= ?"); params.append(d_from)
         elif d_to:
-            conds.append("date(t.date) <= date(?)"); params.append(d_to)
+            conds.append("t.date_iso <= ?"); params.append(d_to)
         if conds: q += " WHERE " + " AND ".join(conds)
         q += " ORDER BY t.date ASC, t.id ASC"
         rows = db.execute(q, params).fetchall()
@@ -230,7 +235,7 @@ def api_timesheets():
             vals = [int(emp), int(job), _normalize_date(dt), float(hours), duration_minutes, place, activity]
             
             # Přidej nová pole pokud existují sloupce
-            timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+            timesheet_cols = table_columns(db, "timesheets")
             
             if 'user_id' in timesheet_cols:
                 cols.append("user_id"); vals.append(int(user_id) if user_id else None)
@@ -301,7 +306,7 @@ def api_timesheets():
             old_material = old_row[1] if old_row and old_row[1] else None
             
             # Získej existující sloupce
-            timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+            timesheet_cols = table_columns(db, "timesheets")
             
             # Povolená pole (stará + nová)
             allowed = ["employee_id", "job_id", "date", "hours", "duration_minutes", "place", "activity",
@@ -476,34 +481,31 @@ def api_timesheets_summary():
     d_from = _normalize_date(request.args.get("from"))
     d_to = _normalize_date(request.args.get("to"))
     
-    # Build WHERE conditions
+    # Build WHERE conditions (labor_daily rollup + stejný filtr pro surové výkazy)
     conds = []
     params = []
     if emp:
-        conds.append("t.employee_id=?")
+        conds.append("employee_id=?")
         params.append(emp)
     if jid:
-        conds.append("t.job_id=?")
+        conds.append("job_id=?")
         params.append(jid)
     if d_from and d_to:
-        conds.append("date(t.date) BETWEEN date(?) AND date(?)")
+        conds.append("{day} BETWEEN ? AND ?")
         params.extend([d_from, d_to])
     elif d_from:
-        conds.append("date(t.date) >= date(?)")
+        conds.append("{day} >= ?")
         params.append(d_from)
     elif d_to:
-        conds.append("date(t.date) <= date(?)")
+        conds.append("{day} <= ?")
         params.append(d_to)
     
     where_clause = " WHERE " + " AND ".join(conds) if conds else ""
     
-    # Zkontroluj existující sloupce
-    timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
-    duration_col = "COALESCE(t.duration_minutes, CAST(t.hours * 60 AS INTEGER))" if 'duration_minutes' in timesheet_cols else "CAST(t.hours * 60 AS INTEGER)"
-    
-    # Celkem minut a hodin
+    # Celkem minut, dny, přesčasy (>8h na výkaz) a anomálie z denních rollupů
     total_result = db.execute(
-        f"SELECT SUM({duration_col}) as total_minutes, COUNT(DISTINCT t.date) as work_days FROM timesheets t {where_clause}",
+        f"""SELECT SUM(minutes), COUNT(DISTINCT day), SUM(overtime_minutes), SUM(anomalies)
+            FROM labor_daily {where_clause.format(day='day')}""",
         params
     ).fetchone()
     
@@ -511,57 +513,36 @@ def api_timesheets_summary():
     total_hours = total_minutes / 60.0
     work_days = int(total_result[1] or 0)
     avg_per_day = (total_hours / work_days) if work_days > 0 else 0
-    
-    # Overtime (>8h denně)
-    overtime_result = db.execute(
-        f"""SELECT SUM(CASE WHEN {duration_col} > 480 THEN {duration_col} - 480 ELSE 0 END) as overtime_minutes
-            FROM timesheets t {where_clause}""",
-        params
-    ).fetchone()
-    overtime_minutes = int(overtime_result[0] or 0)
+    overtime_minutes = int(total_result[2] or 0)
+    anomalies_count = int(total_result[3] or 0)
     
     # Top jobs
     title_col = _job_title_col()
     top_jobs = db.execute(
-        f"""SELECT t.job_id, j.{title_col} as job_name, SUM({duration_col}) as minutes
-            FROM timesheets t
-            LEFT JOIN jobs j ON j.id = t.job_id
-            {where_clause}
-            GROUP BY t.job_id, j.{title_col}
-            ORDER BY minutes DESC
-            LIMIT 10""",
+        f"""SELECT r.job_id, j.{title_col} as job_name, r.minutes
+            FROM (SELECT job_id, SUM(minutes) as minutes
+                  FROM labor_daily {where_clause.format(day='day')}
+                  GROUP BY job_id
+                  ORDER BY minutes DESC
+                  LIMIT 10) r
+            LEFT JOIN jobs j ON j.id = r.job_id
+            ORDER BY r.minutes DESC""",
         params
     ).fetchall()
     
-    # Top work types
+    # Top work types (typ práce rollup nedrží)
+    timesheet_cols = table_columns(db, "timesheets")
     top_work_types = []
     if 'work_type' in timesheet_cols:
+        duration_col = "COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))" if 'duration_minutes' in timesheet_cols else "CAST(hours * 60 AS INTEGER)"
         top_work_types = db.execute(
             f"""SELECT work_type, SUM({duration_col}) as minutes
-                FROM timesheets t
-                {where_clause}
+                FROM timesheets {where_clause.format(day='date_iso')}
                 GROUP BY work_type
                 ORDER BY minutes DESC""",
             params
         ).fetchall()
     
-    # Anomálie count
-    anomalies_count = 0
-    if 'ai_flags' in timesheet_cols:
-        import json as json_lib
-        all_flags = db.execute(
-            f"SELECT ai_flags FROM timesheets t {where_clause}",
-            params
-        ).fetchall()
-        for flag_row in all_flags:
-            if flag_row[0]:
-                try:
-                    flags = json_lib.loads(flag_row[0])
-                    if flags.get('anomaly'):
-                        anomalies_count += 1
-                except:
-                    pass
-    
     return jsonify({
         "ok": True,
         "total_minutes": total_minutes,
@@ -589,70 +570,22 @@ def api_timesheets_heatmap():
     if not d_from or not d_to:
         return jsonify({"ok": False, "error": "from and to dates required"}), 400
     
-    conds = ["date(t.date) BETWEEN date(?) AND date(?)"]
-    params = [d_from, d_to]
-    
-    if emp:
-        conds.append("t.employee_id=?")
-        params.append(emp)
-    
-    where_clause = " WHERE " + " AND ".join(conds)
+    # ?employee_ids=1,2,3 - víc zaměstnanců; ?matrix=1 - navíc matice zaměstnanec × den
+    employee_ids = [emp] if emp else [int(x) for x in (request.args.get("employee_ids") or "").split(",") if x.strip().isdigit()]
     
-    # Zkontroluj existující sloupce
-    timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
-    duration_col = "COALESCE(t.duration_minutes, CAST(t.hours * 60 AS INTEGER))" if 'duration_minutes' in timesheet_cols else "CAST(t.hours * 60 AS INTEGER)"
-    
-    # Agregace po dnech
-    days_data = db.execute(
-        f"""SELECT t.date, SUM({duration_col}) as total_minutes,
-                   COUNT(*) as entries_count
-            FROM timesheets t
-            {where_clause}
-            GROUP BY t.date
-            ORDER BY t.date""",
-        params
-    ).fetchall()
-    
-    import json as json_lib
-    
-    days = []
-    for row in days_data:
-        date_str = row[0]
-        total_mins = int(row[1] or 0)
-        
-        # Load level: 0=<4h, 1=4-6h, 2=6-8h, 3=>8h
-        load_level = 0
-        if total_mins >= 480:  # >=8h
-            load_level = 3
-        elif total_mins >= 360:  # >=6h
-            load_level = 2
-        elif total_mins >= 240:  # >=4h
-            load_level = 1
-        
-        # Zkontroluj AI flags pro tento den
-        day_flags = {"overtime": total_mins > 480, "anomaly": False}
-        if 'ai_flags' in timesheet_cols:
-            day_entries = db.execute(
-                "SELECT ai_flags FROM timesheets WHERE date = ?" + (" AND employee_id = ?" if emp else ""),
-                [date_str] + ([emp] if emp else [])
-            ).fetchall()
-            for flag_row in day_entries:
-                if flag_row[0]:
-                    try:
-                        flags = json_lib.loads(flag_row[0])
-                        if flags.get('anomaly'):
-                            day_flags["anomaly"] = True
-                            break
-                    except:
-                        pass
-        
-        days.append({
-            "date": date_str,
-            "total_minutes": total_mins,
-            "load_level": load_level,
-            "flags": day_flags
-        })
+    days = [
+        {
+            "date": d["date"],
+            "total_minutes": d["total_minutes"],
+            "load_level": d["load_level"],
+            "flags": {"overtime": "overtime" in d["flags"], "anomaly": "anomaly" in d["flags"]}
+        }
+        for d in day_heatmap(db, d_from, d_to, employee_ids=employee_ids)
+    ]
     
+    if request.args.get("matrix") in ("1", "true"):
+        return jsonify({"ok": True, "days": days,
+                        "matrix": employee_day_matrix(db, d_from, d_to, employee_ids=employee_ids)})
     return jsonify({"ok": True, "days": days})
 
 @timesheets_bp.route("/api/timesheets/ai-insights", methods=["GET"])
@@ -672,14 +605,12 @@ def api_timesheets_ai_insights():
         d_to = datetime.now().strftime('%Y-%m-%d')
         d_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
     
-    where_clause = " WHERE date(t.date) BETWEEN date(?) AND date(?)"
+    where_clause = " WHERE t.date_iso BETWEEN ? AND ?"
     params = [d_from, d_to]
     
-    timesheet_cols = [r[1] for r in db.execute("PRAGMA table_info(timesheets)").fetchall()]
+    timesheet_cols = table_columns(db, "timesheets")
     duration_col = "COALESCE(t.duration_minutes, CAST(t.hours * 60 AS INTEGER))" if 'duration_minutes' in timesheet_cols else "CAST(t.hours * 60 AS INTEGER)"
     
-    import json as json_lib
-    
     # Workload risk (průměrné denní zatížení)
     workload_data = db.execute(
         f"""SELECT AVG({duration_col}) as avg_daily, COUNT(DISTINCT t.date) as days
@@ -716,40 +647,31 @@ def api_timesheets_ai_insights():
             for r in problem_jobs
         ]
     
-    # Anomaly days
+    # Anomaly days - příznaky z ai_flags jedním seskupeným dotazem (JSON1)
     anomaly_days = []
     if 'ai_flags' in timesheet_cols:
         anomaly_rows = db.execute(
-            f"""SELECT DISTINCT t.date, COUNT(*) as count
+            f"""SELECT t.date_iso,
+                       MAX(json_extract(t.ai_flags, '$.overtime')) as overtime,
+                       MAX(json_extract(t.ai_flags, '$.low_performance')) as low_performance
                 FROM timesheets t
                 {where_clause}
-                AND t.ai_flags IS NOT NULL
-                GROUP BY t.date""",
+                AND json_valid(t.ai_flags) AND json_extract(t.ai_flags, '$.anomaly')
+                GROUP BY t.date_iso
+                ORDER BY t.date_iso""",
             params
         ).fetchall()
         
         for row in anomaly_rows:
-            date_str = row[0]
-            flags_data = db.execute(
-                "SELECT ai_flags FROM timesheets WHERE date = ? AND ai_flags IS NOT NULL LIMIT 1",
-                (date_str,)
-            ).fetchone()
-            
-            if flags_data and flags_data[0]:
-                try:
-                    flags = json_lib.loads(flags_data[0])
-                    if flags.get('anomaly'):
-                        reasons = []
-                        if flags.get('overtime'):
-                            reasons.append("Přesčas")
-                        if flags.get('low_performance'):
-                            reasons.append("Problémový výkon")
-                        anomaly_days.append({
-                            "date": date_str,
-                            "reason": " + ".join(reasons) if reasons else "Detekována anomálie"
-                        })
-                except:
-                    pass
+            reasons = []
+            if row[1]:
+                reasons.append("Přesčas")
+            if row[2]:
+                reasons.append("Problémový výkon")
+            anomaly_days.append({
+                "date": row[0],
+                "reason": " + ".join(reasons) if reasons else "Detekována anomálie"
+            })
     
     # Recommendations
     recommendations = []
@@ -768,6 +690,9 @@ def api_timesheets_ai_insights():
         "recommendations": recommendations
     })
 
+_EXPORT_HEADER = ["id", "date", "employee_id", "employee_name", "job_id", "job_title", "job_code", "hours", "place", "activity"]
+
+
 @timesheets_bp.route("/api/timesheets/export")
 def api_timesheets_export():
     u, err = require_role(write=False)
@@ -788,30 +713,23 @@ def api_timesheets_export():
     if emp: conds.append("t.employee_id=?"); params.append(emp)
     if jid: conds.append("t.job_id=?"); params.append(jid)
     if d_from and d_to:
-        conds.append("date(t.date) BETWEEN date(?) AND date(?)"); params.extend([d_from, d_to])
+        conds.append("t.date_iso BETWEEN ? AND ?"); params.extend([d_from, d_to])
     elif d_from:
-        conds.append("date(t.date) >= date(?)"); params.append(d_from)
+        conds.append("t.date_iso >= ?"); params.append(d_from)
     elif d_to:
-        conds.append("date(t.date) <= date(?)"); params.append(d_to)
+        conds.append("t.date_iso <= ?"); params.append(d_to)
     if conds: q += " WHERE " + " AND ".join(conds)
-    q += " ORDER BY t.date ASC, t.id ASC"
-    rows = get_db().execute(q, params).fetchall()
-
-    output = io.StringIO()
-    import csv as _csv
-    writer = _csv.writer(output)
-    writer.writerow(["id","date","employee_id","employee_name","job_id","job_title","job_code","hours","place","activity"])
-    for r in rows:
-        writer.writerow([r["id"], r["date"], r["employee_id"], r["employee_name"] or "", r["job_id"], r["job_title"] or "", r["job_code"] or "", r["hours"], r["place"] or "", r["activity"] or ""])
-    mem = io.BytesIO(output.getvalue().encode("utf-8-sig"))
-    mem.seek(0)
-    fname = "timesheets.csv"
-    return send_file(mem, mimetype="text/csv", as_attachment=True, download_name=fname)
+    q += " ORDER BY t.date_iso ASC, t.id ASC"
+    rows = (
+        [r["id"], r["date"], r["employee_id"], r["employee_name"] or "", r["job_id"], r["job_title"] or "", r["job_code"] or "", r["hours"], r["place"] or "", r["activity"] or ""]
+        for r in iter_query(db, q, params)
+    )
+    return export_response(request.args.get("format", "csv").lower(), "timesheets", _EXPORT_HEADER, rows, sheet_title="Výkazy")
 
 
 @timesheets_bp.route("/api/timesheets/export-advanced", methods=["GET"])
 def api_timesheets_export_advanced():
-    """Pokročilý export výkazů s filtry - podporuje PDF, XLSX, CSV"""
+    """Pokročilý export výkazů s filtry - XLSX, CSV (streamovaně)"""
     u, err = require_role(write=False)
     if err: return err
     
@@ -851,28 +769,29 @@ def api_timesheets_export_advanced():
     
     # Filtr data
     if d_from and d_to:
-        conds.append("date(t.date) BETWEEN date(?) AND date(?)")
+        conds.append("t.date_iso BETWEEN ? AND ?")
         params.extend([d_from, d_to])
     elif d_from:
-        conds.append("date(t.date) >= date(?)")
+        conds.append("t.date_iso >= ?")
         params.append(d_from)
     elif d_to:
-        conds.append("date(t.date) <= date(?)")
+        conds.append("t.date_iso <= ?")
         params.append(d_to)
     
     if conds:
         q += " WHERE " + " AND ".join(conds)
-    q += " ORDER BY t.date ASC, t.id ASC"
+    q += " ORDER BY t.date_iso ASC, t.id ASC"
     
-    rows = db.execute(q, params).fetchall()
-    
-    # Generování exportu podle formátu
     if export_format == "pdf":
-        return _generate_pdf_export(rows, d_from, d_to)
-    elif export_format == "xlsx":
-        return _generate_xlsx_export(rows, d_from, d_to)
-    else:  # csv
-        return _generate_csv_export(rows, d_from, d_to)
+        return jsonify({"ok": False, "error": "unsupported_format", "message": "PDF export is not available, use csv or xlsx"}), 400
+    
+    # Streamované generování - kurzor po dávkách, CSV chunked / XLSX write_only
+    rows = (
+        [r["id"], r["date"], r["employee_id"], r["employee_name"] or "", r["job_id"], r["job_title"] or "", r["job_code"] or "", r["hours"], r["place"] or "", r["activity"] or ""]
+        for r in iter_query(db, q, params)
+    )
+    basename = f"vykazy-{d_from}-{d_to}" if d_from and d_to else "vykazy"
+    return export_response(export_format, basename, _EXPORT_HEADER, rows, sheet_title="Výkazy")
 
 
 @timesheets_bp.route("/timesheets.html")
@@ -931,13 +850,13 @@ def gd_api_worklogs():
             conds.append("t.task_id = ?")
             params.append(task_id)
         if d_from and d_to:
-            conds.append("date(t.date) BETWEEN date(?) AND date(?)")
+            conds.append("t.date_iso BETWEEN ? AND ?")
             params.extend([d_from, d_to])
         elif d_from:
-            conds.append("date(t.date) >= date(?)")
+            conds.append("t.date_iso >= ?")
             params.append(d_from)
         elif d_to:
-            conds.append("date(t.date) <= date(?)")
+            conds.append("t.date_iso <= ?")
             params.append(d_to)
         
         if conds:
@@ -1326,110 +1245,73 @@ def gd_api_worklogs_summary():
         d_from = _normalize_date(request.args.get("from"))
         d_to = _normalize_date(request.args.get("to"))
         
-        # Build WHERE clause
+        # Build WHERE clause - rollupy jsou po zaměstnancích, user_id se mapuje přes employees
         conds = []
         params = []
         
         if user_id:
-            conds.append("(user_id = ? OR (user_id IS NULL AND employee_id IN (SELECT id FROM employees WHERE user_id = ?)))")
-            params.extend([user_id, user_id])
+            conds.append("employee_id IN (SELECT id FROM employees WHERE user_id = ?)")
+            params.append(user_id)
         if d_from and d_to:
-            conds.append("date(date) BETWEEN date(?) AND date(?)")
+            conds.append("{day} BETWEEN ? AND ?")
             params.extend([d_from, d_to])
         elif d_from:
-            conds.append("date(date) >= date(?)")
+            conds.append("{day} >= ?")
             params.append(d_from)
         elif d_to:
-            conds.append("date(date) <= date(?)")
+            conds.append("{day} <= ?")
             params.append(d_to)
         
         where_clause = " WHERE " + " AND ".join(conds) if conds else ""
         
-        # Calculate total_minutes
-        total_result = db.execute(f"""
-            SELECT COALESCE(SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))), 0) as total_minutes
-            FROM timesheets
-            {where_clause}
-        """, params).fetchone()
-        total_minutes = total_result['total_minutes'] or 0
-        
-        # Calculate avg_per_day
-        days_result = db.execute(f"""
-            SELECT COUNT(DISTINCT date) as days
-            FROM timesheets
-            {where_clause}
-        """, params).fetchone()
-        days_count = days_result['days'] or 1
-        avg_per_day = total_minutes / days_count if days_count > 0 else 0
-        
-        # Calculate overtime_minutes (assuming 8h/day = 480 minutes)
-        overtime_result = db.execute(f"""
-            SELECT 
-                date,
-                SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) as day_minutes
-            FROM timesheets
-            {where_clause}
-            GROUP BY date
-            HAVING day_minutes > 480
+        # Denní součty: celkem minut, přesčasy (8h/den = 480 min), blokace a zpoždění
+        daily_rows = db.execute(f"""
+            SELECT day,
+                   SUM(minutes) as day_minutes,
+                   SUM(blocked_entries) as blocked,
+                   SUM(delayed_entries) as delayed
+            FROM labor_daily
+            {where_clause.format(day='day')}
+            GROUP BY day
         """, params).fetchall()
-        overtime_minutes = sum(max(0, row['day_minutes'] - 480) for row in overtime_result)
+        total_minutes = sum(row['day_minutes'] or 0 for row in daily_rows)
+        days_count = len(daily_rows) or 1
+        avg_per_day = total_minutes / days_count
+        overtime_minutes = sum(max(0, (row['day_minutes'] or 0) - 480) for row in daily_rows)
         
         # Top jobs
         top_jobs_result = db.execute(f"""
             SELECT 
                 job_id,
-                SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) as total_minutes
-            FROM timesheets
-            {where_clause}
+                SUM(minutes) as total_minutes
+            FROM labor_daily
+            {where_clause.format(day='day')}
             GROUP BY job_id
             ORDER BY total_minutes DESC
             LIMIT 5
         """, params).fetchall()
         top_jobs = [{"job_id": row['job_id'], "total_minutes": row['total_minutes']} for row in top_jobs_result]
         
-        # Efficiency (based on performance_signal)
+        # Efficiency (based on performance_signal) - rollup drží jen blokace, signály čteme z výkazů
+        raw_where = where_clause.format(day='date_iso')
         efficiency_result = db.execute(f"""
             SELECT 
                 performance_signal,
                 COUNT(*) as count
             FROM timesheets
-            {where_clause} AND performance_signal IS NOT NULL
+            {raw_where}{' AND' if raw_where else ' WHERE'} performance_signal IS NOT NULL
             GROUP BY performance_signal
         """, params).fetchall()
         
         total_signals = sum(row['count'] for row in efficiency_result)
         fast_count = next((row['count'] for row in efficiency_result if row['performance_signal'] == 'fast'), 0)
-        slow_count = next((row['count'] for row in efficiency_result if row['performance_signal'] == 'slow'), 0)
-        blocked_count = next((row['count'] for row in efficiency_result if row['performance_signal'] == 'blocked'), 0)
         
         efficiency = (fast_count / total_signals * 100) if total_signals > 0 else 0
         
-        # Anomalies count (overtime + blocked + delay)
-        anomalies_result = db.execute(f"""
-            SELECT COUNT(*) as count
-            FROM (
-                SELECT date, SUM(COALESCE(duration_minutes, CAST(hours * 60 AS INTEGER))) as day_minutes
-                FROM timesheets
-                {where_clause}
-                GROUP BY date
-                HAVING day_minutes > 480
-            ) overtime_days
-        """, params).fetchone()
-        overtime_days = anomalies_result['count'] or 0
-        
-        blocked_anomalies = db.execute(f"""
-            SELECT COUNT(*) as count
-            FROM timesheets
-            {where_clause} AND performance_signal = 'blocked'
-        """, params).fetchone()
-        blocked_count = blocked_anomalies['count'] or 0
-        
-        delay_anomalies = db.execute(f"""
-            SELECT COUNT(*) as count
-            FROM timesheets
-            {where_clause} AND delay_reason IS NOT NULL AND delay_reason != ''
-        """, params).fetchone()
-        delay_count = delay_anomalies['count'] or 0
+        # Anomalies count (overtime days + blocked + delay)
+        overtime_days = sum(1 for row in daily_rows if (row['day_minutes'] or 0) > 480)
+        blocked_count = sum(row['blocked'] or 0 for row in daily_rows)
+        delay_count = sum(row['delayed'] or 0 for row in daily_rows)
         
         anomalies_count = overtime_days + blocked_count + delay_count
         
@@ -1468,107 +1350,36 @@ def gd_api_worklogs_heatmap():
             d_to = today.strftime('%Y-%m-%d')
             d_from = (today - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        # Build WHERE clause with table prefixes
-        conds = ["date(t.date) BETWEEN date(?) AND date(?)"]
-        params = [d_from, d_to]
-        
-        if user_id:
-            conds.append("(t.user_id = ? OR (t.user_id IS NULL AND t.employee_id IN (SELECT id FROM employees WHERE user_id = ?)))")
-            params.extend([user_id, user_id])
-        
-        where_clause = " WHERE " + " AND ".join(conds)
-        
-        # Get daily aggregates
-        daily_result = db.execute(f"""
-            SELECT 
-                t.date,
-                SUM(COALESCE(t.duration_minutes, CAST(t.hours * 60 AS INTEGER))) as total_minutes,
-                COUNT(*) as entries,
-                SUM(CASE WHEN t.performance_signal = 'blocked' THEN 1 ELSE 0 END) as blocked_count,
-                SUM(CASE WHEN t.delay_reason IS NOT NULL AND t.delay_reason != '' THEN 1 ELSE 0 END) as delay_count
-            FROM timesheets t
-            {where_clause}
-            GROUP BY t.date
-            ORDER BY t.date ASC
-        """, params).fetchall()
-        
-        heatmap_data = []
-        for row in daily_result:
-            total_minutes = row['total_minutes'] or 0
-            # Calculate load_level: 0: <4h, 1: 4-6h, 2: 6-8h, 3: >8h
-            if total_minutes < 240:  # < 4h
-                load_level = 0
-            elif total_minutes < 360:  # 4-6h
-                load_level = 1
-            elif total_minutes <= 480:  # 6-8h
-                load_level = 2
-            else:  # > 8h
-                load_level = 3
-            
-            # Build flags
-            flags = []
-            if total_minutes > 480:
-                flags.append("overtime")
-            if row['blocked_count'] > 0:
-                flags.append("blocked")
-            if row['delay_count'] > 0:
-                flags.append("delay")
-            
-            heatmap_data.append({
-                "date": row['date'],
-                "total_minutes": int(total_minutes),
-                "load_level": load_level,
-                "flags": flags
-            })
-        
-        # Get per-user daily aggregates (for timeline view)
-        per_user_result = db.execute(f"""
-            SELECT 
-                t.date,
-                COALESCE(t.user_id, (SELECT user_id FROM employees WHERE id = t.employee_id)) as user_id,
-                e.name as user_name,
-                SUM(COALESCE(t.duration_minutes, CAST(t.hours * 60 AS INTEGER))) as total_minutes,
-                COUNT(*) as entries
-            FROM timesheets t
-            LEFT JOIN employees e ON e.id = t.employee_id
-            {where_clause}
-            GROUP BY t.date, user_id, e.name
-            ORDER BY t.date ASC, user_id ASC
-        """, params).fetchall()
+        # Denní heatmapa i matice zaměstnanec × den - každá jeden dotaz nad labor_daily
+        heatmap_data = [
+            {
+                "date": d["date"],
+                "total_minutes": d["total_minutes"],
+                "load_level": d["load_level"],
+                "flags": [f for f in d["flags"] if f != "anomaly"]
+            }
+            for d in day_heatmap(db, d_from, d_to, user_id=user_id)
+        ]
         
+        matrix = employee_day_matrix(db, d_from, d_to, user_id=user_id)
         per_user_data = {}
-        for row in per_user_result:
-            date = row['date']
-            user_id = row['user_id']
-            if not date or not user_id:
+        for emp in matrix["employees"]:
+            if not emp["user_id"]:
                 continue
-            
-            if date not in per_user_data:
-                per_user_data[date] = []
-            
-            total_minutes = row['total_minutes'] or 0
-            # Calculate load_level: 0: <4h, 1: 4-6h, 2: 6-8h, 3: >8h
-            if total_minutes < 240:  # < 4h
-                load_level = 0
-            elif total_minutes < 360:  # 4-6h
-                load_level = 1
-            elif total_minutes <= 480:  # 6-8h
-                load_level = 2
-            else:  # > 8h
-                load_level = 3
-            
-            per_user_data[date].append({
-                "user_id": user_id,
-                "user_name": row['user_name'] or f"User #{user_id}",
-                "total_minutes": int(total_minutes),
-                "load_level": load_level,
-                "entries": row['entries'] or 0
-            })
+            for date, cell in emp["cells"].items():
+                per_user_data.setdefault(date, []).append({
+                    "user_id": emp["user_id"],
+                    "user_name": emp["name"],
+                    "total_minutes": cell["total_minutes"],
+                    "load_level": cell["load_level"],
+                    "entries": cell["entries"]
+                })
         
         return jsonify({
             "ok": True,
             "heatmap": heatmap_data,
-            "per_user": per_user_data  # New: per-user data for timeline view
+            "per_user": per_user_data,  # New: per-user data for timeline view
+            "matrix": matrix
         })
     except Exception as e:
         print(f"✗ Error getting worklogs heatmap: {e}")
@@ -1598,7 +1409,7 @@ def gd_api_worklogs_ai_insights():
             d_from = (today - timedelta(days=30)).strftime('%Y-%m-%d')
         
         # Build WHERE clause
-        conds = ["date(date) BETWEEN date(?) AND date(?)"]
+        conds = ["date_iso BETWEEN ? AND ?"]
         params = [d_from, d_to]
         
         if user_id:
@@ -1737,7 +1548,7 @@ def gd_api_worklogs_ai_insights():
             seven_days_ago = (datetime.now().date() - timedelta(days=7)).strftime('%Y-%m-%d')
             today_str = datetime.now().date().strftime('%Y-%m-%d')
             
-            workload_conds = ["date(date) BETWEEN date(?) AND date(?)"]
+            workload_conds = ["t.date_iso BETWEEN ? AND ?"]
             workload_params = [seven_days_ago, today_str]
             
             if user_id:
@@ -1,13 +1,17 @@
 # Green David App
-from flask import Blueprint, jsonify, request, send_from_directory, render_template
 from datetime import datetime
-from app.database import get_db
+
+from flask import Blueprint, jsonify, render_template, request, send_from_directory
+
+import warehouse_extended
 from app.config import WRITE_ROLES
-from app.utils.permissions import require_auth, require_role, requires_role, normalize_role
+from app.database import get_db
+from app.utils import search_index
+from app.utils.permissions import normalize_role, require_auth, require_role, requires_role
+from app.utils.response_cache import cached_response
 
 try:
     import planning_extended_api as ext_api
-    ext_api.get_db = get_db
 except ImportError:
     ext_api = None
 
@@ -189,6 +193,12 @@ def api_warehouse_movements():
     if err: return err
     return warehouse_extended.get_movements()
 
+@warehouse_bp.route("/api/warehouse/movements/export", methods=["GET"])
+def api_warehouse_movements_export():
+    u, err = require_auth()
+    if err: return err
+    return warehouse_extended.export_movements()
+
 @warehouse_bp.route("/api/warehouse/movements", methods=["POST"])
 def api_warehouse_movements_create():
     u, err = require_auth()
@@ -197,6 +207,14 @@ def api_warehouse_movements_create():
         return jsonify({"error": "Forbidden"}), 403
     return warehouse_extended.create_movement()
 
+@warehouse_bp.route("/api/warehouse/movements/batch", methods=["POST"])
+def api_warehouse_movements_batch():
+    u, err = require_auth()
+    if err: return err
+    if normalize_role(u.get("role")) not in WRITE_ROLES:
+        return jsonify({"error": "Forbidden"}), 403
+    return warehouse_extended.create_movement_batch()
+
 @warehouse_bp.route("/api/warehouse/jobs/<int:job_id>/materials", methods=["GET"])
 def api_warehouse_job_materials(job_id):
     u, err = require_auth()
@@ -282,6 +300,7 @@ def api_warehouse_items_rename(item_id):
 
 # -------- WAREHOUSE STATS --------
 @warehouse_bp.route("/api/warehouse/stats", methods=["GET"])
+@cached_response(tags=("warehouse_items", "warehouse_reservations"), ttl=120)
 def api_warehouse_stats():
     u, err = require_auth()
     if err: return err
@@ -323,21 +342,20 @@ def api_warehouse_search():
         if not query or len(query) < 2:
             return jsonify({"items": []})
         
-        # Vyhledej položky podle názvu
-        sql = """
+        # Vyhledej položky podle názvu, SKU a kategorie (FTS index)
+        sql = f"""
             SELECT 
                 id, name, sku, category, qty, unit, price, location,
                 reserved_qty,
                 (qty - COALESCE(reserved_qty, 0)) as available_qty
             FROM warehouse_items 
             WHERE status = 'active' 
-            AND (name LIKE ? OR sku LIKE ? OR category LIKE ?)
+            AND id IN ({search_index.match_ids_sql('warehouse_item')})
             ORDER BY name
             LIMIT 20
         """
         
-        pattern = f"%{query}%"
-        items = db.execute(sql, (pattern, pattern, pattern)).fetchall()
+        items = db.execute(sql, (search_index.fts_query(query) or '""',)).fetchall()
         
         result = []
         for item in items:
@@ -0,0 +1,112 @@
+"""
+Team capacity aggregation shared by the crew dashboard, crew capacity API
+and /api/team/capacity-overview.
+
+Jedním dotazem načte pro všechny zaměstnance týdenní hodiny (rollup
+labor_weekly), počet přiřazených zakázek a kapacitu z profilu. Výsledek se
+cachuje po týdnech; klíčem je verze change feedu (entity_change), takže zápis
+timesheetu v libovolném workeru cache zneplatní.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from app.database import change_feed_version, table_columns
+
+DEFAULT_WEEKLY_CAPACITY = 40.0
+# Pojistka pro databáze bez change feedu (verze je pak vždy None)
+CACHE_TTL = 60
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def week_bounds(day=None):
+    """(monday, sunday) ISO strings of the week containing `day` (date, datetime or ISO string)."""
+    if day is None:
+        day = date.today()
+    elif isinstance(day, str):
+        day = datetime.strptime(day[:10], "%Y-%m-%d").date()
+    elif isinstance(day, datetime):
+        day = day.date()
+    monday = day - timedelta(days=day.weekday())
+    return monday.isoformat(), (monday + timedelta(days=6)).isoformat()
+
+
+def _load_week(db, week_start):
+    joins = []
+    selects = []
+    if table_columns(db, "job_employees"):
+        joins.append("LEFT JOIN (SELECT employee_id, COUNT(*) AS cnt FROM job_employees GROUP BY employee_id) je "
+                     "ON je.employee_id = e.id")
+        selects.append("COALESCE(je.cnt, 0) AS active_jobs")
+    else:
+        selects.append("0 AS active_jobs")
+    if "weekly_capacity_hours" in table_columns(db, "team_member_profile"):
+        joins.append("LEFT JOIN team_member_profile tp ON tp.employee_id = e.id")
+        selects.append("tp.weekly_capacity_hours AS profile_capacity")
+    else:
+        selects.append("NULL AS profile_capacity")
+
+    rows = db.execute(f"""
+        SELECT e.id AS employee_id,
+               COALESCE(ts.hours, 0) AS weekly_hours,
+               COALESCE(ts.tracked_hours, 0) AS tracked_hours,
+               {', '.join(selects)}
+        FROM employees e
+        LEFT JOIN (
+            SELECT employee_id, hours, minutes / 60.0 AS tracked_hours
+            FROM labor_weekly
+            WHERE week_start = ?
+        ) ts ON ts.employee_id = e.id
+        {' '.join(joins)}
+    """, (week_start,)).fetchall()
+
+    result = {}
+    for r in rows:
+        capacity = r["profile_capacity"]
+        if capacity is None:
+            capacity = DEFAULT_WEEKLY_CAPACITY
+        result[r["employee_id"]] = {
+            "weekly_hours": r["weekly_hours"] or 0,
+            "tracked_hours": r["tracked_hours"] or 0,
+            "active_jobs": r["active_jobs"] or 0,
+            "weekly_capacity": capacity,
+        }
+    return result
+
+
+def team_week_capacity(db, week_start=None):
+    """{employee_id: {weekly_hours, tracked_hours, active_jobs, weekly_capacity}} for one week.
+
+    weekly_hours sums timesheets.hours; tracked_hours prefers duration_minutes
+    (what the team capacity page shows). Both come from labor_weekly. Cached per week bucket.
+    """
+    week_start, _ = week_bounds(week_start)
+    version = change_feed_version(db)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(week_start)
+        if hit and hit[0] == version and (version is not None or now - hit[1] < CACHE_TTL):
+            return hit[2]
+    data = _load_week(db, week_start)
+    with _cache_lock:
+        _cache[week_start] = (version, now, data)
+        # Drž jen pár posledních týdnů
+        if len(_cache) > 16:
+            for key in sorted(_cache)[:-16]:
+                _cache.pop(key, None)
+    return data
+
+
+def invalidate_capacity_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def utilization(hours, capacity=DEFAULT_WEEKLY_CAPACITY):
+    """Vytížení v % vůči týdenní kapacitě."""
+    capacity = capacity or DEFAULT_WEEKLY_CAPACITY
+    if capacity <= 0:
+        return 0
+    return (hours / capacity) * 100
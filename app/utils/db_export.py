@@ -0,0 +1,259 @@
+"""
+Export celé databáze a konzistentní snapshoty.
+
+NDJSON export (iter_ndjson) běží nad vlastním read-only spojením v jedné
+čtecí transakci - ve WAL režimu tak vidí konzistentní stav databáze a
+neblokuje zapisovatele. Tabulky se čtou po dávkách podle rowid (keyset
+stránkování), WITHOUT ROWID tabulky přes kurzor s fetchmany. Výstup:
+
+  {"type": "manifest", "format": ..., "tables": [{name, columns, rows, max_rowid}]}
+  {"type": "table", "name": ..., "columns": [...], "sql": "CREATE TABLE ..."}
+  {"type": "row", "table": ..., "rowid": 12, "row": [...]}      # hodnoty v pořadí columns
+  {"type": "end", "tables": n, "rows": n}
+
+BLOB hodnoty jsou {"$b64": "..."}. Přerušený export lze navázat parametry
+start_table / after_rowid (řádky rowid tabulek nesou "rowid").
+
+Snapshoty vznikají přes SQLite online backup API (Connection.backup) do
+souboru vedle databáze (.part -> os.replace), takže se nikdy nekopíruje živý
+soubor s napůl checkpointovaným WAL. Stahují se přes send_file s podporou
+Range / If-Range; snapshot mladší než SNAPSHOT_REUSE_SECONDS se pro další
+stažení použije znovu, místo aby se celá databáze kopírovala při každém
+kliknutí.
+"""
+import base64
+import json
+import os
+import re
+import sqlite3
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from app.config import DATABASE as DB_PATH
+from app.database import open_connection
+
+EXPORT_FORMAT = "green-david-ndjson/1"
+CHUNK_ROWS = 1000
+
+SNAPSHOT_DIR = os.environ.get("DB_SNAPSHOT_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(DB_PATH)), "snapshots")
+SNAPSHOT_KEEP = int(os.environ.get("DB_SNAPSHOT_KEEP", "3"))
+SNAPSHOT_MAX_AGE = 24 * 3600
+SNAPSHOT_REUSE_SECONDS = int(os.environ.get("DB_SNAPSHOT_REUSE_SECONDS", "300"))
+_SNAPSHOT_RE = re.compile(r"^snapshot-\d{8}-\d{6}-[0-9a-f]{8}\.db$")
+
+
+# ----------------- NDJSON export -----------------
+
+def _export_tables(db):
+    """Skutečné tabulky (bez interních, virtuálních a shadow tabulek FTS)."""
+    try:
+        listed = db.execute("PRAGMA main.table_list").fetchall()
+        names = sorted(r["name"] for r in listed if r["type"] == "table")
+    except sqlite3.OperationalError:
+        # SQLite < 3.37 - bez table_list; virtuální tabulky poznáme podle SQL
+        names = [r["name"] for r in db.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name")]
+    sql = {r["name"]: r["sql"] for r in db.execute("SELECT name, sql FROM sqlite_master WHERE type='table'")}
+    return [(n, sql.get(n)) for n in names if not n.startswith("sqlite_")]
+
+
+def _has_rowid(db, table):
+    try:
+        db.execute(f'SELECT rowid FROM "{table}" LIMIT 0')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _value(v):
+    if isinstance(v, (bytes, memoryview)):
+        return {"$b64": base64.b64encode(bytes(v)).decode("ascii")}
+    return v
+
+
+def _line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def build_manifest(db, tables=None):
+    """Manifest exportu: tabulky, sloupce, počty řádků a max rowid."""
+    entries = []
+    for name, sql in _export_tables(db):
+        if tables and name not in tables:
+            continue
+        columns = [r[1] for r in db.execute(f'PRAGMA table_info("{name}")')]
+        rowid = _has_rowid(db, name)
+        if rowid:
+            count, max_rowid = db.execute(f'SELECT COUNT(*), MAX(rowid) FROM "{name}"').fetchone()
+        else:
+            count, max_rowid = db.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0], None
+        entries.append({"name": name, "columns": columns, "rows": count,
+                        "rowid": rowid, "max_rowid": max_rowid, "sql": sql})
+    return {
+        "type": "manifest",
+        "format": EXPORT_FORMAT,
+        "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "tables": entries,
+    }
+
+
+def _table_lines(db, entry, after_rowid=0, chunk=CHUNK_ROWS):
+    """Řádky jedné tabulky po dávkách (jeden yield = jedna dávka NDJSON řádků)."""
+    name, columns = entry["name"], entry["columns"]
+    cols = ", ".join(f'"{c}"' for c in columns)
+    if entry["rowid"]:
+        last = after_rowid or 0
+        while True:
+            rows = db.execute(
+                f'SELECT rowid, {cols} FROM "{name}" WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (last, chunk)).fetchall()
+            if not rows:
+                return
+            yield "".join(_line({"type": "row", "table": name, "rowid": r[0],
+                                 "row": [_value(v) for v in tuple(r)[1:]]}) for r in rows), len(rows)
+            last = rows[-1][0]
+    else:
+        cur = db.execute(f'SELECT {cols} FROM "{name}"')
+        try:
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    return
+                yield "".join(_line({"type": "row", "table": name,
+                                     "row": [_value(v) for v in r]}) for r in rows), len(rows)
+        finally:
+            cur.close()
+
+
+def iter_ndjson(tables=None, start_table=None, after_rowid=0, chunk=CHUNK_ROWS):
+    """NDJSON export jako generátor textových bloků (jedna čtecí transakce)."""
+    db = open_connection(readonly=True)
+    try:
+        db.execute("BEGIN")
+        manifest = build_manifest(db, tables)
+        yield _line(manifest)
+        total = 0
+        started = start_table is None
+        for entry in manifest["tables"]:
+            if not started:
+                if entry["name"] != start_table:
+                    continue
+                started = True
+                resume_from = after_rowid
+            else:
+                resume_from = 0
+            yield _line({"type": "table", "name": entry["name"], "columns": entry["columns"],
+                         "sql": entry["sql"]})
+            for block, n in _table_lines(db, entry, resume_from, chunk):
+                total += n
+                yield block
+        yield _line({"type": "end", "tables": len(manifest["tables"]), "rows": total})
+    finally:
+        try:
+            db.rollback()
+        finally:
+            db.close()
+
+
+def gzip_stream(chunks, level=6):
+    """Průběžná gzip komprese textového streamu."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
+
+
+# ----------------- Snapshoty (backup API) -----------------
+
+def _snapshot_info(name):
+    path = os.path.join(SNAPSHOT_DIR, name)
+    st = os.stat(path)
+    return {
+        "id": name,
+        "size": st.st_size,
+        "created_at": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+    }
+
+
+def list_snapshots():
+    """Snapshoty od nejnovějšího."""
+    try:
+        names = [n for n in os.listdir(SNAPSHOT_DIR) if _SNAPSHOT_RE.match(n)]
+    except FileNotFoundError:
+        return []
+    out = []
+    for name in sorted(names, reverse=True):
+        try:
+            out.append(_snapshot_info(name))
+        except OSError:
+            continue  # mezitím smazán jiným workerem
+    return out
+
+
+def snapshot_path(snapshot_id):
+    """Cesta ke snapshotu, nebo None (neplatné id / neexistuje)."""
+    if not snapshot_id or not _SNAPSHOT_RE.match(snapshot_id):
+        return None
+    path = os.path.join(SNAPSHOT_DIR, snapshot_id)
+    return path if os.path.isfile(path) else None
+
+
+def recent_snapshot(max_age=SNAPSHOT_REUSE_SECONDS):
+    """Cesta k nejnovějšímu snapshotu mladšímu než max_age sekund, nebo None."""
+    now = datetime.now(timezone.utc).timestamp()
+    for snap in list_snapshots()[:1]:
+        path = os.path.join(SNAPSHOT_DIR, snap["id"])
+        try:
+            if now - os.path.getmtime(path) <= max_age:
+                return path
+        except OSError:
+            pass
+    return None
+
+
+def prune_snapshots(keep=SNAPSHOT_KEEP, max_age=SNAPSHOT_MAX_AGE):
+    """Smaže snapshoty nad limit počtu a starší než max_age sekund."""
+    now = datetime.now(timezone.utc).timestamp()
+    removed = 0
+    for i, snap in enumerate(list_snapshots()):
+        path = os.path.join(SNAPSHOT_DIR, snap["id"])
+        try:
+            if i >= keep or now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def create_snapshot():
+    """Konzistentní kopie databáze přes backup API; vrací info o snapshotu."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    name = f"snapshot-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.db"
+    final = os.path.join(SNAPSHOT_DIR, name)
+    part = final + ".part"
+    src = open_connection(readonly=True)
+    dst = sqlite3.connect(part)
+    try:
+        # Jeden krok = jedna čtecí transakce nad zdrojem; ve WAL režimu
+        # zapisovatelé běží dál a snapshot obsahuje jen commitnutá data.
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode=DELETE")
+        dst.close()
+        os.replace(part, final)
+    except Exception:
+        dst.close()
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise
+    finally:
+        src.close()
+    prune_snapshots()
+    return _snapshot_info(name)
@@ -0,0 +1,233 @@
+"""
+Události pro klienty - server-sent events (/api/stream) a long-poll fallback.
+
+Publikace: publish(db, event, data, user_ids=None) vloží řádky do tabulky
+stream_events ve stejné transakci jako zápis, který událost vyvolal (commit
+dělá volající). user_id NULL = událost pro všechny přihlášené. id řádku je
+zároveň SSE id, takže klient po výpadku naváže přes Last-Event-ID.
+
+Doručení: v každém gunicorn workeru běží (jen pokud má odběratele) jedno
+vlákno brokeru, které hlídá MAX(id) tabulky - lookup na konci primárního
+klíče - a probudí čekající streamy přes threading.Condition. Události z
+ostatních workerů (i ze scheduleru) tak dorazí do POLL_INTERVAL.
+
+Stream drží vlákno gunicorn workeru (gthread), proto:
+- streamy i čekající long-polly sdílí jeden limit na proces
+  (STREAM_MAX_CLIENTS, výchozí polovina --threads 16); nad limitem dostane
+  klient 503 a zkusí to znovu později, takže na běžné požadavky vždy zbydou
+  vlákna,
+- stream se po STREAM_MAX_SECONDS ukončí a EventSource se sám připojí znovu,
+- mezi událostmi jde jen komentář ": hb" (heartbeat) každých HEARTBEAT s.
+
+Staré události se mažou po RETENTION_SECONDS; klient, jehož Last-Event-ID
+je starší, dostane událost "resync" (načti stav znovu).
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from app.database import open_connection
+
+POLL_INTERVAL = 0.5
+HEARTBEAT = 15
+STREAM_MAX_SECONDS = int(os.environ.get("STREAM_MAX_SECONDS", "300"))
+STREAM_MAX_CLIENTS = int(os.environ.get("STREAM_MAX_CLIENTS", "8"))
+LONG_POLL_TIMEOUT = 25
+RETRY_MS = 3000
+RETENTION_SECONDS = 3600
+PURGE_PROBABILITY = 0.02
+BATCH = 100
+
+
+def apply_event_stream_migrations(db):
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS stream_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_stream_events_created ON stream_events(created_at);
+    """)
+    db.commit()
+
+
+# ----------------- Publikace -----------------
+
+def publish(db, event, data, user_ids=None):
+    """Zařaď událost (bez commitu). user_ids=None = všem; [] = nikomu.
+
+    Nikdy nevyhazuje - chybějící tabulka (starší DB) nesmí shodit zápis.
+    """
+    if user_ids is not None:
+        user_ids = sorted({int(u) for u in user_ids if u is not None})
+        if not user_ids:
+            return
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    now = time.time()
+    try:
+        db.executemany(
+            "INSERT INTO stream_events (user_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+            [(uid, event, payload, now) for uid in (user_ids if user_ids is not None else [None])])
+        if random.random() < PURGE_PROBABILITY:
+            db.execute("DELETE FROM stream_events WHERE created_at < ?", (now - RETENTION_SECONDS,))
+    except Exception as e:
+        print(f"[STREAM] publish {event} failed: {e}")
+
+
+def unread_count(db, user_id):
+    """Počet nepřečtených notifikací uživatele (počítadlo user_counters)."""
+    row = db.execute("SELECT unread_notifications FROM user_counters WHERE user_id = ?",
+                     (int(user_id),)).fetchone()
+    return row[0] if row else 0
+
+
+# ----------------- Čtení -----------------
+
+def latest_id(db):
+    row = db.execute("SELECT MAX(id) FROM stream_events").fetchone()
+    return row[0] or 0
+
+
+def events_after(db, user_id, after_id, limit=BATCH):
+    """Události pro uživatele s id > after_id: ([{id, event, data}], resync)."""
+    if after_id:
+        oldest = db.execute("SELECT MIN(id) FROM stream_events").fetchone()[0]
+        if oldest is not None and after_id < oldest - 1:
+            return [], True
+    rows = db.execute("""
+        SELECT id, event, data FROM stream_events
+        WHERE id > ? AND (user_id IS NULL OR user_id = ?)
+        ORDER BY id
+        LIMIT ?
+    """, (after_id, int(user_id), limit)).fetchall()
+    return [{"id": r[0], "event": r[1], "data": r[2]} for r in rows], False
+
+
+class _Broker:
+    """Hlídá MAX(id) stream_events a probouzí čekající streamy tohoto procesu."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.last_id = 0
+        self.clients = 0
+        self.thread = None
+        self.pid = None
+
+    def acquire(self):
+        """Registruj stream; False = plno (klient má přejít na long-poll)."""
+        with self.cond:
+            if self.pid != os.getpid():
+                # Forknutý worker - vlákno rodiče tu neběží
+                self.clients, self.thread, self.pid = 0, None, os.getpid()
+            if self.clients >= STREAM_MAX_CLIENTS:
+                return False
+            self.clients += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="event-stream-broker", daemon=True)
+                self.thread.start()
+            return True
+
+    def release(self):
+        with self.cond:
+            self.clients = max(0, self.clients - 1)
+
+    def current(self):
+        return self.last_id
+
+    def wait(self, after_id, timeout):
+        """Čekej, až bude v DB událost s id > after_id; True = možná nové události."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.last_id > after_id, timeout)
+
+    def _run(self):
+        db = open_connection(readonly=True)
+        try:
+            while True:
+                with self.cond:
+                    if self.clients == 0:
+                        self.thread = None
+                        return
+                try:
+                    current = latest_id(db)
+                except Exception as e:
+                    print(f"[STREAM] broker poll failed: {e}")
+                    current = self.last_id
+                if current != self.last_id:
+                    with self.cond:
+                        self.last_id = current
+                        self.cond.notify_all()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            db.close()
+
+
+broker = _Broker()
+
+
+def _sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {event['data']}\n\n"
+
+
+def sse_stream(user_id, last_event_id=None):
+    """Generátor SSE odpovědi (volající už zavolal broker.acquire())."""
+    db = open_connection(readonly=True)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        after = last_event_id if last_event_id is not None else latest_id(db)
+        if last_event_id is None:
+            yield f"id: {after}\nevent: ready\ndata: {{}}\n\n"
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            # Horizont čtený před dotazem: události do něj dotaz určitě vidí, čekat se
+            # pak smí jen na novější (události jiných uživatelů stream nebudí opakovaně)
+            horizon = broker.current()
+            events, resync = events_after(db, user_id, after)
+            if resync:
+                after = latest_id(db)
+                yield f"id: {after}\nevent: resync\ndata: {{}}\n\n"
+                continue
+            for event in events:
+                after = event["id"]
+                yield _sse(event)
+            if len(events) == BATCH:
+                continue
+            if not broker.wait(max(horizon, after), HEARTBEAT):
+                yield ": hb\n\n"
+    finally:
+        broker.release()
+        db.close()
+
+
+def long_poll(db, user_id, last_event_id, timeout=LONG_POLL_TIMEOUT):
+    """Long-poll: události po last_event_id, případně čekej až timeout sekund.
+
+    Bez volného místa u brokeru se nečeká - vrací hned {"busy": True}.
+    """
+    if last_event_id is None:
+        return {"events": [], "last_event_id": latest_id(db), "resync": False}
+    if not broker.acquire():
+        return {"events": [], "last_event_id": last_event_id, "resync": False, "busy": True}
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            horizon = broker.current()
+            events, resync = events_after(db, user_id, last_event_id)
+            if events or resync:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            broker.wait(max(horizon, last_event_id), min(remaining, HEARTBEAT))
+    finally:
+        broker.release()
+    if resync:
+        return {"events": [], "last_event_id": latest_id(db), "resync": True}
+    return {
+        "events": [dict(e, data=json.loads(e["data"])) for e in events],
+        "last_event_id": events[-1]["id"] if events else last_event_id,
+        "resync": False,
+    }
@@ -0,0 +1,118 @@
+"""
+Streaming exporty (CSV / XLSX).
+
+CSV se generuje průběžně z kurzoru po dávkách (fetchmany) a posílá se
+chunked odpovědí - worker nikdy nedrží celý soubor v paměti. XLSX používá
+openpyxl ve write_only režimu a ukládá do dočasného souboru, který se po
+odeslání smaže.
+
+Řádky jsou iterovatelné sekvence hodnot; sheets pro XLSX jsou
+[(název listu, hlavička, řádky), ...].
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime
+
+from flask import Response, jsonify, send_file, stream_with_context
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+CHUNK_ROWS = 500
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def iter_query(db, sql, params=(), chunk=CHUNK_ROWS):
+    """Řádky dotazu po dávkách - kurzor se nikdy nevyčte celý najednou."""
+    cur = db.execute(sql, params)
+    try:
+        while True:
+            batch = cur.fetchmany(chunk)
+            if not batch:
+                break
+            yield from batch
+    finally:
+        cur.close()
+
+
+def _attachment(filename):
+    return {"Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no"}
+
+
+def csv_response(filename, header, rows, chunk=CHUNK_ROWS):
+    """Chunked CSV odpověď (UTF-8 s BOM kvůli Excelu)."""
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(header)
+        yield "\ufeff" + buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        for i, row in enumerate(rows, 1):
+            writer.writerow(["" if v is None else v for v in row])
+            if i % chunk == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype="text/csv",
+                    headers=_attachment(filename))
+
+
+def xlsx_response(filename, sheets):
+    """XLSX přes openpyxl write_only do dočasného souboru (smaže se po odeslání)."""
+    if Workbook is None:
+        return jsonify({"ok": False, "error": "xlsx_unavailable", "message": "openpyxl is not installed"}), 501
+    wb = Workbook(write_only=True)
+    for title, header, rows in sheets:
+        ws = wb.create_sheet(title=(title or "Data")[:31])
+        ws.append(list(header))
+        for row in rows:
+            ws.append(list(row))
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    try:
+        wb.save(tmp)
+        tmp.seek(0)
+    except Exception:
+        tmp.close()
+        raise
+    return send_file(tmp, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
+
+
+def export_response(export_format, basename, header, rows, sheet_title=None):
+    """csv (výchozí) nebo xlsx pro jednu tabulku; název souboru dostane datum."""
+    stamp = datetime.now().strftime("%Y%m%d")
+    if export_format == "xlsx":
+        return xlsx_response(f"{basename}-{stamp}.xlsx", [(sheet_title or basename, header, rows)])
+    return csv_response(f"{basename}-{stamp}.csv", header, rows)
+
+
+def section_rows(sections):
+    """Rozloží sekce reportu ({název: dict | list[dict] | hodnota}) na (název, hlavička, řádky)."""
+    for name, value in sections.items():
+        if isinstance(value, list):
+            dicts = [v for v in value if isinstance(v, dict)]
+            header = []
+            for d in dicts:
+                header += [k for k in d if k not in header]
+            if not header:
+                yield name, ["value"], [[v] for v in value]
+            else:
+                yield name, header, [[_cell(d.get(k)) for k in header] for d in dicts]
+        elif isinstance(value, dict):
+            yield name, ["key", "value"], [[k, _cell(v)] for k, v in value.items()]
+        else:
+            yield name, ["value"], [[_cell(value)]]
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
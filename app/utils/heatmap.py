@@ -0,0 +1,105 @@
+"""
+Heatmap engine pro výkazy práce.
+
+Jedním seskupeným průchodem nad labor_daily (viz app.utils.labor_rollup)
+spočítá pro každý den minuty, load level a příznaky overtime / anomaly /
+blocked / delay. Varianta employee_day_matrix vrací matici zaměstnanec × den
+pro týmový pohled - opět jediný dotaz bez ohledu na délku rozsahu.
+"""
+from app.utils.labor_rollup import DAY_MINUTES
+
+
+def load_level(minutes):
+    """0: <4h, 1: 4-6h, 2: 6-8h, 3: >8h"""
+    if minutes < 240:
+        return 0
+    if minutes < 360:
+        return 1
+    if minutes <= DAY_MINUTES:
+        return 2
+    return 3
+
+
+def _where(d_from, d_to, employee_ids=None, user_id=None, job_id=None):
+    conds = ["d.day BETWEEN ? AND ?"]
+    params = [d_from, d_to]
+    if employee_ids:
+        conds.append(f"d.employee_id IN ({','.join('?' * len(employee_ids))})")
+        params.extend(employee_ids)
+    if user_id:
+        conds.append("d.employee_id IN (SELECT id FROM employees WHERE user_id = ?)")
+        params.append(user_id)
+    if job_id:
+        conds.append("d.job_id = ?")
+        params.append(job_id)
+    return " WHERE " + " AND ".join(conds), params
+
+
+def _cell(row):
+    minutes = int(row["minutes"] or 0)
+    flags = []
+    if minutes > DAY_MINUTES:
+        flags.append("overtime")
+    if row["anomalies"]:
+        flags.append("anomaly")
+    if row["blocked"]:
+        flags.append("blocked")
+    if row["delayed"]:
+        flags.append("delay")
+    return {
+        "total_minutes": minutes,
+        "entries": int(row["entries"] or 0),
+        "load_level": load_level(minutes),
+        "flags": flags,
+    }
+
+
+_SUMS = """SUM(d.minutes) AS minutes, SUM(d.entries) AS entries, SUM(d.anomalies) AS anomalies,
+           SUM(d.blocked_entries) AS blocked, SUM(d.delayed_entries) AS delayed"""
+
+
+def day_heatmap(db, d_from, d_to, **filters):
+    """[{date, total_minutes, entries, load_level, flags}] seřazené podle dne.
+
+    filters: employee_ids=[...], user_id=..., job_id=...
+    """
+    where, params = _where(d_from, d_to, **filters)
+    rows = db.execute(f"""
+        SELECT d.day, {_SUMS}
+        FROM labor_daily d
+        {where}
+        GROUP BY d.day
+        ORDER BY d.day
+    """, params).fetchall()
+    return [dict(_cell(r), date=r["day"]) for r in rows]
+
+
+def employee_day_matrix(db, d_from, d_to, **filters):
+    """Matice zaměstnanec × den: {"days": [...], "employees": [{id, name, user_id, total_minutes, cells: {day: cell}}]}"""
+    where, params = _where(d_from, d_to, **filters)
+    rows = db.execute(f"""
+        SELECT d.employee_id, e.name, e.user_id, d.day, {_SUMS}
+        FROM labor_daily d
+        LEFT JOIN employees e ON e.id = d.employee_id
+        {where}
+        GROUP BY d.employee_id, d.day
+        ORDER BY e.name, d.employee_id, d.day
+    """, params).fetchall()
+
+    employees = {}
+    days = set()
+    for r in rows:
+        emp = employees.get(r["employee_id"])
+        if emp is None:
+            emp = employees[r["employee_id"]] = {
+                "id": r["employee_id"],
+                "name": r["name"] or f"#{r['employee_id']}",
+                "user_id": r["user_id"],
+                "total_minutes": 0,
+                "cells": {},
+            }
+        cell = _cell(r)
+        emp["cells"][r["day"]] = cell
+        emp["total_minutes"] += cell["total_minutes"]
+        days.add(r["day"])
+    return {"days": sorted(days), "employees": list(employees.values())}
@@ -2,7 +2,9 @@
 import json
 import re
 from datetime import datetime
-from app.database import get_db
+
+from app.database import cached_statement, get_db, table_info
+from app.utils import event_stream
 from app.utils.permissions import current_user
 
 
@@ -42,7 +44,7 @@ def create_notification(*, user_id=None, employee_id=None, kind="info", title=""
         db = get_db()
         if employee_id is not None and user_id is None:
             user_id = _employee_user_id(db, int(employee_id))
-        db.execute(
+        cur = db.execute(
             "INSERT INTO notifications(user_id, employee_id, kind, title, body, entity_type, entity_id) VALUES (?,?,?,?,?,?,?)",
             (
                 int(user_id) if user_id is not None else None,
@@ -54,6 +56,12 @@ def create_notification(*, user_id=None, employee_id=None, kind="info", title=""
                 int(entity_id) if entity_id is not None else None,
             ),
         )
+        if user_id is not None:
+            event_stream.publish(db, "notification", {
+                "id": cur.lastrowid, "kind": kind, "title": title, "body": body,
+                "entity_type": entity_type, "entity_id": entity_id,
+                "unread": event_stream.unread_count(db, user_id),
+            }, [user_id])
         db.commit()
     except Exception:
         pass
@@ -138,9 +146,8 @@ def _normalize_date(v):
 
 
 def _jobs_info():
-    rows = get_db().execute("PRAGMA table_info(jobs)").fetchall()
-    # rows: cid, name, type, notnull, dflt_value, pk
-    return {r[1]: {"notnull": int(r[3])} for r in rows}
+    # Cached per schema version - see app.database.table_info
+    return table_info(get_db(), "jobs")
 
 
 def _job_title_col():
@@ -151,6 +158,10 @@ def _job_title_col():
 
 
 def _job_select_all():
+    return cached_statement(get_db(), "jobs.select_all", _build_job_select_all)
+
+
+def _build_job_select_all():
     info = _jobs_info()
     base_cols = "id, client, status, city, code, date, note"
     date_cols = ", created_date, start_date" if "created_date" in info else ""
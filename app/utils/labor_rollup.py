@@ -0,0 +1,208 @@
+"""
+Labor rollups - předagregované výkazy práce.
+
+labor_daily   (employee_id, job_id, day)   - součty za zaměstnance, zakázku a den
+labor_weekly  (employee_id, week_start)    - součty za zaměstnance a ISO týden
+
+Obě tabulky drží triggery na timesheets ve stejné transakci jako zápis
+výkazu: dotčený denní řádek se přepočte z timesheets (klíč je date_iso, ne
+surové date) a týden z denních řádků. Přepočet místo delty nezávisí na
+pořadí triggerů - vnořený UPDATE date_iso z triggerů data výkazu nemůže
+výkaz započítat dvakrát. Výkazy bez zaměstnance / zakázky mají v klíči 0;
+výkazy s nerozpoznatelným datem (date_iso IS NULL) se neagregují.
+
+overtime_minutes:
+- labor_daily: minuty nad 8 h u jednotlivých výkazů (jako /api/timesheets/summary)
+- labor_weekly: minuty nad 8 h za den zaměstnance (součet přes zakázky)
+
+Přestavba od nuly: rebuild_labor_rollups(db) nebo
+  python -m app.utils.labor_rollup rebuild
+"""
+import sys
+
+from app.database import table_columns
+
+DAY_MINUTES = 480  # 8 h
+
+# date se nesleduje - den určuje date_iso, který udržují triggery data výkazu
+_TRACKED = ("employee_id", "job_id", "date_iso", "hours", "duration_minutes", "labor_cost",
+            "ai_flags", "performance_signal", "delay_reason")
+
+
+def _measures(cols, row=None):
+    """SQL výrazy metrik jednoho výkazu (row=None pro dotaz nad tabulkou)."""
+    p = f"{row}." if row else ""
+    minutes = (f"COALESCE({p}duration_minutes, CAST({p}hours * 60 AS INTEGER))"
+               if "duration_minutes" in cols else f"CAST({p}hours * 60 AS INTEGER)")
+    minutes = f"COALESCE({minutes}, 0)"
+    flags = f"{p}ai_flags"
+    return {
+        "hours": f"COALESCE({p}hours, 0)",
+        "minutes": minutes,
+        "labor_cost": f"COALESCE({p}labor_cost, 0)" if "labor_cost" in cols else "0",
+        "entries": "1",
+        "overtime_minutes": f"MAX({minutes} - {DAY_MINUTES}, 0)",
+        "anomalies": (f"CASE WHEN json_valid({flags}) AND json_extract({flags}, '$.anomaly') THEN 1 ELSE 0 END"
+                      if "ai_flags" in cols else "0"),
+        "blocked_entries": (f"CASE WHEN {p}performance_signal = 'blocked' THEN 1 ELSE 0 END"
+                            if "performance_signal" in cols else "0"),
+        "delayed_entries": (f"CASE WHEN {p}delay_reason IS NOT NULL AND {p}delay_reason != '' THEN 1 ELSE 0 END"
+                            if "delay_reason" in cols else "0"),
+    }
+
+
+MEASURES = ("hours", "minutes", "labor_cost", "entries", "overtime_minutes",
+            "anomalies", "blocked_entries", "delayed_entries")
+
+
+def _week_start(day_expr):
+    return f"date({day_expr}, 'weekday 0', '-6 days')"
+
+
+def _weekly_refresh_sql(employee_expr, week_expr):
+    """Přepočet jednoho týdne zaměstnance z labor_daily."""
+    return f"""
+        DELETE FROM labor_weekly WHERE employee_id = {employee_expr} AND week_start = {week_expr};
+        INSERT INTO labor_weekly (employee_id, week_start, hours, minutes, labor_cost, entries,
+                                  overtime_minutes, anomalies, days_worked)
+        SELECT * FROM (
+            SELECT {employee_expr}, {week_expr} AS week_start, SUM(h), SUM(m), SUM(c), SUM(n),
+                   SUM(MAX(m - {DAY_MINUTES}, 0)), SUM(a), COUNT(*) AS days_worked
+            FROM (
+                SELECT day, SUM(hours) AS h, SUM(minutes) AS m, SUM(labor_cost) AS c,
+                       SUM(entries) AS n, SUM(anomalies) AS a
+                FROM labor_daily
+                WHERE employee_id = {employee_expr}
+                  AND day BETWEEN {week_expr} AND date({week_expr}, '+6 days')
+                GROUP BY day
+            )
+        ) WHERE week_start IS NOT NULL AND days_worked > 0;"""
+
+
+def _refresh_row_sql(cols, row):
+    """Přepočti denní řádek (zaměstnanec, zakázka, date_iso) výkazu row z timesheets a jeho týden."""
+    m = _measures(cols)
+    sums = ", ".join(f"SUM({m[k]})" for k in MEASURES)
+    day = f"{row}.date_iso"
+    employee = f"IFNULL({row}.employee_id, 0)"
+    job = f"IFNULL({row}.job_id, 0)"
+    return f"""
+        DELETE FROM labor_daily WHERE employee_id = {employee} AND job_id = {job} AND day = {day};
+        INSERT INTO labor_daily (employee_id, job_id, day, {', '.join(MEASURES)})
+        SELECT {employee}, {job}, {day}, {sums}
+        FROM timesheets
+        WHERE date_iso = {day} AND IFNULL(employee_id, 0) = {employee} AND IFNULL(job_id, 0) = {job}
+        HAVING COUNT(*) > 0;
+        {_weekly_refresh_sql(employee, _week_start(day))}"""
+
+
+def apply_labor_rollup_migrations(db):
+    """Tabulky labor_daily / labor_weekly, udržovací triggery a počáteční naplnění."""
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS labor_daily (
+            employee_id INTEGER NOT NULL,
+            job_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            hours REAL NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            labor_cost REAL NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0,
+            overtime_minutes INTEGER NOT NULL DEFAULT 0,
+            anomalies INTEGER NOT NULL DEFAULT 0,
+            blocked_entries INTEGER NOT NULL DEFAULT 0,
+            delayed_entries INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_id, job_id, day)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_labor_daily_day ON labor_daily(day);
+        CREATE INDEX IF NOT EXISTS idx_labor_daily_job_day ON labor_daily(job_id, day);
+
+        CREATE TABLE IF NOT EXISTS labor_weekly (
+            employee_id INTEGER NOT NULL,
+            week_start TEXT NOT NULL,
+            hours REAL NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            labor_cost REAL NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0,
+            overtime_minutes INTEGER NOT NULL DEFAULT 0,
+            anomalies INTEGER NOT NULL DEFAULT 0,
+            days_worked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_id, week_start)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_labor_weekly_week ON labor_weekly(week_start);
+    """)
+
+    cols = set(table_columns(db, "timesheets"))
+    tracked = [c for c in _TRACKED if c in cols]
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in tracked)
+    for name in ("insert", "update", "delete"):
+        db.execute(f"DROP TRIGGER IF EXISTS trg_labor_rollup_{name}")
+    db.executescript(f"""
+        CREATE TRIGGER trg_labor_rollup_insert AFTER INSERT ON timesheets
+        WHEN NEW.date_iso IS NOT NULL
+        BEGIN {_refresh_row_sql(cols, 'NEW')}
+        END;
+        CREATE TRIGGER trg_labor_rollup_update AFTER UPDATE OF {', '.join(tracked)} ON timesheets
+        WHEN {changed}
+        BEGIN {_refresh_row_sql(cols, 'OLD')} {_refresh_row_sql(cols, 'NEW')}
+        END;
+        CREATE TRIGGER trg_labor_rollup_delete AFTER DELETE ON timesheets
+        WHEN OLD.date_iso IS NOT NULL
+        BEGIN {_refresh_row_sql(cols, 'OLD')}
+        END;
+    """)
+    rebuild_labor_rollups(db)
+
+
+def rebuild_labor_rollups(db):
+    """Přestav obě rollup tabulky z timesheets (jedna transakce)."""
+    m = _measures(set(table_columns(db, "timesheets")))
+    sums = ", ".join(f"SUM({m[k]})" for k in MEASURES)
+    try:
+        db.execute("DELETE FROM labor_daily")
+        db.execute("DELETE FROM labor_weekly")
+        db.execute(f"""
+            INSERT INTO labor_daily (employee_id, job_id, day, {', '.join(MEASURES)})
+            SELECT IFNULL(employee_id, 0), IFNULL(job_id, 0), date_iso, {sums}
+            FROM timesheets
+            WHERE date_iso IS NOT NULL
+            GROUP BY IFNULL(employee_id, 0), IFNULL(job_id, 0), date_iso
+        """)
+        db.execute(f"""
+            INSERT INTO labor_weekly (employee_id, week_start, hours, minutes, labor_cost, entries,
+                                      overtime_minutes, anomalies, days_worked)
+            SELECT employee_id, {_week_start('day')}, SUM(h), SUM(m), SUM(c), SUM(n),
+                   SUM(MAX(m - {DAY_MINUTES}, 0)), SUM(a), COUNT(*)
+            FROM (
+                SELECT employee_id, day, SUM(hours) AS h, SUM(minutes) AS m, SUM(labor_cost) AS c,
+                       SUM(entries) AS n, SUM(anomalies) AS a
+                FROM labor_daily
+                GROUP BY employee_id, day
+            )
+            GROUP BY employee_id, {_week_start('day')}
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def main(argv=None):
+    from app.database import open_connection
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m app.utils.labor_rollup rebuild")
+        return 2
+    db = open_connection()
+    try:
+        rebuild_labor_rollups(db)
+        days = db.execute("SELECT COUNT(*) FROM labor_daily").fetchone()[0]
+        weeks = db.execute("SELECT COUNT(*) FROM labor_weekly").fetchone()[0]
+        print(f"[DB] Labor rollups rebuilt: {days} daily rows, {weeks} weekly rows")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,760 +1,481 @@
-import os
 import json
+import os
 from datetime import datetime
-from werkzeug.security import generate_password_hash
-from app.database import get_db, _table_exists, _table_has_column
-
-def apply_migrations():
-    """Lightweight, non-breaking migration runner.
 
-    Tracks applied versions in schema_migrations and applies idempotent ALTERs when needed.
-    """
-    db = get_db()
-    db.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL DEFAULT (datetime('now')))")
-    applied = {r[0] for r in db.execute("SELECT version FROM schema_migrations").fetchall()}
-
-    migrations = [
-        # v1: baseline (existing ensure_schema creates core tables)
-        (1, []),
-
-        # v2: employees extra contact fields (safe idempotent)
-        (2, [
-            ("employees", "phone",   "ALTER TABLE employees ADD COLUMN phone TEXT DEFAULT ''"),
-            ("employees", "email",   "ALTER TABLE employees ADD COLUMN email TEXT DEFAULT ''"),
-            ("employees", "address", "ALTER TABLE employees ADD COLUMN address TEXT DEFAULT ''"),
-        ]),
-
-        # v3: core search stability (jobs/tasks/issues timestamps + assignment tables)
-        (3, [
-            ("jobs", "created_at", "ALTER TABLE jobs ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
-            ("tasks", "created_at", "ALTER TABLE tasks ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
-            """
-            CREATE TABLE IF NOT EXISTS task_assignments (
-                task_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                is_primary INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (task_id, employee_id)
-            );
-            CREATE TABLE IF NOT EXISTS issues (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER,
-                title TEXT NOT NULL,
-                description TEXT DEFAULT '',
-                type TEXT DEFAULT 'issue',
-                status TEXT NOT NULL DEFAULT 'open',
-                severity TEXT DEFAULT '',
-                assigned_to INTEGER,
-                created_by INTEGER,
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
-            );
-            CREATE TABLE IF NOT EXISTS issue_assignments (
-                issue_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                is_primary INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (issue_id, employee_id)
-            );
-            """,
-        ]),
-
-        # v4: assignment tables primary flag (backward compatibility)
-        (4, [
-            ("task_assignments", "is_primary", "ALTER TABLE task_assignments ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0"),
-            ("issue_assignments", "is_primary", "ALTER TABLE issue_assignments ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0"),
-        ]),
-
-        # v5: notifications (safe create)
-        (5, [
-            """
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                employee_id INTEGER,
-                kind TEXT NOT NULL DEFAULT 'info',
-                title TEXT NOT NULL DEFAULT '',
-                body TEXT NOT NULL DEFAULT '',
-                entity_type TEXT,
-                entity_id INTEGER,
-                is_read INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
-            );
-            CREATE INDEX IF NOT EXISTS idx_notifications_user_read ON notifications(user_id, is_read, created_at);
-            CREATE INDEX IF NOT EXISTS idx_notifications_emp_read ON notifications(employee_id, is_read, created_at);
-            """,
-        ]),
-
-        # v6: tasks extra columns (deadline, depends_on, due_date)
-        (6, [
-            ("tasks", "deadline", "ALTER TABLE tasks ADD COLUMN deadline TEXT"),
-            ("tasks", "depends_on", "ALTER TABLE tasks ADD COLUMN depends_on TEXT"),
-            ("tasks", "due_date", "ALTER TABLE tasks ADD COLUMN due_date TEXT"),
-        ]),
-
-        # v7: jobs extra columns (invoiced, address, budget)
-        (7, [
-            ("jobs", "invoiced", "ALTER TABLE jobs ADD COLUMN invoiced INTEGER DEFAULT 0"),
-            ("jobs", "address", "ALTER TABLE jobs ADD COLUMN address TEXT DEFAULT ''"),
-            ("jobs", "budget", "ALTER TABLE jobs ADD COLUMN budget REAL DEFAULT 0"),
-        ]),
-
-        # v8: planning_assignments table
-        (8, [
-            """
-            CREATE TABLE IF NOT EXISTS planning_assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                job_id INTEGER,
-                task_id INTEGER,
-                date TEXT NOT NULL,
-                start_time TEXT,
-                end_time TEXT,
-                hours REAL DEFAULT 8,
-                note TEXT DEFAULT '',
-                status TEXT DEFAULT 'planned',
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (employee_id) REFERENCES employees(id),
-                FOREIGN KEY (job_id) REFERENCES jobs(id),
-                FOREIGN KEY (task_id) REFERENCES tasks(id)
-            );
-            CREATE INDEX IF NOT EXISTS idx_planning_date ON planning_assignments(date);
-            CREATE INDEX IF NOT EXISTS idx_planning_employee ON planning_assignments(employee_id);
-            """,
-        ]),
-
-        # v9: inventory/warehouse table
-        (9, [
-            """
-            CREATE TABLE IF NOT EXISTS inventory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                sku TEXT,
-                category TEXT DEFAULT 'general',
-                quantity REAL DEFAULT 0,
-                unit TEXT DEFAULT 'ks',
-                unit_price REAL DEFAULT 0,
-                min_quantity REAL DEFAULT 0,
-                location TEXT DEFAULT '',
-                supplier TEXT DEFAULT '',
-                note TEXT DEFAULT '',
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                updated_at TEXT NOT NULL DEFAULT (datetime('now'))
-            );
-            CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory(category);
-            CREATE INDEX IF NOT EXISTS idx_inventory_sku ON inventory(sku);
-            """,
-        ]),
-
-        # v10: attachments table
-        (10, [
-            """
-            CREATE TABLE IF NOT EXISTS attachments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                entity_type TEXT NOT NULL,
-                entity_id INTEGER NOT NULL,
-                filename TEXT NOT NULL,
-                filepath TEXT NOT NULL,
-                filesize INTEGER DEFAULT 0,
-                mimetype TEXT DEFAULT '',
-                uploaded_by INTEGER,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (uploaded_by) REFERENCES users(id)
-            );
-            CREATE INDEX IF NOT EXISTS idx_attachments_entity ON attachments(entity_type, entity_id);
-            """,
-        ]),
-
-        # v11: warehouse_items table (alternative naming)
-        (11, [
-            """
-            CREATE TABLE IF NOT EXISTS warehouse_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                sku TEXT,
-                category TEXT DEFAULT 'general',
-                quantity REAL DEFAULT 0,
-                unit TEXT DEFAULT 'ks',
-                unit_price REAL DEFAULT 0,
-                min_quantity REAL DEFAULT 0,
-                location TEXT DEFAULT '',
-                supplier TEXT DEFAULT '',
-                note TEXT DEFAULT '',
-                job_id INTEGER,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                updated_at TEXT NOT NULL DEFAULT (datetime('now'))
-            );
-            """,
-        ]),
+from werkzeug.security import generate_password_hash
 
-        # v12: job_plan_proposals table (Ghost plán)
-        (12, [
-            """
-            CREATE TABLE IF NOT EXISTS job_plan_proposals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL,
-                proposal_type TEXT NOT NULL DEFAULT 'ghost',
-                title TEXT NOT NULL,
-                description TEXT DEFAULT '',
-                proposed_timeline JSON,
-                proposed_resources JSON,
-                proposed_budget REAL DEFAULT 0,
-                risk_score INTEGER DEFAULT 0,
-                health_score INTEGER DEFAULT 0,
-                status TEXT NOT NULL DEFAULT 'pending',
-                created_by INTEGER,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                reviewed_at TEXT,
-                reviewed_by INTEGER,
-                FOREIGN KEY (job_id) REFERENCES jobs(id),
-                FOREIGN KEY (created_by) REFERENCES users(id),
-                FOREIGN KEY (reviewed_by) REFERENCES users(id)
-            );
-            CREATE INDEX IF NOT EXISTS idx_job_plan_proposals_job ON job_plan_proposals(job_id, status);
-            """,
-        ]),
-
-        # v13: timesheets extended (work logs as data package)
-        (13, [
-            ("timesheets", "user_id", "ALTER TABLE timesheets ADD COLUMN user_id INTEGER NULL"),
-            ("timesheets", "duration_minutes", "ALTER TABLE timesheets ADD COLUMN duration_minutes INTEGER NULL"),
-            ("timesheets", "work_type", "ALTER TABLE timesheets ADD COLUMN work_type TEXT DEFAULT 'manual'"),
-            ("timesheets", "start_time", "ALTER TABLE timesheets ADD COLUMN start_time TEXT NULL"),
-            ("timesheets", "end_time", "ALTER TABLE timesheets ADD COLUMN end_time TEXT NULL"),
-            ("timesheets", "location", "ALTER TABLE timesheets ADD COLUMN location TEXT NULL"),
-            ("timesheets", "task_id", "ALTER TABLE timesheets ADD COLUMN task_id INTEGER NULL"),
-            ("timesheets", "material_used", "ALTER TABLE timesheets ADD COLUMN material_used TEXT NULL"),
-            ("timesheets", "weather_snapshot", "ALTER TABLE timesheets ADD COLUMN weather_snapshot TEXT NULL"),
-            ("timesheets", "performance_signal", "ALTER TABLE timesheets ADD COLUMN performance_signal TEXT DEFAULT 'normal'"),
-            ("timesheets", "delay_reason", "ALTER TABLE timesheets ADD COLUMN delay_reason TEXT NULL"),
-            ("timesheets", "photo_url", "ALTER TABLE timesheets ADD COLUMN photo_url TEXT NULL"),
-            ("timesheets", "note", "ALTER TABLE timesheets ADD COLUMN note TEXT NULL"),
-            ("timesheets", "ai_flags", "ALTER TABLE timesheets ADD COLUMN ai_flags TEXT NULL"),
-            ("timesheets", "created_at", "ALTER TABLE timesheets ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
-            ("timesheets", "labor_cost", "ALTER TABLE timesheets ADD COLUMN labor_cost REAL NULL"),
-            """
-            -- Migrate existing hours to duration_minutes
-            UPDATE timesheets SET duration_minutes = CAST(hours * 60 AS INTEGER) WHERE duration_minutes IS NULL AND hours IS NOT NULL;
-            
-            -- Migrate place to location
-            UPDATE timesheets SET location = place WHERE location IS NULL AND place IS NOT NULL AND place != '';
-            
-            -- Migrate activity to note
-            UPDATE timesheets SET note = activity WHERE note IS NULL AND activity IS NOT NULL AND activity != '';
-            
-            -- Create indexes for performance
-            CREATE INDEX IF NOT EXISTS idx_timesheets_user_date ON timesheets(user_id, date);
-            CREATE INDEX IF NOT EXISTS idx_timesheets_job_date ON timesheets(job_id, date);
-            CREATE INDEX IF NOT EXISTS idx_timesheets_task ON timesheets(task_id);
-            CREATE INDEX IF NOT EXISTS idx_timesheets_employee_date ON timesheets(employee_id, date);
-            """,
-        ]),
-
-        # v14: timesheets delay_note (doplněk k delay_reason)
-        (14, [
-            ("timesheets", "delay_note", "ALTER TABLE timesheets ADD COLUMN delay_note TEXT NULL"),
-        ]),
-
-        # v15: trainings module (školení a vzdělávání)
-        (15, [
-            """
-            CREATE TABLE IF NOT EXISTS trainings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                training_type TEXT DEFAULT 'external',
-                category TEXT,
-                provider TEXT,
-                provider_type TEXT,
-                date_start TEXT NOT NULL,
-                date_end TEXT,
-                duration_hours REAL,
-                is_paid INTEGER DEFAULT 1,
-                cost_training REAL DEFAULT 0,
-                cost_travel REAL DEFAULT 0,
-                cost_accommodation REAL DEFAULT 0,
-                cost_meals REAL DEFAULT 0,
-                cost_other REAL DEFAULT 0,
-                cost_total REAL DEFAULT 0,
-                cost_opportunity REAL DEFAULT 0,
-                location TEXT,
-                is_remote INTEGER DEFAULT 0,
-                has_certificate INTEGER DEFAULT 0,
-                certificate_name TEXT,
-                certificate_valid_until TEXT,
-                rating INTEGER,
-                notes TEXT,
-                skills_gained TEXT,
-                skill_level_increase INTEGER DEFAULT 1,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                created_by INTEGER
-            );
-            CREATE TABLE IF NOT EXISTS training_attendees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                training_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                status TEXT DEFAULT 'registered',
-                attendance_confirmed INTEGER DEFAULT 0,
-                test_score REAL,
-                certificate_issued INTEGER DEFAULT 0,
-                certificate_url TEXT,
-                personal_rating INTEGER,
-                personal_notes TEXT,
-                FOREIGN KEY (training_id) REFERENCES trainings(id) ON DELETE CASCADE,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-            );
-            CREATE INDEX IF NOT EXISTS idx_trainings_date ON trainings(date_start);
-            CREATE INDEX IF NOT EXISTS idx_trainings_category ON trainings(category);
-            CREATE INDEX IF NOT EXISTS idx_training_attendees_employee ON training_attendees(employee_id);
-            CREATE INDEX IF NOT EXISTS idx_training_attendees_training ON training_attendees(training_id);
-            """,
-        ]),
-
-        # v16: employees skills tracking
-        (16, [
-            ("employees", "skills", "ALTER TABLE employees ADD COLUMN skills TEXT NULL"),
-            ("employees", "skill_score", "ALTER TABLE employees ADD COLUMN skill_score REAL DEFAULT 50"),
-            ("employees", "training_hours_total", "ALTER TABLE employees ADD COLUMN training_hours_total REAL DEFAULT 0"),
-            ("employees", "last_training_date", "ALTER TABLE employees ADD COLUMN last_training_date TEXT NULL"),
-        ]),
-
-        # v17: training compensation type (typ proplácení školení)
-        (17, [
-            ("trainings", "compensation_type", "ALTER TABLE trainings ADD COLUMN compensation_type TEXT DEFAULT 'paid_workday'"),
-            ("trainings", "wage_cost", "ALTER TABLE trainings ADD COLUMN wage_cost REAL DEFAULT 0"),
-            ("trainings", "wage_cost_per_person", "ALTER TABLE trainings ADD COLUMN wage_cost_per_person REAL NULL"),
-        ]),
-
-        # v18: worklogs training_id (propojení výkazů se školením)
-        (18, [
-            ("timesheets", "training_id", "ALTER TABLE timesheets ADD COLUMN training_id INTEGER NULL"),
-            ("timesheets", "fk_timesheets_training", """
-                CREATE INDEX IF NOT EXISTS idx_timesheets_training ON timesheets(training_id)
-            """),
-        ]),
+from app.database import _table_exists, _table_has_column, get_db
+
+# Versioned ALTER/DDL steps. Each item is either a (table, column, ALTER sql) tuple
+# or a raw DDL script. Applied through the migration registry in app.utils.migrator.
+LEGACY_MIGRATIONS = [
+    # v1: baseline (existing ensure_schema creates core tables)
+    (1, []),
+
+    # v2: employees extra contact fields (safe idempotent)
+    (2, [
+        ("employees", "phone",   "ALTER TABLE employees ADD COLUMN phone TEXT DEFAULT ''"),
+        ("employees", "email",   "ALTER TABLE employees ADD COLUMN email TEXT DEFAULT ''"),
+        ("employees", "address", "ALTER TABLE employees ADD COLUMN address TEXT DEFAULT ''"),
+    ]),
+
+    # v3: core search stability (jobs/tasks/issues timestamps + assignment tables)
+    (3, [
+        ("jobs", "created_at", "ALTER TABLE jobs ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
+        ("tasks", "created_at", "ALTER TABLE tasks ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
+        """
+        CREATE TABLE IF NOT EXISTS task_assignments (
+            task_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            is_primary INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (task_id, employee_id)
+        );
+        CREATE TABLE IF NOT EXISTS issues (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            type TEXT DEFAULT 'issue',
+            status TEXT NOT NULL DEFAULT 'open',
+            severity TEXT DEFAULT '',
+            assigned_to INTEGER,
+            created_by INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        CREATE TABLE IF NOT EXISTS issue_assignments (
+            issue_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            is_primary INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (issue_id, employee_id)
+        );
+        """,
+    ]),
+
+    # v4: assignment tables primary flag (backward compatibility)
+    (4, [
+        ("task_assignments", "is_primary", "ALTER TABLE task_assignments ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0"),
+        ("issue_assignments", "is_primary", "ALTER TABLE issue_assignments ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0"),
+    ]),
+
+    # v5: notifications (safe create)
+    (5, [
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            employee_id INTEGER,
+            kind TEXT NOT NULL DEFAULT 'info',
+            title TEXT NOT NULL DEFAULT '',
+            body TEXT NOT NULL DEFAULT '',
+            entity_type TEXT,
+            entity_id INTEGER,
+            is_read INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_read ON notifications(user_id, is_read, created_at);
+        CREATE INDEX IF NOT EXISTS idx_notifications_emp_read ON notifications(employee_id, is_read, created_at);
+        """,
+    ]),
+
+    # v6: tasks extra columns (deadline, depends_on, due_date)
+    (6, [
+        ("tasks", "deadline", "ALTER TABLE tasks ADD COLUMN deadline TEXT"),
+        ("tasks", "depends_on", "ALTER TABLE tasks ADD COLUMN depends_on TEXT"),
+        ("tasks", "due_date", "ALTER TABLE tasks ADD COLUMN due_date TEXT"),
+    ]),
+
+    # v7: jobs extra columns (invoiced, address, budget)
+    (7, [
+        ("jobs", "invoiced", "ALTER TABLE jobs ADD COLUMN invoiced INTEGER DEFAULT 0"),
+        ("jobs", "address", "ALTER TABLE jobs ADD COLUMN address TEXT DEFAULT ''"),
+        ("jobs", "budget", "ALTER TABLE jobs ADD COLUMN budget REAL DEFAULT 0"),
+    ]),
+
+    # v8: planning_assignments table
+    (8, [
+        """
+        CREATE TABLE IF NOT EXISTS planning_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            job_id INTEGER,
+            task_id INTEGER,
+            date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            hours REAL DEFAULT 8,
+            note TEXT DEFAULT '',
+            status TEXT DEFAULT 'planned',
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (employee_id) REFERENCES employees(id),
+            FOREIGN KEY (job_id) REFERENCES jobs(id),
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_planning_date ON planning_assignments(date);
+        CREATE INDEX IF NOT EXISTS idx_planning_employee ON planning_assignments(employee_id);
+        """,
+    ]),
+
+    # v9: inventory/warehouse table
+    (9, [
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            sku TEXT,
+            category TEXT DEFAULT 'general',
+            quantity REAL DEFAULT 0,
+            unit TEXT DEFAULT 'ks',
+            unit_price REAL DEFAULT 0,
+            min_quantity REAL DEFAULT 0,
+            location TEXT DEFAULT '',
+            supplier TEXT DEFAULT '',
+            note TEXT DEFAULT '',
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory(category);
+        CREATE INDEX IF NOT EXISTS idx_inventory_sku ON inventory(sku);
+        """,
+    ]),
+
+    # v10: attachments table
+    (10, [
+        """
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity_type TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            filepath TEXT NOT NULL,
+            filesize INTEGER DEFAULT 0,
+            mimetype TEXT DEFAULT '',
+            uploaded_by INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (uploaded_by) REFERENCES users(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_attachments_entity ON attachments(entity_type, entity_id);
+        """,
+    ]),
+
+    # v11: warehouse_items table (alternative naming)
+    (11, [
+        """
+        CREATE TABLE IF NOT EXISTS warehouse_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            sku TEXT,
+            category TEXT DEFAULT 'general',
+            quantity REAL DEFAULT 0,
+            unit TEXT DEFAULT 'ks',
+            unit_price REAL DEFAULT 0,
+            min_quantity REAL DEFAULT 0,
+            location TEXT DEFAULT '',
+            supplier TEXT DEFAULT '',
+            note TEXT DEFAULT '',
+            job_id INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """,
+    ]),
+
+    # v12: job_plan_proposals table (Ghost plán)
+    (12, [
+        """
+        CREATE TABLE IF NOT EXISTS job_plan_proposals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            proposal_type TEXT NOT NULL DEFAULT 'ghost',
+            title TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            proposed_timeline JSON,
+            proposed_resources JSON,
+            proposed_budget REAL DEFAULT 0,
+            risk_score INTEGER DEFAULT 0,
+            health_score INTEGER DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_by INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            reviewed_at TEXT,
+            reviewed_by INTEGER,
+            FOREIGN KEY (job_id) REFERENCES jobs(id),
+            FOREIGN KEY (created_by) REFERENCES users(id),
+            FOREIGN KEY (reviewed_by) REFERENCES users(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_plan_proposals_job ON job_plan_proposals(job_id, status);
+        """,
+    ]),
+
+    # v13: timesheets extended (work logs as data package)
+    (13, [
+        ("timesheets", "user_id", "ALTER TABLE timesheets ADD COLUMN user_id INTEGER NULL"),
+        ("timesheets", "duration_minutes", "ALTER TABLE timesheets ADD COLUMN duration_minutes INTEGER NULL"),
+        ("timesheets", "work_type", "ALTER TABLE timesheets ADD COLUMN work_type TEXT DEFAULT 'manual'"),
+        ("timesheets", "start_time", "ALTER TABLE timesheets ADD COLUMN start_time TEXT NULL"),
+        ("timesheets", "end_time", "ALTER TABLE timesheets ADD COLUMN end_time TEXT NULL"),
+        ("timesheets", "location", "ALTER TABLE timesheets ADD COLUMN location TEXT NULL"),
+        ("timesheets", "task_id", "ALTER TABLE timesheets ADD COLUMN task_id INTEGER NULL"),
+        ("timesheets", "material_used", "ALTER TABLE timesheets ADD COLUMN material_used TEXT NULL"),
+        ("timesheets", "weather_snapshot", "ALTER TABLE timesheets ADD COLUMN weather_snapshot TEXT NULL"),
+        ("timesheets", "performance_signal", "ALTER TABLE timesheets ADD COLUMN performance_signal TEXT DEFAULT 'normal'"),
+        ("timesheets", "delay_reason", "ALTER TABLE timesheets ADD COLUMN delay_reason TEXT NULL"),
+        ("timesheets", "photo_url", "ALTER TABLE timesheets ADD COLUMN photo_url TEXT NULL"),
+        ("timesheets", "note", "ALTER TABLE timesheets ADD COLUMN note TEXT NULL"),
+        ("timesheets", "ai_flags", "ALTER TABLE timesheets ADD COLUMN ai_flags TEXT NULL"),
+        ("timesheets", "created_at", "ALTER TABLE timesheets ADD COLUMN created_at TEXT NOT NULL DEFAULT (datetime('now'))"),
+        ("timesheets", "labor_cost", "ALTER TABLE timesheets ADD COLUMN labor_cost REAL NULL"),
+        """
+        -- Migrate existing hours to duration_minutes
+        UPDATE timesheets SET duration_minutes = CAST(hours * 60 AS INTEGER) WHERE duration_minutes IS NULL AND hours IS NOT NULL;
         
-        # v19: trainings participants field (účastníci jako JSON)
-        (19, [
-            ("trainings", "participants", "ALTER TABLE trainings ADD COLUMN participants TEXT DEFAULT '[]'"),
-            ("trainings", "title", "ALTER TABLE trainings ADD COLUMN title TEXT NULL"),
-            ("trainings", "date", "ALTER TABLE trainings ADD COLUMN date TEXT NULL"),
-            ("trainings", "skills_improved", "ALTER TABLE trainings ADD COLUMN skills_improved TEXT NULL"),
-            ("trainings", "skill_increase", "ALTER TABLE trainings ADD COLUMN skill_increase INTEGER DEFAULT 5"),
-        ]),
+        -- Migrate place to location
+        UPDATE timesheets SET location = place WHERE location IS NULL AND place IS NOT NULL AND place != '';
         
-        # v20: Crew Control System - team member profiles and capacity tracking
-        (20, [
-            """
-            CREATE TABLE IF NOT EXISTS team_member_profile (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL UNIQUE,
-                skills TEXT DEFAULT '[]',
-                certifications TEXT DEFAULT '[]',
-                weekly_capacity_hours REAL DEFAULT 40.0,
-                preferred_work_types TEXT DEFAULT '[]',
-                performance_stability_score REAL DEFAULT 0.5,
-                ai_balance_score REAL DEFAULT 0.5,
-                burnout_risk_level TEXT DEFAULT 'normal',
-                total_jobs_completed INTEGER DEFAULT 0,
-                current_active_jobs INTEGER DEFAULT 0,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                updated_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-            );
-            CREATE INDEX IF NOT EXISTS idx_team_profile_employee ON team_member_profile(employee_id);
-            CREATE INDEX IF NOT EXISTS idx_team_profile_burnout ON team_member_profile(burnout_risk_level);
-            
-            CREATE TABLE IF NOT EXISTS team_capacity_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                planned_hours REAL DEFAULT 0,
-                actual_hours REAL DEFAULT 0,
-                capacity_status TEXT DEFAULT 'normal',
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-            );
-            CREATE INDEX IF NOT EXISTS idx_capacity_log_employee_date ON team_capacity_log(employee_id, date);
-            CREATE INDEX IF NOT EXISTS idx_capacity_log_date ON team_capacity_log(date);
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_capacity_log_unique ON team_capacity_log(employee_id, date);
-            """,
-        ]),
-
-        # v21: standardize task statuses - 'open' → 'todo'
-        (21, [
-            """
-            UPDATE tasks SET status = 'todo' WHERE status = 'open';
-            """,
-        ]),
-
-        # v22: add priority column to tasks table
-        (22, [
-            ("tasks", "priority", "ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT 'medium'"),
-        ]),
-
-        # v23: Day planning - přiřazení zaměstnanců na zakázky s plánovanými/skutečnými hodinami
-        (23, [
-            """
-            CREATE TABLE IF NOT EXISTS day_plans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                employee_id INTEGER NOT NULL,
-                job_id INTEGER,
-                planned_hours REAL DEFAULT 8.0,
-                actual_hours REAL,
-                status TEXT DEFAULT 'planned',
-                note TEXT DEFAULT '',
-                created_at TEXT DEFAULT (datetime('now')),
-                confirmed_at TEXT,
-                FOREIGN KEY (employee_id) REFERENCES employees(id),
-                FOREIGN KEY (job_id) REFERENCES jobs(id)
-            );
-            CREATE INDEX IF NOT EXISTS idx_day_plans_date ON day_plans(date);
-            CREATE INDEX IF NOT EXISTS idx_day_plans_emp_date ON day_plans(employee_id, date);
-            """,
-        ]),
-        (24, [
-            """
-            CREATE TABLE IF NOT EXISTS parties (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL DEFAULT 'ORG',
-                display_name TEXT NOT NULL,
-                legal_name TEXT,
-                email TEXT,
-                phone TEXT,
-                website TEXT,
-                street TEXT,
-                city TEXT,
-                zip TEXT,
-                country TEXT DEFAULT 'CZ',
-                gps_lat REAL,
-                gps_lon REAL,
-                ico TEXT,
-                dic TEXT,
-                bank_account TEXT,
-                roles TEXT DEFAULT '["CLIENT"]',
-                tier TEXT DEFAULT 'ONE_OFF',
-                status TEXT DEFAULT 'LEAD',
-                health_index INTEGER DEFAULT 50,
-                total_revenue REAL DEFAULT 0,
-                total_jobs INTEGER DEFAULT 0,
-                last_job_date TEXT,
-                payment_reliability INTEGER DEFAULT 50,
-                tags TEXT DEFAULT '[]',
-                note TEXT,
-                source TEXT,
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE TABLE IF NOT EXISTS party_contacts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                party_id INTEGER NOT NULL REFERENCES parties(id) ON DELETE CASCADE,
-                name TEXT NOT NULL,
-                role TEXT,
-                email TEXT,
-                phone TEXT,
-                is_primary INTEGER DEFAULT 0,
-                note TEXT,
-                created_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE TABLE IF NOT EXISTS party_interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                party_id INTEGER NOT NULL REFERENCES parties(id) ON DELETE CASCADE,
-                type TEXT NOT NULL,
-                summary TEXT,
-                date TEXT DEFAULT (date('now')),
-                created_by TEXT,
-                created_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE INDEX IF NOT EXISTS idx_parties_status ON parties(status);
-            CREATE INDEX IF NOT EXISTS idx_parties_tier ON parties(tier);
-            CREATE INDEX IF NOT EXISTS idx_party_contacts_party ON party_contacts(party_id);
-            CREATE INDEX IF NOT EXISTS idx_party_interactions_party ON party_interactions(party_id);
-            """,
-            ("jobs", "party_id", "ALTER TABLE jobs ADD COLUMN party_id INTEGER REFERENCES parties(id)"),
-        ]),
-        (25, [
-            ("tasks", "created_by", "ALTER TABLE tasks ADD COLUMN created_by TEXT"),
-            ("tasks", "priority", "ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT 'normal'"),
-            ("tasks", "deadline", "ALTER TABLE tasks ADD COLUMN deadline TEXT"),
-            ("jobs", "tags", "ALTER TABLE jobs ADD COLUMN tags TEXT DEFAULT '[]'"),
-            ("jobs", "deadline", "ALTER TABLE jobs ADD COLUMN deadline TEXT"),
-        ]),
-        # v26: notes table (sekce Poznámky)
-        (26, [
-            """
-            CREATE TABLE IF NOT EXISTS notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT,
-                    content TEXT NOT NULL,
-                    category TEXT DEFAULT 'general',
-                    color TEXT DEFAULT 'default',
-                    is_pinned INTEGER DEFAULT 0,
-                    job_id INTEGER REFERENCES jobs(id) ON DELETE SET NULL,
-                    employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
-                    party_id INTEGER REFERENCES parties(id) ON DELETE SET NULL,
-                    created_by INTEGER REFERENCES users(id),
-                    created_at TEXT DEFAULT (datetime('now')),
-                    updated_at TEXT DEFAULT (datetime('now'))
-                );
-                CREATE INDEX IF NOT EXISTS idx_notes_job ON notes(job_id);
-                CREATE INDEX IF NOT EXISTS idx_notes_employee ON notes(employee_id);
-                CREATE INDEX IF NOT EXISTS idx_notes_party ON notes(party_id);
-                CREATE INDEX IF NOT EXISTS idx_notes_created_by ON notes(created_by);
-                CREATE INDEX IF NOT EXISTS idx_notes_category ON notes(category);
-                CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned);
-            """,
-        ]),
-        # v27: notes table — oprava schématu (replace stará notes s jinou strukturou)
-        (27, [
-            """
-            DROP TABLE IF EXISTS notes;
-            CREATE TABLE notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                content TEXT NOT NULL,
-                category TEXT DEFAULT 'general',
-                color TEXT DEFAULT 'default',
-                is_pinned INTEGER DEFAULT 0,
-                job_id INTEGER REFERENCES jobs(id) ON DELETE SET NULL,
-                employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
-                party_id INTEGER REFERENCES parties(id) ON DELETE SET NULL,
-                created_by INTEGER REFERENCES users(id),
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            );
-            CREATE INDEX IF NOT EXISTS idx_notes_job ON notes(job_id);
-            CREATE INDEX IF NOT EXISTS idx_notes_employee ON notes(employee_id);
-            CREATE INDEX IF NOT EXISTS idx_notes_party ON notes(party_id);
-            CREATE INDEX IF NOT EXISTS idx_notes_created_by ON notes(created_by);
-            CREATE INDEX IF NOT EXISTS idx_notes_category ON notes(category);
-            CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned);
-            """,
-        ]),
-        # v28: budget_sections + budget_items (rozpočet zakázky) — DEPRECATED, v29 replaces
-        (28, []),
-        # v29: budget v3 — section_type na sekci, žádný item_type na položce
-        (29, [
-            "DROP TABLE IF EXISTS budget_items",
-            "DROP TABLE IF EXISTS budget_sections",
-            """CREATE TABLE IF NOT EXISTS budget_sections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                section_type TEXT NOT NULL DEFAULT 'material',
-                sort_order INTEGER DEFAULT 0,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
-            )""",
-            "CREATE INDEX IF NOT EXISTS idx_budget_sections_job ON budget_sections(job_id)",
-            """CREATE TABLE IF NOT EXISTS budget_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                section_id INTEGER NOT NULL,
-                description TEXT NOT NULL,
-                unit TEXT DEFAULT 'ks',
-                quantity REAL DEFAULT 0,
-                unit_price REAL DEFAULT 0,
-                sort_order INTEGER DEFAULT 0,
-                note TEXT,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY (section_id) REFERENCES budget_sections(id) ON DELETE CASCADE
-            )""",
-            "CREATE INDEX IF NOT EXISTS idx_budget_items_section ON budget_items(section_id)"
-        ]),
-
-        # v30: job_type (interní vs. klientská zakázka)
-        (30, [
-            ("jobs", "job_type", "ALTER TABLE jobs ADD COLUMN job_type TEXT DEFAULT 'client'"),
-        ]),
-
-        # v31: job detail extended tables (from migrate_jobs_extended.py)
-        (31, [
-            """CREATE TABLE IF NOT EXISTS job_clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                name TEXT NOT NULL,
-                company TEXT, ico TEXT, dic TEXT,
-                email TEXT, phone TEXT, phone_secondary TEXT,
-                preferred_contact TEXT DEFAULT 'phone',
-                billing_street TEXT, billing_city TEXT, billing_zip TEXT,
-                billing_country TEXT DEFAULT 'CZ',
-                client_since DATE, total_projects INTEGER DEFAULT 1,
-                total_revenue DECIMAL(12,2) DEFAULT 0,
-                payment_rating TEXT DEFAULT 'good', notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(job_id)
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_locations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                street TEXT, city TEXT, zip TEXT,
-                country TEXT DEFAULT 'CZ',
-                lat DECIMAL(10,6), lng DECIMAL(10,6),
-                parking TEXT, parking_notes TEXT, access_notes TEXT,
-                gate_code TEXT, key_location TEXT,
-                has_electricity BOOLEAN DEFAULT false,
-                has_water BOOLEAN DEFAULT false,
-                has_toilet BOOLEAN DEFAULT false,
-                neighbors_info TEXT, noise_restrictions TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(job_id)
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_milestones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                name TEXT NOT NULL, description TEXT,
-                planned_date DATE, actual_date DATE,
-                status TEXT DEFAULT 'pending',
-                completion_percent INTEGER DEFAULT 0,
-                order_num INTEGER DEFAULT 0,
-                depends_on INTEGER REFERENCES job_milestones(id),
-                reminder_days_before INTEGER DEFAULT 3,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_equipment (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                name TEXT NOT NULL, type TEXT,
-                days_needed INTEGER, date_from DATE, date_to DATE,
-                cost_per_day DECIMAL(10,2), total_cost DECIMAL(10,2),
-                supplier TEXT, supplier_contact TEXT,
-                reservation_date DATE, reservation_confirmed BOOLEAN DEFAULT false,
-                status TEXT DEFAULT 'needed', owned BOOLEAN DEFAULT false,
-                notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_team_assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                employee_id INTEGER NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
-                role TEXT DEFAULT 'worker',
-                hours_planned INTEGER DEFAULT 0, hours_actual INTEGER DEFAULT 0,
-                availability TEXT DEFAULT 'full-time',
-                assigned_date DATE DEFAULT (date('now')),
-                removed_date DATE, is_active BOOLEAN DEFAULT true, notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(job_id, employee_id, assigned_date)
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_subcontractors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                name TEXT NOT NULL, company TEXT, service TEXT NOT NULL,
-                contact_person TEXT, phone TEXT, email TEXT,
-                price DECIMAL(10,2), payment_terms TEXT,
-                status TEXT DEFAULT 'requested',
-                start_date DATE, end_date DATE,
-                contract_signed BOOLEAN DEFAULT false, invoice_number TEXT,
-                notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_risks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                description TEXT NOT NULL, category TEXT,
-                probability TEXT DEFAULT 'medium', impact TEXT DEFAULT 'medium',
-                risk_score INTEGER, mitigation_plan TEXT, contingency_plan TEXT,
-                status TEXT DEFAULT 'identified',
-                owner_id INTEGER REFERENCES users(id),
-                identified_date DATE DEFAULT (date('now')),
-                review_date DATE, closed_date DATE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                planned_date DATE, amount DECIMAL(12,2) NOT NULL,
-                percentage INTEGER, payment_type TEXT DEFAULT 'progress',
-                status TEXT DEFAULT 'pending',
-                paid_date DATE, paid_amount DECIMAL(12,2),
-                payment_method TEXT, invoice_id TEXT,
-                invoice_date DATE, invoice_due_date DATE, note TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_photos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                file_path TEXT NOT NULL, thumbnail_path TEXT,
-                phase TEXT DEFAULT 'progress',
-                milestone_id INTEGER REFERENCES job_milestones(id),
-                caption TEXT, description TEXT,
-                taken_by INTEGER REFERENCES users(id),
-                taken_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                location_on_site TEXT,
-                lat DECIMAL(10,6), lng DECIMAL(10,6),
-                related_issue_id INTEGER, severity TEXT, tags TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_communications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                communication_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                type TEXT DEFAULT 'note', direction TEXT DEFAULT 'internal',
-                subject TEXT, summary TEXT NOT NULL, full_content TEXT,
-                by_user_id INTEGER REFERENCES users(id),
-                with_client BOOLEAN DEFAULT true, participants TEXT,
-                outcome TEXT, action_items TEXT,
-                is_internal BOOLEAN DEFAULT false, attachments TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_change_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                requested_by TEXT DEFAULT 'client', requested_by_name TEXT,
-                description TEXT NOT NULL, reason TEXT,
-                impact_cost DECIMAL(10,2), impact_time INTEGER, impact_scope TEXT,
-                urgency TEXT DEFAULT 'medium', status TEXT DEFAULT 'pending',
-                approved_by INTEGER REFERENCES users(id),
-                approved_date DATE, rejection_reason TEXT,
-                implemented_date DATE, implementation_notes TEXT,
-                requested_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_documents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                name TEXT NOT NULL, type TEXT DEFAULT 'other', category TEXT,
-                file_path TEXT NOT NULL, file_size INTEGER, mime_type TEXT,
-                version INTEGER DEFAULT 1, is_latest BOOLEAN DEFAULT true,
-                replaces_document_id INTEGER REFERENCES job_documents(id),
-                description TEXT, uploaded_by INTEGER REFERENCES users(id),
-                uploaded_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                signed BOOLEAN DEFAULT false, signed_date DATE,
-                approval_status TEXT DEFAULT 'pending', approval_date DATE,
-                expires_date DATE, tags TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS job_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-                calculated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                days_elapsed INTEGER, days_remaining INTEGER, days_planned INTEGER,
-                schedule_variance INTEGER,
-                budget_spent DECIMAL(12,2), budget_remaining DECIMAL(12,2),
-                budget_variance DECIMAL(12,2), cost_performance_index DECIMAL(5,2),
-                completion_percent INTEGER, on_track BOOLEAN,
-                avg_hours_per_day DECIMAL(5,2), productive_hours_percent INTEGER,
-                defects_count INTEGER DEFAULT 0, rework_hours INTEGER DEFAULT 0,
-                predicted_completion_date DATE,
-                predicted_final_cost DECIMAL(12,2), predicted_profit DECIMAL(12,2),
-                confidence_level TEXT
-            )"""
-        ]),
-
-        # v32: employees.position column (missing on production)
-        (32, [
-            ("employees", "position", "ALTER TABLE employees ADD COLUMN position TEXT DEFAULT ''"),
-        ]),
-        # v33: fix missing columns — tasks.updated_at + notes table rebuild
-        (33, [
-            # Tasks: add updated_at column
-            ("tasks", "updated_at", "ALTER TABLE tasks ADD COLUMN updated_at TEXT DEFAULT (datetime('now'))"),
-            # Notes: drop and recreate with correct schema (no user data to lose — notes never worked)
-            """
-            DROP TABLE IF EXISTS notes;
-            CREATE TABLE notes (
+        -- Migrate activity to note
+        UPDATE timesheets SET note = activity WHERE note IS NULL AND activity IS NOT NULL AND activity != '';
+        
+        -- Create indexes for performance
+        CREATE INDEX IF NOT EXISTS idx_timesheets_user_date ON timesheets(user_id, date);
+        CREATE INDEX IF NOT EXISTS idx_timesheets_job_date ON timesheets(job_id, date);
+        CREATE INDEX IF NOT EXISTS idx_timesheets_task ON timesheets(task_id);
+        CREATE INDEX IF NOT EXISTS idx_timesheets_employee_date ON timesheets(employee_id, date);
+        """,
+    ]),
+
+    # v14: timesheets delay_note (doplněk k delay_reason)
+    (14, [
+        ("timesheets", "delay_note", "ALTER TABLE timesheets ADD COLUMN delay_note TEXT NULL"),
+    ]),
+
+    # v15: trainings module (školení a vzdělávání)
+    (15, [
+        """
+        CREATE TABLE IF NOT EXISTS trainings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            training_type TEXT DEFAULT 'external',
+            category TEXT,
+            provider TEXT,
+            provider_type TEXT,
+            date_start TEXT NOT NULL,
+            date_end TEXT,
+            duration_hours REAL,
+            is_paid INTEGER DEFAULT 1,
+            cost_training REAL DEFAULT 0,
+            cost_travel REAL DEFAULT 0,
+            cost_accommodation REAL DEFAULT 0,
+            cost_meals REAL DEFAULT 0,
+            cost_other REAL DEFAULT 0,
+            cost_total REAL DEFAULT 0,
+            cost_opportunity REAL DEFAULT 0,
+            location TEXT,
+            is_remote INTEGER DEFAULT 0,
+            has_certificate INTEGER DEFAULT 0,
+            certificate_name TEXT,
+            certificate_valid_until TEXT,
+            rating INTEGER,
+            notes TEXT,
+            skills_gained TEXT,
+            skill_level_increase INTEGER DEFAULT 1,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            created_by INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS training_attendees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            training_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'registered',
+            attendance_confirmed INTEGER DEFAULT 0,
+            test_score REAL,
+            certificate_issued INTEGER DEFAULT 0,
+            certificate_url TEXT,
+            personal_rating INTEGER,
+            personal_notes TEXT,
+            FOREIGN KEY (training_id) REFERENCES trainings(id) ON DELETE CASCADE,
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_trainings_date ON trainings(date_start);
+        CREATE INDEX IF NOT EXISTS idx_trainings_category ON trainings(category);
+        CREATE INDEX IF NOT EXISTS idx_training_attendees_employee ON training_attendees(employee_id);
+        CREATE INDEX IF NOT EXISTS idx_training_attendees_training ON training_attendees(training_id);
+        """,
+    ]),
+
+    # v16: employees skills tracking
+    (16, [
+        ("employees", "skills", "ALTER TABLE employees ADD COLUMN skills TEXT NULL"),
+        ("employees", "skill_score", "ALTER TABLE employees ADD COLUMN skill_score REAL DEFAULT 50"),
+        ("employees", "training_hours_total", "ALTER TABLE employees ADD COLUMN training_hours_total REAL DEFAULT 0"),
+        ("employees", "last_training_date", "ALTER TABLE employees ADD COLUMN last_training_date TEXT NULL"),
+    ]),
+
+    # v17: training compensation type (typ proplácení školení)
+    (17, [
+        ("trainings", "compensation_type", "ALTER TABLE trainings ADD COLUMN compensation_type TEXT DEFAULT 'paid_workday'"),
+        ("trainings", "wage_cost", "ALTER TABLE trainings ADD COLUMN wage_cost REAL DEFAULT 0"),
+        ("trainings", "wage_cost_per_person", "ALTER TABLE trainings ADD COLUMN wage_cost_per_person REAL NULL"),
+    ]),
+
+    # v18: worklogs training_id (propojení výkazů se školením)
+    (18, [
+        ("timesheets", "training_id", "ALTER TABLE timesheets ADD COLUMN training_id INTEGER NULL"),
+        ("timesheets", "fk_timesheets_training", """
+            CREATE INDEX IF NOT EXISTS idx_timesheets_training ON timesheets(training_id)
+        """),
+    ]),
+    
+    # v19: trainings participants field (účastníci jako JSON)
+    (19, [
+        ("trainings", "participants", "ALTER TABLE trainings ADD COLUMN participants TEXT DEFAULT '[]'"),
+        ("trainings", "title", "ALTER TABLE trainings ADD COLUMN title TEXT NULL"),
+        ("trainings", "date", "ALTER TABLE trainings ADD COLUMN date TEXT NULL"),
+        ("trainings", "skills_improved", "ALTER TABLE trainings ADD COLUMN skills_improved TEXT NULL"),
+        ("trainings", "skill_increase", "ALTER TABLE trainings ADD COLUMN skill_increase INTEGER DEFAULT 5"),
+    ]),
+    
+    # v20: Crew Control System - team member profiles and capacity tracking
+    (20, [
+        """
+        CREATE TABLE IF NOT EXISTS team_member_profile (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL UNIQUE,
+            skills TEXT DEFAULT '[]',
+            certifications TEXT DEFAULT '[]',
+            weekly_capacity_hours REAL DEFAULT 40.0,
+            preferred_work_types TEXT DEFAULT '[]',
+            performance_stability_score REAL DEFAULT 0.5,
+            ai_balance_score REAL DEFAULT 0.5,
+            burnout_risk_level TEXT DEFAULT 'normal',
+            total_jobs_completed INTEGER DEFAULT 0,
+            current_active_jobs INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_team_profile_employee ON team_member_profile(employee_id);
+        CREATE INDEX IF NOT EXISTS idx_team_profile_burnout ON team_member_profile(burnout_risk_level);
+        
+        CREATE TABLE IF NOT EXISTS team_capacity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            planned_hours REAL DEFAULT 0,
+            actual_hours REAL DEFAULT 0,
+            capacity_status TEXT DEFAULT 'normal',
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_capacity_log_employee_date ON team_capacity_log(employee_id, date);
+        CREATE INDEX IF NOT EXISTS idx_capacity_log_date ON team_capacity_log(date);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_capacity_log_unique ON team_capacity_log(employee_id, date);
+        """,
+    ]),
+
+    # v21: standardize task statuses - 'open' → 'todo'
+    (21, [
+        """
+        UPDATE tasks SET status = 'todo' WHERE status = 'open';
+        """,
+    ]),
+
+    # v22: add priority column to tasks table
+    (22, [
+        ("tasks", "priority", "ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT 'medium'"),
+    ]),
+
+    # v23: Day planning - přiřazení zaměstnanců na zakázky s plánovanými/skutečnými hodinami
+    (23, [
+        """
+        CREATE TABLE IF NOT EXISTS day_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            employee_id INTEGER NOT NULL,
+            job_id INTEGER,
+            planned_hours REAL DEFAULT 8.0,
+            actual_hours REAL,
+            status TEXT DEFAULT 'planned',
+            note TEXT DEFAULT '',
+            created_at TEXT DEFAULT (datetime('now')),
+            confirmed_at TEXT,
+            FOREIGN KEY (employee_id) REFERENCES employees(id),
+            FOREIGN KEY (job_id) REFERENCES jobs(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_day_plans_date ON day_plans(date);
+        CREATE INDEX IF NOT EXISTS idx_day_plans_emp_date ON day_plans(employee_id, date);
+        """,
+    ]),
+    (24, [
+        """
+        CREATE TABLE IF NOT EXISTS parties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL DEFAULT 'ORG',
+            display_name TEXT NOT NULL,
+            legal_name TEXT,
+            email TEXT,
+            phone TEXT,
+            website TEXT,
+            street TEXT,
+            city TEXT,
+            zip TEXT,
+            country TEXT DEFAULT 'CZ',
+            gps_lat REAL,
+            gps_lon REAL,
+            ico TEXT,
+            dic TEXT,
+            bank_account TEXT,
+            roles TEXT DEFAULT '["CLIENT"]',
+            tier TEXT DEFAULT 'ONE_OFF',
+            status TEXT DEFAULT 'LEAD',
+            health_index INTEGER DEFAULT 50,
+            total_revenue REAL DEFAULT 0,
+            total_jobs INTEGER DEFAULT 0,
+            last_job_date TEXT,
+            payment_reliability INTEGER DEFAULT 50,
+            tags TEXT DEFAULT '[]',
+            note TEXT,
+            source TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE TABLE IF NOT EXISTS party_contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            party_id INTEGER NOT NULL REFERENCES parties(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            role TEXT,
+            email TEXT,
+            phone TEXT,
+            is_primary INTEGER DEFAULT 0,
+            note TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE TABLE IF NOT EXISTS party_interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            party_id INTEGER NOT NULL REFERENCES parties(id) ON DELETE CASCADE,
+            type TEXT NOT NULL,
+            summary TEXT,
+            date TEXT DEFAULT (date('now')),
+            created_by TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_parties_status ON parties(status);
+        CREATE INDEX IF NOT EXISTS idx_parties_tier ON parties(tier);
+        CREATE INDEX IF NOT EXISTS idx_party_contacts_party ON party_contacts(party_id);
+        CREATE INDEX IF NOT EXISTS idx_party_interactions_party ON party_interactions(party_id);
+        """,
+        ("jobs", "party_id", "ALTER TABLE jobs ADD COLUMN party_id INTEGER REFERENCES parties(id)"),
+    ]),
+    (25, [
+        ("tasks", "created_by", "ALTER TABLE tasks ADD COLUMN created_by TEXT"),
+        ("tasks", "priority", "ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT 'normal'"),
+        ("tasks", "deadline", "ALTER TABLE tasks ADD COLUMN deadline TEXT"),
+        ("jobs", "tags", "ALTER TABLE jobs ADD COLUMN tags TEXT DEFAULT '[]'"),
+        ("jobs", "deadline", "ALTER TABLE jobs ADD COLUMN deadline TEXT"),
+    ]),
+    # v26: notes table (sekce Poznámky)
+    (26, [
+        """
+        CREATE TABLE IF NOT EXISTS notes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT,
                 content TEXT NOT NULL,
@@ -774,33 +495,312 @@ def apply_migrations():
             CREATE INDEX IF NOT EXISTS idx_notes_created_by ON notes(created_by);
             CREATE INDEX IF NOT EXISTS idx_notes_category ON notes(category);
             CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned);
-            """,
-        ]),
-    ]
-
-    for version, alters in migrations:
-        if version in applied:
+        """,
+    ]),
+    # v27: notes table — oprava schématu (replace stará notes s jinou strukturou)
+    (27, [
+        """
+        DROP TABLE IF EXISTS notes;
+        CREATE TABLE notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            content TEXT NOT NULL,
+            category TEXT DEFAULT 'general',
+            color TEXT DEFAULT 'default',
+            is_pinned INTEGER DEFAULT 0,
+            job_id INTEGER REFERENCES jobs(id) ON DELETE SET NULL,
+            employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
+            party_id INTEGER REFERENCES parties(id) ON DELETE SET NULL,
+            created_by INTEGER REFERENCES users(id),
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_notes_job ON notes(job_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_employee ON notes(employee_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_party ON notes(party_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_created_by ON notes(created_by);
+        CREATE INDEX IF NOT EXISTS idx_notes_category ON notes(category);
+        CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned);
+        """,
+    ]),
+    # v28: budget_sections + budget_items (rozpočet zakázky) — DEPRECATED, v29 replaces
+    (28, []),
+    # v29: budget v3 — section_type na sekci, žádný item_type na položce
+    (29, [
+        "DROP TABLE IF EXISTS budget_items",
+        "DROP TABLE IF EXISTS budget_sections",
+        """CREATE TABLE IF NOT EXISTS budget_sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            section_type TEXT NOT NULL DEFAULT 'material',
+            sort_order INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_budget_sections_job ON budget_sections(job_id)",
+        """CREATE TABLE IF NOT EXISTS budget_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            unit TEXT DEFAULT 'ks',
+            quantity REAL DEFAULT 0,
+            unit_price REAL DEFAULT 0,
+            sort_order INTEGER DEFAULT 0,
+            note TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (section_id) REFERENCES budget_sections(id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_budget_items_section ON budget_items(section_id)"
+    ]),
+
+    # v30: job_type (interní vs. klientská zakázka)
+    (30, [
+        ("jobs", "job_type", "ALTER TABLE jobs ADD COLUMN job_type TEXT DEFAULT 'client'"),
+    ]),
+
+    # v31: job detail extended tables (from migrate_jobs_extended.py)
+    (31, [
+        """CREATE TABLE IF NOT EXISTS job_clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            company TEXT, ico TEXT, dic TEXT,
+            email TEXT, phone TEXT, phone_secondary TEXT,
+            preferred_contact TEXT DEFAULT 'phone',
+            billing_street TEXT, billing_city TEXT, billing_zip TEXT,
+            billing_country TEXT DEFAULT 'CZ',
+            client_since DATE, total_projects INTEGER DEFAULT 1,
+            total_revenue DECIMAL(12,2) DEFAULT 0,
+            payment_rating TEXT DEFAULT 'good', notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(job_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            street TEXT, city TEXT, zip TEXT,
+            country TEXT DEFAULT 'CZ',
+            lat DECIMAL(10,6), lng DECIMAL(10,6),
+            parking TEXT, parking_notes TEXT, access_notes TEXT,
+            gate_code TEXT, key_location TEXT,
+            has_electricity BOOLEAN DEFAULT false,
+            has_water BOOLEAN DEFAULT false,
+            has_toilet BOOLEAN DEFAULT false,
+            neighbors_info TEXT, noise_restrictions TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(job_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_milestones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL, description TEXT,
+            planned_date DATE, actual_date DATE,
+            status TEXT DEFAULT 'pending',
+            completion_percent INTEGER DEFAULT 0,
+            order_num INTEGER DEFAULT 0,
+            depends_on INTEGER REFERENCES job_milestones(id),
+            reminder_days_before INTEGER DEFAULT 3,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_equipment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL, type TEXT,
+            days_needed INTEGER, date_from DATE, date_to DATE,
+            cost_per_day DECIMAL(10,2), total_cost DECIMAL(10,2),
+            supplier TEXT, supplier_contact TEXT,
+            reservation_date DATE, reservation_confirmed BOOLEAN DEFAULT false,
+            status TEXT DEFAULT 'needed', owned BOOLEAN DEFAULT false,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_team_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            employee_id INTEGER NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+            role TEXT DEFAULT 'worker',
+            hours_planned INTEGER DEFAULT 0, hours_actual INTEGER DEFAULT 0,
+            availability TEXT DEFAULT 'full-time',
+            assigned_date DATE DEFAULT (date('now')),
+            removed_date DATE, is_active BOOLEAN DEFAULT true, notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(job_id, employee_id, assigned_date)
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_subcontractors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL, company TEXT, service TEXT NOT NULL,
+            contact_person TEXT, phone TEXT, email TEXT,
+            price DECIMAL(10,2), payment_terms TEXT,
+            status TEXT DEFAULT 'requested',
+            start_date DATE, end_date DATE,
+            contract_signed BOOLEAN DEFAULT false, invoice_number TEXT,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_risks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            description TEXT NOT NULL, category TEXT,
+            probability TEXT DEFAULT 'medium', impact TEXT DEFAULT 'medium',
+            risk_score INTEGER, mitigation_plan TEXT, contingency_plan TEXT,
+            status TEXT DEFAULT 'identified',
+            owner_id INTEGER REFERENCES users(id),
+            identified_date DATE DEFAULT (date('now')),
+            review_date DATE, closed_date DATE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            planned_date DATE, amount DECIMAL(12,2) NOT NULL,
+            percentage INTEGER, payment_type TEXT DEFAULT 'progress',
+            status TEXT DEFAULT 'pending',
+            paid_date DATE, paid_amount DECIMAL(12,2),
+            payment_method TEXT, invoice_id TEXT,
+            invoice_date DATE, invoice_due_date DATE, note TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_photos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            file_path TEXT NOT NULL, thumbnail_path TEXT,
+            phase TEXT DEFAULT 'progress',
+            milestone_id INTEGER REFERENCES job_milestones(id),
+            caption TEXT, description TEXT,
+            taken_by INTEGER REFERENCES users(id),
+            taken_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            location_on_site TEXT,
+            lat DECIMAL(10,6), lng DECIMAL(10,6),
+            related_issue_id INTEGER, severity TEXT, tags TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_communications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            communication_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            type TEXT DEFAULT 'note', direction TEXT DEFAULT 'internal',
+            subject TEXT, summary TEXT NOT NULL, full_content TEXT,
+            by_user_id INTEGER REFERENCES users(id),
+            with_client BOOLEAN DEFAULT true, participants TEXT,
+            outcome TEXT, action_items TEXT,
+            is_internal BOOLEAN DEFAULT false, attachments TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_change_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            requested_by TEXT DEFAULT 'client', requested_by_name TEXT,
+            description TEXT NOT NULL, reason TEXT,
+            impact_cost DECIMAL(10,2), impact_time INTEGER, impact_scope TEXT,
+            urgency TEXT DEFAULT 'medium', status TEXT DEFAULT 'pending',
+            approved_by INTEGER REFERENCES users(id),
+            approved_date DATE, rejection_reason TEXT,
+            implemented_date DATE, implementation_notes TEXT,
+            requested_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL, type TEXT DEFAULT 'other', category TEXT,
+            file_path TEXT NOT NULL, file_size INTEGER, mime_type TEXT,
+            version INTEGER DEFAULT 1, is_latest BOOLEAN DEFAULT true,
+            replaces_document_id INTEGER REFERENCES job_documents(id),
+            description TEXT, uploaded_by INTEGER REFERENCES users(id),
+            uploaded_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            signed BOOLEAN DEFAULT false, signed_date DATE,
+            approval_status TEXT DEFAULT 'pending', approval_date DATE,
+            expires_date DATE, tags TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS job_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+            calculated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            days_elapsed INTEGER, days_remaining INTEGER, days_planned INTEGER,
+            schedule_variance INTEGER,
+            budget_spent DECIMAL(12,2), budget_remaining DECIMAL(12,2),
+            budget_variance DECIMAL(12,2), cost_performance_index DECIMAL(5,2),
+            completion_percent INTEGER, on_track BOOLEAN,
+            avg_hours_per_day DECIMAL(5,2), productive_hours_percent INTEGER,
+            defects_count INTEGER DEFAULT 0, rework_hours INTEGER DEFAULT 0,
+            predicted_completion_date DATE,
+            predicted_final_cost DECIMAL(12,2), predicted_profit DECIMAL(12,2),
+            confidence_level TEXT
+        )"""
+    ]),
+
+    # v32: employees.position column (missing on production)
+    (32, [
+        ("employees", "position", "ALTER TABLE employees ADD COLUMN position TEXT DEFAULT ''"),
+    ]),
+    # v33: fix missing columns — tasks.updated_at + notes table rebuild
+    (33, [
+        # Tasks: add updated_at column
+        ("tasks", "updated_at", "ALTER TABLE tasks ADD COLUMN updated_at TEXT DEFAULT (datetime('now'))"),
+        # Notes: drop and recreate with correct schema (no user data to lose — notes never worked)
+        """
+        DROP TABLE IF EXISTS notes;
+        CREATE TABLE notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            content TEXT NOT NULL,
+            category TEXT DEFAULT 'general',
+            color TEXT DEFAULT 'default',
+            is_pinned INTEGER DEFAULT 0,
+            job_id INTEGER REFERENCES jobs(id) ON DELETE SET NULL,
+            employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
+            party_id INTEGER REFERENCES parties(id) ON DELETE SET NULL,
+            created_by INTEGER REFERENCES users(id),
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_notes_job ON notes(job_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_employee ON notes(employee_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_party ON notes(party_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_created_by ON notes(created_by);
+        CREATE INDEX IF NOT EXISTS idx_notes_category ON notes(category);
+        CREATE INDEX IF NOT EXISTS idx_notes_pinned ON notes(is_pinned);
+        """,
+    ]),
+]
+
+
+def apply_legacy_steps(db, steps):
+    """Apply one LEGACY_MIGRATIONS entry; every step is idempotent and never raises."""
+    for item in steps:
+        # Allow either (table, col, sql) ALTERs or raw DDL scripts as strings
+        if isinstance(item, str):
+            try:
+                db.executescript(item)
+            except Exception:
+                pass
             continue
-        for item in alters:
-            # Allow either (table, col, sql) ALTERs or raw DDL scripts as strings
-            if isinstance(item, str):
-                try:
-                    db.executescript(item)
-                except Exception:
-                    pass
-                continue
-            table, col, sql = item
-            # Skip ALTERs for tables that do not exist yet (fresh DB before ensure_schema).
-            if not _table_exists(db, table):
-                continue
-            if not _table_has_column(db, table, col):
-                try:
-                    db.execute(sql)
-                except Exception:
-                    # last-resort: ignore to avoid breaking startup
-                    pass
-        db.execute("INSERT OR IGNORE INTO schema_migrations(version) VALUES (?)", (version,))
-        db.commit()
+        table, col, sql = item
+        # Skip ALTERs for tables that do not exist yet (fresh DB before ensure_schema).
+        if not _table_exists(db, table):
+            continue
+        if not _table_has_column(db, table, col):
+            try:
+                db.execute(sql)
+            except Exception:
+                # last-resort: ignore to avoid breaking startup
+                pass
+    db.commit()
+
+
+def apply_migrations():
+    """Apply all pending registered migrations (see app.utils.migrator)."""
+    from app.utils.migrator import migrate
+    return migrate(get_db())
 
 
 def _migrate_completed_at():
@@ -987,7 +987,9 @@ def ensure_schema():
 
     CREATE TABLE IF NOT EXISTS schema_migrations (
         version INTEGER PRIMARY KEY,
-        applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        applied_at TEXT NOT NULL DEFAULT (datetime('now')),
+        name TEXT,
+        checksum TEXT
     );
 
     CREATE TABLE IF NOT EXISTS audit_log (
@@ -2181,182 +2183,89 @@ def _backfill_labor_costs():
         print(f"[DB] Backfill labor_cost warning: {e}")
 
 
-from app.database import get_db, _table_exists
-from app.utils.migrations import (
-    seed_admin, _auto_upgrade_admins_to_owner, seed_employees, seed_plant_catalog,
-    _migrate_completed_at, _migrate_employees_enhanced,
-    _migrate_roles_and_hierarchy, _migrate_crew_control_tables,
-    ensure_schema, apply_migrations
-)
+def iso_date_sql(col):
+    """SQL výraz převádějící YYYY-MM-DD[...] i D.M.YYYY na YYYY-MM-DD (jinak NULL)."""
+    rest = f"substr({col}, instr({col}, '.') + 1)"
+    return (
+        f"CASE WHEN {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr({col}, 1, 10) "
+        f"WHEN {col} GLOB '[0-9]*.[0-9]*.[0-9][0-9][0-9][0-9]*' THEN printf('%04d-%02d-%02d', "
+        f"CAST(substr({rest}, instr({rest}, '.') + 1, 4) AS INTEGER), "
+        f"CAST(substr({rest}, 1, instr({rest}, '.') - 1) AS INTEGER), "
+        f"CAST(substr({col}, 1, instr({col}, '.') - 1) AS INTEGER)) "
+        f"ELSE date({col}) END"
+    )
 
-# Startup initialization function from main.py
-def _ensure():
-    # Run schema checks / migrations once per process to avoid unnecessary locking
-    if not getattr(_ensure, "_schema_ready", False):
-        ensure_schema()
-        try:
-            apply_migrations()
-        except Exception as e:
-            # Never break the app startup/runtime on a migration helper issue
-            print(f"[DB] Migration failed: {e}")
-        # Emergency DB fix for missing columns (tasks.updated_at, notes table)
-        try:
-            from app.utils.db_fix import fix_database
-            fix_database()
-        except Exception as e:
-            print(f"[DB] db_fix failed: {e}")
-        # Legacy migrations (kept for backward compatibility with older app.db variants)
-        try:
-            _migrate_completed_at()
-            _migrate_employees_enhanced()
-            _migrate_roles_and_hierarchy()
-            _migrate_crew_control_tables()  # New: Crew Control System tables
-            _backfill_labor_costs()  # Propojení výkazů → finance (PRÁCE)
-        except Exception as e:
-            print(f"[DB] Migration warning: {e}")
-        _ensure._schema_ready = True
-    seed_admin()
-    _auto_upgrade_admins_to_owner()
-    seed_employees()
-    seed_plant_catalog()
 
-    """Create Crew Control System tables if they don't exist"""
+def _migrate_timesheets_date_iso():
+    """Kanonické ISO datum výkazů + stínový sloupec date_iso udržovaný triggery.
+
+    Rozsahové filtry (from/to, týdny, měsíce) jdou přes date_iso a indexy
+    (employee_id, date_iso) / (job_id, date_iso) místo date(t.date).
+    """
     db = get_db()
-    try:
-        tables_to_create = [
-            ("employee_skills", '''
-                CREATE TABLE IF NOT EXISTS employee_skills (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    skill_type TEXT NOT NULL,
-                    skill_name TEXT NOT NULL,
-                    level INTEGER DEFAULT 1,
-                    certified INTEGER DEFAULT 0,
-                    certified_date TEXT,
-                    certified_by TEXT,
-                    notes TEXT,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            '''),
-            ("employee_certifications", '''
-                CREATE TABLE IF NOT EXISTS employee_certifications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    cert_name TEXT NOT NULL,
-                    cert_type TEXT,
-                    issued_date TEXT,
-                    expiry_date TEXT,
-                    issuer TEXT,
-                    document_url TEXT,
-                    status TEXT DEFAULT 'active',
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            '''),
-            ("employee_preferences", '''
-                CREATE TABLE IF NOT EXISTS employee_preferences (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL UNIQUE,
-                    preferred_work_types TEXT,
-                    avoided_work_types TEXT,
-                    max_weekly_hours REAL DEFAULT 40,
-                    preferred_locations TEXT,
-                    travel_radius_km INTEGER DEFAULT 50,
-                    prefers_team_work INTEGER DEFAULT 1,
-                    prefers_solo_work INTEGER DEFAULT 0,
-                    notes TEXT,
-                    updated_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            '''),
-            ("employee_capacity", '''
-                CREATE TABLE IF NOT EXISTS employee_capacity (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    week_start TEXT NOT NULL,
-                    planned_hours REAL DEFAULT 40,
-                    assigned_hours REAL DEFAULT 0,
-                    actual_hours REAL DEFAULT 0,
-                    utilization_pct REAL DEFAULT 0,
-                    status TEXT DEFAULT 'available',
-                    notes TEXT,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
-                    UNIQUE(employee_id, week_start)
-                )
-            '''),
-            ("employee_performance", '''
-                CREATE TABLE IF NOT EXISTS employee_performance (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    period_start TEXT NOT NULL,
-                    period_end TEXT NOT NULL,
-                    total_hours REAL DEFAULT 0,
-                    completed_tasks INTEGER DEFAULT 0,
-                    on_time_rate REAL DEFAULT 100,
-                    quality_score REAL DEFAULT 0,
-                    efficiency_score REAL DEFAULT 0,
-                    reliability_score REAL DEFAULT 0,
-                    notes TEXT,
-                    calculated_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            '''),
-            ("employee_ai_scores", '''
-                CREATE TABLE IF NOT EXISTS employee_ai_scores (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    score_date TEXT NOT NULL,
-                    balance_score REAL DEFAULT 50,
-                    workload_score REAL DEFAULT 50,
-                    burnout_risk REAL DEFAULT 0,
-                    recommendation TEXT,
-                    factors TEXT,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            '''),
-            ("employee_availability", '''
-                CREATE TABLE IF NOT EXISTS employee_availability (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    employee_id INTEGER NOT NULL,
-                    date TEXT NOT NULL,
-                    availability_type TEXT NOT NULL,
-                    start_time TEXT,
-                    end_time TEXT,
-                    all_day INTEGER DEFAULT 1,
-                    notes TEXT,
-                    approved INTEGER DEFAULT 0,
-                    approved_by INTEGER,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                )
-            ''')
-        ]
-        for table_name, create_sql in tables_to_create:
-            if not _table_exists(db, table_name):
-                db.execute(create_sql)
-                db.commit()
-                print(f"[DB] Created table: {table_name}")
-        if _table_exists(db, "employees"):
-            cols = [r[1] for r in db.execute("PRAGMA table_info(employees)").fetchall()]
-            new_cols = {
-                "weekly_capacity": "REAL DEFAULT 40",
-                "current_workload": "REAL DEFAULT 0",
-                "ai_balance_score": "REAL DEFAULT 50",
-                "burnout_risk": "REAL DEFAULT 0",
-                "reliability_score": "REAL DEFAULT 0",
-                "specializations": "TEXT",
-                "availability_status": "TEXT DEFAULT 'available'",
-            }
-            for col_name, col_def in new_cols.items():
-                if col_name not in cols:
-                    try:
-                        db.execute(f"ALTER TABLE employees ADD COLUMN {col_name} {col_def}")
-                        db.commit()
-                        print(f"[DB] Added column: employees.{col_name}")
-                    except Exception as e:
-                        pass  # Column might already exist
-    except Exception as e:
-        print(f"[DB] Crew Control migration warning: {e}")
+    if not _table_exists(db, "timesheets"):
+        return
+    if not _table_has_column(db, "timesheets", "date_iso"):
+        db.execute("ALTER TABLE timesheets ADD COLUMN date_iso TEXT")
+
+    # Jednorázová normalizace: ISO hodnoty přímo v SQL, zbytek (např. 2024-1-5) přes _normalize_date
+    db.execute(f"UPDATE timesheets SET date = {iso_date_sql('date')} "
+               f"WHERE {iso_date_sql('date')} IS NOT NULL AND date != {iso_date_sql('date')}")
+    from app.utils.helpers import _normalize_date
+    for r in db.execute(f"SELECT id, date FROM timesheets WHERE date IS NOT NULL AND {iso_date_sql('date')} IS NULL").fetchall():
+        normalized = _normalize_date(r["date"])
+        if normalized and normalized != r["date"]:
+            db.execute("UPDATE timesheets SET date = ? WHERE id = ?", (normalized, r["id"]))
+    db.execute(f"UPDATE timesheets SET date_iso = {iso_date_sql('date')}")
+
+    iso = iso_date_sql("NEW.date")
+    db.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_timesheets_date_iso_insert
+        AFTER INSERT ON timesheets
+        BEGIN
+            UPDATE timesheets SET date_iso = {iso} WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_timesheets_date_iso_update
+        AFTER UPDATE OF date ON timesheets
+        BEGIN
+            UPDATE timesheets SET date_iso = {iso} WHERE id = NEW.id;
+        END;
+        CREATE INDEX IF NOT EXISTS idx_timesheets_employee_date_iso ON timesheets(employee_id, date_iso);
+        CREATE INDEX IF NOT EXISTS idx_timesheets_job_date_iso ON timesheets(job_id, date_iso);
+        CREATE INDEX IF NOT EXISTS idx_timesheets_date_iso ON timesheets(date_iso);
+    """)
+    db.commit()
+
+
+def _migrate_timesheets_date_canonical():
+    """Triggery výkazů převádějí na ISO i samotný sloupec date, ne jen stín date_iso.
+
+    Zápis ve formátu d.m.yyyy tak neuteče ani dotazům, které ještě filtrují
+    přes date. Nerozpoznaný formát zůstane beze změny (date_iso = NULL).
+    Vnořený UPDATE běží jen když date / date_iso ještě nejsou kanonické -
+    UPDATE z insert triggeru tak update trigger znovu nespustí.
+    """
+    db = get_db()
+    if not _table_exists(db, "timesheets") or not _table_has_column(db, "timesheets", "date_iso"):
+        return
+    iso = iso_date_sql("NEW.date")
+    stale = f"NEW.date_iso IS NOT {iso} OR NEW.date IS NOT COALESCE({iso}, NEW.date)"
+    db.executescript(f"""
+        DROP TRIGGER IF EXISTS trg_timesheets_date_iso_insert;
+        DROP TRIGGER IF EXISTS trg_timesheets_date_iso_update;
+        CREATE TRIGGER trg_timesheets_date_iso_insert
+        AFTER INSERT ON timesheets
+        WHEN {stale}
+        BEGIN
+            UPDATE timesheets SET date_iso = {iso}, date = COALESCE({iso}, NEW.date) WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER trg_timesheets_date_iso_update
+        AFTER UPDATE OF date ON timesheets
+        WHEN {stale}
+        BEGIN
+            UPDATE timesheets SET date_iso = {iso}, date = COALESCE({iso}, NEW.date) WHERE id = NEW.id;
+        END;
+    """)
+    # Řádky zapsané mezi v47 a touto migrací
+    db.execute("UPDATE timesheets SET date = date_iso WHERE date_iso IS NOT NULL AND date != date_iso")
+    db.commit()
@@ -0,0 +1,470 @@
+"""
+Versioned migration registry + startup bootstrap.
+
+Každá migrace má číslo verze, jméno a checksum. Ledger je tabulka
+schema_migrations (version, name, checksum, applied_at); aplikují se jen
+chybějící verze. "Repeatable" migrace (idempotentní baseline a opravné
+skripty) se spustí znovu, pouze když se změní jejich kód (checksum).
+
+Digest celého registru se ukládá do schema_version, takže studený start
+workeru stojí jediný dotaz. Workery se při migraci koordinují file lockem.
+
+CLI:
+  python -m app.utils.migrator            # aplikuj čekající migrace
+  python -m app.utils.migrator status     # vypiš stav ledgeru
+"""
+import hashlib
+import inspect
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (start_local.bat) - single process, lock not needed
+    fcntl = None
+
+from app.config import DATABASE as DB_PATH
+from app.database import _table_has_column, get_db, invalidate_schema_cache
+from app.utils import migrations as m
+from app.utils.db_fix import fix_database
+
+BOOTSTRAP_RETRY_SECONDS = int(os.environ.get("MIGRATION_RETRY_SECONDS", "60"))
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _checksum(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        if callable(part):
+            try:
+                part = inspect.getsource(part)
+            except (OSError, TypeError):
+                part = getattr(part, "__qualname__", repr(part))
+        h.update(str(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _migration(version, name, apply, *sources, repeatable=False, legacy_checksum=None):
+    """Záznam registru; checksum = zdrojový kód sources (funkce přes inspect.getsource).
+
+    legacy_checksum: text, ze kterého se checksum počítal dřív (ručně psaný
+    řetězec). Ledger s tímto checksumem se jen tiše přepíše na nový.
+    """
+    return {
+        "version": version,
+        "name": name,
+        "apply": apply,
+        "checksum": _checksum(*(sources or (apply,))),
+        "legacy_checksum": _checksum(legacy_checksum) if legacy_checksum else None,
+        "repeatable": repeatable,
+    }
+
+
+# ----------------- Migration steps -----------------
+
+def _legacy_step(steps):
+    return lambda db: m.apply_legacy_steps(db, steps)
+
+
+def _sql_file(relpath):
+    """Idempotentní SQL skript z repozitáře (jen CREATE ... IF NOT EXISTS)."""
+    path = os.path.join(_BASE_DIR, relpath)
+
+    def apply(db):
+        with open(path, "r", encoding="utf-8") as f:
+            db.executescript(f.read())
+        db.commit()
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+    except OSError:
+        source = relpath
+    return apply, source
+
+
+def _baseline_schema(db):
+    m.ensure_schema()
+
+
+def _db_fix(db):
+    fix_database()
+
+
+def _legacy_column_fixups(db):
+    m._migrate_completed_at()
+    m._migrate_employees_enhanced()
+    m._migrate_roles_and_hierarchy()
+    m._migrate_crew_control_tables()
+
+
+def _backfill_labor_costs(db):
+    m._backfill_labor_costs()
+
+
+def _warehouse_extended_tables(db):
+    import warehouse_extended
+    warehouse_extended.apply_warehouse_migrations()
+
+
+def _ai_operator_tables(db):
+    from ai_operator_migrations import apply_ai_operator_migrations
+    apply_ai_operator_migrations(db)
+
+
+def _scheduler_tables(db):
+    from ai_operator_migrations import apply_scheduler_migrations
+    apply_scheduler_migrations(db)
+
+
+def _change_feed_triggers(db):
+    from ai_operator_migrations import apply_change_feed_migrations
+    apply_change_feed_migrations(db)
+
+
+def _change_feed_retention(db):
+    from ai_operator_migrations import apply_change_feed_retention
+    apply_change_feed_retention(db)
+
+
+def _timesheets_date_iso(db):
+    m._migrate_timesheets_date_iso()
+
+
+def _timesheets_date_canonical(db):
+    m._migrate_timesheets_date_canonical()
+
+
+def _labor_rollups(db):
+    from app.utils import labor_rollup
+    labor_rollup.apply_labor_rollup_migrations(db)
+
+
+def _search_index(db):
+    from app.utils import search_index
+    search_index.apply_search_index_migrations(db)
+
+
+def _plant_catalog_fts(db):
+    from app.utils import plant_search
+    plant_search.apply_plant_catalog_fts_migrations(db)
+
+
+def _response_cache(db):
+    from app.utils import response_cache
+    response_cache.apply_response_cache_migrations(db)
+
+
+def _stock_summary(db):
+    from app.utils import stock_summary
+    stock_summary.apply_stock_summary_migrations(db)
+
+
+def _movement_batches(db):
+    from app.utils import stock_movements
+    stock_movements.apply_movement_batch_migrations(db)
+
+
+def _notification_fanout(db):
+    from app.utils import notification_fanout
+    notification_fanout.apply_notification_fanout_migrations(db)
+
+
+def _event_stream(db):
+    from app.utils import event_stream
+    event_stream.apply_event_stream_migrations(db)
+
+
+def _user_counters(db):
+    from app.utils import user_counters
+    user_counters.apply_user_counters_migrations(db)
+
+
+def _seed_defaults(db):
+    m.seed_admin()
+    m.seed_employees()
+    m.seed_plant_catalog()
+
+
+def _upgrade_admins_to_owner(db):
+    m._auto_upgrade_admins_to_owner()
+
+
+def _build_registry():
+    import ai_operator_migrations as aim
+    import warehouse_extended
+    from app.utils import (
+        event_stream,
+        labor_rollup,
+        notification_fanout,
+        plant_search,
+        response_cache,
+        search_index,
+        stock_movements,
+        stock_summary,
+        user_counters,
+    )
+
+    registry = [
+        # v0: baseline - ensure_schema musí na čisté DB běžet před v1..v33
+        _migration(0, "baseline_schema", _baseline_schema, m.ensure_schema, repeatable=True),
+    ]
+    for version, steps in m.LEGACY_MIGRATIONS:
+        registry.append(_migration(version, f"legacy_v{version}", _legacy_step(steps), repr(steps)))
+
+    crew_sql = _sql_file("003_crew_control_system.sql")
+    planning_sql = _sql_file("migrations/002_planning_extended.sql")
+    attachments_sql = _sql_file("migrations_attachments.sql")
+    registry += [
+        _migration(34, "db_fix", _db_fix, fix_database, repeatable=True),
+        _migration(35, "legacy_column_fixups", _legacy_column_fixups,
+                   m._migrate_completed_at, m._migrate_employees_enhanced,
+                   m._migrate_roles_and_hierarchy, m._migrate_crew_control_tables, repeatable=True),
+        _migration(36, "backfill_labor_costs", _backfill_labor_costs, m._backfill_labor_costs),
+        _migration(37, "warehouse_extended_tables", _warehouse_extended_tables,
+                   warehouse_extended.apply_warehouse_migrations,
+                   legacy_checksum="warehouse_extended.apply_warehouse_migrations"),
+        _migration(38, "ai_operator_tables", _ai_operator_tables, aim.apply_ai_operator_migrations,
+                   legacy_checksum="ai_operator_migrations.apply_ai_operator_migrations"),
+        _migration(39, "crew_control_sql", crew_sql[0], crew_sql[1]),
+        _migration(40, "planning_extended_sql", planning_sql[0], planning_sql[1]),
+        _migration(41, "task_issue_attachments_sql", attachments_sql[0], attachments_sql[1]),
+        _migration(42, "seed_defaults", _seed_defaults, m.seed_admin, m.seed_employees, m.seed_plant_catalog),
+        # Role cleanup běží znovu s každou změnou kódu (dříve při každém requestu)
+        _migration(43, "upgrade_admins_to_owner", _upgrade_admins_to_owner,
+                   m._auto_upgrade_admins_to_owner, repeatable=True),
+        _migration(44, "scheduler_lease", _scheduler_tables, aim.apply_scheduler_migrations,
+                   legacy_checksum="ai_operator_migrations.apply_scheduler_migrations"),
+        _migration(45, "entity_change_feed", _change_feed_triggers, aim.apply_change_feed_migrations,
+                   legacy_checksum="ai_operator_migrations.apply_change_feed_migrations"),
+        # Týmové tabulky (kapacity) - triggery jsou IF NOT EXISTS, běží jen pro nové zdroje
+        _migration(46, "entity_change_feed_team", _change_feed_triggers, aim.apply_change_feed_migrations,
+                   repr(aim.CHANGE_FEED_SOURCES),
+                   legacy_checksum="change_feed:job_employees,team_member_profile"),
+        _migration(47, "timesheets_date_iso", _timesheets_date_iso, m._migrate_timesheets_date_iso, m.iso_date_sql),
+        # repeatable: změna triggerů / metrik je přegeneruje a rollupy přestaví
+        _migration(48, "labor_rollups", _labor_rollups, labor_rollup.apply_labor_rollup_migrations,
+                   labor_rollup._refresh_row_sql, labor_rollup._weekly_refresh_sql, labor_rollup._measures,
+                   repr(labor_rollup._TRACKED), repeatable=True),
+        # repeatable: změna ENTITIES (tabulky / indexované sloupce) přegeneruje triggery a index
+        _migration(49, "search_index", _search_index, search_index.apply_search_index_migrations,
+                   search_index._indexed_columns, repr(search_index.ENTITIES), repeatable=True),
+        _migration(50, "plant_catalog_fts_prefix", _plant_catalog_fts, plant_search.apply_plant_catalog_fts_migrations,
+                   legacy_checksum="app.utils.plant_search.apply_plant_catalog_fts_migrations"),
+        # repeatable: nová tabulka v TAG_TABLES dostane triggery při dalším startu
+        _migration(51, "response_cache_tags", _response_cache, response_cache.apply_response_cache_migrations,
+                   ",".join(response_cache.TAG_TABLES), repeatable=True),
+        _migration(52, "warehouse_stock_summary", _stock_summary, stock_summary.apply_stock_summary_migrations,
+                   legacy_checksum="app.utils.stock_summary.apply_stock_summary_migrations"),
+        _migration(53, "warehouse_movement_batches", _movement_batches,
+                   stock_movements.apply_movement_batch_migrations,
+                   legacy_checksum="app.utils.stock_movements.apply_movement_batch_migrations"),
+        _migration(54, "notification_fanout_dedup", _notification_fanout,
+                   notification_fanout.apply_notification_fanout_migrations,
+                   legacy_checksum="app.utils.notification_fanout.apply_notification_fanout_migrations"),
+        _migration(55, "stream_events", _event_stream, event_stream.apply_event_stream_migrations,
+                   legacy_checksum="app.utils.event_stream.apply_event_stream_migrations"),
+        _migration(56, "user_counters", _user_counters, user_counters.apply_user_counters_migrations,
+                   legacy_checksum="app.utils.user_counters.apply_user_counters_migrations"),
+        # repeatable: triggery data výkazů se při změně přegenerují (DROP + CREATE)
+        _migration(57, "timesheets_date_canonical", _timesheets_date_canonical,
+                   m._migrate_timesheets_date_canonical, m.iso_date_sql, repeatable=True),
+        _migration(58, "entity_change_retention", _change_feed_retention,
+                   aim.apply_change_feed_retention, aim.CHANGE_FEED_MAX_ROWS,
+                   legacy_checksum="ai_operator_migrations.apply_change_feed_retention:20000"),
+    ]
+    return registry
+
+
+MIGRATIONS = _build_registry()
+REGISTRY_DIGEST = _checksum(*(f"{mig['version']}:{mig['checksum']}" for mig in MIGRATIONS))
+
+
+# ----------------- Ledger -----------------
+
+def _ensure_ledger(db):
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, "
+        "applied_at TEXT NOT NULL DEFAULT (datetime('now')), name TEXT, checksum TEXT)"
+    )
+    for col in ("name", "checksum"):
+        if not _table_has_column(db, "schema_migrations", col):
+            db.execute(f"ALTER TABLE schema_migrations ADD COLUMN {col} TEXT")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+    db.commit()
+
+
+def _applied(db):
+    return {r[0]: r[1] for r in db.execute("SELECT version, checksum FROM schema_migrations").fetchall()}
+
+
+def _read_digest(db):
+    try:
+        row = db.execute("SELECT version FROM schema_version WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except Exception:
+        # Table does not exist yet (fresh or pre-registry database)
+        return None
+
+
+def _write_digest(db, digest):
+    db.execute(
+        "INSERT INTO schema_version(id, version, applied_at) VALUES (1, ?, datetime('now')) "
+        "ON CONFLICT(id) DO UPDATE SET version = excluded.version, applied_at = excluded.applied_at",
+        (digest,),
+    )
+    db.commit()
+
+
+def pending_migrations(db):
+    """Return registry entries that still need to run against this database."""
+    applied = _applied(db)
+    pending = []
+    for mig in MIGRATIONS:
+        if mig["version"] not in applied:
+            pending.append(mig)
+        elif mig["repeatable"] and applied[mig["version"]] != mig["checksum"]:
+            pending.append(mig)
+    return pending
+
+
+def migrate(db=None, verbose=True):
+    """Apply pending migrations in registry order. Returns list of applied versions."""
+    db = db or get_db()
+    _ensure_ledger(db)
+    applied = _applied(db)
+    done = []
+    for mig in MIGRATIONS:
+        version = mig["version"]
+        if version in applied and not mig["repeatable"]:
+            if applied[version] is None or applied[version] == mig["legacy_checksum"]:
+                # Ledger z doby před checksumy (nebo s ručně psaným checksumem) - jen doplň
+                db.execute("UPDATE schema_migrations SET name = ?, checksum = ? WHERE version = ?",
+                           (mig["name"], mig["checksum"], version))
+            elif applied[version] != mig["checksum"] and verbose:
+                print(f"[DB] Migration v{version} ({mig['name']}) changed after it was applied - not re-running")
+            continue
+        if version in applied and applied[version] == mig["checksum"]:
+            continue
+        if verbose:
+            print(f"[DB] Applying migration v{version}: {mig['name']}")
+        mig["apply"](db)
+        db.execute(
+            "INSERT INTO schema_migrations(version, name, checksum, applied_at) VALUES (?, ?, ?, datetime('now')) "
+            "ON CONFLICT(version) DO UPDATE SET name = excluded.name, checksum = excluded.checksum, "
+            "applied_at = excluded.applied_at",
+            (version, mig["name"], mig["checksum"]),
+        )
+        db.commit()
+        done.append(version)
+    _write_digest(db, REGISTRY_DIGEST)
+    if done:
+        invalidate_schema_cache()
+    return done
+
+
+# ----------------- Startup bootstrap -----------------
+
+@contextmanager
+def _migration_lock():
+    """Exclusive cross-process lock held while one worker migrates the database."""
+    if fcntl is None:
+        yield
+        return
+    lock_path = f"{DB_PATH}.migrate.lock"
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    with open(lock_path, "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def bootstrap_database(force=False):
+    """Jednorázová inicializace databáze při startu workeru.
+
+    Vyžaduje app context. Pokud digest v schema_version odpovídá registru,
+    stojí jediný dotaz; jinak worker převezme file lock a aplikuje čekající
+    migrace. Vrací True, pokud je databáze připravená; při chybě si zapamatuje
+    čas selhání (_ensure další pokus odloží o BOOTSTRAP_RETRY_SECONDS).
+    """
+    try:
+        if force or _read_digest(get_db()) != REGISTRY_DIGEST:
+            with _migration_lock():
+                db = get_db()
+                # Jiný worker mohl migrace dokončit, zatímco jsme čekali na lock
+                if force or _read_digest(db) != REGISTRY_DIGEST:
+                    migrate(db)
+    except Exception as e:
+        _ensure._failed_at = time.monotonic()
+        print(f"[DB] Bootstrap failed (next attempt in {BOOTSTRAP_RETRY_SECONDS}s): {e}")
+        return False
+    _ensure._schema_ready = True
+    _ensure._failed_at = None
+    return True
+
+
+def _ensure():
+    """Request fast path - bez dotazů, pokud bootstrap při startu proběhl.
+
+    Po neúspěšné migraci se nový pokus (file lock + migrate) dělá nejvýše
+    jednou za BOOTSTRAP_RETRY_SECONDS, ne při každém requestu; API mezitím
+    nad napůl migrovaným schématem neběží a vrací 503.
+    """
+    if getattr(_ensure, "_schema_ready", False):
+        return None
+    failed_at = getattr(_ensure, "_failed_at", None)
+    if failed_at is None or time.monotonic() - failed_at >= BOOTSTRAP_RETRY_SECONDS:
+        if bootstrap_database():
+            return None
+    from flask import jsonify, request
+
+    if request.path.startswith("/api/"):
+        resp = jsonify({"ok": False, "error": "database_unavailable"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(BOOTSTRAP_RETRY_SECONDS)
+        return resp
+    return None
+
+
+def main(argv=None):
+    from flask import Flask
+
+    from app.database import close_db
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "migrate"
+    app = Flask(__name__)
+    app.teardown_appcontext(close_db)
+    with app.app_context():
+        db = get_db()
+        if command == "status":
+            _ensure_ledger(db)
+            applied = _applied(db)
+            pending = {mig["version"] for mig in pending_migrations(db)}
+            for mig in MIGRATIONS:
+                state = "pending" if mig["version"] in pending else "applied" if mig["version"] in applied else "-"
+                print(f"v{mig['version']:>3}  {state:8}  {mig['name']}")
+            return 0
+        if command == "migrate":
+            with _migration_lock():
+                done = migrate(db)
+            print(f"[DB] Applied {len(done)} migration(s) to {DB_PATH}")
+            return 0
+    print("Usage: python -m app.utils.migrator [migrate|status]")
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Automatické notifikace (termíny, chybějící přiřazení, nízké zásoby, rozpočet).
+
+Kandidátní události se spočítají jednou za běh - ne při každém pollingu
+/api/notifications - a rozešlou se všem aktivním uživatelům jedním
+INSERT ... SELECT přes json_each. Duplicity hlídá unikátní index
+(user_id, entity_type, entity_id, kind, day): stejná událost dostane
+uživatel nejvýše jednou za den, opakované běhy nic nepřidají.
+
+Ruční notifikace (day = NULL) index neomezuje.
+
+Běh: leader scheduleru (ai_operator_scheduler) každých NOTIFY_INTERVAL
+sekund, nebo ručně
+  python -m app.utils.notification_fanout run
+"""
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+from app.database import table_columns
+from app.utils import event_stream, stock_summary
+
+NOTIFY_INTERVAL = int(os.environ.get("NOTIFY_INTERVAL", "300"))
+JOB_DEADLINE_DAYS = 7
+JOB_CRITICAL_DAYS = 3
+BUDGET_ALERT_PCT = 90
+UNASSIGNED_LIMIT = 5
+LOW_STOCK_LIMIT = 5
+
+_OPEN_JOB = "status NOT IN ('completed', 'archived', 'cancelled')"
+
+
+def apply_notification_fanout_migrations(db):
+    """Sloupec notifications.day a unikátní deduplikační index."""
+    if "day" not in table_columns(db, "notifications"):
+        db.execute("ALTER TABLE notifications ADD COLUMN day TEXT")
+    db.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_dedup
+        ON notifications(user_id, entity_type, entity_id, kind, day) WHERE day IS NOT NULL
+    """)
+    db.commit()
+
+
+def _job_name(job, fallback):
+    return job["client"] or job["name"] or job["title"] or fallback
+
+
+def _task_deadlines(db, today):
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    rows = db.execute("""
+        SELECT t.id, t.title, t.deadline, j.client AS job_name FROM tasks t
+        LEFT JOIN jobs j ON t.job_id = j.id
+        WHERE t.status != 'done' AND t.deadline IS NOT NULL
+        AND date(t.deadline) BETWEEN ? AND ?
+    """, (today.isoformat(), tomorrow)).fetchall()
+    for task in rows:
+        is_today = task["deadline"][:10] == today.isoformat()
+        yield {
+            "entity_type": "task", "entity_id": task["id"], "kind": "deadline",
+            "title": "⏰ Termín " + ("DNES!" if is_today else "zítra"),
+            "body": f"{task['title']}" + (f" ({task['job_name']})" if task["job_name"] else ""),
+        }
+
+
+def _unassigned_jobs(db):
+    rows = db.execute(f"""
+        SELECT j.id, j.client, j.name, j.title FROM jobs j
+        WHERE j.{_OPEN_JOB}
+        AND NOT EXISTS (SELECT 1 FROM job_employees je WHERE je.job_id = j.id)
+        ORDER BY j.id
+        LIMIT ?
+    """, (UNASSIGNED_LIMIT,)).fetchall()
+    for job in rows:
+        yield {
+            "entity_type": "job", "entity_id": job["id"], "kind": "warning",
+            "title": "⚠️ Chybí přiřazení",
+            "body": f"Zakázka '{_job_name(job, '#' + str(job['id']))}' nemá přiřazené zaměstnance",
+        }
+
+
+def _job_alerts(db, today):
+    """Termíny zakázek (po termínu / kritické / do týdne) a čerpání rozpočtu."""
+    cols = set(table_columns(db, "jobs"))
+    budget = "budget" if "budget" in cols else "NULL"
+    actual = "actual_value" if "actual_value" in cols else "NULL"
+    week_later = (today + timedelta(days=JOB_DEADLINE_DAYS)).isoformat()
+    rows = db.execute(f"""
+        SELECT id, title, name, client, deadline, {budget} AS budget, {actual} AS actual_value
+        FROM jobs
+        WHERE {_OPEN_JOB}
+        AND ((deadline IS NOT NULL AND date(deadline) <= ?) OR {budget} > 0)
+    """, (week_later,)).fetchall()
+    for job in rows:
+        name = _job_name(job, f"Zakázka #{job['id']}")
+        try:
+            days_left = (date.fromisoformat(job["deadline"][:10]) - today).days if job["deadline"] else None
+        except ValueError:
+            days_left = None
+        if days_left is not None and days_left <= JOB_DEADLINE_DAYS:
+            if days_left < 0:
+                title = f'🚨 Zakázka "{name}" je po termínu'
+                body = f"Zakázka je {abs(days_left)} dní po termínu. Okamžitá akce vyžadována."
+            elif days_left <= JOB_CRITICAL_DAYS:
+                title = f'⏰ Kritický deadline: "{name}"'
+                body = ("Termín je DNES. Zkontrolujte průběh." if days_left == 0
+                        else f"Zbývá pouze {days_left} dní do deadline. Zkontrolujte průběh.")
+            else:
+                title, body = f"📅 Termín zakázky za {days_left} dní", name
+            yield {"entity_type": "job", "entity_id": job["id"], "kind": "deadline", "title": title, "body": body}
+
+        budget_value = job["budget"] or 0
+        if budget_value > 0:
+            spent_pct = (job["actual_value"] or 0) / budget_value * 100
+            if spent_pct > BUDGET_ALERT_PCT:
+                yield {
+                    "entity_type": "job", "entity_id": job["id"], "kind": "budget",
+                    "title": f'💰 Rozpočet téměř vyčerpán: "{name}"',
+                    "body": f"Rozpočet je vyčerpán na {spent_pct:.1f}%. Zkontrolujte další výdaje.",
+                }
+
+
+def _low_stock(db):
+    for item in stock_summary.low_stock_items(db, limit=LOW_STOCK_LIMIT):
+        yield {
+            "entity_type": "stock", "entity_id": item["id"], "kind": "stock",
+            "title": "📦 Nízké zásoby",
+            "body": f"{item['name']}: zbývá {item['qty']:g} {item['unit'] or 'ks'}",
+        }
+
+
+def candidate_events(db, today=None):
+    """Události pro dnešní den (jeden průchod daty pro všechny uživatele)."""
+    today = today or date.today()
+    events = []
+    for name, source in (("tasks", lambda: _task_deadlines(db, today)),
+                         ("unassigned", lambda: _unassigned_jobs(db)),
+                         ("jobs", lambda: _job_alerts(db, today)),
+                         ("stock", lambda: _low_stock(db))):
+        try:
+            events.extend(source())
+        except Exception as e:
+            # Starší schéma (chybějící tabulka / sloupec) nesmí zastavit ostatní zdroje
+            print(f"[NOTIF] {name} candidates skipped: {e}")
+    return events
+
+
+def fan_out(db, events, today=None):
+    """Vloží události všem aktivním uživatelům; vrací počet nových notifikací."""
+    if not events:
+        return 0
+    today = today or date.today()
+    try:
+        cur = db.execute("""
+            INSERT INTO notifications (user_id, kind, title, body, entity_type, entity_id, day, is_read, created_at)
+            SELECT u.id, json_extract(e.value, '$.kind'), json_extract(e.value, '$.title'),
+                   json_extract(e.value, '$.body'), json_extract(e.value, '$.entity_type'),
+                   json_extract(e.value, '$.entity_id'), ?, 0, datetime('now')
+            FROM users u, json_each(?) e
+            WHERE u.active = 1
+            ON CONFLICT DO NOTHING
+        """, (today.isoformat(), json.dumps(events, ensure_ascii=False)))
+        if cur.rowcount > 0:
+            # Nové řádky mají všichni aktivní uživatelé - klienti si načtou seznam a počet
+            event_stream.publish(db, "notifications", {"new": cur.rowcount})
+        db.commit()
+        return cur.rowcount
+    except Exception:
+        db.rollback()
+        raise
+
+
+def run_notification_fanout(db, today=None):
+    """Spočítej kandidáty a rozešli je; vrací (počet událostí, počet vložených)."""
+    today = today or date.today()
+    events = candidate_events(db, today)
+    return len(events), fan_out(db, events, today)
+
+
+def main(argv=None):
+    from app.database import open_connection
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["run"]:
+        print("Usage: python -m app.utils.notification_fanout run")
+        return 2
+    db = open_connection()
+    try:
+        events, inserted = run_notification_fanout(db)
+        print(f"[NOTIF] Fan-out: {events} events, {inserted} new notifications")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,19 @@
 # Green David App
-from flask import session, jsonify
+import threading
+import time
 from functools import wraps
-from app.database import get_db
-from app.config import ROLES, WRITE_ROLES, EMPLOYEE_ROLES
+
+from flask import g, jsonify, session
+
+from app.config import EMPLOYEE_ROLES, ROLES, WRITE_ROLES
+from app.database import _table_exists, cached_statement, get_db, table_columns
+
+# Per-worker cache řádků users. Platnost hlídá generace 'users' v cache_generation
+# (zvyšují ji triggery response_cache při každé změně tabulky users - role, active,
+# ...), takže změna v jiném workeru se projeví hned; TTL je jen pojistka.
+USER_CACHE_TTL = 30
+_user_cache = {}
+_user_cache_lock = threading.Lock()
 
 
 def normalize_role(role):
@@ -31,18 +42,62 @@ def normalize_employee_role(role: str) -> str:
     return r if r in EMPLOYEE_ROLES else "worker"
 
 
+def _user_select(db):
+    cols = "id,email,name,role,active"
+    if 'manager_id' in table_columns(db, "users"):
+        cols += ",manager_id"
+    generation = ("(SELECT generation FROM cache_generation WHERE name = 'users')"
+                  if _table_exists(db, "cache_generation") else "NULL")
+    return f"SELECT {cols}, {generation} AS _generation FROM users WHERE id=?"
+
+
+def _users_generation(db):
+    try:
+        row = db.execute("SELECT generation FROM cache_generation WHERE name = 'users'").fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+def _load_user(db, uid):
+    """Řádek uživatele z cache workeru (jedno čtení generace), jinak z DB (jeden SELECT)."""
+    now = time.monotonic()
+    with _user_cache_lock:
+        hit = _user_cache.get(uid)
+    if hit and hit[0] > now:
+        generation = _users_generation(db)
+        if generation is not None and generation == hit[1]:
+            return dict(hit[2])
+
+    row = db.execute(cached_statement(db, "current_user", lambda: _user_select(db)), (uid,)).fetchone()
+    if not row:
+        with _user_cache_lock:
+            _user_cache.pop(uid, None)
+        return None
+    user = dict(row)
+    generation = user.pop("_generation")
+    if generation is not None:
+        with _user_cache_lock:
+            _user_cache[uid] = (now + USER_CACHE_TTL, generation, user)
+    return dict(user)
+
+
+def clear_user_cache():
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
 def current_user():
+    """Přihlášený uživatel; v rámci requestu se načte jednou (memo na flask.g)."""
     uid = session.get("uid")
     if not uid:
         return None
-    db = get_db()
-    # Zkontrolovat, zda existuje sloupec manager_id
-    cols = [r[1] for r in db.execute("PRAGMA table_info(users)").fetchall()]
-    if 'manager_id' in cols:
-        row = db.execute("SELECT id,email,name,role,active,manager_id FROM users WHERE id=?", (uid,)).fetchone()
-    else:
-        row = db.execute("SELECT id,email,name,role,active FROM users WHERE id=?", (uid,)).fetchone()
-    return dict(row) if row else None
+    memo = g.get("_identity")
+    if memo is not None and memo[0] == uid:
+        return memo[1]
+    user = _load_user(get_db(), uid)
+    g._identity = (uid, user)
+    return user
 
 
 def require_auth():
@@ -70,13 +125,7 @@ def requires_role(*allowed_roles):
             if 'uid' not in session:
                 return jsonify({'ok': False, 'error': 'unauthorized'}), 401
             
-            # Získat roli uživatele z DB
-            db = get_db()
-            user = db.execute(
-                "SELECT role FROM users WHERE id = ?", 
-                (session['uid'],)
-            ).fetchone()
-            
+            user = current_user()
             if not user:
                 return jsonify({'ok': False, 'error': 'unauthorized'}), 401
             
@@ -93,19 +142,11 @@ def requires_role(*allowed_roles):
 
 def get_current_user():
     """Pomocná funkce pro získání aktuálního uživatele s plnými informacemi"""
-    if 'uid' not in session:
-        return None
-    
-    db = get_db()
-    user = db.execute(
-        "SELECT id, email, name, role, manager_id FROM users WHERE id = ?",
-        (session['uid'],)
-    ).fetchone()
-    
+    user = current_user()
     if not user:
         return None
     
-    user_dict = dict(user)
+    user_dict = {k: user.get(k) for k in ("id", "email", "name", "role", "manager_id")}
     
     # Fallback: pokud nemá roli nebo je NULL, považujeme za owner (pro zpětnou kompatibilitu)
     if not user_dict.get('role') or user_dict['role'] == 'admin':
@@ -0,0 +1,133 @@
+"""
+Autocomplete nad katalogem rostlin.
+
+plant_catalog_fts je external-content FTS5 tabulka nad plant_catalog s
+prefixovými indexy 2/3/4 znaky a tokenizerem bez diakritiky. Triggery ji
+synchronizují při INSERT / UPDATE / DELETE (u external content se staré
+hodnoty odebírají příkazem 'delete') a zároveň zvyšují generaci
+'plant_catalog' v tabulce cache_generation.
+
+Výsledky hledání drží per-worker LRU cache; klíč obsahuje generaci, takže
+změna katalogu v libovolném workeru starší záznamy okamžitě zneplatní.
+Přečtení generace je jediný lookup podle primárního klíče.
+"""
+import threading
+from collections import OrderedDict
+
+from app.utils.search_index import fts_query
+
+CACHE_SIZE = 512
+GENERATION = "plant_catalog"
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_FIELDS = ("id", "latin_name", "variety", "container_size", "flower_color", "flowering_time",
+           "height", "light_requirements", "hardiness_zone")
+_FTS_COLUMNS = ("latin_name", "variety", "flower_color", "notes")
+# Váhy bm25 ve stejném pořadí jako _FTS_COLUMNS
+_RANK = "bm25(plant_catalog_fts, 10.0, 5.0, 1.0, 0.5)"
+
+
+def apply_plant_catalog_fts_migrations(db):
+    """Přestaví plant_catalog_fts (prefix index), synchronizační triggery a generaci."""
+    cols = ", ".join(_FTS_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in _FTS_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in _FTS_COLUMNS)
+    bump = f"UPDATE cache_generation SET generation = generation + 1 WHERE name = '{GENERATION}';"
+    db.executescript(f"""
+        CREATE TABLE IF NOT EXISTS cache_generation (
+            name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO cache_generation(name, generation) VALUES ('{GENERATION}', 0);
+
+        DROP TRIGGER IF EXISTS plant_catalog_ai;
+        DROP TRIGGER IF EXISTS plant_catalog_ad;
+        DROP TRIGGER IF EXISTS plant_catalog_au;
+        DROP TABLE IF EXISTS plant_catalog_fts;
+
+        CREATE VIRTUAL TABLE plant_catalog_fts USING fts5(
+            {cols},
+            content = plant_catalog,
+            content_rowid = id,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        );
+
+        CREATE TRIGGER plant_catalog_ai AFTER INSERT ON plant_catalog BEGIN
+            INSERT INTO plant_catalog_fts(rowid, {cols}) VALUES (new.id, {new});
+            {bump}
+        END;
+        CREATE TRIGGER plant_catalog_ad AFTER DELETE ON plant_catalog BEGIN
+            INSERT INTO plant_catalog_fts(plant_catalog_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+            {bump}
+        END;
+        CREATE TRIGGER plant_catalog_au AFTER UPDATE ON plant_catalog BEGIN
+            INSERT INTO plant_catalog_fts(plant_catalog_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO plant_catalog_fts(rowid, {cols}) VALUES (new.id, {new});
+            {bump}
+        END;
+
+        INSERT INTO plant_catalog_fts(plant_catalog_fts) VALUES ('rebuild');
+        {bump}
+    """)
+    db.commit()
+
+
+def catalog_generation(db):
+    try:
+        row = db.execute("SELECT generation FROM cache_generation WHERE name = ?", (GENERATION,)).fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+def _full_name(row):
+    name = row["latin_name"]
+    if row["variety"]:
+        name += f" '{row['variety']}'"
+    if row["container_size"]:
+        name += f" - {row['container_size']}"
+    return name
+
+
+def _query(db, match, limit):
+    rows = db.execute(f"""
+        SELECT {', '.join('pc.' + f for f in _FIELDS)}
+        FROM plant_catalog_fts
+        JOIN plant_catalog pc ON pc.id = plant_catalog_fts.rowid
+        WHERE plant_catalog_fts MATCH ?
+        ORDER BY {_RANK}, pc.latin_name
+        LIMIT ?
+    """, (match, limit)).fetchall()
+    return tuple(dict({f: r[f] for f in _FIELDS}, full_name=_full_name(r)) for r in rows)
+
+
+def search_plants(db, text, limit=20):
+    """Rostliny odpovídající prefixům slov z text (seřazené podle relevance)."""
+    match = fts_query(text)
+    if not match:
+        return []
+    key = (match.lower(), limit)
+    generation = catalog_generation(db)
+    if generation is not None:
+        with _cache_lock:
+            hit = _cache.get(key)
+            if hit and hit[0] == generation:
+                _cache.move_to_end(key)
+                return [dict(p) for p in hit[1]]
+
+    plants = _query(db, match, limit)
+    if generation is not None:
+        with _cache_lock:
+            _cache[key] = (generation, plants)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return [dict(p) for p in plants]
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
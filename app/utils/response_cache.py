@@ -0,0 +1,200 @@
+"""
+Sdílená cache JSON odpovědí pro read-heavy endpointy (dashboardy, statistiky).
+
+Klíč záznamu: endpoint + parametry dotazu + role (volitelně uživatel) + dnešní
+datum. Každý endpoint deklaruje závislosti - tagy = názvy tabulek. Generace
+tagů drží tabulka cache_generation v hlavní databázi; zvyšují ji triggery na
+tagovaných tabulkách ve stejné transakci jako zápis, takže žádná cesta
+zápisu nemůže zapomenout cache zneplatnit. Pro stav mimo tabulky slouží
+invalidate(db, *tags).
+
+Záznamy leží v samostatném SQLite souboru (RESPONSE_CACHE_PATH), sdíleném
+všemi gunicorn workery; zápisy do cache tak nesoupeří o zámek hlavní
+databáze. Záznam platí, dokud sedí generace všech jeho tagů a nevypršelo TTL.
+
+Odpovědi nesou ETag a Cache-Control: private, no-cache - PWA revaliduje
+přes If-None-Match a dostane 304 bez těla.
+
+    @cached_response(tags=("jobs", "tasks"), ttl=60)
+    def api_dashboard_stats(): ...
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import date
+from functools import wraps
+
+from flask import make_response, request, session
+
+from app.config import DATABASE as DB_PATH
+from app.database import _table_exists, get_read_db
+from app.utils.permissions import current_user
+
+CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(DB_PATH)), "response_cache.db")
+DEFAULT_TTL = 60
+PURGE_PROBABILITY = 0.01
+
+# Tabulky, jejichž zápisy zvyšují generaci stejnojmenného tagu
+TAG_TABLES = (
+    "jobs", "tasks", "issues", "timesheets", "employees", "users",
+    "warehouse_items", "warehouse_movements", "warehouse_reservations", "job_materials", "job_employees",
+    "job_assignments", "job_team_assignments", "task_assignments",
+    "parties", "notes", "trainings", "training_attendees",
+)
+
+_local = threading.local()
+
+
+# ----------------- Generace tagů (hlavní DB) -----------------
+
+def apply_response_cache_migrations(db):
+    """Řádky cache_generation a triggery zvyšující generaci pro TAG_TABLES."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS cache_generation (
+            name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    for table in TAG_TABLES:
+        for op in ("insert", "update", "delete"):
+            db.execute(f"DROP TRIGGER IF EXISTS trg_cachegen_{table}_{op}")
+        if not _table_exists(db, table):
+            continue
+        db.execute("INSERT OR IGNORE INTO cache_generation(name, generation) VALUES (?, 0)", (table,))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            db.execute(f"""
+                CREATE TRIGGER trg_cachegen_{table}_{op.lower()} AFTER {op} ON {table}
+                BEGIN
+                    UPDATE cache_generation SET generation = generation + 1 WHERE name = '{table}';
+                END
+            """)
+    db.commit()
+
+
+def tag_versions(db, tags):
+    """'tag:generace,...' pro zadané tagy (chybějící tag = 0)."""
+    marks = ",".join("?" * len(tags))
+    found = dict(db.execute(
+        f"SELECT name, generation FROM cache_generation WHERE name IN ({marks})", tuple(tags)).fetchall())
+    return ",".join(f"{t}:{found.get(t, 0)}" for t in tags)
+
+
+def invalidate(db, *tags):
+    """Ruční zneplatnění tagů (stav, který neleží v tagovaných tabulkách)."""
+    for tag in tags:
+        db.execute(
+            "INSERT INTO cache_generation(name, generation) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET generation = generation + 1", (tag,))
+    db.commit()
+
+
+# ----------------- Úložiště záznamů (sdílený SQLite soubor) -----------------
+
+def _store():
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(CACHE_PATH, timeout=1, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                versions TEXT NOT NULL,
+                etag TEXT NOT NULL,
+                mimetype TEXT NOT NULL,
+                body BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def _get(key, versions):
+    row = _store().execute(
+        "SELECT etag, mimetype, body FROM response_cache WHERE key = ? AND versions = ? AND expires_at > ?",
+        (key, versions, time.time())).fetchone()
+    return row
+
+
+def _put(key, versions, etag, mimetype, body, ttl):
+    conn = _store()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache(key, versions, etag, mimetype, body, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (key, versions, etag, mimetype, body, time.time() + ttl))
+        if random.random() < PURGE_PROBABILITY:
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+
+def clear():
+    conn = _store()
+    with conn:
+        conn.execute("DELETE FROM response_cache")
+
+
+# ----------------- Dekorátor -----------------
+
+def _cache_key(per_user):
+    uid = session.get("uid")
+    u = current_user() if uid else None
+    role = (u["role"] if u["active"] else "inactive") if u else None
+    parts = [request.endpoint or request.path, date.today().isoformat(), f"role={role or 'anon'}"]
+    if per_user:
+        parts.append(f"uid={uid}")
+    for name in sorted(request.args):
+        parts.append(f"{name}={','.join(request.args.getlist(name))}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _conditional(resp, etag):
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+
+def cached_response(tags, ttl=DEFAULT_TTL, per_user=False):
+    """Cache GET odpovědí endpointu; tags = tabulky, na kterých výsledek závisí.
+
+    Ukládají se jen odpovědi 200. per_user=True pro odpovědi závislé na
+    konkrétním uživateli (jinak stačí role). Chyba cache nikdy neshodí
+    endpoint - požadavek se pak jen obslouží bez cache.
+    """
+    tags = tuple(tags)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+            try:
+                key = _cache_key(per_user)
+                versions = tag_versions(get_read_db(), tags)
+                hit = _get(key, versions)
+            except sqlite3.Error as e:
+                print(f"[CACHE] lookup failed: {e}")
+                return view(*args, **kwargs)
+            if hit:
+                etag, mimetype, body = hit
+                resp = make_response(bytes(body))
+                resp.mimetype = mimetype
+                resp.headers["X-Cache"] = "HIT"
+                return _conditional(resp, etag)
+
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200 or resp.direct_passthrough:
+                return resp
+            body = resp.get_data()
+            etag = hashlib.sha1(body).hexdigest()[:20]
+            try:
+                _put(key, versions, etag, resp.mimetype, body, ttl)
+            except sqlite3.Error as e:
+                print(f"[CACHE] store failed: {e}")
+            resp.headers["X-Cache"] = "MISS"
+            return _conditional(resp, etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,242 @@
+"""
+Globální fulltextový index (FTS5) pro vyhledávání.
+
+Jedna tabulka search_index pokrývá zakázky, úkoly, issues, zaměstnance,
+poznámky, partnery (adresář) a skladové položky. Tokenizer unicode61 s
+remove_diacritics 2, takže "zahrada" najde "Zahráda" a "novak" najde
+"Novák". rowid dokumentu = id * 8 + kód typu, takže triggery mažou a
+přepisují jediný řádek bez dohledávání.
+
+Index drží triggery na zdrojových tabulkách (INSERT / UPDATE OF indexovaných
+sloupců / DELETE) ve stejné transakci jako zápis; jména přiřazených
+zaměstnanců u úkolů a issues se obnovují i při změně přiřazení nebo jména.
+
+Přestavba od nuly: rebuild_search_index(db) nebo
+  python -m app.utils.search_index rebuild
+"""
+import re
+import sys
+
+from app.database import _table_exists, table_columns
+
+# kind -> (kód v rowid, tabulka, title, body, extra); sloupce, které ve schématu
+# chybí, se vynechají (schéma se mezi verzemi liší)
+ENTITIES = {
+    "job": (1, "jobs", ("title", "name"), ("description", "note"), ("code", "client", "city", "address", "tags")),
+    "task": (2, "tasks", ("title",), ("description",), ()),
+    "issue": (3, "issues", ("title",), ("description",), ("type",)),
+    "employee": (4, "employees", ("name",), ("position", "role", "skills"), ("email", "phone")),
+    "note": (5, "notes", ("title",), ("content",), ("category",)),
+    "party": (6, "parties", ("display_name",), ("note",), ("legal_name", "email", "ico", "city", "tags")),
+    "warehouse_item": (7, "warehouse_items", ("name",), ("note", "category"), ("sku", "supplier", "location")),
+}
+KIND_STRIDE = 8
+
+# Váhy bm25: kind, ref_id (neindexované), title, body, extra
+_RANK = "bm25(search_index, 0, 0, 10.0, 1.0, 4.0)"
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text):
+    """Uživatelský dotaz -> FTS5 MATCH výraz (každé slovo jako prefix, AND).
+
+    Vrací None, pokud dotaz neobsahuje žádné slovo.
+    """
+    terms = _TERM_RE.findall(text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def _concat(cols, available, row="t"):
+    parts = [f"COALESCE({row}.{c}, '')" for c in cols if c in available]
+    return " || ' ' || ".join(parts) if parts else "''"
+
+
+def _assignees_sql(db, kind, row="t"):
+    """Jména přiřazených zaměstnanců (úkoly / issues)."""
+    link = {"task": ("task_assignments", "task_id"), "issue": ("issue_assignments", "issue_id")}.get(kind)
+    exprs = []
+    if link and _table_exists(db, link[0]):
+        exprs.append(f"(SELECT group_concat(e.name, ' ') FROM {link[0]} a "
+                     f"JOIN employees e ON e.id = a.employee_id WHERE a.{link[1]} = {row}.id)")
+    if kind == "task" and "employee_id" in table_columns(db, "tasks"):
+        exprs.append(f"(SELECT e.name FROM employees e WHERE e.id = {row}.employee_id)")
+    return " || ' ' || ".join(f"COALESCE({e}, '')" for e in exprs)
+
+
+def _document_select(db, kind, where):
+    """SELECT dokumentů jednoho typu pro INSERT INTO search_index."""
+    code, table, title, body, extra = ENTITIES[kind]
+    cols = set(table_columns(db, table))
+    title_parts = [f"t.{c}" for c in title if c in cols]
+    title_sql = f"COALESCE({', '.join(title_parts)}, '')" if len(title_parts) > 1 else (
+        f"COALESCE({title_parts[0]}, '')" if title_parts else "''")
+    extra_sql = _concat(extra, cols)
+    assignees = _assignees_sql(db, kind)
+    if assignees:
+        extra_sql = f"{extra_sql} || ' ' || {assignees}"
+    return (f"SELECT t.id * {KIND_STRIDE} + {code}, '{kind}', t.id, {title_sql}, "
+            f"{_concat(body, cols)}, {extra_sql} FROM {table} t WHERE {where}")
+
+
+def _refresh_sql(db, kind, where):
+    """Přepiš dokumenty typu kind pro řádky zdrojové tabulky splňující where."""
+    code, table = ENTITIES[kind][:2]
+    return f"""
+        DELETE FROM search_index WHERE rowid IN (SELECT t.id * {KIND_STRIDE} + {code} FROM {table} t WHERE {where});
+        INSERT INTO search_index(rowid, kind, ref_id, title, body, extra) {_document_select(db, kind, where)};"""
+
+
+def _indexed_columns(db, kind):
+    code, table, title, body, extra = ENTITIES[kind]
+    cols = set(table_columns(db, table))
+    tracked = [c for c in (*title, *body, *extra) if c in cols]
+    if kind == "task" and "employee_id" in cols:
+        tracked.append("employee_id")
+    return tracked
+
+
+def _trigger_names(db):
+    return [r[0] for r in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_search_%'")]
+
+
+def apply_search_index_migrations(db):
+    """Tabulka search_index, udržovací triggery a počáteční naplnění."""
+    db.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED,
+            ref_id UNINDEXED,
+            title,
+            body,
+            extra,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+    """)
+    for name in _trigger_names(db):
+        db.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    triggers = []
+    for kind, (code, table, *_rest) in ENTITIES.items():
+        if not _table_exists(db, table):
+            continue
+        tracked = _indexed_columns(db, kind)
+        triggers.append(f"""
+            CREATE TRIGGER trg_search_{kind}_insert AFTER INSERT ON {table}
+            BEGIN {_refresh_sql(db, kind, 't.id = NEW.id')}
+            END;""")
+        if tracked:
+            # Bez indexovaných sloupců by UPDATE OF byl neplatné SQL
+            triggers.append(f"""
+            CREATE TRIGGER trg_search_{kind}_update AFTER UPDATE OF {', '.join(tracked)} ON {table}
+            BEGIN {_refresh_sql(db, kind, 't.id = NEW.id')}
+            END;""")
+        triggers.append(f"""
+            CREATE TRIGGER trg_search_{kind}_delete AFTER DELETE ON {table}
+            BEGIN DELETE FROM search_index WHERE rowid = OLD.id * {KIND_STRIDE} + {code};
+            END;""")
+
+    # Jména přiřazených zaměstnanců jsou součástí dokumentu úkolu / issue
+    for kind, link, fk in (("task", "task_assignments", "task_id"), ("issue", "issue_assignments", "issue_id")):
+        table = ENTITIES[kind][1]
+        if not (_table_exists(db, table) and _table_exists(db, link)):
+            continue
+        triggers.append(f"""
+            CREATE TRIGGER trg_search_{link}_insert AFTER INSERT ON {link}
+            BEGIN {_refresh_sql(db, kind, f't.id = NEW.{fk}')}
+            END;
+            CREATE TRIGGER trg_search_{link}_delete AFTER DELETE ON {link}
+            BEGIN {_refresh_sql(db, kind, f't.id = OLD.{fk}')}
+            END;""")
+    if _table_exists(db, "employees"):
+        body = ""
+        if _table_exists(db, "task_assignments"):
+            body += _refresh_sql(db, "task", "t.id IN (SELECT task_id FROM task_assignments WHERE employee_id = NEW.id)")
+        if "employee_id" in table_columns(db, "tasks"):
+            body += _refresh_sql(db, "task", "t.employee_id = NEW.id")
+        if _table_exists(db, "issue_assignments"):
+            body += _refresh_sql(db, "issue", "t.id IN (SELECT issue_id FROM issue_assignments WHERE employee_id = NEW.id)")
+        if body:
+            triggers.append(f"""
+            CREATE TRIGGER trg_search_employee_rename AFTER UPDATE OF name ON employees
+            BEGIN {body}
+            END;""")
+    db.executescript("".join(triggers))
+    rebuild_search_index(db)
+
+
+def rebuild_search_index(db):
+    """Přestav search_index ze zdrojových tabulek (jedna transakce)."""
+    try:
+        db.execute("DELETE FROM search_index")
+        for kind, (_code, table, *_rest) in ENTITIES.items():
+            if _table_exists(db, table):
+                db.execute(f"INSERT INTO search_index(rowid, kind, ref_id, title, body, extra) "
+                           f"{_document_select(db, kind, '1')}")
+        db.execute("INSERT INTO search_index(search_index) VALUES('optimize')")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def search(db, text, kinds=None, limit=20, per_kind=None):
+    """Seřazené zásahy [{kind, id, title, snippet, score}] (nejlepší první).
+
+    kinds omezí typy, per_kind vrátí nejvýše N zásahů od každého typu.
+    """
+    match = fts_query(text)
+    if not match:
+        return []
+    where, params = "search_index MATCH ?", [match]
+    if kinds:
+        where += f" AND kind IN ({','.join('?' * len(kinds))})"
+        params.extend(kinds)
+    sql = f"""
+        SELECT kind, ref_id, title,
+               snippet(search_index, -1, '**', '**', '…', 12) AS snippet,
+               {_RANK} AS score
+        FROM search_index
+        WHERE {where}
+    """
+    if per_kind:
+        sql = f"""
+            SELECT kind, ref_id, title, snippet, score FROM (
+                SELECT *, row_number() OVER (PARTITION BY kind ORDER BY score) AS rn
+                FROM ({sql})
+            ) WHERE rn <= ?
+        """
+        params.append(per_kind)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    return [{"kind": r["kind"], "id": r["ref_id"], "title": r["title"],
+             "snippet": (r["snippet"] or "").strip(), "score": round(r["score"], 4)}
+            for r in db.execute(sql, params).fetchall()]
+
+
+def match_ids_sql(kind):
+    """Poddotaz na id řádků typu kind odpovídajících dotazu (parametr: fts_query)."""
+    return f"SELECT ref_id FROM search_index WHERE search_index MATCH ? AND kind = '{kind}'"
+
+
+def main(argv=None):
+    from app.database import open_connection
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m app.utils.search_index rebuild")
+        return 2
+    db = open_connection()
+    try:
+        rebuild_search_index(db)
+        docs = db.execute("SELECT COUNT(*) FROM search_index").fetchone()[0]
+        print(f"[DB] Search index rebuilt: {docs} documents")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
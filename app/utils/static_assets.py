@@ -0,0 +1,247 @@
+"""
+Otisky statických souborů (fingerprinting) a předkomprimované varianty.
+
+Build (Dockerfile, po COPY zdrojáků):
+  python -m app.utils.static_assets build
+spočítá otisk obsahu každého souboru ve static/, zapíše manifest
+static/asset-manifest.json a vedle textových souborů uloží .gz (a .br,
+pokud je nainstalovaný modul brotli).
+
+Za běhu:
+- HTML odpovědi (kořenové stránky i šablony) a sw.js dostanou odkazy
+  /static/css/app.css přepsané na /static/css/app.<otisk>.css; zdrojové
+  soubory v repozitáři zůstávají beze změny,
+- URL s aktuálním otiskem jde s Cache-Control: public, max-age=31536000,
+  immutable; URL bez otisku (nebo se starým otiskem) zůstává no-cache,
+- přijímá-li klient br/gzip a vedle souboru leží aktuální .br/.gz, pošle
+  se ten (Content-Encoding, Vary: Accept-Encoding),
+- sw.js: PRECACHE_URLS se přepíší stejným manifestem a CACHE_VERSION dostane
+  verzi manifestu - nový deploy nainstaluje nový service worker a staré
+  cache se smažou při activate.
+
+Bez buildu se manifest spočítá při prvním použití v paměti (otisky fungují,
+jen bez předkomprimovaných variant). Manifest starší než některý soubor ve
+static/ se ignoruje. STATIC_FINGERPRINT=0 otisky vypne (vývoj).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIR = os.path.join(ROOT, "static")
+MANIFEST_PATH = os.path.join(STATIC_DIR, "asset-manifest.json")
+SERVICE_WORKER_PATH = os.path.join(ROOT, "sw.js")
+ENABLED = os.environ.get("STATIC_FINGERPRINT", "1") != "0"
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESS_EXTENSIONS = (".js", ".css", ".svg", ".json", ".html", ".txt", ".map")
+COMPRESS_MIN_SIZE = 1024
+
+# (Accept-Encoding, přípona sourozence) v pořadí preference
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_REF_RE = re.compile(r"/static/[\w\-./]+\.\w+")
+_HASHED_RE = re.compile(r"^(.+)\.([0-9a-f]{%d})(\.\w+)$" % HASH_LENGTH)
+_CACHE_VERSION_RE = re.compile(r"(const CACHE_VERSION = '[^']*)'")
+
+_manifest = None
+_lock = threading.Lock()
+
+
+# ----------------- Manifest -----------------
+
+def _asset_files():
+    """(název relativní ke static/, cesta) všech zdrojových souborů."""
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if filename.startswith(".") or filename.endswith((".gz", ".br")) or path == MANIFEST_PATH:
+                continue
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"), path
+
+
+def _digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def compute_manifest():
+    """{"version": ..., "assets": {název: otisk}} podle aktuálního obsahu static/."""
+    assets = {name: _digest(path) for name, path in _asset_files()}
+    version = hashlib.sha1(json.dumps(assets, sort_keys=True).encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return {"version": version, "assets": assets}
+
+
+def _load():
+    try:
+        built = os.path.getmtime(MANIFEST_PATH)
+        if all(os.path.getmtime(path) <= built for _name, path in _asset_files()):
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                return json.load(f)
+        print("[STATIC] asset-manifest.json is stale, fingerprinting in memory")
+    except (OSError, ValueError):
+        pass
+    return compute_manifest()
+
+
+def manifest():
+    """Manifest tohoto procesu (načtený nebo spočítaný při prvním použití)."""
+    global _manifest
+    if _manifest is None:
+        with _lock:
+            if _manifest is None:
+                _manifest = _load()
+    return _manifest
+
+
+# ----------------- URL s otiskem -----------------
+
+def asset_url(url):
+    """/static/... -> URL s otiskem (neznámý soubor nebo vypnuté otisky = beze změny)."""
+    if not ENABLED or not url.startswith("/static/"):
+        return url
+    name = url[len("/static/"):]
+    digest = manifest()["assets"].get(name)
+    if not digest:
+        return url
+    stem, ext = os.path.splitext(name)
+    return f"/static/{stem}.{digest}{ext}"
+
+
+def rewrite_references(text):
+    """Přepiš odkazy /static/... v textu (HTML, JS) na URL s otiskem."""
+    if not ENABLED:
+        return text
+    return _REF_RE.sub(lambda m: asset_url(m.group(0)), text)
+
+
+def resolve(filename):
+    """Požadovaná cesta ve static/ -> (skutečný soubor, nese aktuální otisk)."""
+    if not ENABLED or os.path.isfile(os.path.join(STATIC_DIR, filename)):
+        return filename, False
+    m = _HASHED_RE.match(filename)
+    if not m:
+        return filename, False
+    name = m.group(1) + m.group(3)
+    current = manifest()["assets"].get(name)
+    if current is None:
+        return filename, False
+    # Starý otisk (stránka z dřívějšího deploye) dostane aktuální obsah, ale bez immutable
+    return name, current == m.group(2)
+
+
+# ----------------- Odpovědi -----------------
+
+def _fresh(source, sibling):
+    try:
+        return os.path.getmtime(sibling) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def send_asset(filename):
+    """Odpověď pro /static/<filename>: otisk -> immutable, br/gzip podle Accept-Encoding."""
+    from flask import request, send_from_directory
+
+    name, immutable = resolve(filename)
+    source = os.path.join(STATIC_DIR, name)
+    variants = [(encoding, suffix) for encoding, suffix in _ENCODINGS if _fresh(source, source + suffix)]
+    resp = None
+    for encoding, suffix in variants:
+        if request.accept_encodings[encoding]:
+            resp = send_from_directory(STATIC_DIR, name + suffix,
+                                       mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream")
+            resp.headers["Content-Encoding"] = encoding
+            break
+    if resp is None:
+        resp = send_from_directory(STATIC_DIR, name)
+    if variants:
+        resp.vary.add("Accept-Encoding")
+    if immutable:
+        resp.headers["Cache-Control"] = IMMUTABLE
+    return resp
+
+
+def rewrite_html_response(resp):
+    """after_request: odkazy na /static/ v HTML odpovědi -> URL s otiskem.
+
+    ETag se přepočítá z přepsaného těla - soubor stránky se nezměnil, ale
+    odkazy ano (nový deploy), takže ETag/Last-Modified souboru neplatí.
+    """
+    from flask import request
+
+    if not ENABLED or resp.status_code != 200 or resp.mimetype != "text/html":
+        return resp
+    resp.direct_passthrough = False
+    body = resp.get_data().decode("utf-8", "surrogateescape")
+    rewritten = rewrite_references(body)
+    if rewritten == body:
+        return resp
+    resp.set_data(rewritten.encode("utf-8", "surrogateescape"))
+    resp.headers.pop("Last-Modified", None)
+    resp.set_etag(hashlib.sha1(resp.get_data()).hexdigest()[:20])
+    return resp.make_conditional(request)
+
+
+def service_worker_source():
+    """sw.js s PRECACHE_URLS (i ikonami) s otisky a CACHE_VERSION podle manifestu."""
+    with open(SERVICE_WORKER_PATH, encoding="utf-8") as f:
+        source = f.read()
+    if not ENABLED:
+        return source
+    return _CACHE_VERSION_RE.sub(rf"\1-{manifest()['version']}'", rewrite_references(source), count=1)
+
+
+# ----------------- Build -----------------
+
+def _write(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build():
+    """Předkomprimuj textové soubory a zapiš manifest; vrací (manifest, počet komprimovaných)."""
+    compressed = 0
+    for name, path in _asset_files():
+        if not name.endswith(COMPRESS_EXTENSIONS) or os.path.getsize(path) < COMPRESS_MIN_SIZE:
+            continue
+        with open(path, "rb") as f:
+            raw = f.read()
+        _write(path + ".gz", gzip.compress(raw, 9, mtime=0))
+        if brotli is not None:
+            _write(path + ".br", brotli.compress(raw, quality=11))
+        compressed += 1
+    # Manifest až nakonec - musí být novější než všechny soubory (viz _load)
+    data = compute_manifest()
+    _write(MANIFEST_PATH, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+    return data, compressed
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["build"]:
+        print("Usage: python -m app.utils.static_assets build")
+        return 2
+    data, compressed = build()
+    print(f"[STATIC] {len(data['assets'])} assets fingerprinted (version {data['version']}), "
+          f"{compressed} precompressed (gzip{', brotli' if brotli is not None else ''})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""
+Hromadné skladové pohyby (příjem dodávky, výdej, dokončení inventury).
+
+apply_movement_batch zapíše celou dávku v jedné BEGIN IMMEDIATE transakci:
+zámek pro zápis se bere hned na začátku, takže validace (existence položek)
+i zápis vidí stejný stav. Pohyby jdou jedním executemany INSERT, změny
+množství jedním executemany UPDATE (delta sečtená po položkách) - triggery
+stavu skladu a cache tak běží jednou na položku, ne jednou na řádek.
+
+Každý řádek dávky dostane výsledek {line, ok, movement_id | error}.
+atomic=True (výchozí): chyba v jakémkoli řádku = nic se nezapíše.
+atomic=False: zapíšou se platné řádky, chybné se jen vrátí.
+
+Idempotence: dávka s klíčem (hlavička Idempotency-Key nebo idempotency_key
+v těle) uloží odpověď do warehouse_movement_batches ve stejné transakci.
+Opakovaný požadavek se stejným klíčem (retry z mobilu po výpadku sítě)
+dostane uloženou odpověď a nic se nezapíše podruhé; stejný klíč s jiným
+obsahem dávky = 409. Neúspěšné dávky se neukládají - klient je opraví a
+pošle znovu se stejným klíčem.
+"""
+import hashlib
+import json
+import math
+
+from app.utils.stock_summary import _item_columns
+
+# typ pohybu -> znaménko změny množství (0 = jen záznam)
+MOVEMENT_TYPES = {
+    "in": 1,           # příjem (nákup)
+    "return": 1,       # vrácení ze zakázky
+    "adjustment": 1,   # korekce (qty se znaménkem)
+    "out": -1,         # výdej na zakázku
+    "transfer": -1,    # přesun mezi lokacemi
+    "inventory": 0,    # inventurní záznam
+}
+MAX_LINES = 500
+MAX_KEY_LENGTH = 200
+KEY_RETENTION_DAYS = 30
+
+_MOVEMENT_FIELDS = ("item_id", "movement_type", "qty", "job_id", "from_location", "to_location",
+                    "employee_id", "note", "batch_number")
+
+
+class BatchError(ValueError):
+    """Dávku nelze přijmout jako celek (status = HTTP kód odpovědi)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def apply_movement_batch_migrations(db):
+    """Tabulka idempotenčních klíčů hromadných pohybů."""
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS warehouse_movement_batches (
+            idempotency_key TEXT PRIMARY KEY,
+            request_hash TEXT,
+            status_code INTEGER NOT NULL DEFAULT 200,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_warehouse_movement_batches_created
+            ON warehouse_movement_batches(created_at);
+    """)
+    db.commit()
+
+
+def request_hash(lines):
+    """Otisk obsahu dávky (kontrola, že retry posílá totéž)."""
+    raw = json.dumps(lines, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _int_or_none(value):
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def _validate(line, items):
+    """Řádek -> (hodnoty pro INSERT, None) nebo (None, chyba)."""
+    if not isinstance(line, dict):
+        return None, "Řádek musí být objekt"
+    try:
+        item_id = int(line.get("item_id"))
+    except (TypeError, ValueError):
+        return None, "Chybí nebo je neplatné item_id"
+    if item_id not in items:
+        return None, f"Položka {item_id} neexistuje"
+    movement_type = line.get("movement_type")
+    if movement_type not in MOVEMENT_TYPES:
+        return None, "Neplatný typ pohybu"
+    try:
+        qty = float(line.get("qty"))
+    except (TypeError, ValueError):
+        return None, "Chybí nebo je neplatné množství"
+    if not math.isfinite(qty):
+        return None, "Neplatné množství"
+    if movement_type == "adjustment":
+        if qty == 0:
+            return None, "Korekce musí mít nenulové množství"
+    elif qty <= 0:
+        return None, "Množství musí být kladné"
+    try:
+        job_id = _int_or_none(line.get("job_id"))
+        employee_id = _int_or_none(line.get("employee_id"))
+    except (TypeError, ValueError):
+        return None, "Neplatné job_id nebo employee_id"
+    return (item_id, movement_type, qty, job_id,
+            line.get("from_location") or "", line.get("to_location") or "",
+            employee_id, line.get("note") or "", line.get("batch_number") or ""), None
+
+
+def _existing_items(db, lines, status_col):
+    ids = set()
+    for line in lines:
+        try:
+            ids.add(int(line.get("item_id")))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    if not ids:
+        return set()
+    active = f" AND {status_col} = 'active'" if status_col else ""
+    rows = db.execute(
+        f"SELECT id FROM warehouse_items WHERE id IN (SELECT value FROM json_each(?)){active}",
+        (json.dumps(sorted(ids)),)).fetchall()
+    return {r[0] for r in rows}
+
+
+def _stored_response(db, key, digest):
+    row = db.execute(
+        "SELECT request_hash, status_code, response FROM warehouse_movement_batches WHERE idempotency_key = ?",
+        (key,)).fetchone()
+    if row is None:
+        return None
+    if digest and row[0] and row[0] != digest:
+        raise BatchError("Idempotency-Key už byl použit pro jinou dávku", 409)
+    payload = json.loads(row[2])
+    payload["replayed"] = True
+    return payload, row[1]
+
+
+def apply_movement_batch(db, lines, idempotency_key=None, atomic=True, digest=None, finalize=None):
+    """Zapíše dávku pohybů; vrací (payload, status_code).
+
+    lines je seznam řádků, nebo funkce lines(db) načítající řádky uvnitř
+    transakce (inventura). finalize(db, payload) běží před COMMITem a může
+    doplnit payload i další zápisy (stejná transakce). Vyhazuje BatchError.
+    """
+    if idempotency_key is not None:
+        idempotency_key = str(idempotency_key).strip()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise BatchError("Neplatný Idempotency-Key")
+    if not callable(lines) and digest is None and idempotency_key:
+        digest = request_hash(lines)
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if idempotency_key:
+            stored = _stored_response(db, idempotency_key, digest)
+            if stored:
+                db.rollback()
+                return stored
+
+        if callable(lines):
+            lines = lines(db)
+        if not isinstance(lines, list):
+            raise BatchError("lines musí být seznam")
+        if len(lines) > MAX_LINES:
+            raise BatchError(f"Dávka může mít nejvýše {MAX_LINES} řádků")
+
+        cols = _item_columns(db)
+        items = _existing_items(db, lines, cols["status"])
+        results, rows = [], []
+        for i, line in enumerate(lines):
+            values, error = _validate(line, items)
+            if error:
+                results.append({"line": i, "ok": False, "error": error})
+            else:
+                results.append({"line": i, "ok": True})
+                rows.append((i, values))
+        errors = sum(1 for r in results if not r["ok"])
+
+        if errors and atomic:
+            db.rollback()
+            return {"success": False, "error": f"Chybné řádky: {errors}", "results": results,
+                    "applied": 0, "rejected": errors}, 400
+
+        if rows:
+            last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM warehouse_movements").fetchone()[0]
+            db.executemany(f"""
+                INSERT INTO warehouse_movements ({', '.join(_MOVEMENT_FIELDS)})
+                VALUES ({', '.join('?' * len(_MOVEMENT_FIELDS))})
+            """, [values for _i, values in rows])
+            # Zámek držíme od BEGIN IMMEDIATE - nová id jsou právě naše řádky, v pořadí vložení
+            new_ids = [r[0] for r in db.execute(
+                "SELECT id FROM warehouse_movements WHERE id > ? ORDER BY id", (last_id,)).fetchall()]
+            for (i, _values), movement_id in zip(rows, new_ids):
+                results[i]["movement_id"] = movement_id
+
+            deltas, locations = {}, {}
+            for _i, (item_id, movement_type, qty, _job, _from, to_location, *_rest) in rows:
+                sign = MOVEMENT_TYPES[movement_type]
+                if sign:
+                    deltas[item_id] = deltas.get(item_id, 0) + sign * qty
+                if movement_type == "transfer" and to_location:
+                    locations[item_id] = to_location
+            if deltas:
+                db.executemany(f"""
+                    UPDATE warehouse_items
+                    SET {cols['qty']} = {cols['qty']} + ?, updated_at = datetime('now')
+                    WHERE id = ?
+                """, [(delta, item_id) for item_id, delta in deltas.items()])
+            if locations and cols["location"]:
+                db.executemany(f"UPDATE warehouse_items SET {cols['location']} = ? WHERE id = ?",
+                               [(loc, item_id) for item_id, loc in locations.items()])
+
+        payload = {"success": True, "results": results, "applied": len(rows), "rejected": errors}
+        if finalize:
+            finalize(db, payload)
+        if idempotency_key:
+            db.execute("DELETE FROM warehouse_movement_batches WHERE created_at < datetime('now', ?)",
+                       (f"-{KEY_RETENTION_DAYS} days",))
+            db.execute("""
+                INSERT INTO warehouse_movement_batches (idempotency_key, request_hash, status_code, response)
+                VALUES (?, ?, 200, ?)
+            """, (idempotency_key, digest, json.dumps(payload, ensure_ascii=False)))
+        db.commit()
+        return payload, 200
+    except Exception:
+        if db.in_transaction:
+            db.rollback()
+        raise
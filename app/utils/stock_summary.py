@@ -0,0 +1,231 @@
+"""
+Stav skladu - materializované souhrny pro statistiky a hlídání minim.
+
+warehouse_stock_state    (item_id)  - aktivní položka: qty, min_qty, cena,
+                                      expirace (ISO) a stav ok / low / out
+warehouse_stock_summary  (id = 1)   - počet položek, hodnota skladu,
+                                      počet low / out položek
+
+Obě tabulky drží triggery na warehouse_items, takže se aktualizují ve stejné
+transakci jako create_movement, dokončení inventury, sloučení položek i
+ruční úpravy. Souhrn se mění deltou (odečti starý stav položky, přičti
+nový), žádný zápis neskenuje sklad.
+
+Stav položky:
+- out: qty <= 0
+- low: minimum je nastavené a qty < minimum
+- ok:  ostatní
+
+Počty podle data (expirující, expirované, aktivní rezervace) se počítají
+při čtení přes částečné indexy - jsou to rozsahové dotazy na index, ne scan.
+
+Přestavba od nuly: rebuild_stock_summary(db) nebo
+  python -m app.utils.stock_summary rebuild
+"""
+import json
+import sys
+from datetime import date, timedelta
+
+from app.database import table_columns
+
+EXPIRING_DAYS = 30
+
+_STATE_COLUMNS = "item_id, name, unit, location, qty, min_qty, price, expiration_date, state"
+
+
+def _item_columns(db):
+    """Sloupce warehouse_items ve dvou generacích schématu (viz RuleFacts.stock)."""
+    cols = set(table_columns(db, "warehouse_items"))
+    return {
+        "qty": "qty" if "qty" in cols else "quantity",
+        "min_qty": "minStock" if "minStock" in cols else "min_quantity",
+        "price": "price" if "price" in cols else ("unit_price" if "unit_price" in cols else None),
+        "location": "location" if "location" in cols else None,
+        "expiration_date": "expiration_date" if "expiration_date" in cols else None,
+        "status": "status" if "status" in cols else None,
+    }
+
+
+def _state_select(db, row, source=""):
+    """SELECT řádků warehouse_stock_state z warehouse_items (row = NEW v triggeru nebo alias v source)."""
+    c = _item_columns(db)
+    qty = f"COALESCE({row}.{c['qty']}, 0)"
+    min_qty = f"COALESCE({row}.{c['min_qty']}, 0)"
+    price = f"COALESCE({row}.{c['price']}, 0)" if c["price"] else "0"
+    location = f"{row}.{c['location']}" if c["location"] else "NULL"
+    expiration = (f"CASE WHEN {row}.{c['expiration_date']} != '' THEN date({row}.{c['expiration_date']}) END"
+                  if c["expiration_date"] else "NULL")
+    state = f"CASE WHEN {qty} <= 0 THEN 'out' WHEN {min_qty} > 0 AND {qty} < {min_qty} THEN 'low' ELSE 'ok' END"
+    active = f"{row}.{c['status']} = 'active'" if c["status"] else "1"
+    return (f"SELECT {row}.id, {row}.name, {row}.unit, {location}, {qty}, {min_qty}, {price}, "
+            f"{expiration}, {state} {source} WHERE {active}")
+
+
+def _summary_delta_sql(item_expr, sign):
+    """Přičti (sign=1) / odečti (sign=-1) příspěvek položky k souhrnu."""
+    op = "+" if sign > 0 else "-"
+    return f"""
+        UPDATE warehouse_stock_summary SET
+            total_items = total_items {op} 1,
+            total_value = total_value {op} s.qty * s.price,
+            low_stock = low_stock {op} (s.state = 'low'),
+            out_of_stock = out_of_stock {op} (s.state = 'out'),
+            updated_at = datetime('now')
+        FROM (SELECT qty, price, state FROM warehouse_stock_state WHERE item_id = {item_expr}) s
+        WHERE warehouse_stock_summary.id = 1;"""
+
+
+def _remove_sql(item_expr):
+    return f"""{_summary_delta_sql(item_expr, -1)}
+        DELETE FROM warehouse_stock_state WHERE item_id = {item_expr};"""
+
+
+def _add_sql(db):
+    return f"""
+        INSERT INTO warehouse_stock_state ({_STATE_COLUMNS}) {_state_select(db, 'NEW')};
+        {_summary_delta_sql('NEW.id', 1)}"""
+
+
+def apply_stock_summary_migrations(db):
+    """Tabulky stavu skladu, udržovací triggery, indexy a počáteční naplnění."""
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS warehouse_stock_state (
+            item_id INTEGER PRIMARY KEY,
+            name TEXT,
+            unit TEXT,
+            location TEXT,
+            qty REAL NOT NULL DEFAULT 0,
+            min_qty REAL NOT NULL DEFAULT 0,
+            price REAL NOT NULL DEFAULT 0,
+            expiration_date TEXT,
+            state TEXT NOT NULL DEFAULT 'ok'
+        );
+        CREATE INDEX IF NOT EXISTS idx_stock_state_alert
+            ON warehouse_stock_state(state) WHERE state != 'ok';
+        CREATE INDEX IF NOT EXISTS idx_stock_state_expiration
+            ON warehouse_stock_state(expiration_date) WHERE expiration_date IS NOT NULL;
+
+        CREATE TABLE IF NOT EXISTS warehouse_stock_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_items INTEGER NOT NULL DEFAULT 0,
+            total_value REAL NOT NULL DEFAULT 0,
+            low_stock INTEGER NOT NULL DEFAULT 0,
+            out_of_stock INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+    """)
+    if "status" in table_columns(db, "warehouse_reservations"):
+        db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_warehouse_reservations_active_until
+            ON warehouse_reservations(reserved_until) WHERE status = 'active'
+        """)
+
+    c = _item_columns(db)
+    tracked = ", ".join(["name", "unit"] + [v for v in c.values() if v])
+    for name in ("insert", "update", "delete"):
+        db.execute(f"DROP TRIGGER IF EXISTS trg_stock_state_{name}")
+    db.executescript(f"""
+        CREATE TRIGGER trg_stock_state_insert AFTER INSERT ON warehouse_items
+        BEGIN {_add_sql(db)}
+        END;
+        CREATE TRIGGER trg_stock_state_update AFTER UPDATE OF {tracked} ON warehouse_items
+        BEGIN {_remove_sql('OLD.id')} {_add_sql(db)}
+        END;
+        CREATE TRIGGER trg_stock_state_delete AFTER DELETE ON warehouse_items
+        BEGIN {_remove_sql('OLD.id')}
+        END;
+    """)
+    rebuild_stock_summary(db)
+
+
+def rebuild_stock_summary(db):
+    """Přestav stav skladu i souhrn z warehouse_items (jedna transakce)."""
+    try:
+        db.execute("DELETE FROM warehouse_stock_state")
+        db.execute(f"INSERT INTO warehouse_stock_state ({_STATE_COLUMNS}) "
+                   f"{_state_select(db, 'w', 'FROM warehouse_items w')}")
+        db.execute("DELETE FROM warehouse_stock_summary")
+        db.execute("""
+            INSERT INTO warehouse_stock_summary (id, total_items, total_value, low_stock, out_of_stock, updated_at)
+            SELECT 1, COUNT(*), COALESCE(SUM(qty * price), 0),
+                   COALESCE(SUM(state = 'low'), 0), COALESCE(SUM(state = 'out'), 0), datetime('now')
+            FROM warehouse_stock_state
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def warehouse_stats(db, today=None):
+    """Statistiky skladu jedním dotazem (tvar /api/warehouse/stats)."""
+    today = today or date.today()
+    has_reservations = "status" in table_columns(db, "warehouse_reservations")
+    reserved = ("""(SELECT COALESCE(SUM(qty), 0) FROM warehouse_reservations
+                    WHERE status = 'active' AND reserved_until >= :today)""" if has_reservations else "0")
+    row = db.execute(f"""
+        SELECT s.total_items, s.total_value, s.low_stock, s.out_of_stock,
+               (SELECT COUNT(*) FROM warehouse_stock_state
+                WHERE expiration_date > :today AND expiration_date <= :soon) AS expiring_soon,
+               (SELECT COUNT(*) FROM warehouse_stock_state
+                WHERE expiration_date IS NOT NULL AND expiration_date <= :today) AS expired,
+               {reserved} AS reserved
+        FROM warehouse_stock_summary s
+        WHERE s.id = 1
+    """, {"today": today.isoformat(), "soon": (today + timedelta(days=EXPIRING_DAYS)).isoformat()}).fetchone()
+    if row is None:
+        return {"total_value": 0, "total_items": 0, "low_stock": 0, "out_of_stock": 0,
+                "expiring_soon": 0, "expired": 0, "reserved": 0}
+    return {
+        "total_value": round(row["total_value"] or 0, 2),
+        "total_items": row["total_items"],
+        "low_stock": row["low_stock"],
+        "out_of_stock": row["out_of_stock"],
+        "expiring_soon": row["expiring_soon"],
+        "expired": row["expired"],
+        "reserved": round(row["reserved"] or 0, 2),
+    }
+
+
+def low_stock_items(db, item_ids=None, limit=None):
+    """Položky pod nastaveným minimem (qty < min_qty), nejhorší poměr první.
+
+    item_ids omezí výsledek na dané položky (inkrementální běh pravidel).
+    """
+    params = []
+    where = "state != 'ok' AND min_qty > 0"
+    if item_ids is not None:
+        where += " AND item_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(sorted(int(i) for i in item_ids)))
+    sql = f"""
+        SELECT item_id AS id, name, unit, location, qty, min_qty
+        FROM warehouse_stock_state
+        WHERE {where}
+        ORDER BY qty / min_qty, item_id
+    """
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [dict(r) for r in db.execute(sql, params).fetchall()]
+
+
+def main(argv=None):
+    from app.database import open_connection
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m app.utils.stock_summary rebuild")
+        return 2
+    db = open_connection()
+    try:
+        rebuild_stock_summary(db)
+        stats = warehouse_stats(db)
+        print(f"[DB] Stock summary rebuilt: {stats['total_items']} items, "
+              f"{stats['low_stock']} low, {stats['out_of_stock']} out of stock")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
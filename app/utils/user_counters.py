@@ -0,0 +1,237 @@
+"""
+Počítadla pro /api/me - nepřečtené notifikace, otevřené úkoly a issues.
+
+user_counters (user_id) - unread_notifications, open_tasks, open_issues
+
+Uživatel "vidí" řádek podle stejných pravidel jako dřívější dotazy v /api/me:
+- notifikace: user_id nebo zaměstnanec (employee_id) propojený s uživatelem,
+- úkol: created_by, zaměstnanec úkolu (employee_id) nebo přiřazení
+  v task_assignments,
+- issue: zaměstnanec assigned_to nebo přiřazení v issue_assignments.
+Řádek se počítá jednou, i když k němu vede víc cest.
+
+Počítadla drží triggery deltou: změna řádku odečte jeho starý příspěvek
+(OLD) a přičte nový (NEW); přiřazení mění počet jen uživateli, ke kterému
+zatím nevedla jiná cesta. Přepojení zaměstnance na jiného uživatele
+(employees.user_id) přepočítá oba dotčené uživatele.
+
+reconcile_user_counters(db) porovná počítadla s přepočtem od nuly a opraví
+rozdíly (leader scheduleru ji spouští každých RECONCILE_INTERVAL s), ručně:
+  python -m app.utils.user_counters rebuild
+"""
+import os
+import sys
+
+from app.database import _table_exists, table_columns
+
+RECONCILE_INTERVAL = int(os.environ.get("COUNTERS_RECONCILE_INTERVAL", str(6 * 3600)))
+
+_EMPLOYEE_USER = "(SELECT user_id FROM employees WHERE id = {r}.%s)"
+
+# sloupec -> (tabulka, podmínka "otevřeno", přímé cesty k uživateli,
+#             přiřazovací tabulka (tabulka, fk) nebo None, sledované sloupce)
+COUNTERS = {
+    "unread_notifications": (
+        "notifications", "{r}.is_read = 0",
+        {"user_id": "{r}.user_id", "employee_id": _EMPLOYEE_USER % "employee_id"},
+        None, ("is_read", "user_id", "employee_id"),
+    ),
+    "open_tasks": (
+        "tasks", "{r}.status NOT IN ('completed', 'done', 'cancelled', 'closed')",
+        {"created_by": "{r}.created_by", "employee_id": _EMPLOYEE_USER % "employee_id"},
+        ("task_assignments", "task_id"), ("status", "created_by", "employee_id"),
+    ),
+    "open_issues": (
+        "issues", "{r}.status NOT IN ('resolved', 'closed', 'done', 'cancelled')",
+        {"assigned_to": _EMPLOYEE_USER % "assigned_to"},
+        ("issue_assignments", "issue_id"), ("status", "assigned_to"),
+    ),
+}
+
+
+def _spec(db, name):
+    """Definice počítadla omezená na sloupce a tabulky, které ve schématu jsou."""
+    table, is_open, direct, link, tracked = COUNTERS[name]
+    if not _table_exists(db, table):
+        return None
+    cols = set(table_columns(db, table))
+    direct = [expr for col, expr in direct.items() if col in cols]
+    if link and not _table_exists(db, link[0]):
+        link = None
+    return table, is_open, direct, link, [c for c in tracked if c in cols]
+
+
+def _users_sql(spec, row, skip_employee=None):
+    """SELECT uživatelů, kteří vidí řádek row (bez NULL); skip_employee vynechá jedno přiřazení."""
+    _table, _is_open, direct, link, _tracked = spec
+    # CAST: created_by bývá ve starších schématech TEXT ('3' != 3 v UNION)
+    parts = [f"SELECT CAST({expr.format(r=row)} AS INTEGER) AS uid" for expr in direct]
+    if link:
+        skip = f" AND l.employee_id != {skip_employee}" if skip_employee else ""
+        parts.append(f"SELECT e.user_id FROM {link[0]} l JOIN employees e ON e.id = l.employee_id "
+                     f"WHERE l.{link[1]} = {row}.id{skip}")
+    return f"SELECT uid FROM ({' UNION '.join(parts)}) WHERE uid IS NOT NULL"
+
+
+def _add_sql(name, users_sql, where, sign):
+    if sign > 0:
+        return f"""
+            INSERT INTO user_counters (user_id, {name}) SELECT uid, 1 FROM ({users_sql}) WHERE {where}
+            ON CONFLICT(user_id) DO UPDATE SET {name} = {name} + 1, updated_at = datetime('now');"""
+    return f"""
+            UPDATE user_counters SET {name} = {name} - 1, updated_at = datetime('now')
+            WHERE user_id IN ({users_sql}) AND {where};"""
+
+
+def _counter_triggers(db, name):
+    spec = _spec(db, name)
+    if spec is None:
+        return ""
+    table, is_open, _direct, link, tracked = spec
+    new_open, old_open = is_open.format(r="NEW"), is_open.format(r="OLD")
+    sql = f"""
+        CREATE TRIGGER trg_ucount_{name}_insert AFTER INSERT ON {table}
+        BEGIN {_add_sql(name, _users_sql(spec, 'NEW'), new_open, 1)}
+        END;
+        CREATE TRIGGER trg_ucount_{name}_update AFTER UPDATE OF {', '.join(tracked)} ON {table}
+        BEGIN {_add_sql(name, _users_sql(spec, 'OLD'), old_open, -1)}
+              {_add_sql(name, _users_sql(spec, 'NEW'), new_open, 1)}
+        END;
+        CREATE TRIGGER trg_ucount_{name}_delete AFTER DELETE ON {table}
+        BEGIN {_add_sql(name, _users_sql(spec, 'OLD'), old_open, -1)}
+        END;"""
+    if link:
+        link_table, fk = link
+        for op, row, sign in (("insert", "NEW", 1), ("delete", "OLD", -1)):
+            # Uživatel přiřazeného zaměstnance, pokud k otevřenému řádku nevede jiná cesta
+            users = (f"SELECT e.user_id AS uid FROM employees e, {table} s "
+                     f"WHERE e.id = {row}.employee_id AND s.id = {row}.{fk} AND e.user_id IS NOT NULL "
+                     f"AND {is_open.format(r='s')} "
+                     f"AND e.user_id NOT IN ({_users_sql(spec, 's', f'{row}.employee_id')})")
+            sql += f"""
+        CREATE TRIGGER trg_ucount_{name}_{link_table}_{op} AFTER {op.upper()} ON {link_table}
+        BEGIN {_add_sql(name, users, '1', sign)}
+        END;"""
+    return sql
+
+
+def _count_for_user_sql(db, name, user_expr):
+    spec = _spec(db, name)
+    if spec is None:
+        return "0"
+    table, is_open = spec[0], spec[1]
+    return (f"(SELECT COUNT(*) FROM {table} s WHERE {is_open.format(r='s')} "
+            f"AND {user_expr} IN ({_users_sql(spec, 's')}))")
+
+
+def _recount_user_sql(db, user_expr):
+    """Přepočet všech počítadel jednoho uživatele (přepojení zaměstnance)."""
+    values = ", ".join(_count_for_user_sql(db, name, user_expr) for name in COUNTERS)
+    updates = ", ".join(f"{name} = excluded.{name}" for name in COUNTERS)
+    return f"""
+            INSERT INTO user_counters (user_id, {', '.join(COUNTERS)}, updated_at)
+            SELECT {user_expr}, {values}, datetime('now') WHERE {user_expr} IS NOT NULL
+            ON CONFLICT(user_id) DO UPDATE SET {updates}, updated_at = excluded.updated_at;"""
+
+
+def _trigger_names(db):
+    return [r[0] for r in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_ucount_%'")]
+
+
+def apply_user_counters_migrations(db):
+    """Tabulka user_counters, udržovací triggery a počáteční naplnění."""
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS user_counters (
+            user_id INTEGER PRIMARY KEY,
+            unread_notifications INTEGER NOT NULL DEFAULT 0,
+            open_tasks INTEGER NOT NULL DEFAULT 0,
+            open_issues INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_employees_user ON employees(user_id);
+    """)
+    for name in _trigger_names(db):
+        db.execute(f"DROP TRIGGER IF EXISTS {name}")
+    triggers = "".join(_counter_triggers(db, name) for name in COUNTERS)
+    triggers += f"""
+        CREATE TRIGGER trg_ucount_employee_user AFTER UPDATE OF user_id ON employees
+        BEGIN {_recount_user_sql(db, 'OLD.user_id')} {_recount_user_sql(db, 'NEW.user_id')}
+        END;
+        CREATE TRIGGER trg_ucount_employee_delete AFTER DELETE ON employees
+        BEGIN {_recount_user_sql(db, 'OLD.user_id')}
+        END;"""
+    db.executescript(triggers)
+    reconcile_user_counters(db)
+
+
+def _truth(db):
+    """Počítadla přepočtená od nuly: {user_id: {sloupec: počet}}."""
+    truth = {}
+    for name in COUNTERS:
+        spec = _spec(db, name)
+        if spec is None:
+            continue
+        table, is_open, direct, link, _tracked = spec
+        where = is_open.format(r="s")
+        parts = [f"SELECT s.id AS sid, CAST({expr.format(r='s')} AS INTEGER) AS uid FROM {table} s WHERE {where}"
+                 for expr in direct]
+        if link:
+            parts.append(f"SELECT s.id, e.user_id FROM {table} s JOIN {link[0]} l ON l.{link[1]} = s.id "
+                         f"JOIN employees e ON e.id = l.employee_id WHERE {where}")
+        rows = db.execute(f"SELECT uid, COUNT(*) FROM ({' UNION '.join(parts)}) "
+                          f"WHERE uid IS NOT NULL GROUP BY uid").fetchall()
+        for uid, count in rows:
+            truth.setdefault(uid, dict.fromkeys(COUNTERS, 0))[name] = count
+    return truth
+
+
+def reconcile_user_counters(db):
+    """Oprav počítadla podle přepočtu od nuly; vrací počet opravených uživatelů."""
+    zero = dict.fromkeys(COUNTERS, 0)
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        truth = _truth(db)
+        current = {r[0]: dict(zip(COUNTERS, r[1:])) for r in db.execute(
+            f"SELECT user_id, {', '.join(COUNTERS)} FROM user_counters")}
+        fixes = [(uid, *truth.get(uid, zero).values()) for uid in set(truth) | set(current)
+                 if truth.get(uid, zero) != current.get(uid, zero)]
+        if fixes:
+            updates = ", ".join(f"{name} = excluded.{name}" for name in COUNTERS)
+            db.executemany(f"""
+                INSERT INTO user_counters (user_id, {', '.join(COUNTERS)}, updated_at)
+                VALUES (?, {', '.join('?' * len(COUNTERS))}, datetime('now'))
+                ON CONFLICT(user_id) DO UPDATE SET {updates}, updated_at = excluded.updated_at
+            """, fixes)
+        db.commit()
+        return len(fixes)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def counters_for(db, user_id):
+    """Počítadla uživatele (lookup podle primárního klíče; chybějící řádek = nuly)."""
+    row = db.execute(f"SELECT {', '.join(COUNTERS)} FROM user_counters WHERE user_id = ?",
+                     (int(user_id),)).fetchone()
+    return dict(zip(COUNTERS, row)) if row else dict.fromkeys(COUNTERS, 0)
+
+
+def main(argv=None):
+    from app.database import open_connection
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m app.utils.user_counters rebuild")
+        return 2
+    db = open_connection()
+    try:
+        fixed = reconcile_user_counters(db)
+        print(f"[DB] User counters reconciled: {fixed} users corrected")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,16 +3,15 @@ Crew Control System API
 API endpoints for the Team/Crew management system
 """
 
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
 import json
+from datetime import datetime, timedelta
 
-crew_bp = Blueprint('crew', __name__)
+from flask import Blueprint, jsonify, request
 
-def get_db():
-    """Get database connection - imported from main app"""
-    from main import get_db as main_get_db
-    return main_get_db()
+from app.database import get_db
+from app.utils.capacity import team_week_capacity, utilization, week_bounds
+
+crew_bp = Blueprint('crew', __name__)
 
 # =====================================================
 # EMPLOYEE SKILLS API
@@ -189,10 +188,21 @@ def api_crew_capacity():
                 WHERE ec.week_start = ?
             ''', [week]).fetchall()
             
+            # Odpracované hodiny ze sdílené agregace (jeden dotaz pro celý tým)
+            live = team_week_capacity(db, week)
+            result = []
+            for c in capacities:
+                c = dict(c)
+                stats = live.get(c['employee_id'], {})
+                c['live_hours'] = stats.get('weekly_hours', 0)
+                c['active_jobs'] = stats.get('active_jobs', 0)
+                c['live_utilization_pct'] = round(utilization(c['live_hours'], c.get('planned_hours')), 1)
+                result.append(c)
+            
             return jsonify({
                 'ok': True,
                 'week': week,
-                'capacities': [dict(c) for c in capacities]
+                'capacities': result
             })
     
     elif request.method == 'POST' or request.method == 'PATCH':
@@ -324,23 +334,14 @@ def api_crew_ai_insights():
         # Get all employees with their capacity data
         employees = db.execute('SELECT * FROM employees').fetchall()
         
-        today = datetime.now()
-        monday = today - timedelta(days=today.weekday())
-        week_start = monday.strftime('%Y-%m-%d')
-        week_end = (monday + timedelta(days=6)).strftime('%Y-%m-%d')
+        # Týdenní hodiny všech zaměstnanců z labor_weekly (jeden dotaz, cache)
+        capacity = team_week_capacity(db)
         
         for emp in employees:
             emp_dict = dict(emp)
             emp_id = emp_dict['id']
             
-            # Calculate utilization from timesheets
-            ts_result = db.execute('''
-                SELECT COALESCE(SUM(hours), 0) as total
-                FROM timesheets
-                WHERE employee_id = ? AND date >= ? AND date <= ?
-            ''', [emp_id, week_start, week_end]).fetchone()
-            
-            hours = ts_result['total'] if ts_result else 0
+            hours = capacity.get(emp_id, {}).get('weekly_hours', 0)
             utilization = (hours / 40) * 100 if hours else 0
             
             # Check for overload
@@ -400,11 +401,7 @@ def api_crew_ai_insights():
         # General balance insight
         if len(employees) > 0:
             avg_util = sum([
-                (db.execute('''
-                    SELECT COALESCE(SUM(hours), 0) / 40.0 * 100 as util
-                    FROM timesheets
-                    WHERE employee_id = ? AND date >= ? AND date <= ?
-                ''', [dict(e)['id'], week_start, week_end]).fetchone()['util'] or 0)
+                capacity.get(dict(e)['id'], {}).get('weekly_hours', 0) / 40.0 * 100
                 for e in employees
             ]) / len(employees)
             
@@ -445,13 +442,11 @@ def api_crew_dashboard():
     db = get_db()
     
     try:
-        today = datetime.now()
-        monday = today - timedelta(days=today.weekday())
-        week_start = monday.strftime('%Y-%m-%d')
-        week_end = (monday + timedelta(days=6)).strftime('%Y-%m-%d')
+        week_start, week_end = week_bounds()
         
-        # Get employees with calculated metrics
+        # Get employees with calculated metrics (hodiny a zakázky jedním agregátem)
         employees = db.execute('SELECT * FROM employees WHERE status != "inactive"').fetchall()
+        capacity = team_week_capacity(db, week_start)
         
         team_data = []
         total_utilization = 0
@@ -461,15 +456,10 @@ def api_crew_dashboard():
         for emp in employees:
             emp_dict = dict(emp)
             emp_id = emp_dict['id']
+            stats = capacity.get(emp_id, {})
             
             # Weekly hours
-            ts = db.execute('''
-                SELECT COALESCE(SUM(hours), 0) as total
-                FROM timesheets
-                WHERE employee_id = ? AND date >= ? AND date <= ?
-            ''', [emp_id, week_start, week_end]).fetchone()
-            
-            weekly_hours = ts['total'] if ts else 0
+            weekly_hours = stats.get('weekly_hours', 0)
             utilization = (weekly_hours / 40) * 100
             
             total_utilization += utilization
@@ -479,10 +469,7 @@ def api_crew_dashboard():
                 underutilized_count += 1
             
             # Active jobs count
-            jobs_count = db.execute('''
-                SELECT COUNT(*) as cnt FROM job_employees 
-                WHERE employee_id = ?
-            ''', [emp_id]).fetchone()['cnt']
+            jobs_count = stats.get('active_jobs', 0)
             
             emp_dict['weekly_hours'] = weekly_hours
             emp_dict['utilization'] = utilization
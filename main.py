@@ -1,31 +1,64 @@
-import os, re, io, sqlite3, json
-from datetime import datetime, date, timedelta
-from flask import Flask, abort, g, jsonify, render_template, request, send_file, send_from_directory, session, redirect
-from werkzeug.security import generate_password_hash, check_password_hash
-from assignment_helpers import (
-    assign_employees_to_task, assign_employees_to_issue,
-    get_task_assignees, get_issue_assignees,
-    get_employee_tasks, get_employee_issues
-)
-from app.config import (
-    DATABASE as DB_PATH, SECRET_KEY, UPLOAD_FOLDER as UPLOAD_DIR,
-    ROLES, WRITE_ROLES, EMPLOYEE_ROLES, SEND_FILE_MAX_AGE_DEFAULT
+import io
+import json
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from flask import Flask, abort, g, jsonify, redirect, render_template, request, send_file, send_from_directory, session
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from ai_operator_rule_engine import register_ai_operator_routes
+from ai_operator_scheduler import start_scheduler as start_rules_scheduler
+from app.config import DATABASE as DB_PATH
+from app.config import EMPLOYEE_ROLES, ROLES, SECRET_KEY, SEND_FILE_MAX_AGE_DEFAULT, WRITE_ROLES
+from app.config import UPLOAD_FOLDER as UPLOAD_DIR
+from app.database import _table_exists, _table_has_column, close_db, get_db
+from app.utils import static_assets
+from app.utils.helpers import (
+    _employee_user_id,
+    _expand_assignees_with_delegate,
+    _job_insert_cols_and_vals,
+    _job_select_all,
+    _job_title_col,
+    _job_title_update_set,
+    _jobs_info,
+    _normalize_date,
+    _notify_assignees,
+    audit_event,
+    create_notification,
 )
-from app.database import get_db, close_db, _table_has_column, _table_exists
 from app.utils.migrations import (
-    apply_migrations, ensure_schema,
-    _migrate_completed_at, _migrate_employees_enhanced,
-    _migrate_roles_and_hierarchy, _migrate_crew_control_tables,
-    seed_admin, _auto_upgrade_admins_to_owner, seed_employees, seed_plant_catalog
+    _auto_upgrade_admins_to_owner,
+    _migrate_completed_at,
+    _migrate_crew_control_tables,
+    _migrate_employees_enhanced,
+    _migrate_roles_and_hierarchy,
+    apply_migrations,
+    ensure_schema,
+    seed_admin,
+    seed_employees,
+    seed_plant_catalog,
 )
+from app.utils.migrator import _ensure as _ensure_schema_ready
+from app.utils.migrator import bootstrap_database
 from app.utils.permissions import (
-    normalize_role, normalize_employee_role, current_user,
-    require_auth, require_role, requires_role, get_current_user, can_manage_employee
+    can_manage_employee,
+    current_user,
+    get_current_user,
+    normalize_employee_role,
+    normalize_role,
+    require_auth,
+    require_role,
+    requires_role,
 )
-from app.utils.helpers import (
-    audit_event, _employee_user_id, create_notification,
-    _expand_assignees_with_delegate, _notify_assignees, _normalize_date,
-    _jobs_info, _job_title_col, _job_select_all, _job_insert_cols_and_vals, _job_title_update_set
+from assignment_helpers import (
+    assign_employees_to_issue,
+    assign_employees_to_task,
+    get_employee_issues,
+    get_employee_tasks,
+    get_issue_assignees,
+    get_task_assignees,
 )
 
 # Crew Control System API
@@ -37,25 +70,25 @@ except ImportError:
     print("[INFO] Crew API module not available")
 
 # Import route blueprints
+from app.routes.api import api_bp
 from app.routes.auth import auth_bp
-from app.routes.notifications import notifications_bp
+from app.routes.budget import budget_bp
+from app.routes.calendar_routes import calendar_bp
+from app.routes.documents import documents_bp
 from app.routes.employees import employees_bp
+from app.routes.finance import finance_bp
 from app.routes.jobs import jobs_bp
-from app.routes.tasks import tasks_bp
-from app.routes.timesheets import timesheets_bp
-from app.routes.calendar_routes import calendar_bp
-from app.routes.warehouse import warehouse_bp
-from app.routes.planning import planning_bp
-from app.routes.reports import reports_bp
-from app.routes.nursery import nursery_bp
-from app.routes.settings import settings_bp
 from app.routes.mobile import mobile_bp
-from app.routes.finance import finance_bp
-from app.routes.documents import documents_bp
 from app.routes.notes import notes_bp
-from app.routes.budget import budget_bp
-from app.routes.api import api_bp
+from app.routes.notifications import notifications_bp
+from app.routes.nursery import nursery_bp
 from app.routes.parties import parties_bp
+from app.routes.planning import planning_bp
+from app.routes.reports import reports_bp
+from app.routes.settings import settings_bp
+from app.routes.tasks import tasks_bp
+from app.routes.timesheets import timesheets_bp
+from app.routes.warehouse import warehouse_bp
 
 app = Flask(__name__, static_folder=".", static_url_path="")
 # Disable aggressive caching in development so UI settings (language/theme) apply immediately
@@ -82,6 +115,9 @@ app.register_blueprint(budget_bp)
 app.register_blueprint(api_bp)
 app.register_blueprint(parties_bp)
 
+# AI Operátor: insighty a návrhy akcí materializované schedulerem (/api/ai/insights*, /api/ai/dashboard/v2)
+register_ai_operator_routes(app)
+
 # Register Crew Control System API blueprint
 if CREW_API_AVAILABLE:
     app.register_blueprint(crew_bp)
@@ -91,7 +127,10 @@ if CREW_API_AVAILABLE:
 def _disable_cache_for_static(resp):
     try:
         path = request.path or ""
-        if path.startswith("/static/") or path.endswith(".js") or path.endswith(".css"):
+        if resp.headers.get("Cache-Control") == static_assets.IMMUTABLE:
+            # URL s otiskem obsahu - smí se cachovat natrvalo
+            pass
+        elif path.startswith("/static/") or path.endswith(".js") or path.endswith(".css"):
             resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
             resp.headers["Pragma"] = "no-cache"
             resp.headers["Expires"] = "0"
@@ -102,6 +141,15 @@ def _disable_cache_for_static(resp):
         pass
     return resp
 
+@app.after_request
+def _fingerprint_static_refs(resp):
+    """Odkazy na /static/ v HTML stránkách -> URL s otiskem (app.utils.static_assets)."""
+    try:
+        return static_assets.rewrite_html_response(resp)
+    except Exception as e:
+        print(f"[STATIC] rewrite failed: {e}")
+        return resp
+
 app.secret_key = SECRET_KEY
 
 # ----------------- Database utilities -----------------
@@ -115,11 +163,19 @@ def teardown_db(exception=None):
 # Helper functions are imported from app.utils.helpers and app.utils.permissions
 
 
+# Migrace a seed běží jednou při startu workeru (koordinováno file lockem),
+# ne při každém requestu.
+with app.app_context():
+    bootstrap_database()
+
+# AI rule engine běží na pozadí (leader přes scheduler_lease), ne při GET dashboardu
+start_rules_scheduler()
+
+
 @app.before_request
 def _ensure():
-    """Run migrations and seed data on startup"""
-    from app.utils.migrations import _ensure as _run_migrations
-    _run_migrations()
+    """Fallback if startup bootstrap failed; no DB queries once the schema is ready."""
+    return _ensure_schema_ready()
 
 @app.route("/")
 def index():
@@ -136,8 +192,14 @@ def work_inbox_page():
 
 @app.route("/static/<path:filename>")
 def static_files(filename):
-    """Serve static files from static/ directory"""
-    return send_from_directory("static", filename)
+    """Serve static files from static/ directory (fingerprinted URLs are immutable)"""
+    return static_assets.send_asset(filename)
+
+
+@app.route("/sw.js")
+def service_worker():
+    """Service worker with PRECACHE_URLS and CACHE_VERSION from the asset manifest"""
+    return app.response_class(static_assets.service_worker_source(), mimetype="application/javascript")
 
 @app.route("/uploads/<path:name>")
 def uploaded_file(name):
@@ -2,9 +2,11 @@
 Planning Module API - WORKING VERSION
 Uses EXISTING data from jobs, tasks, timesheets, employees
 """
-from flask import jsonify, request, session
-from datetime import datetime, date, timedelta
+import json
 import os
+from datetime import date, datetime, timedelta
+
+from flask import jsonify, request, session
 
 # Optional requests for weather
 try:
@@ -13,7 +15,9 @@ try:
 except ImportError:
     REQUESTS_AVAILABLE = False
 
-get_db = None
+from app.database import get_db
+from app.utils.helpers import _normalize_date
+
 WEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "")
 WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/forecast"
 
@@ -61,38 +65,77 @@ def get_weather_forecast(lat=49.69, lon=14.01):
 # TIMELINE
 # ================================================================
 def get_planning_timeline():
+    """Zakázky s úkoly pro timeline - 2 dotazy bez ohledu na počet zakázek.
+
+    Volitelné parametry: status, from/to (okno zobrazení, zakázky bez termínů
+    se vrací vždy), limit/offset (stránkování).
+    """
     try:
         status = request.args.get('status')
+        d_from = _normalize_date(request.args.get('from'))
+        d_to = _normalize_date(request.args.get('to'))
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
         db = get_db()
         
-        query = """SELECT j.id, j.name, j.code, j.status, j.start_date, j.planned_end_date,
-                   j.deadline, j.progress, j.priority, j.estimated_hours, j.actual_hours,
-                   j.estimated_value as budget_total, j.actual_value, j.completed_at
-                   FROM jobs j WHERE j.status != 'cancelled'"""
+        where = "j.status != 'cancelled'"
         params = []
         if status:
-            query += " AND j.status = ?"
+            where += " AND j.status = ?"
             params.append(status)
-        query += " ORDER BY CASE WHEN j.priority IS NULL THEN 1 ELSE 0 END, j.priority, j.deadline"
+        if d_to:
+            where += " AND (j.start_date IS NULL OR j.start_date <= ?)"
+            params.append(d_to)
+        if d_from:
+            where += " AND (COALESCE(j.planned_end_date, j.deadline, j.start_date) IS NULL OR COALESCE(j.planned_end_date, j.deadline, j.start_date) >= ?)"
+            params.append(d_from)
+        
+        # Počty úkolů jedním seskupeným agregátem místo COUNT na každou zakázku
+        query = f"""SELECT j.id, j.name, j.code, j.status, j.start_date, j.planned_end_date,
+                   j.deadline, j.progress, j.priority, j.estimated_hours, j.actual_hours,
+                   j.estimated_value as budget_total, j.actual_value, j.completed_at,
+                   COALESCE(ts.task_count, 0) as task_count,
+                   COALESCE(ts.completed_tasks, 0) as completed_tasks
+                   FROM jobs j
+                   LEFT JOIN (SELECT job_id, COUNT(*) as task_count,
+                                     COUNT(CASE WHEN status = 'done' THEN 1 END) as completed_tasks
+                              FROM tasks GROUP BY job_id) ts ON ts.job_id = j.id
+                   WHERE {where}
+                   ORDER BY CASE WHEN j.priority IS NULL THEN 1 ELSE 0 END, j.priority, j.deadline, j.id"""
+        total = None
+        if limit:
+            total = db.execute(f"SELECT COUNT(*) FROM jobs j WHERE {where}", params).fetchone()[0]
+            query += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+        projects = [dict(p) for p in db.execute(query, params).fetchall()]
+        
+        # Úkoly všech zakázek na stránce jedním dotazem
+        tasks_by_job = {p['id']: [] for p in projects}
+        if projects:
+            task_query = """SELECT t.id, t.title, t.status, t.due_date, t.employee_id, t.job_id
+                FROM tasks t WHERE t.job_id IN (SELECT value FROM json_each(?))"""
+            task_params = [json.dumps(list(tasks_by_job))]
+            if d_from:
+                task_query += " AND (t.due_date IS NULL OR t.due_date >= ?)"
+                task_params.append(d_from)
+            if d_to:
+                task_query += " AND (t.due_date IS NULL OR t.due_date <= ?)"
+                task_params.append(d_to)
+            task_query += " ORDER BY t.job_id, t.due_date ASC"
+            for t in db.execute(task_query, task_params).fetchall():
+                task = dict(t)
+                tasks_by_job[task.pop('job_id')].append(task)
         
-        projects = db.execute(query, params).fetchall()
         result = []
         for proj in projects:
-            task_stats = db.execute("""SELECT COUNT(*) as task_count,
-                COUNT(CASE WHEN t.status = 'done' THEN 1 END) as completed_tasks
-                FROM tasks t WHERE t.job_id = ?""", (proj['id'],)).fetchone()
-            
-            tasks = db.execute("""SELECT t.id, t.title, t.status, t.due_date, t.employee_id
-                FROM tasks t WHERE t.job_id = ? ORDER BY t.due_date ASC""", (proj['id'],)).fetchall()
-            
-            proj_dict = dict(proj)
-            proj_dict['task_count'] = task_stats['task_count']
-            proj_dict['completed_tasks'] = task_stats['completed_tasks']
-            result.append({'project': proj_dict, 'tasks': [dict(t) for t in tasks],
-                          'task_count': task_stats['task_count'],
-                          'completed_tasks': task_stats['completed_tasks']})
-        
-        return jsonify({'success': True, 'timeline': result})
+            result.append({'project': proj, 'tasks': tasks_by_job[proj['id']],
+                          'task_count': proj['task_count'],
+                          'completed_tasks': proj['completed_tasks']})
+        
+        response = {'success': True, 'timeline': result}
+        if total is not None:
+            response.update({'total': total, 'limit': limit, 'offset': offset})
+        return jsonify(response)
     except Exception as e:
         print(f"[ERROR] Timeline: {e}")
         import traceback
@@ -282,7 +325,7 @@ def get_planning_costs(job_id=None):
                     SELECT COALESCE(SUM(ts.hours * COALESCE(e.hourly_rate, 0)), 0) as cost
                     FROM timesheets ts
                     LEFT JOIN employees e ON ts.employee_id = e.id
-                    WHERE ts.date >= ? AND ts.date < ?
+                    WHERE ts.date_iso >= ? AND ts.date_iso < ?
                 """, (m_start.isoformat(), m_end.isoformat())).fetchone()
                 
                 months_data.append({
@@ -366,7 +409,7 @@ def get_smart_suggestions():
             SELECT e.id, e.name, SUM(ts.hours) as total_hours
             FROM timesheets ts
             JOIN employees e ON ts.employee_id = e.id
-            WHERE ts.date >= ?
+            WHERE ts.date_iso >= ?
             GROUP BY e.id
             HAVING SUM(ts.hours) > 40
             ORDER BY total_hours DESC
@@ -385,7 +428,7 @@ def get_smart_suggestions():
         week_hours = db.execute("""
             SELECT e.id, e.name, COALESCE(SUM(ts.hours), 0) as total_hours
             FROM employees e
-            LEFT JOIN timesheets ts ON ts.employee_id = e.id AND ts.date >= ?
+            LEFT JOIN timesheets ts ON ts.employee_id = e.id AND ts.date_iso >= ?
             WHERE e.status = 'active'
             GROUP BY e.id
             HAVING total_hours > 0
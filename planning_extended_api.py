@@ -2,12 +2,13 @@
 Planning Extended API - All New Features
 Nursery, Recurring, Materials, Photos, etc.
 """
-from flask import jsonify, request, session
-from datetime import datetime, date, timedelta
 import json
 import os
+from datetime import date, datetime, timedelta
+
+from flask import jsonify, request, session
 
-get_db = None
+from app.database import get_db
 
 # ================================================================
 # 1. NURSERY - Trvalkové školka 🌸
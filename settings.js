@@ -624,7 +624,7 @@
   
   function exportData() {
     // Server-side export (owner/admin only)
-    if (!confirm('Stáhnout export všech dat do JSON?')) return;
+    if (!confirm('Stáhnout export všech dat (NDJSON)?')) return;
 
     // Uložíme čas exportu lokálně (UI), samotný soubor dodá server
     currentSettings.lastExport = new Date().toISOString();
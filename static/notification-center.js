@@ -5,7 +5,10 @@
   let unreadCount = 0;
   let notifications = [];
   let isOpen = false;
-  let pollInterval = null;
+  let longPolling = false;
+  let stream = null;
+  let lastEventId = null;
+  let refreshTimer = null;
   let container = null;
 
   // Icons
@@ -100,6 +103,81 @@
     }
   }
 
+  // Víc událostí za sebou (fan-out, hromadné přiřazení) = jeden fetch
+  function scheduleRefresh() {
+    if (refreshTimer) return;
+    refreshTimer = setTimeout(() => {
+      refreshTimer = null;
+      fetchNotifications();
+    }, 300);
+  }
+
+  function handleStreamEvent(type, data) {
+    if (type === 'unread') {
+      unreadCount = data.unread || 0;
+      updateBadge();
+      if (isOpen) scheduleRefresh();
+    } else if (type === 'notification' || type === 'notifications' || type === 'resync') {
+      scheduleRefresh();
+    }
+    // Ostatní komponenty (AI operátor, dashboard) poslouchají na window
+    window.dispatchEvent(new CustomEvent('gd:stream', { detail: { type: type, data: data } }));
+  }
+
+  const STREAM_EVENTS = ['notification', 'notifications', 'unread', 'ai_notification', 'insights', 'resync'];
+
+  function startStream() {
+    if (!('EventSource' in window)) {
+      longPoll();
+      return;
+    }
+    stream = new EventSource('/api/stream');
+    STREAM_EVENTS.forEach(type => {
+      stream.addEventListener(type, (e) => {
+        lastEventId = e.lastEventId || lastEventId;
+        let data = {};
+        try { data = JSON.parse(e.data || '{}'); } catch (err) { /* ignore */ }
+        handleStreamEvent(type, data);
+      });
+    });
+    stream.addEventListener('ready', (e) => { lastEventId = e.lastEventId || lastEventId; });
+    stream.onerror = () => {
+      // EventSource se po výpadku připojuje sám; CLOSED = server odmítl (503 / 401)
+      if (stream.readyState === EventSource.CLOSED) {
+        stream = null;
+        longPoll();
+      }
+    };
+  }
+
+  // Long-poll je jen dočasná náhrada - po SSE_RETRY_MS zkus znovu EventSource
+  const SSE_RETRY_MS = 60000;
+
+  async function longPoll() {
+    if (longPolling) return;
+    longPolling = true;
+    const retrySseAt = Date.now() + SSE_RETRY_MS;
+    while (longPolling) {
+      if ('EventSource' in window && Date.now() >= retrySseAt) {
+        longPolling = false;
+        startStream();
+        return;
+      }
+      try {
+        const q = lastEventId !== null ? '&last_event_id=' + encodeURIComponent(lastEventId) : '';
+        const response = await fetch('/api/stream?mode=poll' + q, { credentials: 'same-origin' });
+        if (!response.ok) throw new Error('HTTP ' + response.status);
+        const data = await response.json();
+        if (data.resync) handleStreamEvent('resync', {});
+        (data.events || []).forEach(ev => handleStreamEvent(ev.event, ev.data || {}));
+        lastEventId = data.last_event_id;
+      } catch (e) {
+        console.warn('Notification long-poll failed:', e);
+        await new Promise(resolve => setTimeout(resolve, 30000));
+      }
+    }
+  }
+
   // Mark notification as read
   async function markAsRead(id) {
     try {
@@ -318,8 +396,8 @@
     // Initial fetch
     fetchNotifications();
 
-    // Poll every 30 seconds
-    pollInterval = setInterval(fetchNotifications, 30000);
+    // Změny chodí přes /api/stream (SSE), fallback long-poll
+    startStream();
 
     // Request permission after a delay (safely — Safari may not support Notification API)
     setTimeout(() => {
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Testy labor rollupů: triggery na timesheets musí dát stejný výsledek jako
+rebuild_labor_rollups (vložení, změny data / hodin / zakázky, smazání).
+Spustit: python3 -m pytest -q test_labor_rollup.py
+"""
+import unittest
+
+import testing_support
+from app.utils.labor_rollup import rebuild_labor_rollups
+
+
+class LaborRollupTest(testing_support.DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        insert = testing_support.insert
+        self.employee = insert(self.db, "employees", name="Rollup Test", role="worker")
+        self.other_employee = insert(self.db, "employees", name="Rollup Test 2", role="worker")
+        self.job = insert(self.db, "jobs", title="Rollup A", name="Rollup A", client="", city="", code="RA")
+        self.other_job = insert(self.db, "jobs", title="Rollup B", name="Rollup B", client="", city="", code="RB")
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.execute("DELETE FROM timesheets WHERE employee_id IN (?, ?)", (self.employee, self.other_employee))
+        self.db.execute("DELETE FROM employees WHERE id IN (?, ?)", (self.employee, self.other_employee))
+        self.db.execute("DELETE FROM jobs WHERE id IN (?, ?)", (self.job, self.other_job))
+        self.db.commit()
+        super().tearDown()
+
+    def _timesheet(self, date, hours, employee=None, job=None):
+        cur = self.db.execute("INSERT INTO timesheets (employee_id, job_id, date, hours) VALUES (?, ?, ?, ?)",
+                              (employee or self.employee, job or self.job, date, hours))
+        self.db.commit()
+        return cur.lastrowid
+
+    def _rollups(self):
+        ids = (self.employee, self.other_employee)
+        daily = self.db.execute(
+            "SELECT employee_id, job_id, day, ROUND(hours, 6), minutes, entries, overtime_minutes "
+            "FROM labor_daily WHERE employee_id IN (?, ?) ORDER BY 1, 2, 3", ids).fetchall()
+        weekly = self.db.execute(
+            "SELECT employee_id, week_start, ROUND(hours, 6), minutes, entries, overtime_minutes, days_worked "
+            "FROM labor_weekly WHERE employee_id IN (?, ?) ORDER BY 1, 2", ids).fetchall()
+        return [tuple(r) for r in daily], [tuple(r) for r in weekly]
+
+    def assertMatchesRebuild(self):
+        maintained = self._rollups()
+        rebuild_labor_rollups(self.db)
+        self.assertEqual(maintained, self._rollups())
+
+    def _daily(self, day, job=None):
+        return self.db.execute(
+            "SELECT hours, entries, overtime_minutes FROM labor_daily WHERE employee_id = ? AND job_id = ? AND day = ?",
+            (self.employee, job or self.job, day)).fetchone()
+
+    def test_insert_counts_entry_once(self):
+        self._timesheet("2026-03-02", 8)
+        row = self._daily("2026-03-02")
+        self.assertEqual((row["hours"], row["entries"], row["overtime_minutes"]), (8, 1, 0))
+        self.assertMatchesRebuild()
+
+    def test_czech_date_insert_counts_once(self):
+        ts = self._timesheet("3.3.2026", 8)
+        stored = self.db.execute("SELECT date, date_iso FROM timesheets WHERE id = ?", (ts,)).fetchone()
+        self.assertEqual(tuple(stored), ("2026-03-03", "2026-03-03"))
+        row = self._daily("2026-03-03")
+        self.assertEqual((row["hours"], row["entries"], row["overtime_minutes"]), (8, 1, 0))
+        self.assertMatchesRebuild()
+
+    def test_weekly_overtime_across_jobs(self):
+        self._timesheet("2026-03-04", 6)
+        self._timesheet("2026-03-04", 6, job=self.other_job)
+        week = self.db.execute("SELECT hours, entries, overtime_minutes, days_worked FROM labor_weekly "
+                               "WHERE employee_id = ? AND week_start = '2026-03-02'", (self.employee,)).fetchone()
+        self.assertEqual(tuple(week), (12, 2, 240, 1))
+        self.assertMatchesRebuild()
+
+    def test_edits_and_deletes_match_rebuild(self):
+        first = self._timesheet("2026-03-09", 5)
+        second = self._timesheet("2026-03-09", 4)
+        self._timesheet("2026-03-10", 9, job=self.other_job)
+        self.assertMatchesRebuild()
+
+        steps = [
+            ("UPDATE timesheets SET hours = 7 WHERE id = ?", (first,)),
+            ("UPDATE timesheets SET date = '12.3.2026' WHERE id = ?", (first,)),
+            ("UPDATE timesheets SET date = '2026-03-16', hours = 3 WHERE id = ?", (second,)),
+            ("UPDATE timesheets SET job_id = ? WHERE id = ?", (self.other_job, first)),
+            ("UPDATE timesheets SET employee_id = ? WHERE id = ?", (self.other_employee, second)),
+            ("UPDATE timesheets SET date = date WHERE id = ?", (first,)),
+            ("DELETE FROM timesheets WHERE id = ?", (first,)),
+        ]
+        for sql, params in steps:
+            with self.subTest(sql=sql):
+                self.db.execute(sql, params)
+                self.db.commit()
+                self.assertMatchesRebuild()
+
+        self.assertIsNone(self._daily("2026-03-12", job=self.other_job))
+        self.assertIsNone(self._daily("2026-03-09"))
+
+
+if __name__ == "__main__":
+    unittest.main()
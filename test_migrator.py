@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Testy registru migrací a ledgeru schema_migrations.
+Spustit: python3 -m pytest -q test_migrator.py
+"""
+import unittest
+
+import testing_support
+from app.utils import migrator
+
+
+class MigratorLedgerTest(testing_support.DatabaseTestCase):
+    def _ledger(self):
+        return {row["version"]: row["checksum"]
+                for row in self.db.execute("SELECT version, checksum FROM schema_migrations")}
+
+    def test_versions_unique_and_ordered(self):
+        versions = [mig["version"] for mig in migrator.MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_bootstrap_records_every_migration(self):
+        ledger = self._ledger()
+        for mig in migrator.MIGRATIONS:
+            self.assertEqual(ledger.get(mig["version"]), mig["checksum"], mig["name"])
+        self.assertEqual(migrator._read_digest(self.db), migrator.REGISTRY_DIGEST)
+        self.assertEqual(migrator.pending_migrations(self.db), [])
+
+    def test_migrate_is_noop_when_current(self):
+        self.assertEqual(migrator.migrate(self.db, verbose=False), [])
+
+    def test_checksums_follow_source_code(self):
+        # Žádná migrace nesmí mít checksum z ručně psaného řetězce místo kódu
+        for mig in migrator.MIGRATIONS:
+            if mig["legacy_checksum"]:
+                self.assertNotEqual(mig["checksum"], mig["legacy_checksum"], mig["name"])
+
+    def test_legacy_and_missing_checksums_are_backfilled(self):
+        legacy = next(mig for mig in migrator.MIGRATIONS if mig["legacy_checksum"])
+        plain = next(mig for mig in migrator.MIGRATIONS if not mig["repeatable"] and mig is not legacy)
+        self.db.execute("UPDATE schema_migrations SET checksum = ? WHERE version = ?",
+                        (legacy["legacy_checksum"], legacy["version"]))
+        self.db.execute("UPDATE schema_migrations SET checksum = NULL WHERE version = ?", (plain["version"],))
+        self.db.commit()
+
+        self.assertEqual(migrator.migrate(self.db, verbose=False), [])
+        ledger = self._ledger()
+        self.assertEqual(ledger[legacy["version"]], legacy["checksum"])
+        self.assertEqual(ledger[plain["version"]], plain["checksum"])
+
+    def test_changed_one_shot_migration_is_not_rerun(self):
+        mig = next(mig for mig in migrator.MIGRATIONS if not mig["repeatable"])
+        self.db.execute("UPDATE schema_migrations SET checksum = 'stale' WHERE version = ?", (mig["version"],))
+        self.db.commit()
+        try:
+            self.assertEqual(migrator.migrate(self.db, verbose=False), [])
+            self.assertEqual(self._ledger()[mig["version"]], "stale")
+        finally:
+            self.db.execute("UPDATE schema_migrations SET checksum = ? WHERE version = ?",
+                            (mig["checksum"], mig["version"]))
+            self.db.commit()
+
+    def test_changed_repeatable_migration_reruns(self):
+        mig = next(mig for mig in migrator.MIGRATIONS if mig["repeatable"])
+        self.db.execute("UPDATE schema_migrations SET checksum = 'stale' WHERE version = ?", (mig["version"],))
+        self.db.commit()
+        self.assertEqual(migrator.migrate(self.db, verbose=False), [mig["version"]])
+        self.assertEqual(self._ledger()[mig["version"]], mig["checksum"])
+
+    def test_missing_migration_is_applied(self):
+        mig = migrator.MIGRATIONS[-1]
+        self.db.execute("DELETE FROM schema_migrations WHERE version = ?", (mig["version"],))
+        self.db.commit()
+        self.assertIn(mig["version"], [p["version"] for p in migrator.pending_migrations(self.db)])
+        self.assertEqual(migrator.migrate(self.db, verbose=False), [mig["version"]])
+        self.assertEqual(self._ledger()[mig["version"]], mig["checksum"])
+
+
+if __name__ == "__main__":
+    unittest.main()
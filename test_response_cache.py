@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Testy sdílené cache odpovědí: generace tagů z triggerů, HIT/MISS, ETag / 304
+a zneplatnění zápisem do tagované tabulky i ručním invalidate().
+Spustit: python3 -m pytest -q test_response_cache.py
+"""
+import unittest
+
+import testing_support
+from app.database import _table_exists
+from app.utils import response_cache
+from app.utils.stock_summary import _item_columns
+
+
+class TagGenerationTest(testing_support.DatabaseTestCase):
+    def _generation(self, tag):
+        row = self.db.execute("SELECT generation FROM cache_generation WHERE name = ?", (tag,)).fetchone()
+        return row[0] if row else None
+
+    def test_every_existing_tag_table_has_triggers(self):
+        triggers = {r[0] for r in self.db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_cachegen_%'")}
+        for table in response_cache.TAG_TABLES:
+            if not _table_exists(self.db, table):
+                continue
+            with self.subTest(table=table):
+                self.assertIsNotNone(self._generation(table))
+                for op in ("insert", "update", "delete"):
+                    self.assertIn(f"trg_cachegen_{table}_{op}", triggers)
+
+    def test_writes_bump_generation(self):
+        start = self._generation("notes")
+        note = testing_support.insert(self.db, "notes", title="Cache test", content="x", body="x")
+        self.db.execute("UPDATE notes SET title = 'Cache test 2' WHERE id = ?", (note,))
+        self.db.execute("DELETE FROM notes WHERE id = ?", (note,))
+        self.db.commit()
+        self.assertEqual(self._generation("notes"), start + 3)
+        self.assertEqual(response_cache.tag_versions(self.db, ("notes", "no_such_tag")),
+                         f"notes:{start + 3},no_such_tag:0")
+
+    def test_rolled_back_write_keeps_generation(self):
+        start = self._generation("notes")
+        testing_support.insert(self.db, "notes", title="Cache test", content="x", body="x")
+        self.db.rollback()
+        self.assertEqual(self._generation("notes"), start)
+
+
+class CachedResponseTest(testing_support.DatabaseTestCase):
+    URL = "/api/warehouse/stats"
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        self.client = testing_support.admin_client()
+        self.items = []
+
+    def tearDown(self):
+        for item_id in self.items:
+            self.db.execute("DELETE FROM warehouse_items WHERE id = ?", (item_id,))
+        self.db.commit()
+        super().tearDown()
+
+    def _get(self, **headers):
+        return self.client.get(self.URL, headers=headers)
+
+    def test_hit_after_miss_with_same_etag(self):
+        first = self._get()
+        self.assertEqual((first.status_code, first.headers["X-Cache"]), (200, "MISS"))
+        second = self._get()
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(second.get_data(), first.get_data())
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(self._get(**{"If-None-Match": first.headers["ETag"]}).status_code, 304)
+
+    def test_write_to_tagged_table_invalidates(self):
+        before = self._get().get_json()
+        qty = _item_columns(self.db)["qty"]
+        self.items.append(testing_support.insert(self.db, "warehouse_items", name="Cache test", status="active",
+                                                 **{qty: 5}))
+        self.db.commit()
+        after = self._get()
+        self.assertEqual(after.headers["X-Cache"], "MISS")
+        self.assertEqual(after.get_json()["stats"]["total_items"], before["stats"]["total_items"] + 1)
+
+    def test_manual_invalidate(self):
+        self._get()
+        response_cache.invalidate(self.db, "warehouse_reservations")
+        self.assertEqual(self._get().headers["X-Cache"], "MISS")
+
+    def test_anonymous_response_is_not_served_from_cache(self):
+        self._get()
+        anon = testing_support.app.test_client().get(self.URL)
+        self.assertEqual(anon.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
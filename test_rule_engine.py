@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Testy zápisu nálezů rule enginu (upsert insightů a jejich stavy).
+Spustit: python3 -m pytest -q test_rule_engine.py
+"""
+import unittest
+
+import testing_support
+from ai_operator_rule_engine import RuleEngine, dismiss_insight, resolve_insight, snooze_insight
+
+
+class FlushFindingsTest(testing_support.DatabaseTestCase):
+    KEY = "R1_flush_test"
+
+    def tearDown(self):
+        self.db.execute("DELETE FROM insight WHERE insight_key = ?", (self.KEY,))
+        self.db.commit()
+        super().tearDown()
+
+    def _flush(self, summary="Zakázka je po termínu"):
+        engine = RuleEngine(self.db)
+        engine._create_or_update_insight(self.KEY, "DEADLINE_RISK", "WARNING", "Test", summary,
+                                         {"job_id": 1}, [], "job", 1)
+        # Bez pravidel v běhu - auto-resolve se netýká
+        engine._flush_findings([])
+        return engine
+
+    def _insight(self):
+        return self.db.execute("SELECT id, status, summary, resolved_at FROM insight WHERE insight_key = ?",
+                               (self.KEY,)).fetchone()
+
+    def test_new_finding_is_open(self):
+        engine = self._flush()
+        self.assertEqual(self._insight()["status"], "open")
+        self.assertEqual([i["key"] for i in engine.insights_generated], [self.KEY])
+
+    def test_snoozed_insight_stays_snoozed(self):
+        self._flush()
+        snooze_insight(self._insight()["id"], "2099-01-01")
+        self._flush(summary="Zakázka je stále po termínu")
+        row = self._insight()
+        self.assertEqual(row["status"], "snoozed")
+        self.assertEqual(row["summary"], "Zakázka je stále po termínu")
+
+    def test_dismissed_insight_reopens(self):
+        self._flush()
+        dismiss_insight(self._insight()["id"], "not_relevant")
+        self._flush()
+        self.assertEqual(self._insight()["status"], "open")
+
+    def test_resolved_insight_reopens(self):
+        self._flush()
+        resolve_insight(self._insight()["id"])
+        self.assertIsNotNone(self._insight()["resolved_at"])
+        self._flush()
+        row = self._insight()
+        self.assertEqual(row["status"], "open")
+        self.assertIsNone(row["resolved_at"])
+
+
+if __name__ == "__main__":
+    unittest.main()
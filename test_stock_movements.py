@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Testy hromadných skladových pohybů: idempotence (replay / 409), atomic
+a částečné dávky, dokončení inventury se smazanou položkou.
+Spustit: python3 -m pytest -q test_stock_movements.py
+"""
+import unittest
+import uuid
+
+import testing_support
+from app.utils.stock_summary import _item_columns
+
+
+class StockTestCase(testing_support.DatabaseTestCase):
+    """Dvě skladové položky (po 10 ks) a přihlášený admin."""
+
+    def setUp(self):
+        super().setUp()
+        self.qty_col = _item_columns(self.db)["qty"]
+        self.items = [self._item(f"Batch test {i}", 10) for i in range(2)]
+        self.db.commit()
+        self.client = testing_support.admin_client()
+
+    def tearDown(self):
+        ids = ",".join(str(i) for i in self.items)
+        self.db.execute(f"DELETE FROM warehouse_movements WHERE item_id IN ({ids})")
+        self.db.execute(f"DELETE FROM warehouse_items WHERE id IN ({ids})")
+        self.db.commit()
+        super().tearDown()
+
+    def _item(self, name, qty):
+        return testing_support.insert(self.db, "warehouse_items", name=name, status="active",
+                                      **{self.qty_col: qty})
+
+    def _qty(self, item_id):
+        return self.db.execute(f"SELECT {self.qty_col} FROM warehouse_items WHERE id = ?", (item_id,)).fetchone()[0]
+
+    def _movements(self):
+        ids = ",".join(str(i) for i in self.items)
+        return self.db.execute(f"SELECT COUNT(*) FROM warehouse_movements WHERE item_id IN ({ids})").fetchone()[0]
+
+    def _post(self, lines, key=None, **body):
+        headers = {"Idempotency-Key": key} if key else {}
+        return self.client.post("/api/warehouse/movements/batch", json=dict(body, lines=lines), headers=headers)
+
+
+class StockMovementBatchTest(StockTestCase):
+    def test_batch_applies_all_lines(self):
+        resp = self._post([{"item_id": self.items[0], "movement_type": "in", "qty": 5},
+                           {"item_id": self.items[1], "movement_type": "out", "qty": 3}])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["applied"], 2)
+        self.assertEqual((self._qty(self.items[0]), self._qty(self.items[1])), (15, 7))
+
+    def test_replay_returns_stored_response(self):
+        key = f"test-{uuid.uuid4()}"
+        lines = [{"item_id": self.items[0], "movement_type": "in", "qty": 4}]
+        first = self._post(lines, key)
+        self.assertEqual(first.status_code, 200)
+        replay = self._post(lines, key)
+        self.assertEqual(replay.status_code, 200)
+        self.assertTrue(replay.get_json()["replayed"])
+        self.assertEqual(replay.get_json()["results"], first.get_json()["results"])
+        self.assertEqual(self._qty(self.items[0]), 14)
+        self.assertEqual(self._movements(), 1)
+
+    def test_key_reuse_with_other_lines_is_conflict(self):
+        key = f"test-{uuid.uuid4()}"
+        self._post([{"item_id": self.items[0], "movement_type": "in", "qty": 4}], key)
+        resp = self._post([{"item_id": self.items[0], "movement_type": "in", "qty": 40}], key)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self._qty(self.items[0]), 14)
+
+    def test_atomic_batch_rejects_everything(self):
+        key = f"test-{uuid.uuid4()}"
+        lines = [{"item_id": self.items[0], "movement_type": "in", "qty": 5},
+                 {"item_id": self.items[1], "movement_type": "out", "qty": -1}]
+        resp = self._post(lines, key)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([r["ok"] for r in resp.get_json()["results"]], [True, False])
+        self.assertEqual((self._qty(self.items[0]), self._movements()), (10, 0))
+        # Neúspěšná dávka se neukládá - opravená jde se stejným klíčem projít
+        lines[1]["qty"] = 1
+        self.assertEqual(self._post(lines, key).status_code, 200)
+
+    def test_non_atomic_batch_applies_valid_lines(self):
+        resp = self._post([{"item_id": self.items[0], "movement_type": "in", "qty": 5},
+                           {"item_id": 0, "movement_type": "in", "qty": 5}], atomic=False)
+        self.assertEqual(resp.status_code, 200)
+        payload = resp.get_json()
+        self.assertEqual((payload["applied"], payload["rejected"]), (1, 1))
+        self.assertEqual(self._qty(self.items[0]), 15)
+
+
+class CompleteInventoryTest(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.execute("UPDATE warehouse_inventory SET status = 'cancelled' WHERE status = 'in_progress'")
+        self.inventory = testing_support.insert(self.db, "warehouse_inventory", inventory_date="2026-01-01")
+        for item_id, counted in zip(self.items, (12, 7)):
+            testing_support.insert(self.db, "warehouse_inventory_items", inventory_id=self.inventory,
+                                   item_id=item_id, expected_qty=10, counted_qty=counted, difference=counted - 10)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.execute("DELETE FROM warehouse_inventory_items WHERE inventory_id = ?", (self.inventory,))
+        self.db.execute("DELETE FROM warehouse_inventory WHERE id = ?", (self.inventory,))
+        self.db.execute("DELETE FROM warehouse_movement_batches WHERE idempotency_key = ?",
+                        (f"inventory:{self.inventory}",))
+        self.db.commit()
+        super().tearDown()
+
+    def _complete(self):
+        return self.client.post(f"/api/warehouse/inventory/{self.inventory}/complete", json={})
+
+    def test_complete_applies_differences_once(self):
+        resp = self._complete()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["adjustments_count"], 2)
+        self.assertEqual((self._qty(self.items[0]), self._qty(self.items[1])), (12, 7))
+        replay = self._complete()
+        self.assertEqual(replay.status_code, 200)
+        self.assertTrue(replay.get_json()["replayed"])
+        self.assertEqual(self._movements(), 2)
+
+    def test_deleted_item_is_skipped(self):
+        gone = self.items.pop()
+        self.db.execute("DELETE FROM warehouse_items WHERE id = ?", (gone,))
+        self.db.commit()
+        resp = self._complete()
+        self.assertEqual(resp.status_code, 200)
+        payload = resp.get_json()
+        self.assertEqual(payload["adjustments_count"], 1)
+        self.assertEqual([s["item_id"] for s in payload["skipped"]], [gone])
+        self.assertEqual(self._qty(self.items[0]), 12)
+        status = self.db.execute("SELECT status FROM warehouse_inventory WHERE id = ?", (self.inventory,)).fetchone()
+        self.assertEqual(status[0], "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Testy materializovaného stavu skladu: triggery na warehouse_items musí dát
+totéž co rebuild_stock_summary (vložení, pohyby, změna minima, archivace,
+smazání) a warehouse_stats z nich čte správná čísla.
+Spustit: python3 -m pytest -q test_stock_summary.py
+"""
+import unittest
+from datetime import date
+
+import testing_support
+from app.utils.stock_movements import apply_movement_batch
+from app.utils.stock_summary import _item_columns, low_stock_items, rebuild_stock_summary, warehouse_stats
+
+
+class StockSummaryTest(testing_support.DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cols = _item_columns(self.db)
+        self.items = []
+
+    def tearDown(self):
+        for item_id in self.items:
+            self.db.execute("DELETE FROM warehouse_movements WHERE item_id = ?", (item_id,))
+            self.db.execute("DELETE FROM warehouse_items WHERE id = ?", (item_id,))
+        self.db.commit()
+        super().tearDown()
+
+    def _item(self, name, qty, min_qty=0, price=0, expiration=None):
+        c = self.cols
+        values = {c["qty"]: qty, c["min_qty"]: min_qty}
+        if c["price"]:
+            values[c["price"]] = price
+        if c["expiration_date"]:
+            values[c["expiration_date"]] = expiration
+        item_id = testing_support.insert(self.db, "warehouse_items", name=name, unit="ks", status="active", **values)
+        self.db.commit()
+        self.items.append(item_id)
+        return item_id
+
+    def _snapshot(self):
+        state = self.db.execute(
+            "SELECT item_id, name, location, qty, min_qty, price, expiration_date, state "
+            "FROM warehouse_stock_state ORDER BY item_id").fetchall()
+        summary = self.db.execute("SELECT total_items, ROUND(total_value, 6), low_stock, out_of_stock "
+                                  "FROM warehouse_stock_summary").fetchall()
+        return [tuple(r) for r in state], [tuple(r) for r in summary]
+
+    def assertMatchesRebuild(self):
+        maintained = self._snapshot()
+        rebuild_stock_summary(self.db)
+        self.assertEqual(maintained, self._snapshot())
+
+    def _state(self, item_id):
+        row = self.db.execute("SELECT state FROM warehouse_stock_state WHERE item_id = ?", (item_id,)).fetchone()
+        return row[0] if row else None
+
+    def test_item_lifecycle_matches_rebuild(self):
+        c = self.cols
+        bolts = self._item("Summary šrouby", 50, min_qty=20, price=2.5)
+        soil = self._item("Summary substrát", 5, min_qty=10, price=120)
+        empty = self._item("Summary prázdné", 0, price=10)
+        self.assertEqual((self._state(bolts), self._state(soil), self._state(empty)), ("ok", "low", "out"))
+        self.assertMatchesRebuild()
+
+        steps = [
+            lambda: apply_movement_batch(self.db, [{"item_id": bolts, "movement_type": "out", "qty": 40},
+                                                   {"item_id": soil, "movement_type": "in", "qty": 10},
+                                                   {"item_id": empty, "movement_type": "in", "qty": 3}]),
+            lambda: self.db.execute(f"UPDATE warehouse_items SET {c['min_qty']} = 0 WHERE id = ?", (bolts,)),
+            lambda: self.db.execute("UPDATE warehouse_items SET name = 'Summary hlína' WHERE id = ?", (soil,)),
+            lambda: self.db.execute("DELETE FROM warehouse_items WHERE id = ?", (empty,)),
+        ]
+        if c["status"]:
+            steps.append(lambda: self.db.execute("UPDATE warehouse_items SET status = 'archived' WHERE id = ?",
+                                                 (soil,)))
+        if c["price"]:
+            steps.append(lambda: self.db.execute(f"UPDATE warehouse_items SET {c['price']} = 3 WHERE id = ?",
+                                                 (bolts,)))
+        for i, step in enumerate(steps):
+            with self.subTest(step=i):
+                step()
+                self.db.commit()
+                self.assertMatchesRebuild()
+
+    def test_stats_and_low_stock(self):
+        rebuild_stock_summary(self.db)
+        before = warehouse_stats(self.db, date(2026, 6, 1))
+        low = self._item("Summary málo", 2, min_qty=10, price=1)
+        self._item("Summary dost", 30, min_qty=10, price=1)
+        after = warehouse_stats(self.db, date(2026, 6, 1))
+        self.assertEqual(after["total_items"] - before["total_items"], 2)
+        self.assertEqual(after["low_stock"] - before["low_stock"], 1)
+        self.assertAlmostEqual(after["total_value"] - before["total_value"], 32)
+        self.assertIn(low, [row["id"] for row in low_stock_items(self.db, item_ids=self.items)])
+        self.assertEqual(len(low_stock_items(self.db, item_ids=self.items)), 1)
+
+    def test_expiration_counts(self):
+        if not self.cols["expiration_date"]:
+            self.skipTest("warehouse_items bez expiration_date")
+        rebuild_stock_summary(self.db)
+        today = date(2026, 6, 1)
+        before = warehouse_stats(self.db, today)
+        self._item("Summary prošlé", 1, expiration="2026-05-01")
+        self._item("Summary brzy", 1, expiration="2026-06-10")
+        self._item("Summary později", 1, expiration="2026-12-01")
+        after = warehouse_stats(self.db, today)
+        self.assertEqual((after["expired"] - before["expired"], after["expiring_soon"] - before["expiring_soon"]),
+                         (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
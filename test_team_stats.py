@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Testy týmových metrik (/api/employees, /api/team/stats) nad týdenním rollupem.
+Spustit: python3 -m pytest -q test_team_stats.py
+"""
+import unittest
+
+import testing_support
+from app.utils.capacity import week_bounds
+
+
+class TeamStatsTest(testing_support.DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        insert = testing_support.insert
+        week_start, _ = week_bounds()
+        self.busy = insert(self.db, "employees", name="Stats Busy", role="worker", status="active")
+        self.idle = insert(self.db, "employees", name="Stats Idle", role="worker", status="active")
+        self.job = insert(self.db, "jobs", title="Stats", name="Stats", client="", city="", code="ST")
+        # Ostatní zaměstnanci dočasně neaktivní - metriky počítají jen tyto dva
+        self.others = [tuple(r) for r in self.db.execute(
+            "SELECT id, status FROM employees WHERE id NOT IN (?, ?)", (self.busy, self.idle))]
+        self.db.execute("UPDATE employees SET status = 'inactive' WHERE id NOT IN (?, ?)", (self.busy, self.idle))
+        insert(self.db, "team_member_profile", employee_id=self.busy, weekly_capacity_hours=20)
+        for hours in (8, 8, 6):
+            insert(self.db, "timesheets", employee_id=self.busy, job_id=self.job, date=week_start, hours=hours)
+        self.db.commit()
+        self.client = testing_support.admin_client()
+
+    def tearDown(self):
+        self.db.execute("DELETE FROM timesheets WHERE employee_id IN (?, ?)", (self.busy, self.idle))
+        self.db.execute("DELETE FROM team_member_profile WHERE employee_id IN (?, ?)", (self.busy, self.idle))
+        self.db.execute("DELETE FROM employees WHERE id IN (?, ?)", (self.busy, self.idle))
+        self.db.execute("DELETE FROM jobs WHERE id = ?", (self.job,))
+        self.db.executemany("UPDATE employees SET status = ? WHERE id = ?",
+                            [(status, emp_id) for emp_id, status in self.others])
+        self.db.commit()
+        super().tearDown()
+
+    def test_employees_week_hours(self):
+        resp = self.client.get("/api/employees")
+        self.assertEqual(resp.status_code, 200)
+        by_id = {e["id"]: e for e in resp.get_json()["employees"]}
+        self.assertEqual(by_id[self.busy]["hours_week"], 22)
+        self.assertEqual(by_id[self.idle]["hours_week"], 0)
+        self.assertEqual(by_id[self.busy]["profile"]["capacity_percent"], 110)
+
+    def test_team_stats(self):
+        resp = self.client.get("/api/team/stats")
+        self.assertEqual(resp.status_code, 200)
+        stats = resp.get_json()["stats"]
+        # 22 h / 20 h = 110 %, druhý zaměstnanec 0 % (výchozí kapacita 40 h)
+        self.assertEqual(stats["active_count"], 2)
+        self.assertEqual(stats["average_utilization"], 55.0)
+        self.assertEqual(stats["overloaded_count"], 1)
+        self.assertEqual(stats["ai_balance_score"], 45)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Testy kanonického data výkazů (date / date_iso udržované triggery).
+Spustit: python3 -m pytest -q test_timesheet_dates.py
+"""
+import unittest
+
+import testing_support
+
+
+class TimesheetDateTest(testing_support.DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        insert = testing_support.insert
+        self.employee = insert(self.db, "employees", name="Date Test", role="worker")
+        self.job = insert(self.db, "jobs", title="Date Test", name="Date Test", client="", city="", code="DT")
+        # Počítadlo UPDATE výkazů (temp trigger nad hlavní tabulkou, jen pro toto připojení)
+        self.db.executescript("""
+            CREATE TEMP TABLE IF NOT EXISTS ts_updates (n INTEGER);
+            DELETE FROM ts_updates;
+            INSERT INTO ts_updates VALUES (0);
+            CREATE TEMP TRIGGER IF NOT EXISTS trg_count_ts_updates AFTER UPDATE ON main.timesheets
+            BEGIN UPDATE ts_updates SET n = n + 1; END;
+        """)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.executescript("DROP TRIGGER IF EXISTS temp.trg_count_ts_updates; DROP TABLE IF EXISTS temp.ts_updates;")
+        self.db.execute("DELETE FROM timesheets WHERE employee_id = ?", (self.employee,))
+        self.db.execute("DELETE FROM employees WHERE id = ?", (self.employee,))
+        self.db.execute("DELETE FROM jobs WHERE id = ?", (self.job,))
+        self.db.commit()
+        super().tearDown()
+
+    def _insert(self, date):
+        cur = self.db.execute("INSERT INTO timesheets (employee_id, job_id, date, hours) VALUES (?, ?, ?, 8)",
+                              (self.employee, self.job, date))
+        return cur.lastrowid
+
+    def _stored(self, ts):
+        return tuple(self.db.execute("SELECT date, date_iso FROM timesheets WHERE id = ?", (ts,)).fetchone())
+
+    def _updates(self):
+        return self.db.execute("SELECT n FROM ts_updates").fetchone()[0]
+
+    def test_czech_date_is_canonicalized(self):
+        ts = self._insert("5.1.2026")
+        self.assertEqual(self._stored(ts), ("2026-01-05", "2026-01-05"))
+        self.db.execute("UPDATE timesheets SET date = '17.2.2026' WHERE id = ?", (ts,))
+        self.assertEqual(self._stored(ts), ("2026-02-17", "2026-02-17"))
+
+    def test_unknown_format_is_kept(self):
+        ts = self._insert("někdy")
+        self.assertEqual(self._stored(ts), ("někdy", None))
+
+    def test_insert_rewrites_row_once(self):
+        self._insert("2026-01-06")
+        self.assertEqual(self._updates(), 1)
+        self._insert("6.1.2026")
+        self.assertEqual(self._updates(), 2)
+
+    def test_canonical_date_update_does_not_cascade(self):
+        ts = self._insert("2026-01-07")
+        before = self._updates()
+        self.db.execute("UPDATE timesheets SET date = '2026-01-08' WHERE id = ?", (ts,))
+        # vnější UPDATE + jeden vnořený (date_iso), žádný další
+        self.assertEqual(self._updates() - before, 2)
+        self.db.execute("UPDATE timesheets SET date = date WHERE id = ?", (ts,))
+        self.assertEqual(self._updates() - before, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
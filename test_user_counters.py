@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Testy počítadel pro /api/me: triggery musí dát totéž co přepočet od nuly
+(reconcile_user_counters po každém kroku nic neopravuje).
+Spustit: python3 -m pytest -q test_user_counters.py
+"""
+import unittest
+import uuid
+
+import testing_support
+from app.utils.user_counters import counters_for, reconcile_user_counters
+
+
+class UserCountersTest(testing_support.DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        insert = testing_support.insert
+        self.users = [insert(self.db, "users", email=f"counters-{uuid.uuid4()}@test.local", name=f"Counter {i}",
+                             role="worker", password_hash="x") for i in range(2)]
+        self.employees = [insert(self.db, "employees", name=f"Counter {i}", role="worker", user_id=user)
+                          for i, user in enumerate(self.users)]
+        self.db.commit()
+        reconcile_user_counters(self.db)
+        self.created = []
+
+    def tearDown(self):
+        for table, row_id in reversed(self.created):
+            self.db.execute(f"DELETE FROM {table} WHERE rowid = ?", (row_id,))
+        self.db.execute(f"DELETE FROM employees WHERE id IN ({','.join('?' * len(self.employees))})", self.employees)
+        self.db.execute(f"DELETE FROM user_counters WHERE user_id IN ({','.join('?' * len(self.users))})", self.users)
+        self.db.execute(f"DELETE FROM users WHERE id IN ({','.join('?' * len(self.users))})", self.users)
+        self.db.commit()
+        super().tearDown()
+
+    def _insert(self, table, **values):
+        row_id = testing_support.insert(self.db, table, **values)
+        self.created.append((table, row_id))
+        return row_id
+
+    def _step(self, sql, params=()):
+        self.db.execute(sql, params)
+        self.db.commit()
+
+    def assertCounters(self, user, **expected):
+        self.assertEqual(reconcile_user_counters(self.db), 0)
+        counters = counters_for(self.db, user)
+        self.assertEqual({k: counters[k] for k in expected}, expected)
+
+    def test_notifications(self):
+        u1 = self.users[0]
+        self._insert("notifications", user_id=u1, title="a")
+        self._insert("notifications", employee_id=self.employees[0], title="b")
+        both = self._insert("notifications", user_id=u1, employee_id=self.employees[0], title="c")
+        self.db.commit()
+        self.assertCounters(u1, unread_notifications=3)
+        self._step("UPDATE notifications SET is_read = 1 WHERE id = ?", (both,))
+        self.assertCounters(u1, unread_notifications=2)
+        self._step("UPDATE notifications SET is_read = 0, user_id = NULL WHERE id = ?", (both,))
+        self.assertCounters(u1, unread_notifications=3)
+        self._step("DELETE FROM notifications WHERE id = ?", (both,))
+        self.assertCounters(u1, unread_notifications=2)
+
+    def test_tasks_and_assignments(self):
+        (u1, u2), (e1, e2) = self.users, self.employees
+        own = self._insert("tasks", title="own", status="open", created_by=str(u1), employee_id=e2)
+        other = self._insert("tasks", title="other", status="open")
+        self.db.commit()
+        self.assertCounters(u1, open_tasks=1)
+        self.assertCounters(u2, open_tasks=1)
+
+        # Přiřazení k úkolu, ke kterému už vede jiná cesta, nic nemění
+        self._insert("task_assignments", task_id=own, employee_id=e1)
+        self._insert("task_assignments", task_id=other, employee_id=e1)
+        self.db.commit()
+        self.assertCounters(u1, open_tasks=2)
+        self._step("DELETE FROM task_assignments WHERE task_id = ? AND employee_id = ?", (own, e1))
+        self.assertCounters(u1, open_tasks=2)
+        self._step("UPDATE tasks SET status = 'completed' WHERE id = ?", (other,))
+        self.assertCounters(u1, open_tasks=1)
+        self._step("UPDATE tasks SET employee_id = ? WHERE id = ?", (e1, own))
+        self.assertCounters(u2, open_tasks=0)
+        self._step("DELETE FROM task_assignments WHERE task_id = ?", (other,))
+        self.assertCounters(u1, open_tasks=1)
+
+    def test_issues_and_employee_relink(self):
+        (u1, u2), (e1, e2) = self.users, self.employees
+        issue = self._insert("issues", title="issue", status="open", assigned_to=e2)
+        self._insert("issue_assignments", issue_id=issue, employee_id=e1)
+        self.db.commit()
+        self.assertCounters(u1, open_issues=1)
+        self.assertCounters(u2, open_issues=1)
+
+        # Zaměstnanec e1 přepojený na druhého uživatele
+        self._step("UPDATE employees SET user_id = ? WHERE id = ?", (u2, e1))
+        self.assertCounters(u1, open_issues=0)
+        self.assertCounters(u2, open_issues=1)
+        self._step("UPDATE issues SET status = 'resolved' WHERE id = ?", (issue,))
+        self.assertCounters(u2, open_issues=0)
+        self._step("DELETE FROM issue_assignments WHERE issue_id = ?", (issue,))
+        self._step("UPDATE issues SET status = 'open' WHERE id = ?", (issue,))
+        self.assertCounters(u2, open_issues=1)
+        self._step("DELETE FROM employees WHERE id = ?", (e2,))
+        self.employees.remove(e2)
+        self.assertCounters(u2, open_issues=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
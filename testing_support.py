@@ -0,0 +1,61 @@
+"""
+Společná příprava pro unittest testy v kořeni repozitáře.
+
+Importovat PŘED main / app.* - app.config čte DB_PATH při importu. Testy běží
+nad dočasnou databází (migrace proběhnou při importu main), scheduler AI
+pravidel se nespouští.
+"""
+import os
+import tempfile
+import unittest
+
+# Vždy izolovaná dočasná databáze - testy mažou a přepisují řádky
+TMPDIR = tempfile.mkdtemp(prefix="green_david_tests_")
+os.environ["DB_PATH"] = os.path.join(TMPDIR, "test_app.db")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(TMPDIR, "response_cache.db")
+os.environ["DB_SNAPSHOT_DIR"] = os.path.join(TMPDIR, "snapshots")
+os.environ["AI_RULES_SCHEDULER"] = "0"
+os.environ.setdefault("ADMIN_EMAIL", "admin@greendavid.local")
+os.environ.setdefault("ADMIN_PASSWORD", "admin123")
+
+import main  # noqa: E402
+from app.database import get_db, open_connection  # noqa: E402
+
+app = main.app
+
+
+def connect():
+    """Samostatné připojení k testovací databázi (sqlite3.Row, FK zapnuté)."""
+    return open_connection()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Test v app contextu; self.db je pooled připojení z get_db()."""
+
+    def setUp(self):
+        self._ctx = app.app_context()
+        self._ctx.push()
+        self.db = get_db()
+
+    def tearDown(self):
+        self.db.rollback()
+        self._ctx.pop()
+
+
+def admin_client():
+    """Test client přihlášený jako výchozí admin."""
+    client = app.test_client()
+    client.post("/api/login", json={"email": os.environ["ADMIN_EMAIL"],
+                                    "password": os.environ["ADMIN_PASSWORD"]})
+    return client
+
+
+def insert(db, table, **values):
+    """INSERT jen se sloupci, které tabulka v tomto schématu má; vrací rowid."""
+    columns = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+    values = {k: v for k, v in values.items() if k in columns}
+    cur = db.execute(
+        f"INSERT INTO {table} ({', '.join(values)}) VALUES ({', '.join('?' for _ in values)})",
+        tuple(values.values()),
+    )
+    return cur.lastrowid
@@ -8,11 +8,15 @@ Warehouse Extended Features
 - Přejmenování/Slučování položek
 - Inventurní režim
 """
-from flask import jsonify, request, session
-from datetime import datetime, date, timedelta
 import json
+from datetime import date, datetime, timedelta
+
+from flask import jsonify, request, session
 
-get_db = None  # Will be set from main.py
+# Pooled connection from app.database (single injection point for all modules)
+from app.database import get_db
+from app.utils import stock_summary
+from app.utils.stock_movements import BatchError, apply_movement_batch
 
 # ================================================================
 # DATABASE MIGRATIONS
@@ -322,6 +326,48 @@ def get_movements():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def export_movements():
+    """GET /api/warehouse/movements/export?format=csv|xlsx&item_id=X&job_id=Y&from=&to=
+
+    Bez limitu - streamuje se po dávkách (viz app.utils.exports).
+    """
+    from app.utils.exports import export_response, iter_query
+    db = get_db()
+    query = """
+        SELECT wm.id, wm.created_at, wm.movement_type, wm.item_id,
+               wi.name as item_name, wm.qty, wi.unit as item_unit,
+               wm.job_id, j.title as job_title,
+               wm.employee_id, e.name as employee_name,
+               wm.from_location, wm.to_location, wm.batch_number, wm.note
+        FROM warehouse_movements wm
+        LEFT JOIN warehouse_items wi ON wm.item_id = wi.id
+        LEFT JOIN jobs j ON wm.job_id = j.id
+        LEFT JOIN employees e ON wm.employee_id = e.id
+        WHERE 1=1
+    """
+    params = []
+    for arg, column in (('item_id', 'wm.item_id'), ('job_id', 'wm.job_id')):
+        value = request.args.get(arg, type=int)
+        if value:
+            query += f" AND {column} = ?"
+            params.append(value)
+    # created_at je "YYYY-MM-DD HH:MM:SS" - rozsah po dnech bez date() kvůli indexu
+    if request.args.get('from'):
+        query += " AND wm.created_at >= ?"
+        params.append(request.args['from'][:10])
+    if request.args.get('to'):
+        query += " AND wm.created_at < date(?, '+1 day')"
+        params.append(request.args['to'][:10])
+    query += " ORDER BY wm.created_at, wm.id"
+
+    header = ['id', 'created_at', 'movement_type', 'item_id', 'item_name', 'qty', 'unit',
+              'job_id', 'job_title', 'employee_id', 'employee_name',
+              'from_location', 'to_location', 'batch_number', 'note']
+    rows = (list(r) for r in iter_query(db, query, params))
+    return export_response(request.args.get('format', 'csv').lower(), 'pohyby-skladu', header, rows,
+                           sheet_title='Pohyby')
+
+
 def create_movement():
     """POST /api/warehouse/movements
     
@@ -720,62 +766,90 @@ def update_inventory_item(inventory_item_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def create_movement_batch():
+    """POST /api/warehouse/movements/batch
+
+    Body: {"lines": [{item_id, movement_type, qty, job_id, ...}, ...],
+           "atomic": true, "idempotency_key": "..."}
+    movement_type / job_id / employee_id / note v těle platí jako výchozí
+    hodnoty pro řádky. Klíč lze poslat i hlavičkou Idempotency-Key.
+    """
+    db = get_db()
+    try:
+        data = request.get_json(silent=True) or {}
+        lines = data.get('lines')
+        if not isinstance(lines, list) or not lines:
+            return jsonify({'success': False, 'error': 'Chybí řádky dávky (lines)'}), 400
+        defaults = {k: data[k] for k in ('movement_type', 'job_id', 'employee_id', 'note') if k in data}
+        lines = [dict(defaults, **line) if isinstance(line, dict) else line for line in lines]
+        key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        payload, status = apply_movement_batch(db, lines, idempotency_key=key,
+                                               atomic=data.get('atomic', True) is not False)
+        return jsonify(payload), status
+    except BatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        if db.in_transaction:
+            db.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 def complete_inventory(inventory_id):
     """POST /api/warehouse/inventory/<id>/complete
     
-    Ukončí inventuru a aplikuje rozdíly
+    Ukončí inventuru a aplikuje rozdíly (jedna dávka adjustment pohybů).
+    Idempotentní: opakované dokončení vrátí původní výsledek. Rozdíly u
+    položek, které mezitím někdo archivoval nebo smazal, se přeskočí
+    (skipped v odpovědi) - jinak by inventura nešla dokončit nikdy.
     """
+    db = get_db()
     try:
-        data = request.json
-        db = get_db()
-        
-        # Získej všechny položky s rozdíly
-        items = db.execute("""
-            SELECT item_id, difference, note
-            FROM warehouse_inventory_items
-            WHERE inventory_id = ?
-            AND counted_qty IS NOT NULL
-            AND difference != 0
-        """, (inventory_id,)).fetchall()
-        
-        # Aplikuj každý rozdíl jako adjustment movement
-        for item in items:
-            # Vytvoř movement
-            db.execute("""
-                INSERT INTO warehouse_movements
-                (item_id, movement_type, qty, note)
-                VALUES (?, 'adjustment', ?, ?)
-            """, (
-                item['item_id'],
-                item['difference'],
-                f"Inventura {inventory_id}: {item['note'] or 'Korekce stavu'}"
-            ))
-            
-            # Aktualizuj qty v items
+        data = request.get_json(silent=True) or {}
+        lines = []
+
+        def inventory_lines(db):
+            inventory = db.execute("SELECT status FROM warehouse_inventory WHERE id = ?",
+                                   (inventory_id,)).fetchone()
+            if inventory is None:
+                raise BatchError('Inventura neexistuje', 404)
+            if inventory['status'] != 'in_progress':
+                raise BatchError('Inventura není rozpracovaná', 409)
+            # Rozdíly se čtou až pod zámkem, souběžné sčítání je už nezmění
+            items = db.execute("""
+                SELECT item_id, difference, note
+                FROM warehouse_inventory_items
+                WHERE inventory_id = ?
+                AND counted_qty IS NOT NULL
+                AND difference != 0
+            """, (inventory_id,)).fetchall()
+            lines[:] = [{
+                'item_id': item['item_id'],
+                'movement_type': 'adjustment',
+                'qty': item['difference'],
+                'note': f"Inventura {inventory_id}: {item['note'] or 'Korekce stavu'}",
+            } for item in items]
+            return lines
+
+        def mark_completed(db, payload):
             db.execute("""
-                UPDATE warehouse_items
-                SET qty = qty + ?,
-                    updated_at = datetime('now')
+                UPDATE warehouse_inventory
+                SET status = 'completed',
+                    completed_by = ?,
+                    completed_at = datetime('now')
                 WHERE id = ?
-            """, (item['difference'], item['item_id']))
-        
-        # Označ inventuru jako dokončenou
-        db.execute("""
-            UPDATE warehouse_inventory
-            SET status = 'completed',
-                completed_by = ?,
-                completed_at = datetime('now')
-            WHERE id = ?
-        """, (data.get('completed_by'), inventory_id))
-        
-        db.commit()
-        
-        return jsonify({
-            'success': True,
-            'adjustments_count': len(items)
-        })
+            """, (data.get('completed_by'), inventory_id))
+            payload['adjustments_count'] = payload['applied']
+            payload['skipped'] = [{'item_id': lines[r['line']]['item_id'], 'error': r['error']}
+                                  for r in payload['results'] if not r['ok']]
+
+        payload, status = apply_movement_batch(db, inventory_lines, idempotency_key=f"inventory:{inventory_id}",
+                                               atomic=False, finalize=mark_completed)
+        return jsonify(payload), status
+    except BatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
     except Exception as e:
-        db.rollback()
+        if db.in_transaction:
+            db.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -884,79 +958,16 @@ def rename_item(item_id):
 # ------------ STATS ------------
 
 def get_warehouse_stats():
-    """GET /api/warehouse/stats"""
+    """GET /api/warehouse/stats
+
+    Čte materializovaný souhrn (app.utils.stock_summary) - jeden dotaz
+    místo skenů warehouse_items a warehouse_reservations.
+    """
     try:
         db = get_db()
-        
-        # Celková hodnota
-        total_value = db.execute("""
-            SELECT COALESCE(SUM(qty * price), 0) as total
-            FROM warehouse_items
-            WHERE status = 'active'
-        """).fetchone()['total']
-        
-        # Celkem položek
-        total_items = db.execute("""
-            SELECT COUNT(*) as cnt
-            FROM warehouse_items
-            WHERE status = 'active'
-        """).fetchone()['cnt']
-        
-        # Nízký stav
-        low_stock = db.execute("""
-            SELECT COUNT(*) as cnt
-            FROM warehouse_items
-            WHERE status = 'active'
-            AND qty > 0
-            AND qty < minStock
-        """).fetchone()['cnt']
-        
-        # Nedostupné
-        out_of_stock = db.execute("""
-            SELECT COUNT(*) as cnt
-            FROM warehouse_items
-            WHERE status = 'active'
-            AND qty <= 0
-        """).fetchone()['cnt']
-        
-        # Expirující položky (do 30 dnů)
-        expiring_soon = db.execute("""
-            SELECT COUNT(*) as cnt
-            FROM warehouse_items
-            WHERE status = 'active'
-            AND expiration_date != ''
-            AND date(expiration_date) <= date('now', '+30 days')
-            AND date(expiration_date) > date('now')
-        """).fetchone()['cnt']
-        
-        # Již expirované
-        expired = db.execute("""
-            SELECT COUNT(*) as cnt
-            FROM warehouse_items
-            WHERE status = 'active'
-            AND expiration_date != ''
-            AND date(expiration_date) <= date('now')
-        """).fetchone()['cnt']
-        
-        # Rezervované množství
-        reserved = db.execute("""
-            SELECT COALESCE(SUM(qty), 0) as total
-            FROM warehouse_reservations
-            WHERE status = 'active'
-            AND reserved_until >= date('now')
-        """).fetchone()['total']
-        
         return jsonify({
             'success': True,
-            'stats': {
-                'total_value': round(total_value, 2),
-                'total_items': total_items,
-                'low_stock': low_stock,
-                'out_of_stock': out_of_stock,
-                'expiring_soon': expiring_soon,
-                'expired': expired,
-                'reserved': round(reserved, 2)
-            }
+            'stats': stock_summary.warehouse_stats(db)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500